@@ -16,17 +16,45 @@ Version: 1.0.0
 # ============================================
 
 # Flask framework imports
-from flask import Flask, jsonify, request, send_file, render_template
+from flask import Flask, Response, g, jsonify, request, send_file, render_template, stream_with_context
 from flask_cors import CORS
 
 # Service imports (our custom modules)
+from services.admission_control import admission_controller
 from services.ai_client import gemini_client
+from services.bulk_export import find_documents, stream_zip
+from services.circuit_breaker import CircuitOpenError, ai_circuit
+from services.content_store import content_store
 from services.doc_generator import document_generator
-from utils.helpers import format_api_response, validate_topic
-from utils.logger import logger
+from services.document_catalog import CatalogQueryError, document_catalog
+from services.docx_compression import COMPRESSION_PROFILES, archive_recompressor, normalize_profile
+from services.docx_writer import document_builder, fragment_docx_writer
+from services.file_server import file_server
+from services.generation_pipeline import GenerationError, generation_pipeline, scheduled_generator
+from services.generation_plan import PlanError, generate_for_plan, is_cached, resolve_plan
+from services.generation_scheduler import SchedulerRejected, generation_scheduler
+from services.job_journal import job_journal
+from services.output_formats import OUTPUT_FORMATS, normalize_format, output_formats
+from services.prompt_builder import prompt_builder
+from services.section_content import ContentError, validate_sections
+from services.section_patcher import PatchError, section_patcher
+from services.semantic_cache import semantic_cache
+from services.shared_cache import shared_cache
+from services.topic_warmer import topic_warmer
+from services.streaming_ingest import IngestError, MemoryMeter, SectionSpool, ingest_limits, parse_document_stream
+from utils.helpers import format_api_response, is_valid_file_id
+from utils.structured_logger import get_request_id, logger, set_request_id
+from utils.profiler import SamplingProfiler
+from utils.tracing import instrument_methods, tracer
+from utils.topic_validator import topic_validator
 
 # Standard library imports
+import hmac
 import os
+import threading
+import time
+import uuid
+from datetime import datetime
 
 
 # ============================================
@@ -45,6 +73,188 @@ app.config['DEBUG'] = True              # Enable debug mode (disable in producti
 app.config['JSON_SORT_KEYS'] = False    # Keep JSON keys in original order
 
 
+# ============================================
+# PROMPT BUILDER SETUP
+# ============================================
+
+# Compile the static prompt once and measure input tokens of model calls
+if gemini_client:
+    prompt_builder.install(gemini_client)
+    # Provider errors the client turns into failed results still trip the breaker
+    ai_circuit.watch(getattr(gemini_client, 'model', None))
+
+
+# ============================================
+# TRACING SETUP
+# ============================================
+
+# Wrap pipeline steps in spans without changing the services themselves
+if gemini_client:
+    instrument_methods(
+        gemini_client,
+        ['generate_academic_content', '_create_academic_prompt', '_parse_academic_content'],
+        'GeminiAIClient'
+    )
+    # The model call itself
+    if getattr(gemini_client, 'model', None) is not None:
+        instrument_methods(gemini_client.model, ['generate_content'], 'gemini')
+
+instrument_methods(
+    document_generator,
+    ['create_blackbook', '_setup_document_styles', '_generate_unique_filename']
+    + [name for name in dir(document_generator) if name.startswith('_add_')],
+    'DocumentGenerator'
+)
+
+instrument_methods(fragment_docx_writer, ['create_blackbook'], 'FragmentDocxWriter')
+
+# Saving the .docx (zip + XML serialization) inside create_blackbook
+try:
+    from docx.document import Document as DocxDocument
+    instrument_methods(DocxDocument, ['save'], 'docx')
+except ImportError:
+    pass
+
+
+# ============================================
+# STARTUP TASKS
+# ============================================
+
+# Resume generations orphaned by a crashed or redeployed worker. Every
+# worker scans; the journal's compare-and-set claims hand each job to one.
+if gemini_client:
+    job_journal.recover(generation_pipeline.run)
+
+# Documents written with a cheap profile before a restart still get archived
+archive_recompressor.resume_pending()
+
+# Pre-generate trending topics with idle model capacity (WARMER_ENABLED)
+if gemini_client:
+    topic_warmer.start(scheduled_generator('warmer', 'batch'))
+
+
+# Index documents created before the catalog existed (no-op once filled)
+threading.Thread(
+    target=document_catalog.backfill,
+    args=('outputs', content_store.load),
+    name='catalog-backfill',
+    daemon=True
+).start()
+
+
+# ============================================
+# REQUEST LIFECYCLE
+# ============================================
+
+@app.before_request
+def assign_request_id():
+    """
+    Attach a request ID to every log record of this request
+    
+    Uses the client's X-Request-ID header when present so logs can be
+    matched with the caller's own traces.
+    """
+    incoming_id = request.headers.get('X-Request-ID', '')
+    if not incoming_id or len(incoming_id) > 64 or not is_valid_file_id(incoming_id):
+        incoming_id = uuid.uuid4().hex[:16]
+    set_request_id(incoming_id)
+    
+    # Root span for the whole request (continues an incoming W3C trace)
+    g.request_span = tracer.start_span(
+        f"{request.method} {request.path}",
+        traceparent=request.headers.get('traceparent'),
+        request_id=incoming_id
+    )
+
+
+# Endpoints that call the model; only these are subject to load shedding
+ADMISSION_CONTROLLED_ENDPOINTS = frozenset({'generate_blackbook', 'generate_content_only'})
+
+
+@app.before_request
+def shed_overload():
+    """
+    Reject generation requests early when the server is overloaded
+    
+    Runs before any generation work. Requests that a cache or an
+    idempotent replay answers without a model call are let through even
+    when model calls are being shed. Health checks, downloads and all
+    other endpoints are never shed.
+    """
+    if request.endpoint not in ADMISSION_CONTROLLED_ENDPOINTS:
+        return None
+    
+    decision = admission_controller.try_admit('interactive', without_model=_answered_without_model)
+    if decision.admitted:
+        g.admitted = True
+        return None
+    
+    logger.warning(f"Load shed ({decision.reason}): {request.method} {request.path}")
+    response = jsonify(format_api_response(
+        success=False,
+        error="Server is overloaded. Please retry later.",
+        error_code="OVERLOADED",
+        reason=decision.reason,
+        retry_after=decision.retry_after
+    ))
+    response.headers['Retry-After'] = str(decision.retry_after)
+    return response, 503
+
+
+def _answered_without_model():
+    """
+    Check whether a generation request needs no model call
+    
+    True for a replay of a completed Idempotency-Key job and for topics
+    whose result is already cached. Only asked for requests that would
+    otherwise be shed; invalid requests are left to the endpoint.
+    """
+    idempotency_key = request.headers.get('Idempotency-Key', '').strip()
+    if idempotency_key and len(idempotency_key) <= 64 and is_valid_file_id(idempotency_key):
+        job = job_journal.get(idempotency_key)
+        if job is not None and job['status'] == 'completed':
+            return True
+    
+    request_data = request.get_json(silent=True)
+    if not isinstance(request_data, dict):
+        return False
+    verdict = topic_validator.validate(request_data.get('topic', ''))
+    if not verdict.is_valid:
+        return False
+    try:
+        plan = resolve_plan(request_data.get('length'), request_data.get('sections'))
+    except PlanError:
+        return False
+    return is_cached(verdict.topic, plan)
+
+
+@app.after_request
+def add_request_id_header(response):
+    """Return the request and trace IDs so clients can quote them when reporting issues"""
+    request_id = get_request_id()
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    
+    # Trace ID lets slow requests be found in logs/traces.jsonl
+    request_span = g.get('request_span')
+    if request_span is not None:
+        request_span.set_attribute('http.status_code', response.status_code)
+        response.headers['X-Trace-ID'] = request_span.trace_id
+        response.headers['traceparent'] = tracer.traceparent(request_span)
+    return response
+
+
+@app.teardown_request
+def end_request_span(error=None):
+    """Free the admission slot, finish the request span and export the trace"""
+    if g.pop('admitted', False):
+        admission_controller.release()
+    
+    request_span = g.pop('request_span', None)
+    if request_span is not None:
+        tracer.end_span(request_span, error=str(error) if error else None)
+
+
 # ============================================
 # BASIC ENDPOINTS
 # ============================================
@@ -79,7 +289,14 @@ def api_info():
             "web_ui": "GET /",
             "api_info": "GET /api",
             "generate": "POST /generate",
+            "job_status": "GET /jobs/<job_id>",
+            "documents": "GET /documents?q=&format=&sort=&cursor=",
             "download": "GET /download/<file_id>",
+            "bulk_download": "POST /download/bulk",
+            "render": "POST /documents/<file_id>/render",
+            "edit_section": "PATCH /documents/<file_id>/sections/<name>",
+            "cache_stats": "GET /api/cache/stats",
+            "metrics": "GET /metrics",
             "health": "GET /health"
         }
     })
@@ -95,13 +312,18 @@ def health_check():
     """
     logger.info("Health check requested")
     
-    # Check if Gemini AI client is initialized
-    gemini_status = "connected" if gemini_client else "not configured"
+    # Gemini status follows the circuit breaker (open = recent calls failing or too slow)
+    circuit = ai_circuit.get_stats()
+    if not gemini_client:
+        gemini_status = "not configured"
+    else:
+        gemini_status = {'closed': "connected", 'half_open': "recovering", 'open': "unavailable"}[circuit['state']]
     
     return jsonify({
-        "status": "healthy",
+        "status": "degraded" if gemini_client and circuit['state'] == 'open' else "healthy",
         "service": "AI Blackbook Generator",
         "gemini_api": gemini_status,
+        "ai_circuit": circuit,
         "timestamp": logger.get_timestamp()
     })
 
@@ -123,16 +345,24 @@ def generate_blackbook():
     
     Request Body:
         {
-            "topic": "Your academic topic here"
+            "topic": "Your academic topic here",
+            "length": "preview" | "short" | "standard" (default) | "long",
+            "sections": ["abstract", "conclusion"]    (optional subset)
         }
     
+    Query Parameters:
+        format: docx (default), html, markdown or pdf
+        compression: stored, fast, default or max (DOCX only)
+    
+    Headers:
+        Idempotency-Key: Optional job ID; retrying with the same key
+            returns the stored result or resumes the unfinished job
+    
     Returns:
         JSON: Success response with file info or error details
     """
     try:
-        logger.info("=" * 60)
-        logger.info("NEW GENERATION REQUEST")
-        logger.info("=" * 60)
+        logger.info("New generation request")
         
         # ----------------------------------------
         # STEP 1: Validate Gemini API is configured
@@ -168,123 +398,107 @@ def generate_blackbook():
                 error_code="MISSING_TOPIC"
             )), 400
         
-        # Get and clean the topic
-        topic = request_data.get('topic', '').strip()
-        
-        # Validate topic using helper function
-        is_valid, error_message, error_code = validate_topic(topic)
-        if not is_valid:
-            logger.warning(f"Invalid topic: {error_message}")
+        # Validate and normalize the topic (precompiled rules, memoized verdicts)
+        topic = request_data.get('topic', '')
+        with tracer.span('validate_topic', topic_length=len(topic) if isinstance(topic, str) else None):
+            verdict = topic_validator.validate(topic)
+        if not verdict.is_valid:
+            logger.warning(f"Invalid topic: {verdict.error}")
             return jsonify(format_api_response(
                 success=False,
-                error=error_message,
-                error_code=error_code
+                error=verdict.error,
+                error_code=verdict.error_code
             )), 400
+        topic = verdict.topic
         
-        logger.info(f"Topic received: {topic}")
-        
-        # ----------------------------------------
-        # STEP 3: Generate AI content
-        # ----------------------------------------
-        logger.info("Step 1/2: Generating AI content with Gemini...")
-        
-        ai_result = gemini_client.generate_academic_content(topic)
-        
-        # Check if AI generation was successful
-        if not ai_result.get('success'):
-            error_msg = ai_result.get('error', 'Unknown error')
-            logger.error(f"AI generation failed: {error_msg}")
+        # Validate requested output format (default: docx)
+        output_format = normalize_format(request.args.get('format'))
+        if output_format is None:
             return jsonify(format_api_response(
                 success=False,
-                error=error_msg,
-                error_code="AI_GENERATION_FAILED",
-                topic=topic
-            )), 500
-        
-        logger.success("AI content generated successfully")
-        
-        # ----------------------------------------
-        # STEP 4: Extract and validate sections
-        # ----------------------------------------
-        logger.info("Extracting content sections...")
-        
-        sections = ai_result.get('content', {})
+                error=f"Unsupported format. Use one of: {', '.join(OUTPUT_FORMATS)}",
+                error_code="INVALID_FORMAT"
+            )), 400
         
-        # Remove full_text (we only need individual sections)
-        if 'full_text' in sections:
-            del sections['full_text']
+        # DOCX compression profile (stored / fast / default / max)
+        compression = _requested_compression(request_data)
+        if compression is None:
+            return _invalid_compression_response()
         
-        # Verify we have sections
-        if not sections:
-            logger.error("No sections found in AI content")
+        # Sections and length to generate (default: the full blackbook)
+        try:
+            plan = resolve_plan(request_data.get('length'), request_data.get('sections'))
+        except PlanError as e:
             return jsonify(format_api_response(
                 success=False,
-                error="AI generated content but no sections were found",
-                error_code="NO_SECTIONS_FOUND",
-                topic=topic
-            )), 500
+                error=str(e),
+                error_code=e.error_code
+            )), 400
         
-        logger.info(f"Found {len(sections)} sections: {', '.join(sections.keys())}")
+        logger.info(f"Topic received: {topic}")
         
         # ----------------------------------------
-        # STEP 5: Create Word document
+        # STEP 3: Find or create the job
         # ----------------------------------------
-        logger.info("Step 2/2: Creating Word document...")
         
-        doc_result = document_generator.create_blackbook(
-            title=topic,
-            sections_dict=sections
-        )
-        
-        # Check if document creation was successful
-        if not doc_result.get('success'):
-            error_msg = doc_result.get('error', 'Unknown error')
-            logger.error(f"Document creation failed: {error_msg}")
+        # A retry with the same Idempotency-Key resumes (or replays) the
+        # earlier job instead of calling Gemini again
+        idempotency_key = request.headers.get('Idempotency-Key', '').strip()
+        if idempotency_key and (len(idempotency_key) > 64 or not is_valid_file_id(idempotency_key)):
             return jsonify(format_api_response(
                 success=False,
-                error=error_msg,
-                error_code="DOCUMENT_CREATION_FAILED",
-                topic=topic
-            )), 500
+                error="Idempotency-Key must be a short alphanumeric ID (max 64 characters)",
+                error_code="INVALID_IDEMPOTENCY_KEY"
+            )), 400
         
-        logger.success(f"Document created: {doc_result['filename']}")
+        client_id, priority = _scheduling_identity()
+        job = job_journal.claim(idempotency_key) if idempotency_key else None
+        
+        if job is not None:
+            job_journal.record_resume(job, replayed=job['status'] == 'completed')
+            if job['status'] == 'completed':
+                logger.info(f"Replaying completed job {job['job_id']}")
+                return jsonify(job['response']), 200
+        elif not idempotency_key or job_journal.get(idempotency_key) is None:
+            # None if a concurrent request with the same key created it first
+            job = generation_pipeline.new_job(
+                topic, output_format=output_format, client_id=client_id,
+                priority=priority, job_id=idempotency_key or None,
+                options={'compression': compression, 'length': plan.length, 'sections': list(plan.sections)}
+            )
+        
+        if job is None:
+            return jsonify(format_api_response(
+                success=False,
+                error="A request with this Idempotency-Key is still in progress",
+                error_code="JOB_IN_PROGRESS",
+                job_id=idempotency_key
+            )), 409
         
         # ----------------------------------------
-        # STEP 6: Prepare response
+        # STEP 4: Run (or resume) the pipeline
         # ----------------------------------------
         
-        # Extract file information
-        filename = doc_result['filename']
-        file_id = filename.rsplit('_', 1)[-1].replace('.docx', '')
-        
-        # Build response object
-        response_data = {
-            "success": True,
-            "message": "Document generated successfully",
-            "topic": topic,
-            "file_id": file_id,
-            "filename": filename,
-            "download_link": f"/download/{file_id}",
-            "download_url": f"http://localhost:5000/download/{file_id}",
-            "download_link_full": f"/api/download/{filename}",
-            "download_url_full": f"http://localhost:5000/api/download/{filename}",
-            "document_info": {
-                "file_size": doc_result['file_size'],
-                "file_size_kb": round(doc_result['file_size'] / 1024, 2),
-                "sections_count": doc_result['sections_count'],
-                "sections": list(sections.keys())
-            },
-            "ai_metadata": {
-                "model": ai_result.get('metadata', {}).get('model', 'gemini-pro'),
-                "word_count": ai_result.get('metadata', {}).get('word_count', 0),
-                "character_count": ai_result.get('metadata', {}).get('character_count', 0)
-            }
-        }
-        
-        logger.success(f"Generation complete! File ID: {file_id}")
-        logger.info("=" * 60)
+        # AI content -> Word document -> stored sections; each finished stage
+        # is journaled, so a restarted worker resumes instead of starting over
+        response_data = generation_pipeline.run(job, scheduled_generator(client_id, priority))
         
         return jsonify(response_data), 200
+    
+    except GenerationError as e:
+        logger.error(f"Generation failed ({e.error_code}): {str(e)}")
+        return jsonify(format_api_response(
+            success=False,
+            error=str(e),
+            error_code=e.error_code,
+            topic=topic
+        )), e.status_code
+    
+    except SchedulerRejected as e:
+        return _queue_rejected_response(e)
+    
+    except CircuitOpenError as e:
+        return _ai_unavailable_response(e)
         
     except Exception as e:
         # Catch any unexpected errors
@@ -297,6 +511,193 @@ def generate_blackbook():
         )), 500
 
 
+@app.route('/jobs/<job_id>')
+def get_job_status(job_id):
+    """
+    Look up a generation job
+    
+    Lets a client whose connection dropped (e.g. during a deploy) pick up
+    the result once the job was resumed by a restarted worker.
+    
+    Args:
+        job_id (str): Job ID from the /generate response or Idempotency-Key
+    
+    Returns:
+        JSON: Job stage and status, plus the response once completed
+    """
+    if len(job_id) > 64 or not is_valid_file_id(job_id):
+        return jsonify(format_api_response(
+            success=False,
+            error="Invalid job ID format",
+            error_code="INVALID_JOB_ID"
+        )), 400
+    
+    job = job_journal.get(job_id)
+    if job is None:
+        return jsonify(format_api_response(
+            success=False,
+            error="Job not found",
+            error_code="JOB_NOT_FOUND"
+        )), 404
+    
+    return jsonify(format_api_response(
+        success=True,
+        job_id=job_id,
+        topic=job['topic'],
+        status=job['status'],
+        stage=job['stage'],
+        attempts=job['attempts'],
+        error=job['error'],
+        error_code=job['error_code'],
+        result=job['response']
+    )), 200
+
+
+def _scheduling_identity():
+    """
+    Identify the client and priority class of a generation request
+    
+    Both are decided on the server: HTTP requests are always interactive
+    (batch work comes from batch_generate.py and the topic warmer), and
+    the client is the one mapped to the X-API-Key header in
+    SCHEDULER_API_KEYS, or else the remote address. Client-supplied
+    priority or client ID fields are ignored.
+    
+    Returns:
+        tuple: (client_id, priority)
+    """
+    client_id = generation_scheduler.identify_client(request.headers.get('X-API-Key', ''), request.remote_addr)
+    return client_id, 'interactive'
+
+
+def _requested_compression(options):
+    """
+    Compression profile requested for a new DOCX
+    
+    Taken from the ?compression= query parameter or the "compression"
+    body field; falls back to DOCX_COMPRESSION_PROFILE.
+    
+    Args:
+        options (dict): Parsed request body (or other request options)
+    
+    Returns:
+        str: Profile name, or None if the requested profile is unknown
+    """
+    return normalize_profile(request.args.get('compression') or options.get('compression'))
+
+
+def _invalid_compression_response():
+    """Build the 400 response for an unknown compression profile"""
+    return jsonify(format_api_response(
+        success=False,
+        error=f"Unsupported compression. Use one of: {', '.join(COMPRESSION_PROFILES)}",
+        error_code="INVALID_COMPRESSION"
+    )), 400
+
+
+def _queue_rejected_response(rejection):
+    """
+    Build the 503 response for a request rejected by the scheduler
+    
+    Args:
+        rejection (SchedulerRejected): The scheduler's rejection
+    
+    Returns:
+        tuple: (JSON response with Retry-After header, 503)
+    """
+    logger.warning(f"Generation rejected by scheduler: {str(rejection)}")
+    response = jsonify(format_api_response(
+        success=False,
+        error=str(rejection),
+        error_code="QUEUE_OVER_BUDGET",
+        priority=rejection.priority,
+        retry_after=rejection.retry_after
+    ))
+    response.headers['Retry-After'] = str(rejection.retry_after)
+    return response, 503
+
+
+def _ai_unavailable_response(error):
+    """
+    Build the 503 response for a generation refused by the circuit breaker
+    
+    Args:
+        error (CircuitOpenError): The breaker's error
+    
+    Returns:
+        tuple: (JSON response with Retry-After header, 503)
+    """
+    logger.warning(f"Generation failed fast: {str(error)}")
+    response = jsonify(format_api_response(
+        success=False,
+        error=str(error),
+        error_code=error.error_code,
+        retry_after=error.retry_after
+    ))
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status_code
+
+
+def _send_preview(file_id, output_format):
+    """
+    Send a cached (or freshly rendered) preview format of a document
+    
+    Args:
+        file_id (str): Document file ID
+        output_format (str): 'html', 'markdown' or 'pdf'
+    
+    Returns:
+        Response: File download or JSON error
+    """
+    record = content_store.load(file_id)
+    if record is None:
+        logger.warning(f"No stored content for {output_format} download: {file_id}")
+        return jsonify(format_api_response(
+            success=False,
+            error=f"No stored content found for file ID: {file_id}",
+            error_code="FILE_NOT_FOUND",
+            file_id=file_id
+        )), 404
+    
+    filepath = output_formats.get_or_render(file_id, output_format, record)
+    download_name = output_formats.download_name(record, file_id, output_format)
+    
+    logger.info(f"Sending {output_format} preview: {download_name}")
+    document_catalog.increment_downloads(file_id)
+    
+    # Previews inside outputs/ can be offloaded like documents
+    relative_path = os.path.relpath(filepath, 'outputs')
+    entry = None if relative_path.startswith('..') else file_server.index.stat(relative_path)
+    if entry is not None:
+        return file_server.send(entry, download_name=download_name, mimetype=OUTPUT_FORMATS[output_format][1])
+    
+    return send_file(
+        filepath,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=OUTPUT_FORMATS[output_format][1]
+    )
+
+
+def _file_not_found_response(filename):
+    """
+    404 response for a document file that does not exist (or is not a regular file)
+    
+    Args:
+        filename (str): Requested filename
+    
+    Returns:
+        tuple: (JSON response, 404)
+    """
+    logger.warning(f"File not found: {filename}")
+    return jsonify(format_api_response(
+        success=False,
+        error=f"File not found: {filename}",
+        error_code="FILE_NOT_FOUND",
+        filename=filename
+    )), 404
+
+
 # ============================================
 # DOWNLOAD ENDPOINTS
 # ============================================
@@ -310,6 +711,9 @@ def download_by_file_id(file_id):
     
     Args:
         file_id: The UUID identifier (e.g., "a1b2c3d4")
+    
+    Query Parameters:
+        format: docx (default), html, markdown or pdf
         
     Returns:
         File: Word document with proper headers
@@ -341,22 +745,33 @@ def download_by_file_id(file_id):
                 error_code="INVALID_FILE_ID"
             )), 400
         
+        # Preview formats are rendered from stored content and cached
+        output_format = normalize_format(request.args.get('format'))
+        if output_format is None:
+            return jsonify(format_api_response(
+                success=False,
+                error=f"Unsupported format. Use one of: {', '.join(OUTPUT_FORMATS)}",
+                error_code="INVALID_FORMAT"
+            )), 400
+        
+        if output_format != 'docx':
+            return _send_preview(file_id, output_format)
+        
         # ----------------------------------------
-        # STEP 2: Search for file in outputs folder
+        # STEP 2: Look up the file (catalog first, directory scan as fallback)
         # ----------------------------------------
         
-        outputs_directory = 'outputs'
-        matching_files = []
+        # Stat results come from the file index (cached per file)
+        document = document_catalog.get(file_id)
+        entry = file_server.index.stat(document['filename']) if document and document['filename'] else None
         
-        # Check if outputs directory exists
-        if os.path.exists(outputs_directory):
-            # Search for files containing this ID
-            for filename in os.listdir(outputs_directory):
-                if filename.endswith('.docx') and file_id in filename:
-                    matching_files.append(filename)
+        # Documents created before the catalog (or by other tools): the
+        # directory scan is shared by all workers
+        if entry is None:
+            entry = file_server.index.find_by_file_id(file_id)
         
-        # Check if we found any matching files
-        if not matching_files:
+        # Check if we found a matching file
+        if entry is None:
             logger.warning(f"No file found for ID: {file_id}")
             return jsonify(format_api_response(
                 success=False,
@@ -369,19 +784,17 @@ def download_by_file_id(file_id):
         # STEP 3: Send file to client
         # ----------------------------------------
         
-        # Use the first matching file (should only be one)
-        filename = matching_files[0]
-        filepath = os.path.join(outputs_directory, filename)
+        filename = entry.filename
         
-        logger.info(f"Sending file: {filename}")
+        logger.info(f"Sending file: {filename} ({entry.size} bytes, {file_server.mode})")
+        document_catalog.increment_downloads(file_id)
         
-        # Send file with proper headers
-        return send_file(
-            filepath,
-            as_attachment=True,                    # Force download
-            download_name=filename,                # Filename for download
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
+        # Send file with proper headers (or let the front proxy send it)
+        return file_server.send(entry, download_name=filename, mimetype=OUTPUT_FORMATS['docx'][1])
+        
+    except FileNotFoundError as e:
+        # Deleted between the lookup and the send
+        return _file_not_found_response(os.path.basename(str(e.filename or '')))
         
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}")
@@ -392,6 +805,95 @@ def download_by_file_id(file_id):
         )), 500
 
 
+@app.route('/download/bulk', methods=['POST'])
+def download_bulk():
+    """
+    Download many documents as one streamed ZIP archive
+    
+    The archive is built while it is sent, so memory use stays at one
+    read chunk no matter how many documents are requested. DOCX files are
+    stored without recompression.
+    
+    Request Body:
+        {
+            "file_ids": ["a1b2c3d4", "e5f6a7b8", ...]
+        }
+    
+    Returns:
+        File: ZIP archive (IDs without a document are listed in the
+              X-Missing-File-Ids header)
+        JSON: Error message if the request is invalid or nothing was found
+    """
+    try:
+        # ----------------------------------------
+        # STEP 1: Validate file ID list
+        # ----------------------------------------
+        request_data = request.get_json(silent=True) or {}
+        file_ids = request_data.get('file_ids')
+        
+        if not isinstance(file_ids, list) or not file_ids:
+            return jsonify(format_api_response(
+                success=False,
+                error="Request body must contain a non-empty 'file_ids' list",
+                error_code="MISSING_FILE_IDS"
+            )), 400
+        
+        max_files = int(os.getenv('BULK_DOWNLOAD_MAX_FILES', 500))
+        if len(file_ids) > max_files:
+            return jsonify(format_api_response(
+                success=False,
+                error=f"Too many files requested (maximum {max_files})",
+                error_code="TOO_MANY_FILES"
+            )), 400
+        
+        invalid_ids = [fid for fid in file_ids if not isinstance(fid, str) or not is_valid_file_id(fid)]
+        if invalid_ids:
+            return jsonify(format_api_response(
+                success=False,
+                error="Invalid file ID format. Use only letters, numbers, hyphens, and underscores",
+                error_code="INVALID_FILE_ID",
+                invalid_file_ids=[str(fid) for fid in invalid_ids[:20]]
+            )), 400
+        
+        # ----------------------------------------
+        # STEP 2: Locate documents
+        # ----------------------------------------
+        documents, missing_ids = find_documents(file_ids)
+        
+        if not documents:
+            logger.warning("Bulk download found no documents")
+            return jsonify(format_api_response(
+                success=False,
+                error="None of the requested documents were found",
+                error_code="FILE_NOT_FOUND",
+                missing_file_ids=missing_ids
+            )), 404
+        
+        logger.info(f"Streaming bulk download: {len(documents)} files, {len(missing_ids)} missing")
+        document_catalog.increment_downloads(*(set(file_ids) - set(missing_ids)))
+        
+        # ----------------------------------------
+        # STEP 3: Stream the archive
+        # ----------------------------------------
+        headers = {'Content-Disposition': 'attachment; filename=blackbooks.zip'}
+        if missing_ids:
+            headers['X-Missing-File-Ids'] = ','.join(missing_ids)
+        
+        return Response(
+            stream_with_context(stream_zip(documents)),
+            mimetype='application/zip',
+            headers=headers
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in bulk download: {str(e)}")
+        return jsonify(format_api_response(
+            success=False,
+            error=f"Bulk download failed: {str(e)}",
+            error_code="DOWNLOAD_ERROR"
+        )), 500
+
+
 @app.route('/api/download/<filename>')
 def download_by_filename(filename):
     """
@@ -402,6 +904,9 @@ def download_by_filename(filename):
     
     Args:
         filename: Full filename including .docx extension
+    
+    Query Parameters:
+        format: docx (default), html, markdown or pdf
         
     Returns:
         File: Word document with proper headers
@@ -440,50 +945,363 @@ def download_by_filename(filename):
         # This ensures filename doesn't contain path separators
         filename = os.path.basename(filename)
         
-        # Build full file path
-        filepath = os.path.join('outputs', filename)
+        # Preview formats are rendered from the document's stored content
+        output_format = normalize_format(request.args.get('format'))
+        if output_format is None:
+            return jsonify(format_api_response(
+                success=False,
+                error=f"Unsupported format. Use one of: {', '.join(OUTPUT_FORMATS)}",
+                error_code="INVALID_FORMAT"
+            )), 400
+        
+        if output_format != 'docx':
+            file_id = filename.rsplit('_', 1)[-1].replace('.docx', '')
+            return _send_preview(file_id, output_format)
+        
+        # One cached stat() answers exists / is-a-file / size
+        entry = file_server.index.stat(filename)
+        if entry is None:
+            return _file_not_found_response(filename)
+        
+        # ----------------------------------------
+        # STEP 3: Send file to client
+        # ----------------------------------------
+        
+        # Log file size for monitoring
+        logger.info(f"Sending file: {filename} ({entry.size} bytes, {file_server.mode})")
+        document_catalog.increment_downloads(filename.rsplit('_', 1)[-1].replace('.docx', ''))
+        
+        # Send file with proper headers (or let the front proxy send it)
+        return file_server.send(entry, download_name=filename, mimetype=OUTPUT_FORMATS['docx'][1])
+        
+    except FileNotFoundError as e:
+        # Deleted between the lookup and the send
+        return _file_not_found_response(os.path.basename(str(e.filename or '')))
+        
+    except Exception as e:
+        logger.error(f"Error downloading file: {str(e)}")
+        return jsonify(format_api_response(
+            success=False,
+            error=f"Download failed: {str(e)}",
+            error_code="DOWNLOAD_ERROR"
+        )), 500
+
+
+# ============================================
+# DOCUMENT ENDPOINTS
+# ============================================
+
+@app.route('/documents')
+def list_documents():
+    """
+    List generated documents from the catalog
+    
+    Query Parameters:
+        q: Words to search for in titles and topics (prefix match)
+        format: Only documents of this format (docx, html, markdown, pdf)
+        created_after / created_before: ISO date (2026-01-31) or Unix timestamp
+        min_size / max_size: File size bounds in bytes
+        sort: newest (default), oldest or downloads
+        limit: Page size, 1-100 (default: 20)
+        cursor: next_cursor from the previous page
+    
+    Returns:
+        JSON: Page of documents and the cursor for the next page
+    """
+    try:
+        args = request.args
+        
+        output_format = None
+        if args.get('format'):
+            output_format = normalize_format(args.get('format'))
+            if output_format is None:
+                return jsonify(format_api_response(
+                    success=False,
+                    error=f"Unsupported format. Use one of: {', '.join(OUTPUT_FORMATS)}",
+                    error_code="INVALID_FORMAT"
+                )), 400
+        
+        try:
+            page = document_catalog.search(
+                query=args.get('q'),
+                output_format=output_format,
+                created_after=_parse_time_param(args.get('created_after')),
+                created_before=_parse_time_param(args.get('created_before')),
+                min_size=int(args['min_size']) if args.get('min_size') else None,
+                max_size=int(args['max_size']) if args.get('max_size') else None,
+                sort=args.get('sort', 'newest'),
+                limit=int(args.get('limit', 20)),
+                cursor=args.get('cursor')
+            )
+        except (CatalogQueryError, ValueError) as e:
+            return jsonify(format_api_response(
+                success=False,
+                error=f"Invalid query parameter: {str(e)}",
+                error_code="INVALID_QUERY"
+            )), 400
+        
+        for document in page['documents']:
+            document['created'] = datetime.fromtimestamp(document['created_at']).isoformat(timespec='seconds')
+            document['download_link'] = f"/download/{document['file_id']}" + (
+                '' if document['format'] == 'docx' else f"?format={document['format']}"
+            )
+        
+        return jsonify(format_api_response(
+            success=True,
+            count=len(page['documents']),
+            documents=page['documents'],
+            next_cursor=page['next_cursor']
+        )), 200
+        
+    except Exception as e:
+        logger.error(f"Error listing documents: {str(e)}")
+        return jsonify(format_api_response(
+            success=False,
+            error=f"Server error: {str(e)}",
+            error_code="INTERNAL_SERVER_ERROR"
+        )), 500
+
+
+def _parse_time_param(value):
+    """
+    Parse an ISO date/datetime or a Unix timestamp query parameter
+    
+    Returns:
+        float: Unix timestamp, or None if the parameter is empty
+    
+    Raises:
+        ValueError: If the value is neither format
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@app.route('/documents/<file_id>/render', methods=['POST'])
+def render_stored_document(file_id):
+    """
+    Re-render a document from its stored AI content (no model call)
+    
+    The sections generated for a document are kept next to its file ID,
+    so a new title or a different section selection only costs a
+    document build, not another Gemini request.
+    
+    Request Body (all fields optional):
+        {
+            "title": "New document title",
+            "sections": ["abstract", "introduction", "conclusion"]
+        }
+    
+    Args:
+        file_id: ID of the document whose content should be reused
+    
+    Returns:
+        JSON: Information about the newly rendered document
+    """
+    try:
+        logger.info(f"Render requested for stored content: {file_id}")
+        
+        # ----------------------------------------
+        # STEP 1: Validate file ID and load stored content
+        # ----------------------------------------
+        if not is_valid_file_id(file_id):
+            return jsonify(format_api_response(
+                success=False,
+                error="Invalid file ID format. Use only letters, numbers, hyphens, and underscores",
+                error_code="INVALID_FILE_ID"
+            )), 400
         
-        # Check if file exists
-        if not os.path.exists(filepath):
-            logger.warning(f"File not found: {filename}")
+        record = content_store.load(file_id)
+        if record is None:
+            logger.warning(f"No stored content for file ID: {file_id}")
             return jsonify(format_api_response(
                 success=False,
-                error=f"File not found: {filename}",
-                error_code="FILE_NOT_FOUND",
-                filename=filename
+                error=f"No stored content found for file ID: {file_id}",
+                error_code="CONTENT_NOT_FOUND",
+                file_id=file_id
             )), 404
         
-        # Verify it's actually a file (not a directory)
-        if not os.path.isfile(filepath):
-            logger.error(f"Path is not a file: {filepath}")
+        # ----------------------------------------
+        # STEP 2: Apply render options
+        # ----------------------------------------
+        options = request.get_json(silent=True) or {}
+        
+        title = (options.get('title') or record['title']).strip()
+        sections = record['sections']
+        
+        selected_sections = options.get('sections')
+        if selected_sections is not None:
+            if not isinstance(selected_sections, list):
+                return jsonify(format_api_response(
+                    success=False,
+                    error="'sections' must be a list of section names",
+                    error_code="INVALID_SECTIONS"
+                )), 400
+            
+            unknown = [name for name in selected_sections if name not in sections]
+            if unknown:
+                return jsonify(format_api_response(
+                    success=False,
+                    error=f"Unknown sections: {', '.join(map(str, unknown))}",
+                    error_code="INVALID_SECTIONS",
+                    available_sections=list(sections.keys())
+                )), 400
+            
+            # Keep the requested order
+            sections = {name: sections[name] for name in selected_sections}
+        
+        if not title or not sections:
             return jsonify(format_api_response(
                 success=False,
-                error="Invalid file path",
-                error_code="INVALID_PATH"
+                error="Title and at least one section are required",
+                error_code="INVALID_RENDER_OPTIONS"
             )), 400
         
+        compression = _requested_compression(options)
+        if compression is None:
+            return _invalid_compression_response()
+        
         # ----------------------------------------
-        # STEP 3: Send file to client
+        # STEP 3: Build the new document
         # ----------------------------------------
+        start_time = time.perf_counter()
+        doc_result = document_builder.create_blackbook(title=title, sections_dict=sections, compression=compression)
+        render_ms = (time.perf_counter() - start_time) * 1000
         
-        # Log file size for monitoring
-        file_size = os.path.getsize(filepath)
-        logger.info(f"Sending file: {filename} ({file_size} bytes)")
-        
-        # Send file with proper headers
-        return send_file(
-            filepath,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        if not doc_result.get('success'):
+            error_msg = doc_result.get('error', 'Unknown error')
+            logger.error(f"Re-render failed: {error_msg}")
+            return jsonify(format_api_response(
+                success=False,
+                error=error_msg,
+                error_code="DOCUMENT_CREATION_FAILED",
+                file_id=file_id
+            )), 500
+        
+        filename = doc_result['filename']
+        new_file_id = filename.rsplit('_', 1)[-1].replace('.docx', '')
+        content_store.save(
+            new_file_id, title=title, sections=sections,
+            topic=record.get('topic'), filename=filename, source_file_id=file_id
+        )
+        document_catalog.record(
+            new_file_id, title=title, topic=record.get('topic'), filename=filename,
+            file_size=doc_result['file_size'], sections=sections.keys(),
+            compression=doc_result['compression']['profile']
         )
         
+        logger.success(f"Document re-rendered in {render_ms:.1f} ms: {filename}")
+        
+        return jsonify({
+            "success": True,
+            "message": "Document rendered from stored content",
+            "source_file_id": file_id,
+            "file_id": new_file_id,
+            "filename": filename,
+            "download_link": f"/download/{new_file_id}",
+            "download_link_full": f"/api/download/{filename}",
+            "document_info": {
+                "file_size": doc_result['file_size'],
+                "file_size_kb": round(doc_result['file_size'] / 1024, 2),
+                "sections_count": doc_result['sections_count'],
+                "sections": list(sections.keys()),
+                "render_time_ms": round(render_ms, 2),
+                "compression": doc_result.get('compression')
+            }
+        }), 200
+        
     except Exception as e:
-        logger.error(f"Error downloading file: {str(e)}")
+        logger.error(f"Error rendering stored document: {str(e)}")
         return jsonify(format_api_response(
             success=False,
-            error=f"Download failed: {str(e)}",
-            error_code="DOWNLOAD_ERROR"
+            error=f"Render failed: {str(e)}",
+            error_code="INTERNAL_SERVER_ERROR"
+        )), 500
+
+
+@app.route('/documents/<file_id>/sections/<section_name>', methods=['PATCH'])
+def patch_document_section(file_id, section_name):
+    """
+    Replace a single section of an existing document
+    
+    Only the edited section is sent and re-rendered; the rest of the
+    document is reused from cached fragments. Sending an empty
+    content string removes the section.
+    
+    Request Body:
+        {
+            "content": "New section text..."
+        }
+    
+    Args:
+        file_id: ID of the document to edit
+        section_name: Section key, e.g. "introduction"
+    
+    Returns:
+        JSON: Patch summary with updated file information
+    """
+    try:
+        logger.info(f"Section edit requested: {file_id}/{section_name}")
+        
+        # ----------------------------------------
+        # STEP 1: Validate input
+        # ----------------------------------------
+        if not is_valid_file_id(file_id):
+            return jsonify(format_api_response(
+                success=False,
+                error="Invalid file ID format. Use only letters, numbers, hyphens, and underscores",
+                error_code="INVALID_FILE_ID"
+            )), 400
+        
+        if not all(c.isalnum() or c == '_' for c in section_name) or len(section_name) > 64:
+            return jsonify(format_api_response(
+                success=False,
+                error="Invalid section name. Use only letters, numbers and underscores",
+                error_code="INVALID_SECTION_NAME"
+            )), 400
+        
+        request_data = request.get_json(silent=True)
+        if not request_data or not isinstance(request_data.get('content'), str):
+            return jsonify(format_api_response(
+                success=False,
+                error="Request body must contain a 'content' string",
+                error_code="MISSING_CONTENT"
+            )), 400
+        
+        # ----------------------------------------
+        # STEP 2: Apply the edit
+        # ----------------------------------------
+        patch_result = section_patcher.patch_section(
+            file_id, section_name, request_data['content'].strip()
+        )
+        
+        logger.success(f"Section '{section_name}' updated in {patch_result['patch_time_ms']} ms")
+        
+        return jsonify(format_api_response(
+            success=True,
+            message="Section updated successfully",
+            download_link=f"/download/{file_id}",
+            **patch_result
+        )), 200
+        
+    except PatchError as e:
+        logger.warning(f"Section edit rejected: {str(e)}")
+        return jsonify(format_api_response(
+            success=False,
+            error=str(e),
+            error_code=e.error_code,
+            file_id=file_id
+        )), e.status_code
+        
+    except Exception as e:
+        logger.error(f"Error editing section: {str(e)}")
+        return jsonify(format_api_response(
+            success=False,
+            error=f"Section edit failed: {str(e)}",
+            error_code="INTERNAL_SERVER_ERROR"
         )), 500
 
 
@@ -499,6 +1317,13 @@ def generate_content_only():
     This endpoint only generates the AI content and returns it as JSON.
     Use /generate endpoint to also create a Word document.
     
+    Request Body:
+        {
+            "topic": "Your academic topic here",
+            "length": "preview" | "short" | "standard" (default) | "long",
+            "sections": ["abstract", "conclusion"]    (optional subset)
+        }
+    
     Returns:
         JSON: Generated content sections
     """
@@ -521,21 +1346,33 @@ def generate_content_only():
                 error_code="MISSING_TOPIC"
             )), 400
         
-        topic = request_data.get('topic', '').strip()
+        # Validate and normalize the topic
+        topic = request_data.get('topic', '')
+        with tracer.span('validate_topic', topic_length=len(topic) if isinstance(topic, str) else None):
+            verdict = topic_validator.validate(topic)
+        if not verdict.is_valid:
+            return jsonify(format_api_response(
+                success=False,
+                error=verdict.error,
+                error_code=verdict.error_code
+            )), 400
+        topic = verdict.topic
         
-        # Validate topic
-        is_valid, error_message, error_code = validate_topic(topic)
-        if not is_valid:
+        try:
+            plan = resolve_plan(request_data.get('length'), request_data.get('sections'))
+        except PlanError as e:
             return jsonify(format_api_response(
                 success=False,
-                error=error_message,
-                error_code=error_code
+                error=str(e),
+                error_code=e.error_code
             )), 400
         
-        logger.info(f"Generating content for: {topic}")
+        logger.info(f"Generating content for: {topic} ({plan.length}, {len(plan.sections)} sections)")
         
-        # Generate content
-        result = gemini_client.generate_academic_content(topic)
+        # Generate the requested sections (similar topics are served from the semantic cache)
+        result = generate_for_plan(
+            topic, plan, scheduled_generator(*_scheduling_identity())
+        )
         
         if result['success']:
             logger.success("Content generated successfully")
@@ -543,6 +1380,12 @@ def generate_content_only():
         else:
             logger.error(f"Content generation failed: {result.get('error')}")
             return jsonify(result), 500
+    
+    except SchedulerRejected as e:
+        return _queue_rejected_response(e)
+    
+    except CircuitOpenError as e:
+        return _ai_unavailable_response(e)
             
     except Exception as e:
         logger.error(f"Error in generate content endpoint: {str(e)}")
@@ -567,14 +1410,55 @@ def create_document_from_content():
             "sections": {
                 "abstract": "content...",
                 "introduction": "content...",
+                "results": [
+                    "content...",
+                    {"type": "table", "caption": "...", "columns": [...], "rows": [[...], ...]},
+                    {"type": "bullets", "items": [...]}
+                ],
+                "references": {"type": "references", "items": [...]},
                 ...
             }
         }
     
+    A section is plain text or a list of content blocks (see
+    services/section_content.py). Tables are rendered as bulk XML.
+    
+    Bodies larger than CREATE_DOCUMENT_STREAM_THRESHOLD (or sent without
+    a Content-Length) are parsed incrementally and written section by
+    section, so memory stays bounded by the largest section instead of
+    the whole upload. The response reports the request's memory use.
+    
     Returns:
-        JSON: Document information and download link
+        JSON: Document information, download link and memory report
     """
+    # ----------------------------------------
+    # STEP 1: Enforce the size limit and reserve memory
+    # ----------------------------------------
+    content_length = request.content_length
+    if content_length is not None and content_length > ingest_limits.max_bytes:
+        return jsonify(format_api_response(
+            success=False,
+            error=f"Request body exceeds {ingest_limits.max_bytes} bytes",
+            error_code="PAYLOAD_TOO_LARGE"
+        )), 413
+    
+    streamed = content_length is None or content_length > ingest_limits.stream_threshold
+    reservation = ingest_limits.estimate(content_length, streamed)
+    if not ingest_limits.reserve(reservation):
+        response = jsonify(format_api_response(
+            success=False,
+            error="Server is busy with other uploads. Please retry shortly.",
+            error_code="OVERLOADED",
+            retry_after=5
+        ))
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    meter = MemoryMeter()
     try:
+        if streamed:
+            return _create_document_streamed(meter)
+        
         # Get request data
         request_data = request.get_json()
         
@@ -605,19 +1489,51 @@ def create_document_from_content():
                 error_code="INVALID_SECTIONS"
             )), 400
         
+        # Tables, lists and references are checked before anything is written
+        validate_sections(sections)
+        
+        compression = _requested_compression(request_data)
+        if compression is None:
+            return _invalid_compression_response()
+        
         logger.info(f"Creating document: {title}")
         
         # Create document
-        result = document_generator.create_blackbook(title, sections)
+        result = document_builder.create_blackbook(title, sections, compression=compression)
         
         if result['success']:
+            # Keep the sections so the document can be re-rendered later
+            file_id = result['filename'].rsplit('_', 1)[-1].replace('.docx', '')
+            content_store.save(file_id, title=title, sections=sections, filename=result['filename'])
+            document_catalog.record(
+                file_id, title=title, topic=title, filename=result['filename'],
+                file_size=result['file_size'], sections=sections.keys(),
+                compression=result['compression']['profile']
+            )
+            
             # Add download URL to response
+            result['file_id'] = file_id
             result['download_url'] = f"/api/download/{result['filename']}"
+            result['memory'] = dict(meter.report(), streamed=False)
             logger.success(f"Document created: {result['filename']}")
             return jsonify(result), 200
         else:
             return jsonify(result), 500
             
+    except IngestError as e:
+        return jsonify(format_api_response(
+            success=False,
+            error=str(e),
+            error_code=e.error_code
+        )), e.status_code
+    
+    except ContentError as e:
+        return jsonify(format_api_response(
+            success=False,
+            error=str(e),
+            error_code=e.error_code
+        )), 400
+    
     except Exception as e:
         logger.error(f"Error in create document endpoint: {str(e)}")
         return jsonify(format_api_response(
@@ -625,6 +1541,241 @@ def create_document_from_content():
             error=f"Server error: {str(e)}",
             error_code="INTERNAL_SERVER_ERROR"
         )), 500
+    
+    finally:
+        ingest_limits.release(reservation)
+
+
+def _create_document_streamed(meter):
+    """
+    Create a document from a large body without loading it into memory
+    
+    Sections are spooled to a temporary file as they are parsed, then
+    streamed into the DOCX and the content store one at a time. Always
+    uses the fragment writer: python-docx needs the whole document tree
+    in memory.
+    
+    Args:
+        meter (MemoryMeter): Memory meter of the request
+    
+    Returns:
+        tuple: (JSON response, status code)
+    
+    Raises:
+        IngestError: If the body is invalid or exceeds a limit
+    """
+    spool = SectionSpool()
+    try:
+        title = None
+        options = {}
+        for event in parse_document_stream(request.stream, ingest_limits, meter):
+            if event[0] == 'title':
+                title = event[1].strip()
+            elif event[0] == 'section':
+                validate_sections({event[1]: event[2]})
+                spool.add(event[1], event[2])
+            else:
+                options[event[1]] = event[2]
+            meter.sample()
+        
+        if title is None:
+            return jsonify(format_api_response(
+                success=False,
+                error="Missing 'title' or 'sections' in request body",
+                error_code="MISSING_FIELDS"
+            )), 400
+        
+        if not title:
+            return jsonify(format_api_response(
+                success=False,
+                error="Title cannot be empty",
+                error_code="EMPTY_TITLE"
+            )), 400
+        
+        if not len(spool):
+            return jsonify(format_api_response(
+                success=False,
+                error="Sections must be a non-empty dictionary",
+                error_code="INVALID_SECTIONS"
+            )), 400
+        
+        compression = _requested_compression(options)
+        if compression is None:
+            return _invalid_compression_response()
+        
+        logger.info(f"Creating document (streamed): {title}, {len(spool)} sections")
+        
+        section_keys = spool.keys()
+        result = fragment_docx_writer.create_blackbook(
+            title, spool, section_keys=section_keys, compression=compression
+        )
+        meter.sample()
+        
+        if not result['success']:
+            return jsonify(result), 500
+        
+        file_id = result['filename'].rsplit('_', 1)[-1].replace('.docx', '')
+        content_store.save_streamed(file_id, title=title, section_items=spool.items(), filename=result['filename'])
+        document_catalog.record(
+            file_id, title=title, topic=title, filename=result['filename'],
+            file_size=result['file_size'], sections=section_keys,
+            compression=result['compression']['profile']
+        )
+        
+        result['file_id'] = file_id
+        result['download_url'] = f"/api/download/{result['filename']}"
+        result['memory'] = dict(meter.report(), streamed=True)
+        logger.success(f"Document created: {result['filename']} (peak RSS {result['memory']['peak_rss_mb']} MB)")
+        return jsonify(result), 200
+    
+    finally:
+        spool.close()
+
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """
+    Semantic cache statistics endpoint
+    
+    Reports how often similar topics were served from the cache
+    and how long the similarity lookups take.
+    
+    Returns:
+        JSON: Hit rate, entry count and lookup latency
+    """
+    logger.info("Cache statistics requested")
+    
+    return jsonify(format_api_response(
+        success=True,
+        semantic_cache=semantic_cache.get_stats()
+    )), 200
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Runtime metrics endpoint
+    
+    Collects the statistics of the admission, caching, scheduling, job
+    journal and logging layers in one place for dashboards and alerting.
+    
+    Returns:
+        JSON: Metrics grouped by component
+    """
+    return jsonify(format_api_response(
+        success=True,
+        timestamp=logger.get_timestamp(),
+        admission=admission_controller.get_stats(),
+        ai_circuit=ai_circuit.get_stats(),
+        scheduler=generation_scheduler.get_stats(),
+        jobs=job_journal.get_stats(),
+        prompts=prompt_builder.get_stats(),
+        topics=topic_validator.get_stats(),
+        downloads=file_server.get_stats(),
+        warmer=topic_warmer.get_stats(),
+        uploads=ingest_limits.get_stats(),
+        docx_archive=archive_recompressor.get_stats(),
+        semantic_cache=semantic_cache.get_stats(),
+        shared_cache=shared_cache.get_stats(),
+        logger=logger.get_stats()
+    )), 200
+
+
+# ============================================
+# DEBUG ENDPOINTS
+# ============================================
+
+# Only one profiling session may run at a time
+profiler_lock = threading.Lock()
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    """
+    Sample CPU stacks of all worker threads for N seconds
+    
+    Disabled unless DEBUG_PROFILER_TOKEN is set. The token must be sent
+    in the X-Debug-Token header (or as "Authorization: Bearer <token>").
+    
+    Query Parameters:
+        seconds: Sampling duration, 1-60 (default: 10)
+        mode: "all" (default) or "create_blackbook" to keep only stacks
+              inside document creation
+        output: "collapsed" (default, flamegraph input) or "json"
+                (adds the docx / zip / logging / model breakdown)
+    
+    Returns:
+        Text: Collapsed stacks ("frame;frame;frame count" per line)
+        JSON: Profile summary when output=json, or error details
+    """
+    # ----------------------------------------
+    # STEP 1: Check that profiling is enabled and authorized
+    # ----------------------------------------
+    expected_token = os.getenv('DEBUG_PROFILER_TOKEN', '')
+    if not expected_token:
+        return jsonify(format_api_response(
+            success=False,
+            error="The requested endpoint does not exist",
+            error_code="NOT_FOUND"
+        )), 404
+    
+    provided_token = request.headers.get('X-Debug-Token', '')
+    authorization = request.headers.get('Authorization', '')
+    if not provided_token and authorization.startswith('Bearer '):
+        provided_token = authorization[len('Bearer '):]
+    
+    if not hmac.compare_digest(provided_token.encode(), expected_token.encode()):
+        logger.warning("Unauthorized profiler request")
+        return jsonify(format_api_response(
+            success=False,
+            error="Invalid or missing debug token",
+            error_code="UNAUTHORIZED"
+        )), 401
+    
+    # ----------------------------------------
+    # STEP 2: Validate options
+    # ----------------------------------------
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        seconds = -1
+    
+    mode = request.args.get('mode', 'all')
+    output = request.args.get('output', 'collapsed')
+    
+    if not 1 <= seconds <= 60 or mode not in ('all', 'create_blackbook') \
+            or output not in ('collapsed', 'json'):
+        return jsonify(format_api_response(
+            success=False,
+            error="Use seconds=1-60, mode=all|create_blackbook, output=collapsed|json",
+            error_code="INVALID_PROFILE_OPTIONS"
+        )), 400
+    
+    if not profiler_lock.acquire(blocking=False):
+        return jsonify(format_api_response(
+            success=False,
+            error="A profiling session is already running",
+            error_code="PROFILER_BUSY"
+        )), 409
+    
+    # ----------------------------------------
+    # STEP 3: Sample
+    # ----------------------------------------
+    try:
+        logger.info(f"Profiling for {seconds}s (mode: {mode})")
+        profiler = SamplingProfiler(
+            only_function='create_blackbook' if mode == 'create_blackbook' else None
+        )
+        profile = profiler.run(seconds)
+    finally:
+        profiler_lock.release()
+    
+    logger.info(f"Profile finished: {profile['samples']} samples")
+    
+    if output == 'json':
+        return jsonify(format_api_response(success=True, **profile)), 200
+    
+    return Response(profile['collapsed'] + '\n', mimetype='text/plain')
 
 
 # ============================================
@@ -0,0 +1,471 @@
+"""
+Batch Generator
+===============
+
+Offline bulk generation without the HTTP layer.
+
+Runs the same generation pipeline as `/generate` (Gemini client, semantic
+cache, document builder, content store and catalog) straight from the
+command line, so term-start runs of thousands of topics skip JSON
+request handling, HTTP and per-request logging.
+
+Features:
+    - Reads topics from a JSONL file; each line needs a topic in "topic"
+      or "title" (the requests.jsonl shape) and may set "request_id",
+      "format", "length", "sections" and "compression"
+    - Producer / consumer pipeline: a reader thread feeds a bounded queue,
+      worker threads (optionally in several processes) run the jobs and a
+      single writer appends one result line per topic
+    - Checkpoint and resume: the results file is the checkpoint. A rerun
+      skips topics that already succeeded, and every topic is a journaled
+      job, so one interrupted mid-way resumes from its last finished
+      stage (e.g. the Word document is built from the stored AI content)
+    - Model concurrency is governed by the generation scheduler
+      (SCHEDULER_MAX_CONCURRENT per process, default: --workers)
+
+Usage:
+    python batch_generate.py topics.jsonl results.jsonl
+    python batch_generate.py topics.jsonl results.jsonl --workers 8 --processes 4
+    python batch_generate.py topics.jsonl results.jsonl --fresh
+
+Result line:
+    {"request_id": "...", "topic": "...", "success": true, "file_id": "...",
+     "filename": "...", "job_id": "...", "elapsed_ms": 8123.4, ...}
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+BATCH_CLIENT_ID = 'batch-cli'
+
+# Sentinels on the task and result queues
+STOP = None
+WORKER_DONE = '__worker_done__'
+
+# Tasks buffered per consumer (keeps memory flat for huge input files)
+QUEUE_DEPTH_PER_CONSUMER = 2
+
+# Attempts when the scheduler rejects a job for being over its queue budget
+MAX_SCHEDULER_ATTEMPTS = 5
+
+
+# ============================================
+# INPUT AND CHECKPOINT
+# ============================================
+
+def job_key(run_name, request_id):
+    """
+    Journal job ID for one input line (stable across reruns)
+
+    Args:
+        run_name (str): Batch run name
+        request_id (str): Request ID from the input line
+
+    Returns:
+        str: Job ID usable as an idempotency key
+    """
+    digest = hashlib.sha1(f"{run_name}\0{request_id}".encode('utf-8')).hexdigest()
+    return f"batch-{digest[:24]}"
+
+
+def parse_line(line_number, line):
+    """
+    Turn one input line into a task
+
+    Args:
+        line_number (int): 1-based line number (the default request ID)
+        line (str): JSON text
+
+    Returns:
+        tuple: (task, None) or (None, error result)
+    """
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        return None, {'request_id': str(line_number), 'success': False,
+                      'error': f"Invalid JSON: {e}", 'error_code': 'INVALID_JSON'}
+
+    if not isinstance(record, dict):
+        return None, {'request_id': str(line_number), 'success': False,
+                      'error': "Each line must be a JSON object", 'error_code': 'INVALID_JSON'}
+
+    request_id = str(record.get('request_id') or record.get('id') or line_number)
+    topic = record.get('topic', record.get('title'))
+    if topic is None:
+        return None, {'request_id': request_id, 'success': False,
+                      'error': "Missing 'topic' (or 'title')", 'error_code': 'MISSING_TOPIC'}
+
+    return {
+        'request_id': request_id,
+        'topic': topic,
+        'format': record.get('format'),
+        'length': record.get('length'),
+        'sections': record.get('sections'),
+        'compression': record.get('compression')
+    }, None
+
+
+def load_checkpoint(output_path):
+    """
+    Request IDs that already succeeded in an earlier run
+
+    A line torn by a crash is ignored (its topic simply runs again).
+
+    Args:
+        output_path (str): Results JSONL file
+
+    Returns:
+        set: Completed request IDs
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(result, dict) and result.get('success'):
+                completed.add(str(result.get('request_id')))
+    return completed
+
+
+def produce(input_path, completed, task_queue, consumers, counters):
+    """
+    Reader thread: queue every pending topic, then one STOP per consumer
+
+    Args:
+        input_path (str): Topics JSONL file
+        completed (set): Request IDs to skip
+        task_queue (Queue): Bounded queue the workers read
+        consumers (int): Worker threads in total
+        counters (dict): 'queued' and 'skipped' totals, and 'invalid'
+            result lines for unusable input lines
+    """
+    try:
+        with open(input_path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                task, error = parse_line(line_number, line)
+                if error is not None:
+                    counters['invalid'].append(error)
+                elif task['request_id'] in completed:
+                    counters['skipped'] += 1
+                else:
+                    task_queue.put(task)
+                    counters['queued'] += 1
+    finally:
+        for _ in range(consumers):
+            task_queue.put(STOP)
+
+
+# ============================================
+# WORKERS
+# ============================================
+
+def prepare_client():
+    """
+    Set up the Gemini client the way app.py does (once per process)
+
+    Returns:
+        GeminiAIClient: The client, or None if the API is not configured
+    """
+    from services.ai_client import gemini_client
+    from services.circuit_breaker import ai_circuit
+    from services.prompt_builder import prompt_builder
+
+    # Compiled prompts; also what applies the length / section instructions
+    if gemini_client:
+        prompt_builder.install(gemini_client)
+        ai_circuit.watch(getattr(gemini_client, 'model', None))
+    return gemini_client
+
+
+def generate_one(task, run_name):
+    """
+    Run (or resume, or replay) the generation job for one task
+
+    Args:
+        task (dict): Task from parse_line()
+        run_name (str): Batch run name (part of the job ID)
+
+    Returns:
+        dict: Result line
+    """
+    from services.docx_compression import normalize_profile
+    from services.generation_pipeline import generation_pipeline, scheduled_generator
+    from services.generation_plan import PlanError, resolve_plan
+    from services.generation_scheduler import SchedulerRejected
+    from services.job_journal import job_journal
+    from services.output_formats import normalize_format
+    from utils.topic_validator import topic_validator
+
+    started = time.perf_counter()
+    result = {'request_id': task['request_id'], 'topic': task['topic']}
+
+    def failed(error, error_code):
+        result.update(success=False, error=error, error_code=error_code,
+                      elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+        return result
+
+    verdict = topic_validator.validate(task['topic'])
+    if not verdict.is_valid:
+        return failed(verdict.error, verdict.error_code)
+    result['topic'] = verdict.topic
+
+    output_format = normalize_format(task['format'])
+    if output_format is None:
+        return failed(f"Unsupported format: {task['format']}", 'INVALID_FORMAT')
+    compression = normalize_profile(task['compression'])
+    if compression is None:
+        return failed(f"Unsupported compression: {task['compression']}", 'INVALID_COMPRESSION')
+    try:
+        plan = resolve_plan(task['length'], task['sections'])
+    except PlanError as e:
+        return failed(str(e), e.error_code)
+
+    # Same journal semantics as an Idempotency-Key on /generate
+    job_id = job_key(run_name, task['request_id'])
+    job = job_journal.claim(job_id)
+    if job is None and job_journal.get(job_id) is not None:
+        return failed("Another worker is running this job", 'JOB_IN_PROGRESS')
+
+    try:
+        if job is not None and job['status'] == 'completed':
+            response_data = job['response']
+            result['resumed'] = 'replayed'
+        else:
+            if job is not None:
+                job_journal.record_resume(job)
+                result['resumed'] = job['stage']
+            else:
+                job = generation_pipeline.new_job(
+                    verdict.topic, output_format=output_format, client_id=BATCH_CLIENT_ID,
+                    priority='batch', job_id=job_id,
+                    options={'compression': compression, 'length': plan.length, 'sections': list(plan.sections)}
+                )
+                if job is None:
+                    return failed("Another worker is running this job", 'JOB_IN_PROGRESS')
+
+            generate_function = scheduled_generator(BATCH_CLIENT_ID, 'batch')
+            for attempt in range(1, MAX_SCHEDULER_ATTEMPTS + 1):
+                try:
+                    response_data = generation_pipeline.run(job, generate_function)
+                    break
+                except SchedulerRejected as e:
+                    if attempt == MAX_SCHEDULER_ATTEMPTS:
+                        raise
+                    time.sleep(e.retry_after)
+                    job = job_journal.claim(job_id) or job
+    except Exception as e:
+        return failed(str(e), getattr(e, 'error_code', 'INTERNAL_SERVER_ERROR'))
+
+    document_info = response_data.get('document_info', {})
+    ai_metadata = response_data.get('ai_metadata', {})
+    result.update(
+        success=True,
+        job_id=job_id,
+        file_id=response_data.get('file_id'),
+        filename=response_data.get('filename'),
+        format=output_format,
+        download_link=response_data.get('download_link'),
+        sections=document_info.get('sections'),
+        file_size=document_info.get('file_size'),
+        word_count=ai_metadata.get('word_count'),
+        cache_hit=bool((ai_metadata.get('semantic_cache') or {}).get('hit')),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
+    return result
+
+
+def consume(task_queue, result_queue, run_name):
+    """Worker thread: generate tasks until STOP, then report WORKER_DONE"""
+    try:
+        while True:
+            task = task_queue.get()
+            if task is STOP:
+                break
+            try:
+                result_queue.put(generate_one(task, run_name))
+            except Exception as e:
+                result_queue.put({'request_id': task['request_id'], 'topic': task['topic'], 'success': False,
+                                  'error': str(e), 'error_code': 'INTERNAL_SERVER_ERROR'})
+    finally:
+        result_queue.put(WORKER_DONE)
+
+
+def run_process(task_queue, result_queue, workers, run_name):
+    """Worker process: the same consumer threads as the single-process mode"""
+    prepare_client()
+    threads = [
+        threading.Thread(target=consume, args=(task_queue, result_queue, run_name), daemon=True)
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+# ============================================
+# BATCH RUN
+# ============================================
+
+def run_batch(input_path, output_path, workers=4, processes=1, run_name=None, fresh=False, quiet=False):
+    """
+    Generate every pending topic of an input file
+
+    Args:
+        input_path (str): Topics JSONL file
+        output_path (str): Results JSONL file (appended to; also the checkpoint)
+        workers (int): Worker threads per process
+        processes (int): Worker processes (1 runs the workers in this process)
+        run_name (str): Job ID namespace (default: input file name)
+        fresh (bool): Ignore and truncate earlier results
+        quiet (bool): No per-topic progress lines
+
+    Returns:
+        dict: Summary counters
+    """
+    run_name = run_name or os.path.splitext(os.path.basename(input_path))[0]
+    consumers = workers * processes
+
+    if fresh and os.path.exists(output_path):
+        open(output_path, 'w').close()
+    completed = load_checkpoint(output_path)
+
+    if processes > 1:
+        # spawn: children open their own SQLite connections and model clients
+        context = multiprocessing.get_context('spawn')
+        task_queue = context.Queue(maxsize=consumers * QUEUE_DEPTH_PER_CONSUMER)
+        result_queue = context.Queue()
+        runners = [
+            context.Process(target=run_process, args=(task_queue, result_queue, workers, run_name), daemon=True)
+            for _ in range(processes)
+        ]
+    else:
+        task_queue = queue.Queue(maxsize=consumers * QUEUE_DEPTH_PER_CONSUMER)
+        result_queue = queue.Queue()
+        runners = [
+            threading.Thread(target=consume, args=(task_queue, result_queue, run_name), daemon=True)
+            for _ in range(workers)
+        ]
+    for runner in runners:
+        runner.start()
+
+    counters = {'queued': 0, 'skipped': 0, 'invalid': []}
+    producer = threading.Thread(
+        target=produce, args=(input_path, completed, task_queue, consumers, counters), daemon=True
+    )
+    producer.start()
+
+    summary = {'succeeded': 0, 'failed': 0, 'cache_hits': 0}
+    started = time.perf_counter()
+    finished_workers = 0
+
+    # Single writer: one flushed line per topic, so the file is always a valid checkpoint
+    with open(output_path, 'a', encoding='utf-8') as output:
+        while finished_workers < consumers:
+            result = result_queue.get()
+            if result == WORKER_DONE:
+                finished_workers += 1
+                continue
+
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            output.flush()
+
+            summary['succeeded' if result.get('success') else 'failed'] += 1
+            summary['cache_hits'] += 1 if result.get('cache_hit') else 0
+            if not quiet:
+                done = summary['succeeded'] + summary['failed']
+                status = 'ok  ' if result.get('success') else f"FAIL {result.get('error_code')}"
+                print(f"[{done:>6}] {status} {result.get('request_id')}: {str(result.get('topic'))[:60]}",
+                      file=sys.stderr)
+
+        # The producer has finished once every worker saw its STOP
+        producer.join()
+        for result in counters['invalid']:
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        summary['failed'] += len(counters['invalid'])
+
+    for runner in runners:
+        runner.join()
+
+    elapsed = time.perf_counter() - started
+    summary.update(
+        skipped=counters['skipped'],
+        elapsed_seconds=round(elapsed, 1),
+        topics_per_minute=round((summary['succeeded'] + summary['failed']) / elapsed * 60, 1) if elapsed else 0.0
+    )
+    return summary
+
+
+# ============================================
+# COMMAND LINE
+# ============================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate blackbooks for a JSONL file of topics")
+    parser.add_argument('input', help="Topics JSONL (one object per line with 'topic' or 'title')")
+    parser.add_argument('output', help="Results JSONL (appended to; reruns resume from it)")
+    parser.add_argument('--workers', type=int, default=4, help="Worker threads per process (default: 4)")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes (default: 1)")
+    parser.add_argument('--run-name', help="Job ID namespace (default: input file name)")
+    parser.add_argument('--fresh', action='store_true', help="Start over instead of resuming")
+    parser.add_argument('--quiet', action='store_true', help="Only print the summary")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.processes < 1:
+        parser.error("--workers and --processes must be at least 1")
+    if not os.path.isfile(args.input):
+        parser.error(f"Input file not found: {args.input}")
+
+    # Set before the services are imported (here and in spawned workers):
+    # one scheduler slot per worker thread in every process (not split
+    # like a web server's), nothing reserved for interactive
+    # traffic, and log records go to the log file only
+    os.environ.setdefault('SCHEDULER_MAX_CONCURRENT', str(args.workers))
+    os.environ.setdefault('SCHEDULER_WORKER_PROCESSES', '1')
+    os.environ.setdefault('SCHEDULER_INTERACTIVE_RESERVED', '0')
+    os.environ.setdefault('LOG_CONSOLE', 'false')
+
+    if not prepare_client():
+        print("❌ Gemini API is not configured (set GEMINI_API_KEY)", file=sys.stderr)
+        return 1
+
+    run_name = args.run_name or os.path.splitext(os.path.basename(args.input))[0]
+    print(f"🚀 Batch run '{run_name}': "
+          f"{args.processes} process(es) x {args.workers} worker(s)", file=sys.stderr)
+
+    summary = run_batch(
+        args.input, args.output, workers=args.workers, processes=args.processes,
+        run_name=run_name, fresh=args.fresh, quiet=args.quiet
+    )
+
+    print(f"\n✅ {summary['succeeded']} succeeded, ❌ {summary['failed']} failed, "
+          f"⏭️  {summary['skipped']} already done, {summary['cache_hits']} cache hits "
+          f"in {summary['elapsed_seconds']}s ({summary['topics_per_minute']} topics/min)", file=sys.stderr)
+    return 0 if summary['failed'] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
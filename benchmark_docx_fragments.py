@@ -0,0 +1,166 @@
+"""
+Microbenchmark: pre-serialized OOXML fragments vs python-docx element trees
+
+Measures the CPU time per document spent on the invariant parts of a
+blackbook (styles, title page, TOC field, footer page number) and on a
+complete document build, once with python-docx (the same formatting steps
+DocumentGenerator performs) and once with the fragment templates from
+services/ooxml_fragments.py and services/docx_writer.py.
+
+Usage:
+    python benchmark_docx_fragments.py [iterations]
+"""
+
+import io
+import sys
+import time
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+from services.document_layout import format_document_date, iter_sections, toc_entries
+from services.docx_writer import build_package
+from services.ooxml_fragments import render_title_page, render_toc
+from utils.text_stats import analyze_section
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+TITLE = "Impact of Artificial Intelligence on Modern Education"
+PARAGRAPH = ("Artificial intelligence is reshaping how students learn and how teachers "
+             "assess progress, from adaptive tutoring systems to automated feedback. ") * 4
+SECTIONS = {
+    key: "\n\n".join([PARAGRAPH] * 4)
+    for key in ('abstract', 'introduction', 'literature_review', 'methodology',
+                'results', 'discussion', 'conclusion', 'references')
+}
+
+
+# ============================================
+# PYTHON-DOCX BASELINE
+# ============================================
+
+def _add_field(paragraph, instruction):
+    """Append a complex field (begin / instrText / separate / end)"""
+    for kind, text in (('begin', None), ('instr', instruction), ('separate', None), ('end', None)):
+        run = paragraph.add_run()
+        if kind == 'instr':
+            element = OxmlElement('w:instrText')
+            element.set(qn('xml:space'), 'preserve')
+            element.text = text
+        else:
+            element = OxmlElement('w:fldChar')
+            element.set(qn('w:fldCharType'), kind)
+        run._r.append(element)
+
+
+def python_docx_boilerplate(document):
+    """Styles, title page, TOC and footer built as element trees"""
+    normal = document.styles['Normal']
+    normal.font.name = 'Times New Roman'
+    normal.font.size = Pt(12)
+    normal.paragraph_format.line_spacing = 1.5
+    normal.paragraph_format.space_after = Pt(6)
+    heading = document.styles['Heading 1']
+    heading.font.name = 'Times New Roman'
+    heading.font.size = Pt(14)
+    heading.font.bold = True
+
+    for _ in range(8):
+        document.add_paragraph()
+    title = document.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = title.add_run(TITLE.upper())
+    run.bold, run.font.size = True, Pt(18)
+    for _ in range(2):
+        document.add_paragraph()
+    subtitle = document.add_paragraph()
+    subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    subtitle.add_run('Academic Blackbook').font.size = Pt(14)
+    for _ in range(3):
+        document.add_paragraph()
+    date = document.add_paragraph()
+    date.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    date.add_run(format_document_date())
+    document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+
+    toc_heading = document.add_paragraph()
+    toc_heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    toc_run = toc_heading.add_run('Table of Contents')
+    toc_run.bold, toc_run.font.size = True, Pt(16)
+    toc = document.add_paragraph()
+    _add_field(toc, ' TOC \\o "1-1" \\h \\z \\u ')
+    for entry in toc_entries(SECTIONS):
+        line = document.add_paragraph()
+        line.paragraph_format.left_indent = Pt(36)
+        line.add_run(f"{entry['title']}\t{entry['number']}")
+    document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+
+    footer = document.sections[0].footer.paragraphs[0]
+    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    footer.add_run('Page ')
+    _add_field(footer, ' PAGE ')
+
+
+def python_docx_full():
+    """Complete document with python-docx, saved to memory"""
+    document = Document()
+    python_docx_boilerplate(document)
+    for _, _, section_title, content in iter_sections(SECTIONS):
+        document.add_heading(section_title, level=1)
+        for text in analyze_section(content)['paragraphs']:
+            paragraph = document.add_paragraph(text)
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    document.save(io.BytesIO())
+
+
+# ============================================
+# FRAGMENT VERSIONS
+# ============================================
+
+def fragment_boilerplate():
+    """Title page and TOC from templates (styles and footer are static bytes)"""
+    render_title_page(TITLE, format_document_date())
+    render_toc(toc_entries(SECTIONS))
+
+
+def fragment_full():
+    """Complete document from fragments, saved to memory"""
+    build_package(TITLE, SECTIONS)
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def measure(function, iterations):
+    """CPU milliseconds per call"""
+    function()  # warm-up
+    start = time.process_time()
+    for _ in range(iterations):
+        function()
+    return (time.process_time() - start) * 1000 / iterations
+
+
+if __name__ == '__main__':
+    print("\n" + "=" * 60)
+    print("⏱️  OOXML Fragment Cache Benchmark")
+    print("=" * 60)
+    print(f"Iterations: {ITERATIONS}, sections: {len(SECTIONS)}\n")
+
+    results = [
+        ('Boilerplate (styles, title page, TOC, footer; python-docx incl. Document())',
+         measure(lambda: python_docx_boilerplate(Document()), ITERATIONS),
+         measure(fragment_boilerplate, ITERATIONS)),
+        ('Complete document incl. save',
+         measure(python_docx_full, ITERATIONS),
+         measure(fragment_full, ITERATIONS))
+    ]
+
+    for label, baseline_ms, fragment_ms in results:
+        print(f"{label}")
+        print(f"   python-docx : {baseline_ms:8.3f} ms CPU / document")
+        print(f"   fragments   : {fragment_ms:8.3f} ms CPU / document")
+        print(f"   saved       : {baseline_ms - fragment_ms:8.3f} ms ({baseline_ms / fragment_ms:.1f}x)\n")
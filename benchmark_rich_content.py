@@ -0,0 +1,115 @@
+"""
+Microbenchmark: rich content blocks, bulk OOXML vs python-docx
+
+Measures the time to render a large results table (and a reference list)
+with python-docx's per-cell API (add_table() + cell.text, the way
+python-docx documents are usually extended) and with the bulk table
+markup from services/ooxml_fragments.py, plus a complete .docx build
+with the fragment writer.
+
+Usage:
+    python benchmark_rich_content.py [rows] [iterations]
+"""
+
+import io
+import sys
+import time
+
+from docx import Document
+
+from services.docx_writer import build_package
+from services.ooxml_fragments import render_references, render_table
+from services.section_content import section_blocks
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+TITLE = "Evaluation of Classification Models for Crop Disease Detection"
+COLUMNS = ["Model", "Dataset", "Accuracy", "Precision", "Recall", "Notes"]
+ROW_DATA = [
+    [f"Model {number}", "PlantVillage", round(0.8 + number % 17 / 100, 3), 0.91, 0.88, "5-fold CV & augmentation"]
+    for number in range(ROWS)
+]
+REFERENCES = [f"Author {number}, A. ({2000 + number % 25}). Study of crop disease {number}. Journal, 1(2)."
+              for number in range(50)]
+
+SECTIONS = {
+    'abstract': "This study compares classification models for crop disease detection.",
+    'results': [
+        "The table below lists every evaluated configuration.",
+        {"type": "table", "caption": "Table 1: Model performance", "columns": COLUMNS, "rows": ROW_DATA},
+        {"type": "bullets", "items": ["Ensembles performed best", "Augmentation helped small models"]}
+    ],
+    'references': {"type": "references", "items": REFERENCES}
+}
+
+
+# ============================================
+# PYTHON-DOCX BASELINE
+# ============================================
+
+def python_docx_table():
+    """Results table and references through python-docx's per-cell API, saved to memory"""
+    document = Document()
+    document.add_paragraph("Table 1: Model performance").runs[0].bold = True
+    table = document.add_table(rows=ROWS + 1, cols=len(COLUMNS))
+    table.style = 'Table Grid'
+    for column, name in enumerate(COLUMNS):
+        cell = table.cell(0, column)
+        cell.text = name
+        cell.paragraphs[0].runs[0].bold = True
+    for row_number, row in enumerate(ROW_DATA, 1):
+        cells = table.rows[row_number].cells
+        for column, value in enumerate(row):
+            cells[column].text = str(value)
+    for number, reference in enumerate(REFERENCES, 1):
+        document.add_paragraph(f"[{number}]\t{reference}")
+    document.save(io.BytesIO())
+
+
+# ============================================
+# FRAGMENT VERSIONS
+# ============================================
+
+def fragment_table():
+    """Results table and references as bulk XML (parsing the blocks included)"""
+    blocks = section_blocks(SECTIONS['results'], 'results') + section_blocks(SECTIONS['references'], 'references')
+    render_table(blocks[1])
+    render_references(blocks[-1])
+
+
+def fragment_document():
+    """Complete document with the table, lists and references, saved to memory"""
+    build_package(TITLE, SECTIONS)
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def measure(function, iterations):
+    """Wall-clock milliseconds per call"""
+    function()  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+if __name__ == '__main__':
+    print("\n" + "=" * 60)
+    print("⏱️  Rich Content Benchmark")
+    print("=" * 60)
+    print(f"Table: {ROWS} rows x {len(COLUMNS)} columns, {len(REFERENCES)} references, "
+          f"iterations: {ITERATIONS}\n")
+
+    baseline_ms = measure(python_docx_table, ITERATIONS)
+    table_ms = measure(fragment_table, ITERATIONS)
+    document_ms = measure(fragment_document, ITERATIONS)
+
+    print("Table + references")
+    print(f"   python-docx (per cell, incl. save) : {baseline_ms:9.1f} ms")
+    print(f"   fragments (bulk XML)               : {table_ms:9.1f} ms")
+    print(f"   speed-up                           : {baseline_ms / table_ms:9.1f}x\n")
+    print("Complete document with fragments (incl. zip)")
+    print(f"   fragments                          : {document_ms:9.1f} ms\n")
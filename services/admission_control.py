@@ -0,0 +1,248 @@
+"""
+Admission Control
+=================
+
+Load shedding for the generation endpoints.
+
+Under overload it is better to turn a request away in a millisecond than
+to accept it and leave a worker blocked on Gemini. Before a generation
+request does any work, the controller checks three signals:
+
+    1. In-flight generations on this worker (ADMISSION_MAX_IN_FLIGHT)
+    2. Scheduler queue depth and the estimated queue latency for the
+       request's own priority class
+    3. Model limiter state (extra signals: the AI circuit breaker is
+       registered by default)
+
+If any is over its limit the request is shed with an OVERLOADED error
+and a Retry-After hint - unless the caller can show that the request is
+answered without a model call (a cache hit or an idempotent replay).
+Health checks and downloads never pass through the controller, so they
+keep answering while generation is saturated.
+
+Configuration (environment variables):
+    ADMISSION_MAX_IN_FLIGHT       Concurrent generation requests (default: 32)
+    ADMISSION_MAX_QUEUE           Queued model calls (default: 64)
+    ADMISSION_MAX_QUEUE_SECONDS   Estimated queue wait (default: 20)
+
+Usage:
+    from services.admission_control import admission_controller
+
+    decision = admission_controller.try_admit('interactive', without_model=lambda: is_cached(topic, plan))
+    if not decision.admitted:
+        return overloaded_response(decision)
+    ...
+    admission_controller.release()
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from services.circuit_breaker import ai_circuit
+from services.generation_scheduler import generation_scheduler
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Window for the recent shed-rate metric (seconds)
+SHED_RATE_WINDOW_SECONDS = 60
+
+
+# ============================================
+# DECISION CLASS
+# ============================================
+
+class AdmissionDecision:
+    """
+    Result of an admission check
+
+    Attributes:
+        admitted (bool): True if the request may proceed
+        reason (str): Why it was shed ('in_flight', 'queue_depth', ...),
+            or 'without_model' for a request let through because no model
+            call is needed
+        retry_after (int): Suggested seconds before retrying
+    """
+
+    __slots__ = ('admitted', 'reason', 'retry_after')
+
+    def __init__(self, admitted, reason=None, retry_after=0):
+        self.admitted = admitted
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ============================================
+# ADMISSION CONTROLLER CLASS
+# ============================================
+
+class AdmissionController:
+    """
+    Decides whether a generation request may start
+
+    Attributes:
+        max_in_flight (int): Limit on concurrent generation requests
+        max_queue (int): Limit on queued model calls
+        max_queue_seconds (float): Limit on estimated queue wait
+    """
+
+    def __init__(self, scheduler=None, max_in_flight=None, max_queue=None, max_queue_seconds=None):
+        """
+        Initialize the controller
+
+        Args:
+            scheduler (GenerationScheduler): Source of queue signals (optional)
+            max_in_flight (int): Default ADMISSION_MAX_IN_FLIGHT
+            max_queue (int): Default ADMISSION_MAX_QUEUE
+            max_queue_seconds (float): Default ADMISSION_MAX_QUEUE_SECONDS
+        """
+        self.scheduler = scheduler
+        self.max_in_flight = int(max_in_flight or os.getenv('ADMISSION_MAX_IN_FLIGHT', 32))
+        self.max_queue = int(max_queue or os.getenv('ADMISSION_MAX_QUEUE', 64))
+        self.max_queue_seconds = float(max_queue_seconds or os.getenv('ADMISSION_MAX_QUEUE_SECONDS', 20))
+
+        self._signals = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._recent = deque()
+
+    # ----------------------------------------
+    # Public methods
+    # ----------------------------------------
+
+    def add_signal(self, name, check):
+        """
+        Register an extra overload signal (e.g. model limiter state)
+
+        Args:
+            name (str): Reason reported when the signal sheds load
+            check (callable): Returns retry-after seconds (int > 0) to shed,
+                or 0/None to admit
+        """
+        self._signals[name] = check
+
+    def try_admit(self, priority='interactive', without_model=None):
+        """
+        Check all signals and reserve an in-flight slot if admitted
+
+        Args:
+            priority (str): Scheduler class the request will queue in
+            without_model (callable): Returns True if the request will be
+                answered without a model call; only asked when the request
+                would otherwise be shed
+
+        Returns:
+            AdmissionDecision: Admission result (call release() if admitted)
+        """
+        decision = self._evaluate(priority)
+
+        with self._lock:
+            if decision.admitted:
+                if self._in_flight < self.max_in_flight:
+                    self._in_flight += 1
+                    self._record(decision)
+                    return decision
+                decision = AdmissionDecision(False, 'in_flight', 1)
+
+        # Cache hits and replays cost no model call: never shed them
+        if without_model is not None and without_model():
+            decision = AdmissionDecision(True, 'without_model')
+
+        with self._lock:
+            if decision.admitted:
+                self._in_flight += 1
+            self._record(decision)
+
+        return decision
+
+    def release(self):
+        """Free the in-flight slot of an admitted request"""
+        with self._lock:
+            self._in_flight = max(self._in_flight - 1, 0)
+
+    def get_stats(self):
+        """
+        Get admission counters and shed rates
+
+        Returns:
+            dict: In-flight count, totals, per-reason sheds, overall and
+                recent (last 60s) shed rate
+        """
+        with self._lock:
+            self._trim_recent()
+            admitted = self._counters['admitted']
+            shed = self._counters['shed']
+            recent_shed = sum(1 for _, was_shed in self._recent if was_shed)
+
+            return {
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+                'admitted': admitted,
+                'admitted_without_model': self._counters['admitted_without_model'],
+                'shed': shed,
+                'shed_by_reason': {
+                    key[len('shed_'):]: value for key, value in self._counters.items()
+                    if key.startswith('shed_')
+                },
+                'shed_rate': round(shed / (admitted + shed), 4) if admitted + shed else 0.0,
+                'shed_rate_recent': round(recent_shed / len(self._recent), 4) if self._recent else 0.0
+            }
+
+    # ----------------------------------------
+    # Internal methods
+    # ----------------------------------------
+
+    def _evaluate(self, priority):
+        """Check queue and limiter signals (without the in-flight slot)"""
+        if self.scheduler is not None:
+            queued = self.scheduler.queue_depth()
+            estimated_wait = self.scheduler.estimate_wait(priority)
+            if queued >= self.max_queue:
+                return AdmissionDecision(False, 'queue_depth', max(int(estimated_wait), 1))
+            if estimated_wait > self.max_queue_seconds:
+                return AdmissionDecision(
+                    False, 'queue_latency', max(int(estimated_wait - self.max_queue_seconds), 1)
+                )
+
+        for name, check in self._signals.items():
+            retry_after = check()
+            if retry_after:
+                return AdmissionDecision(False, name, int(retry_after))
+
+        return AdmissionDecision(True)
+
+    def _record(self, decision):
+        """Update counters (caller holds the lock)"""
+        if decision.admitted:
+            self._counters['admitted'] += 1
+            if decision.reason == 'without_model':
+                self._counters['admitted_without_model'] += 1
+        else:
+            self._counters['shed'] += 1
+            self._counters[f'shed_{decision.reason}'] += 1
+
+        self._recent.append((time.monotonic(), not decision.admitted))
+        self._trim_recent()
+
+    def _trim_recent(self):
+        cutoff = time.monotonic() - SHED_RATE_WINDOW_SECONDS
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+# Shared controller, fed by the generation scheduler's queue and the AI
+# circuit breaker (an open breaker sheds model calls until its next probe)
+admission_controller = AdmissionController(scheduler=generation_scheduler)
+admission_controller.add_signal('ai_unavailable', ai_circuit.open_retry_after)
@@ -0,0 +1,180 @@
+"""
+Bulk Export
+===========
+
+Streams many generated documents back as one ZIP archive.
+
+The archive is produced while it is being sent: each document is read in
+chunks and written into the ZIP stream, and every chunk is handed to the
+client right away. Nothing is buffered in memory beyond one chunk and
+nothing is written to disk. DOCX files are already deflate-compressed, so
+they are added with ZIP_STORED (no recompression); throughput is bounded
+by disk and network speed, not CPU.
+
+Every document is opened when stream_zip() is called, before the response
+starts. An open file stays readable when the archive tier or a section
+edit replaces it (or it is deleted), so the ZIP is never cut short after
+the 200 has been sent. A document that vanished between the lookup and
+the open is skipped and named in a MISSING.txt entry in the archive.
+An export holds one file descriptor per document until it finishes
+(BULK_DOWNLOAD_MAX_FILES bounds the count).
+
+Documents are located through the catalog and the file index
+(services.file_server) rather than a listing of the output directory.
+
+Usage:
+    from services.bulk_export import find_documents, stream_zip
+
+    found, missing = find_documents(file_ids)
+    return Response(stream_zip(found), mimetype='application/zip')
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import os
+import time
+import zipfile
+
+from services.document_catalog import document_catalog
+from services.file_server import file_server
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Read size for copying document bytes into the archive
+CHUNK_SIZE = 64 * 1024
+
+# Archive entry listing documents that vanished before they were opened
+MANIFEST_NAME = 'MISSING.txt'
+
+
+# ============================================
+# STREAM BUFFER
+# ============================================
+
+class _ChunkBuffer:
+    """
+    Write-only file object that collects ZipFile output between yields
+
+    ZipFile only needs write() and flush(); without tell()/seek() it
+    switches to streaming mode and writes data descriptors after each
+    entry instead of seeking back to patch local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and clear everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# ============================================
+# EXPORT FUNCTIONS
+# ============================================
+
+def find_documents(file_ids):
+    """
+    Locate the .docx files for a list of file IDs
+
+    The catalog gives the filename of every document it knows; older
+    documents are found through the file index's shared (and negatively
+    cached) directory scan.
+
+    Args:
+        file_ids (list): File IDs to export (duplicates are ignored)
+
+    Returns:
+        tuple: (found, missing) - found is a list of (filename, filepath),
+            missing is a list of file IDs without a document
+    """
+    found, missing = [], []
+    for file_id in dict.fromkeys(file_ids):
+        document = document_catalog.get(file_id)
+        entry = file_server.index.stat(document['filename']) if document and document['filename'] else None
+        if entry is None:
+            entry = file_server.index.find_by_file_id(file_id)
+
+        if entry is None:
+            missing.append(file_id)
+        else:
+            found.append((entry.filename, entry.filepath))
+    return found, missing
+
+
+def stream_zip(documents, chunk_size=CHUNK_SIZE):
+    """
+    Open every document, then generate the ZIP archive chunk by chunk
+
+    Args:
+        documents (list): (archive_name, filepath) tuples
+        chunk_size (int): Read size for document bytes
+
+    Returns:
+        generator: Consecutive pieces of the ZIP file (bytes)
+
+    Raises:
+        OSError: If a document exists but cannot be opened
+    """
+    opened, vanished = [], []
+    try:
+        for archive_name, filepath in documents:
+            try:
+                opened.append((archive_name, open(filepath, 'rb')))
+            except FileNotFoundError:
+                vanished.append(archive_name)
+    except BaseException:
+        # Out of descriptors or unreadable: fail before the response starts
+        for _, source in opened:
+            source.close()
+        raise
+    return _stream_opened(opened, vanished, chunk_size)
+
+
+def _stream_opened(opened, vanished, chunk_size):
+    """Write already open documents (and the manifest) into a ZIP stream"""
+    buffer = _ChunkBuffer()
+
+    try:
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for archive_name, source in opened:
+                # Size and time of the open file, not of whatever the path names now
+                status = os.fstat(source.fileno())
+                info = zipfile.ZipInfo(archive_name, date_time=time.localtime(status.st_mtime)[:6])
+                info.external_attr = (status.st_mode & 0xFFFF) << 16
+                info.file_size = status.st_size
+
+                with source, archive.open(info, 'w', force_zip64=True) as target:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        yield buffer.drain()
+
+                yield buffer.drain()
+
+            if vanished:
+                archive.writestr(
+                    MANIFEST_NAME,
+                    'Removed before the export started:\n' + ''.join(f"{name}\n" for name in vanished)
+                )
+
+        # Central directory is written when the archive closes
+        yield buffer.drain()
+    finally:
+        for _, source in opened:
+            source.close()
@@ -0,0 +1,402 @@
+"""
+Circuit Breaker
+===============
+
+Fail-fast protection around the AI provider.
+
+During a Gemini outage every generation used to wait for the full client
+timeout before failing, which tied up workers and slowed downloads too.
+The breaker watches the outcome and latency of recent model calls and
+stops calling the provider once it is clearly unhealthy:
+
+    closed      Normal operation. Calls are recorded in a rolling window.
+    open        Error rate or slow-call rate over the window crossed its
+                threshold. Calls fail immediately with CircuitOpenError
+                (HTTP 503 + Retry-After) until the open period ends.
+    half_open   After the open period a few probe calls are let through.
+                Probes that succeed close the breaker; a failed probe opens
+                it again for twice as long (up to CIRCUIT_MAX_OPEN_SECONDS).
+
+While the breaker is open, topics that are already cached are still
+served - the same topic from the shared cache, or a reworded one that
+passes the normal semantic cache match (never a looser one, which would
+serve a different topic's blackbook). Those responses are marked as
+degraded.
+
+Only provider and transport errors count as failures: connection errors,
+timeouts, rate limits and 5xx API errors, recognized by exception type
+(or HTTP status) or by an explicit error_code on the result. The Gemini
+client turns exceptions into results with success=False, so watch() wraps
+the model's generate_content to note the provider errors raised inside a
+call. A result that failed for another reason (a blocked prompt, a reply
+that could not be parsed) shows that the provider is answering and does
+not trip the breaker.
+
+Configuration (environment variables):
+    CIRCUIT_BREAKER_ENABLED     true/false (default: true)
+    CIRCUIT_WINDOW_SECONDS      Rolling window for the rates (default: 60)
+    CIRCUIT_MIN_CALLS           Calls in the window before it can trip (default: 5)
+    CIRCUIT_FAILURE_RATE        Error rate that opens the breaker (default: 0.5)
+    CIRCUIT_SLOW_CALL_SECONDS   A call slower than this counts as slow (default: 30)
+    CIRCUIT_SLOW_CALL_RATE      Slow-call rate that opens the breaker (default: 0.8)
+    CIRCUIT_OPEN_SECONDS        First open period (default: 30)
+    CIRCUIT_MAX_OPEN_SECONDS    Longest open period (default: 300)
+    CIRCUIT_HALF_OPEN_PROBES    Successful probes needed to close (default: 2)
+
+Usage:
+    from services.circuit_breaker import ai_circuit
+
+    ai_circuit.watch(gemini_client.model)  # once, at startup
+    ai_circuit.raise_if_open()            # before queueing for a model slot
+    result = ai_circuit.call(gemini_client.generate_academic_content, topic)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Exception class names (anywhere in the MRO) of provider and transport
+# errors: google.api_core, requests / httpx and the builtin ones
+PROVIDER_ERROR_TYPES = frozenset({
+    'ConnectionError', 'TimeoutError', 'Timeout', 'TimeoutException', 'TransportError',
+    'ServiceUnavailable', 'InternalServerError', 'BadGateway', 'GatewayTimeout',
+    'DeadlineExceeded', 'TooManyRequests', 'ResourceExhausted', 'RetryError'
+})
+
+# error_code values on a failed result that mean the provider failed
+PROVIDER_ERROR_CODES = frozenset({'AI_UNAVAILABLE', 'AI_TIMEOUT', 'AI_RATE_LIMITED', 'AI_PROVIDER_ERROR'})
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose breaker is open
+
+    Attributes:
+        retry_after (int): Seconds until the breaker lets a probe through
+        error_code (str): API error code for format_api_response()
+        status_code (int): HTTP status to return
+    """
+
+    error_code = 'AI_UNAVAILABLE'
+    status_code = 503
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ============================================
+# CIRCUIT BREAKER CLASS
+# ============================================
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker driven by error rate and latency
+
+    Attributes:
+        name (str): Provider name used in messages and logs
+        enabled (bool): False turns every check into a no-op
+    """
+
+    def __init__(self, name, enabled=None):
+        if enabled is None:
+            enabled = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+
+        self.name = name
+        self.enabled = enabled
+        self.window_seconds = float(os.getenv('CIRCUIT_WINDOW_SECONDS', 60))
+        self.min_calls = int(os.getenv('CIRCUIT_MIN_CALLS', 5))
+        self.failure_rate = float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))
+        self.slow_call_seconds = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', 30))
+        self.slow_call_rate = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', 0.8))
+        self.open_seconds = float(os.getenv('CIRCUIT_OPEN_SECONDS', 30))
+        self.max_open_seconds = float(os.getenv('CIRCUIT_MAX_OPEN_SECONDS', 300))
+        self.half_open_probes = int(os.getenv('CIRCUIT_HALF_OPEN_PROBES', 2))
+
+        self._state = CLOSED
+        self._calls = deque()          # (finished_at, failed, slow)
+        self._opened_at = 0.0
+        self._current_open_seconds = self.open_seconds
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'slow_calls': 0, 'rejected': 0, 'opened': 0, 'degraded_served': 0}
+        self._last_error = None
+        self._local = threading.local()
+
+    # ----------------------------------------
+    # Guarding calls
+    # ----------------------------------------
+
+    @property
+    def state(self):
+        """Current state ('closed', 'open' or 'half_open')"""
+        with self._lock:
+            return self._refresh_state()
+
+    def raise_if_open(self):
+        """
+        Fail fast while the breaker is open (does not use a probe)
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._refresh_state() == OPEN:
+                self._stats['rejected'] += 1
+                raise self._open_error()
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call the provider through the breaker
+
+        A provider error (see is_provider_error()) raised by the call,
+        noted by a watched model during it, or named by a failed result's
+        error_code counts as a failure; a call slower than
+        CIRCUIT_SLOW_CALL_SECONDS as slow.
+
+        Args:
+            function (callable): Provider call
+            *args, **kwargs: Passed through
+
+        Returns:
+            The function's result
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all
+                probes already in flight
+        """
+        if not self.enabled:
+            return function(*args, **kwargs)
+
+        with self._lock:
+            state = self._refresh_state()
+            if state == OPEN or (state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes):
+                self._stats['rejected'] += 1
+                raise self._open_error()
+            is_probe = state == HALF_OPEN
+            if is_probe:
+                self._probes_in_flight += 1
+
+        self._local.provider_error = None
+        started = time.monotonic()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            failed = is_provider_error(e) or self._local.provider_error is not None
+            self._record(not failed, time.monotonic() - started, is_probe, str(e) if failed else None)
+            raise
+        finally:
+            provider_error, self._local.provider_error = self._local.provider_error, None
+
+        failed = isinstance(result, dict) and not result.get('success', True) and (
+            provider_error is not None or result.get('error_code') in PROVIDER_ERROR_CODES
+        )
+        self._record(not failed, time.monotonic() - started, is_probe,
+                     result.get('error') or provider_error if failed else None)
+        return result
+
+    def watch(self, model):
+        """
+        Note provider errors raised by a model's generate_content
+
+        The client catches them and returns a failed result; call() then
+        still knows that the provider failed.
+
+        Args:
+            model: The client's GenerativeModel
+
+        Returns:
+            bool: True if the model was wrapped (False if already watched
+                or it has no generate_content)
+        """
+        generate_content = getattr(model, 'generate_content', None)
+        if not callable(generate_content) or getattr(generate_content, '_circuit_watched', False):
+            return False
+
+        @functools.wraps(generate_content)
+        def watched(*args, **kwargs):
+            try:
+                return generate_content(*args, **kwargs)
+            except Exception as e:
+                if is_provider_error(e):
+                    self._local.provider_error = e
+                raise
+
+        watched._circuit_watched = True
+        model.generate_content = watched
+        return True
+
+    def open_retry_after(self):
+        """
+        Seconds until the breaker lets a probe through (admission signal)
+
+        Returns:
+            int: Retry-after seconds while open, 0 otherwise
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            return self._retry_after() if self._refresh_state() == OPEN else 0
+
+    def record_degraded(self):
+        """Count a response served from the cache because the breaker was open"""
+        with self._lock:
+            self._stats['degraded_served'] += 1
+
+    # ----------------------------------------
+    # State machine
+    # ----------------------------------------
+
+    def _record(self, succeeded, elapsed, is_probe, error=None):
+        now = time.monotonic()
+        slow = elapsed >= self.slow_call_seconds
+
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['failures'] += 0 if succeeded else 1
+            self._stats['slow_calls'] += 1 if slow else 0
+            if error:
+                self._last_error = str(error)[:200]
+
+            if is_probe:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if not succeeded or slow:
+                    # Still unhealthy: back off for longer
+                    self._open(now, min(self._current_open_seconds * 2, self.max_open_seconds))
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes and self._state == HALF_OPEN:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    self._current_open_seconds = self.open_seconds
+                    logger.info(f"Circuit breaker '{self.name}' closed: provider recovered")
+                return
+
+            if self._state != CLOSED:
+                return
+
+            self._calls.append((now, not succeeded, slow))
+            self._trim(now)
+            calls = len(self._calls)
+            if calls < self.min_calls:
+                return
+
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, _, was_slow in self._calls if was_slow)
+            if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                self._open(now, self.open_seconds)
+
+    def _open(self, now, open_seconds):
+        """Switch to open (caller holds the lock)"""
+        self._state = OPEN
+        self._opened_at = now
+        self._current_open_seconds = open_seconds
+        self._probe_successes = 0
+        self._calls.clear()
+        self._stats['opened'] += 1
+        logger.warning(
+            f"Circuit breaker '{self.name}' opened for {open_seconds:.0f}s "
+            f"(last error: {self._last_error or 'slow responses'})"
+        )
+
+    def _refresh_state(self):
+        """Move from open to half-open once the open period is over (caller holds the lock)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._current_open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        return self._state
+
+    def _retry_after(self):
+        remaining = self._current_open_seconds - (time.monotonic() - self._opened_at)
+        return max(int(math.ceil(remaining)), 1)
+
+    def _open_error(self):
+        return CircuitOpenError(
+            f"The AI provider ({self.name}) is unavailable; try again later",
+            self._retry_after()
+        )
+
+    def _trim(self, now):
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def get_stats(self):
+        """
+        Get breaker state and counters
+
+        Returns:
+            dict: State, retry-after while open, window rates and totals
+        """
+        with self._lock:
+            state = self._refresh_state()
+            self._trim(time.monotonic())
+            calls = len(self._calls)
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, _, was_slow in self._calls if was_slow)
+
+            return {
+                'enabled': self.enabled,
+                'state': state,
+                'retry_after': self._retry_after() if state == OPEN else 0,
+                'window_calls': calls,
+                'window_failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'window_slow_rate': round(slow_calls / calls, 3) if calls else 0.0,
+                'last_error': self._last_error,
+                **self._stats
+            }
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def is_provider_error(error):
+    """
+    Check whether an exception means the provider (or the way to it) failed
+
+    Args:
+        error (Exception): Raised by a model call
+
+    Returns:
+        bool: True for connection errors, timeouts, rate limits and 5xx
+            API errors
+    """
+    if any(cls.__name__ in PROVIDER_ERROR_TYPES for cls in type(error).__mro__):
+        return True
+    # google.api_core errors carry the HTTP status
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+ai_circuit = CircuitBreaker('gemini')
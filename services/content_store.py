@@ -0,0 +1,205 @@
+"""
+Content Store
+=============
+
+Keeps the parsed AI sections of every generated document next to its
+file ID, so documents can be re-rendered (new title, different section
+order, other output options) without calling the model again.
+
+Each document is stored as one gzip-compressed JSON record:
+
+    outputs/content/<file_id>.json.gz
+
+Features:
+    - Compact gzip JSON records (typically 3-4x smaller than plain JSON)
+    - Atomic writes (temp file + rename) so readers never see partial records
+    - Safe file ID handling (records can only live inside the store directory)
+
+Usage:
+    from services.content_store import content_store
+
+    content_store.save(file_id, title="AI in Education", sections=sections)
+    record = content_store.load(file_id)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import gzip
+import json
+import os
+import time
+
+# Local imports
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_STORE_DIR = os.path.join('outputs', 'content')
+RECORD_EXTENSION = '.json.gz'
+
+
+# ============================================
+# CONTENT STORE CLASS
+# ============================================
+
+class ContentStore:
+    """
+    File-based store of document sections keyed by file ID
+
+    Attributes:
+        store_dir (str): Directory holding the compressed records
+    """
+
+    def __init__(self, store_dir=None):
+        """
+        Initialize the content store
+
+        Args:
+            store_dir (str): Record directory (default: CONTENT_STORE_DIR or outputs/content)
+        """
+        self.store_dir = store_dir or os.getenv('CONTENT_STORE_DIR', DEFAULT_STORE_DIR)
+
+    # ----------------------------------------
+    # Public methods
+    # ----------------------------------------
+
+    def save(self, file_id, title, sections, **extra_fields):
+        """
+        Store the sections used to build a document
+
+        Args:
+            file_id (str): Document file ID
+            title (str): Document title
+            sections (dict): Section name -> content
+            **extra_fields: Additional fields to keep (topic, filename, ...)
+
+        Returns:
+            bool: True if the record was written
+        """
+        record = {
+            'file_id': file_id,
+            'title': title,
+            'sections': sections,
+            'created_at': time.time()
+        }
+        record.update(extra_fields)
+        return self.save_record(record)
+
+    def save_record(self, record):
+        """
+        Write a complete record (as returned by load()) back to the store
+
+        Args:
+            record (dict): Record with at least 'file_id', 'title' and 'sections'
+
+        Returns:
+            bool: True if the record was written
+        """
+        file_id = record['file_id']
+
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            record_path = self._record_path(file_id)
+            temp_path = f"{record_path}.tmp"
+
+            # Compact separators + gzip keep records small on disk
+            payload = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+            with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(payload)
+            os.replace(temp_path, record_path)
+
+            return True
+
+        except Exception as e:
+            logger.warning(f"Could not store content for {file_id}: {str(e)}")
+            return False
+
+    def save_streamed(self, file_id, title, section_items, **extra_fields):
+        """
+        Store sections that are produced one at a time
+
+        Writes the same record format as save() without holding all
+        sections in memory.
+
+        Args:
+            file_id (str): Document file ID
+            title (str): Document title
+            section_items (iterable): (name, content) pairs
+            **extra_fields: Additional fields to keep (topic, filename, ...)
+
+        Returns:
+            bool: True if the record was written
+        """
+        header = {'file_id': file_id, 'title': title, 'created_at': time.time()}
+        header.update(extra_fields)
+
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            record_path = self._record_path(file_id)
+            temp_path = f"{record_path}.tmp"
+
+            with gzip.open(temp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                # '{...}' without its closing brace, then the sections object
+                f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':'))[:-1])
+                f.write(',"sections":{')
+                for index, (name, content) in enumerate(section_items):
+                    if index:
+                        f.write(',')
+                    f.write(json.dumps(name, ensure_ascii=False))
+                    f.write(':')
+                    f.write(json.dumps(content, ensure_ascii=False))
+                f.write('}}')
+
+            os.replace(temp_path, record_path)
+            return True
+
+        except Exception as e:
+            logger.warning(f"Could not store content for {file_id}: {str(e)}")
+            return False
+
+    def load(self, file_id):
+        """
+        Load the stored record for a document
+
+        Args:
+            file_id (str): Document file ID
+
+        Returns:
+            dict: Stored record, or None if there is no record
+        """
+        record_path = self._record_path(file_id)
+
+        if not os.path.isfile(record_path):
+            return None
+
+        try:
+            with gzip.open(record_path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read stored content for {file_id}: {str(e)}")
+            return None
+
+    def exists(self, file_id):
+        """Check whether a record exists for a file ID"""
+        return os.path.isfile(self._record_path(file_id))
+
+    # ----------------------------------------
+    # Path helpers
+    # ----------------------------------------
+
+    def _record_path(self, file_id):
+        """Build the record path (basename prevents directory traversal)"""
+        return os.path.join(self.store_dir, os.path.basename(file_id) + RECORD_EXTENSION)
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+content_store = ContentStore()
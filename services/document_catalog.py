@@ -0,0 +1,499 @@
+"""
+Document Catalog
+================
+
+SQLite index of every generated document.
+
+Listing documents used to mean `ls outputs/`, and downloads by file ID
+scanned the whole directory for a matching name. The catalog keeps one
+row per document with its metadata, so listing, filtering and lookups
+are index reads no matter how many documents exist.
+
+Features:
+    - file_id, filename, title, topic, format, size, sections, created time,
+      DOCX compression profile and download count per document
+    - Keyset pagination (stable and O(page) even deep into the list);
+      ties in the sort column are broken by the row's integer ID
+    - Indexed filters: format, created range, size range
+    - Full-text search over titles and topics (SQLite FTS5)
+    - One-time backfill of documents created before the catalog existed
+
+Configuration (environment variables):
+    DOCUMENT_CATALOG_PATH    SQLite file (default: cache/catalog.sqlite3)
+
+If the database cannot be opened the catalog disables itself: writes are
+skipped, listings are empty and downloads fall back to the directory scan.
+
+Usage:
+    from services.document_catalog import document_catalog
+
+    document_catalog.record(file_id, title=topic, topic=topic, ...)
+    page = document_catalog.search(query='machine learning', limit=20)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import base64
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_CATALOG_PATH = os.path.join('cache', 'catalog.sqlite3')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Search terms used from a query (longer queries are truncated)
+MAX_SEARCH_TERMS = 10
+
+# Sort order -> (key column, SQL direction)
+SORT_ORDERS = {
+    'newest': ('created_at', 'DESC'),
+    'oldest': ('created_at', 'ASC'),
+    'downloads': ('download_count', 'DESC')
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id             INTEGER PRIMARY KEY,
+    file_id        TEXT NOT NULL UNIQUE,
+    filename       TEXT,
+    title          TEXT NOT NULL,
+    topic          TEXT,
+    format         TEXT NOT NULL DEFAULT 'docx',
+    file_size      INTEGER NOT NULL DEFAULT 0,
+    sections       TEXT NOT NULL DEFAULT '[]',
+    section_count  INTEGER NOT NULL DEFAULT 0,
+    created_at     REAL NOT NULL,
+    compression    TEXT,
+    download_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS documents_created ON documents (created_at, id);
+CREATE INDEX IF NOT EXISTS documents_format_created ON documents (format, created_at, id);
+CREATE INDEX IF NOT EXISTS documents_downloads ON documents (download_count, id);
+
+-- One-time tasks already done on this database (e.g. the backfill)
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- External content keyed on the explicit INTEGER PRIMARY KEY: an implicit
+-- rowid may be renumbered by VACUUM, which would desync the index
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, topic, content='documents', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, title, topic) VALUES (new.id, new.title, new.topic);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, topic)
+    VALUES ('delete', old.id, old.title, old.topic);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF title, topic ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, title, topic)
+    VALUES ('delete', old.id, old.title, old.topic);
+    INSERT INTO documents_fts (rowid, title, topic) VALUES (new.id, new.title, new.topic);
+END;
+"""
+
+# Columns returned by search() and get()
+PUBLIC_COLUMNS = ('file_id', 'filename', 'title', 'topic', 'format', 'file_size',
+                  'sections', 'section_count', 'created_at', 'compression', 'download_count')
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class CatalogQueryError(ValueError):
+    """Raised for invalid list parameters (bad cursor, unknown sort, ...)"""
+
+
+# ============================================
+# DOCUMENT CATALOG CLASS
+# ============================================
+
+class DocumentCatalog:
+    """
+    SQLite-backed metadata catalog of generated documents
+
+    Attributes:
+        enabled (bool): False if the database could not be opened
+        path (str): SQLite database file
+    """
+
+    def __init__(self, path=None):
+        """
+        Initialize the catalog and create the schema
+
+        Args:
+            path (str): Database file (default: DOCUMENT_CATALOG_PATH)
+        """
+        self.enabled = True
+        self.path = path or os.getenv('DOCUMENT_CATALOG_PATH', DEFAULT_CATALOG_PATH)
+        self._local = threading.local()
+
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection().executescript(SCHEMA)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Document catalog disabled: {str(e)}")
+            self.enabled = False
+
+    # ----------------------------------------
+    # Writing
+    # ----------------------------------------
+
+    def record(self, file_id, title, topic=None, filename=None, output_format='docx',
+               file_size=0, sections=(), created_at=None, compression=None):
+        """
+        Insert or update a document's metadata
+
+        Re-recording an existing file ID (e.g. after a section edit) keeps
+        its creation time and download count, and its compression profile
+        unless a new one is given.
+
+        Args:
+            file_id (str): Document ID
+            title (str): Document title
+            topic (str): Topic it was generated for
+            filename (str): .docx filename in outputs/ (None for previews)
+            output_format (str): docx, html, markdown or pdf
+            file_size (int): Size in bytes
+            sections (iterable): Section keys in document order
+            created_at (float): Unix timestamp (default: now)
+            compression (str): Profile the .docx was written with
+        """
+        if not self.enabled:
+            return
+
+        sections = [key for key in sections if key != 'full_text']
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "INSERT INTO documents (file_id, filename, title, topic, format, file_size, "
+                    "sections, section_count, created_at, compression) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (file_id) DO UPDATE SET filename = excluded.filename, "
+                    "title = excluded.title, topic = excluded.topic, format = excluded.format, "
+                    "file_size = excluded.file_size, sections = excluded.sections, "
+                    "section_count = excluded.section_count, "
+                    "compression = COALESCE(excluded.compression, compression)",
+                    (file_id, filename, title, topic, output_format, int(file_size or 0),
+                     json.dumps(sections), len(sections), created_at or time.time(), compression)
+                )
+        except sqlite3.Error as e:
+            # The catalog is an index; a failed write must not fail the request
+            logger.warning(f"Could not catalog document {file_id}: {str(e)}")
+
+    def increment_downloads(self, *file_ids):
+        """
+        Count a download of one or more documents
+
+        Args:
+            *file_ids (str): Downloaded document IDs
+        """
+        if not file_ids or not self.enabled:
+            return
+        try:
+            with self._connection() as connection:
+                connection.executemany(
+                    "UPDATE documents SET download_count = download_count + 1 WHERE file_id = ?",
+                    [(file_id,) for file_id in file_ids]
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update download count: {str(e)}")
+
+    def update_file_size(self, file_id, file_size, compression=None):
+        """
+        Record a new size after a document was rewritten in place
+
+        Args:
+            file_id (str): Document ID
+            file_size (int): Size in bytes
+            compression (str): New compression profile (None: unchanged)
+        """
+        if not self.enabled:
+            return
+
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "UPDATE documents SET file_size = ?, compression = COALESCE(?, compression) WHERE file_id = ?",
+                    (int(file_size), compression, file_id)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update size of {file_id}: {str(e)}")
+
+    def backfill(self, output_dir='outputs', load_record=None):
+        """
+        Catalog .docx files that were created before the catalog existed
+
+        Runs once per database, in a single transaction that also marks it
+        as done. Documents recorded meanwhile (the backfill runs in a
+        background thread at startup) keep their metadata.
+
+        Args:
+            output_dir (str): Directory holding the documents
+            load_record (callable): file_id -> stored content record or None
+                (used for the topic and section list)
+
+        Returns:
+            int: Number of documents added
+        """
+        if not self.enabled:
+            return 0
+
+        connection = self._connection()
+        done = connection.execute("SELECT 1 FROM catalog_meta WHERE key = 'backfilled'").fetchone()
+        if done or not os.path.isdir(output_dir):
+            return 0
+
+        rows = []
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.docx') or '_' not in entry.name or not entry.is_file():
+                    continue
+
+                stem, file_id = entry.name[:-len('.docx')].rsplit('_', 1)
+                record = load_record(file_id) if load_record else None
+                title = (record or {}).get('title') or stem.replace('_', ' ')
+                sections = list((record or {}).get('sections', {}))
+                stat = entry.stat()
+                rows.append((
+                    file_id, entry.name, title, (record or {}).get('topic') or title, 'docx',
+                    stat.st_size, json.dumps(sections), len(sections), stat.st_mtime
+                ))
+
+        with connection:
+            added = connection.executemany(
+                "INSERT OR IGNORE INTO documents (file_id, filename, title, topic, format, file_size, "
+                "sections, section_count, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            ).rowcount
+            connection.execute(
+                "INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('backfilled', ?)", (str(time.time()),)
+            )
+
+        if added:
+            logger.info(f"Document catalog backfilled with {added} existing documents")
+        return added
+
+    # ----------------------------------------
+    # Reading
+    # ----------------------------------------
+
+    def get(self, file_id):
+        """
+        Look up one document
+
+        Args:
+            file_id (str): Document ID
+
+        Returns:
+            dict: Document metadata, or None if not cataloged
+        """
+        if not self.enabled:
+            return None
+
+        row = self._connection().execute(
+            f"SELECT {', '.join(PUBLIC_COLUMNS)} FROM documents WHERE file_id = ?",
+            (file_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def search(self, query=None, output_format=None, created_after=None, created_before=None,
+               min_size=None, max_size=None, sort='newest', limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        List documents with filters, full-text search and keyset pagination
+
+        Args:
+            query (str): Words to match in title or topic (prefix match)
+            output_format (str): Only documents of this format
+            created_after (float): Unix timestamp lower bound (inclusive)
+            created_before (float): Unix timestamp upper bound (exclusive)
+            min_size (int): Minimum file size in bytes
+            max_size (int): Maximum file size in bytes
+            sort (str): 'newest', 'oldest' or 'downloads' (download counts
+                change between pages, so a document downloaded meanwhile
+                can move to a page already read)
+            limit (int): Page size (1-100)
+            cursor (str): next_cursor from the previous page
+
+        Returns:
+            dict: documents (list) and next_cursor (None on the last page)
+
+        Raises:
+            CatalogQueryError: If sort or cursor is invalid
+        """
+        if sort not in SORT_ORDERS:
+            raise CatalogQueryError(f"Unknown sort '{sort}'. Use one of: {', '.join(SORT_ORDERS)}")
+        if not self.enabled:
+            return {'documents': [], 'next_cursor': None}
+
+        sort_column, direction = SORT_ORDERS[sort]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions, params = [], []
+
+        if query:
+            match = self._fts_query(query)
+            if match:
+                conditions.append("id IN (SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?)")
+                params.append(match)
+        if output_format:
+            conditions.append("format = ?")
+            params.append(output_format)
+        if created_after is not None:
+            conditions.append("created_at >= ?")
+            params.append(float(created_after))
+        if created_before is not None:
+            conditions.append("created_at < ?")
+            params.append(float(created_before))
+        if min_size is not None:
+            conditions.append("file_size >= ?")
+            params.append(int(min_size))
+        if max_size is not None:
+            conditions.append("file_size <= ?")
+            params.append(int(max_size))
+
+        if cursor:
+            last_value, last_id = self._decode_cursor(cursor, sort)
+            operator = '<' if direction == 'DESC' else '>'
+            conditions.append(f"({sort_column}, id) {operator} (?, ?)")
+            params.extend([last_value, last_id])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = (
+            f"SELECT {', '.join(PUBLIC_COLUMNS)}, id FROM documents {where} "
+            f"ORDER BY {sort_column} {direction}, id {direction} LIMIT ?"
+        )
+        # One extra row tells whether another page exists
+        rows = self._connection().execute(sql, (*params, limit + 1)).fetchall()
+
+        documents = [self._to_dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = documents[-1]
+            next_cursor = self._encode_cursor(sort, last[sort_column], rows[limit - 1][-1])
+
+        return {'documents': documents, 'next_cursor': next_cursor}
+
+    def recent_topics(self, since, limit=5000):
+        """
+        Topics of the newest documents (newest first)
+
+        Args:
+            since (float): Only documents created after this Unix time
+            limit (int): Maximum number of documents scanned
+
+        Returns:
+            list: (topic, created_at, download_count) tuples
+        """
+        if not self.enabled:
+            return []
+
+        rows = self._connection().execute(
+            "SELECT topic, created_at, download_count FROM documents "
+            "WHERE created_at >= ? AND topic IS NOT NULL ORDER BY created_at DESC LIMIT ?",
+            (since, limit)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def with_compression(self, profiles):
+        """
+        Documents written with one of the given compression profiles
+
+        Args:
+            profiles (iterable): Profile names
+
+        Returns:
+            list: (file_id, filename, created_at) tuples, oldest first
+        """
+        profiles = list(profiles)
+        if not self.enabled or not profiles:
+            return []
+
+        rows = self._connection().execute(
+            f"SELECT file_id, filename, created_at FROM documents "
+            f"WHERE compression IN ({', '.join('?' * len(profiles))}) AND filename IS NOT NULL "
+            f"ORDER BY created_at",
+            profiles
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def count(self):
+        """Total number of cataloged documents"""
+        if not self.enabled:
+            return 0
+        return self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    # ----------------------------------------
+    # Internal methods
+    # ----------------------------------------
+
+    @staticmethod
+    def _fts_query(query):
+        """
+        Turn free text into a safe FTS5 query (all words, prefix match)
+
+        Example:
+            >>> DocumentCatalog._fts_query('machine learn')
+            '"machine"* "learn"*'
+        """
+        terms = re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def _encode_cursor(sort, value, row_id):
+        """Opaque cursor for the row a page ended on"""
+        raw = json.dumps([sort, value, row_id], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor, sort):
+        """Read (sort value, row ID) back from a cursor"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        except (ValueError, TypeError):
+            raise CatalogQueryError("Invalid cursor")
+        if cursor_sort != sort or not isinstance(row_id, int) or not isinstance(value, (int, float)):
+            raise CatalogQueryError("Cursor does not belong to this sort order")
+        return value, row_id
+
+    @staticmethod
+    def _to_dict(row):
+        document = dict(zip(PUBLIC_COLUMNS, row))
+        document['sections'] = json.loads(document['sections'])
+        return document
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+document_catalog = DocumentCatalog()
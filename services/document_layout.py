@@ -0,0 +1,121 @@
+"""
+Document Layout
+===============
+
+Format-independent structure of a blackbook: which sections appear, in
+what order, under which headings, and what the table of contents lists.
+
+Every writer (the DOCX section patcher and the preview renderers) builds
+on these helpers so that headings and TOC entries stay identical across
+output formats.
+
+Functions:
+    - section_title(): Display heading for a section key
+    - iter_sections(): Ordered (number, key, title, content) tuples
+    - toc_entries(): Table of contents entries for a sections dict
+    - format_document_date(): Date line shown on the title page
+
+Usage:
+    from services.document_layout import iter_sections, toc_entries
+
+    for number, key, title, content in iter_sections(sections):
+        ...
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+from datetime import datetime
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Subtitle printed under the title on the first page
+DOCUMENT_SUBTITLE = 'Academic Blackbook'
+
+# Heading of the table of contents page
+TOC_HEADING = 'Table of Contents'
+
+# Keys that are never rendered as sections
+NON_SECTION_KEYS = frozenset({'full_text'})
+
+
+# ============================================
+# LAYOUT FUNCTIONS
+# ============================================
+
+def section_title(section_key):
+    """
+    Convert a section key into its display heading
+
+    Args:
+        section_key (str): Key like 'literature_review'
+
+    Returns:
+        str: Heading like 'Literature Review'
+
+    Example:
+        >>> section_title('literature_review')
+        'Literature Review'
+    """
+    return section_key.replace('_', ' ').strip().title()
+
+
+def iter_sections(sections_dict):
+    """
+    Iterate over the renderable sections of a document in order
+
+    Sections keep the order of the dict (the order the AI produced them
+    or the caller sent them). Helper keys like 'full_text' and empty
+    sections are skipped.
+
+    Args:
+        sections_dict (dict): Section key -> content
+
+    Yields:
+        tuple: (number, key, title, content) with number starting at 1
+    """
+    number = 0
+    for key, content in sections_dict.items():
+        if key in NON_SECTION_KEYS or not content:
+            continue
+        number += 1
+        yield number, key, section_title(key), content
+
+
+def toc_entries(sections_dict):
+    """
+    Build the table of contents entries for a document
+
+    Args:
+        sections_dict (dict): Section key -> content
+
+    Returns:
+        list: Dicts with 'number', 'key', 'title' and 'anchor'
+    """
+    return [
+        {
+            'number': number,
+            'key': key,
+            'title': title,
+            'anchor': f"section-{key.replace('_', '-')}"
+        }
+        for number, key, title, _ in iter_sections(sections_dict)
+    ]
+
+
+def format_document_date(timestamp=None):
+    """
+    Format the date shown on the title page
+
+    Args:
+        timestamp (float): Unix timestamp (default: now)
+
+    Returns:
+        str: Date like 'February 20, 2026'
+    """
+    moment = datetime.fromtimestamp(timestamp) if timestamp else datetime.now()
+    return moment.strftime('%B %d, %Y')
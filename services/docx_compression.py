@@ -0,0 +1,460 @@
+"""
+DOCX Compression Profiles
+=========================
+
+Trade-off between the CPU spent zipping a .docx and its size on disk.
+
+python-docx saves with zlib's default deflate level, although most
+documents are downloaded once right after generation. Deflating the XML
+parts is a noticeable share of the CPU per document, and for a download
+over a fast link a larger file costs less than the compression does.
+
+Profiles:
+    stored    No compression (fastest write, ~4-6x larger)
+    fast      Deflate level 1
+    default   Deflate level 6 (what python-docx writes)
+    max       Deflate level 9 (smallest, slowest)
+
+python_docx_compression() makes python-docx zip with another profile
+while the document is saved (python-docx has no option for it, so its zip
+writer is replaced by one that reads the profile of the current thread).
+The package is written once; nothing is re-zipped afterwards.
+
+Documents written with stored or fast can be recompressed for long-term
+storage by a background task once they are no longer fresh (the
+"archive" tier). The file is replaced atomically and the catalog size is
+updated; downloads in progress keep reading the old file. Every writer
+that replaces a document in place holds document_lock() while it does,
+so a section edit in another worker is never overwritten. The catalog
+keeps each document's profile, so documents still waiting for the archive
+tier are queued again when a worker starts.
+
+Configuration (environment variables):
+    DOCX_COMPRESSION_PROFILE     Profile for new documents (default: default)
+    DOCX_ARCHIVE_PROFILE         Profile for the archive tier, or "none" (default: max)
+    DOCX_ARCHIVE_DELAY_SECONDS   Age before a document is recompressed (default: 600)
+
+Usage:
+    from services.docx_compression import normalize_profile, archive_recompressor
+
+    profile = normalize_profile(request.args.get('compression'))
+    result = document_builder.create_blackbook(title, sections, compression=profile)
+
+    with python_docx_compression('fast'):
+        document.save(filepath)
+
+    archive_recompressor.resume_pending()    # at startup
+
+    with document_lock(filepath):
+        ...  # read, rewrite and os.replace() the document
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import heapq
+import os
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: in-place writers are not serialized
+    fcntl = None
+
+try:
+    from docx.opc import phys_pkg as docx_phys_pkg
+except ImportError:  # pragma: no cover - python-docx output always uses its default level
+    docx_phys_pkg = None
+
+from services.document_catalog import document_catalog
+from utils.structured_logger import logger
+
+
+# ============================================
+# PROFILES
+# ============================================
+
+CompressionProfile = namedtuple('CompressionProfile', ['name', 'compress_type', 'compresslevel', 'rank'])
+
+COMPRESSION_PROFILES = {
+    'stored': CompressionProfile('stored', zipfile.ZIP_STORED, None, 0),
+    'fast': CompressionProfile('fast', zipfile.ZIP_DEFLATED, 1, 1),
+    'default': CompressionProfile('default', zipfile.ZIP_DEFLATED, 6, 2),
+    'max': CompressionProfile('max', zipfile.ZIP_DEFLATED, 9, 3)
+}
+
+PROFILE_ALIASES = {
+    'none': 'stored',
+    'store': 'stored',
+    'speed': 'fast',
+    'archive': 'max',
+    'best': 'max'
+}
+
+# Profile python-docx writes outside python_docx_compression()
+PYTHON_DOCX_PROFILE = 'default'
+
+
+def normalize_profile(profile_name):
+    """
+    Resolve a compression profile name
+
+    Args:
+        profile_name (str): Requested profile (case-insensitive, may be None
+            for the configured default)
+
+    Returns:
+        str: Profile name, or None if unknown
+    """
+    name = (profile_name or DEFAULT_PROFILE).strip().lower()
+    name = PROFILE_ALIASES.get(name, name)
+    return name if name in COMPRESSION_PROFILES else None
+
+
+def _configured_profile(variable, default):
+    """Read a profile name from the environment, falling back on typos"""
+    value = os.getenv(variable, default).strip().lower()
+    value = PROFILE_ALIASES.get(value, value)
+    if value not in COMPRESSION_PROFILES:
+        logger.warning(f"Unknown {variable} '{value}' - using '{default}'")
+        return default
+    return value
+
+
+DEFAULT_PROFILE = _configured_profile('DOCX_COMPRESSION_PROFILE', 'default')
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def compression_report(filepath, profile, write_ms):
+    """
+    Describe how a document was compressed
+
+    Args:
+        filepath (str): The .docx file
+        profile (str): Profile it was written with
+        write_ms (float): Time spent writing (or re-zipping) the package
+
+    Returns:
+        dict: profile, file_size, uncompressed_size, ratio, write_ms
+    """
+    with zipfile.ZipFile(filepath) as archive:
+        uncompressed_size = sum(item.file_size for item in archive.infolist())
+    file_size = os.path.getsize(filepath)
+
+    return {
+        'profile': profile,
+        'file_size': file_size,
+        'uncompressed_size': uncompressed_size,
+        'ratio': round(uncompressed_size / file_size, 2) if file_size else None,
+        'write_ms': round(write_ms, 2)
+    }
+
+
+@contextmanager
+def python_docx_compression(profile):
+    """
+    Make python-docx saves in this thread zip with a profile
+
+    Args:
+        profile (str): Profile name
+
+    Yields:
+        str: The profile the package is written with (PYTHON_DOCX_PROFILE
+            if python-docx's zip writer could not be replaced)
+    """
+    if not PYTHON_DOCX_PROFILES_SUPPORTED:
+        yield PYTHON_DOCX_PROFILE
+        return
+
+    previous = getattr(_python_docx_profile, 'name', None)
+    _python_docx_profile.name = profile
+    try:
+        yield profile
+    finally:
+        _python_docx_profile.name = previous
+
+
+@contextmanager
+def document_lock(filepath):
+    """
+    Exclusive lock on a document across worker processes
+
+    Held from reading a .docx until its replacement is renamed over it.
+    The lock is taken on the file itself: if another writer replaced the
+    file while we waited, the new file is locked instead.
+
+    Args:
+        filepath (str): The .docx file
+
+    Raises:
+        FileNotFoundError: If the document does not exist (any more)
+    """
+    if fcntl is None:
+        yield
+        return
+
+    while True:
+        handle = open(filepath, 'rb')
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            if os.fstat(handle.fileno()).st_ino == os.stat(filepath).st_ino:
+                break
+        except BaseException:
+            handle.close()
+            raise
+        handle.close()
+
+    try:
+        yield
+    finally:
+        # Closing the file releases the lock
+        handle.close()
+
+
+def _write_recompressed(filepath, temp_path, profile):
+    """Copy every part of a .docx into temp_path with another profile"""
+    settings = COMPRESSION_PROFILES[profile]
+
+    with zipfile.ZipFile(filepath) as source, \
+            zipfile.ZipFile(temp_path, 'w', settings.compress_type, compresslevel=settings.compresslevel) as target:
+        for item in source.infolist():
+            info = zipfile.ZipInfo(item.filename, item.date_time)
+            info.compress_type = settings.compress_type
+            info.external_attr = item.external_attr
+            target.writestr(info, source.read(item), compresslevel=settings.compresslevel)
+
+
+def recompress(filepath, profile):
+    """
+    Rewrite every part of a .docx with another profile
+
+    The new package is written next to the original and swapped in with
+    os.replace(), so readers never see a partial file.
+
+    Args:
+        filepath (str): The .docx file
+        profile (str): Target profile name
+
+    Returns:
+        float: Milliseconds spent
+    """
+    temp_path = f"{filepath}.recompress"
+    start_time = time.perf_counter()
+
+    _write_recompressed(filepath, temp_path, profile)
+    os.replace(temp_path, filepath)
+
+    return (time.perf_counter() - start_time) * 1000
+
+
+# ============================================
+# PYTHON-DOCX ZIP WRITER
+# ============================================
+
+# Profile for python-docx saves in the current thread (None: PYTHON_DOCX_PROFILE)
+_python_docx_profile = threading.local()
+
+PYTHON_DOCX_PROFILES_SUPPORTED = docx_phys_pkg is not None and hasattr(docx_phys_pkg, '_ZipPkgWriter')
+
+if PYTHON_DOCX_PROFILES_SUPPORTED:
+    class ProfileZipPkgWriter(docx_phys_pkg._ZipPkgWriter):
+        """python-docx's zip writer using the profile of the current thread"""
+
+        def __init__(self, pkg_file):
+            settings = COMPRESSION_PROFILES[getattr(_python_docx_profile, 'name', None) or PYTHON_DOCX_PROFILE]
+            self._zipf = zipfile.ZipFile(
+                pkg_file, 'w', compression=settings.compress_type, compresslevel=settings.compresslevel
+            )
+
+    # PhysPkgWriter() looks the class up here on every save
+    docx_phys_pkg._ZipPkgWriter = ProfileZipPkgWriter
+else:  # pragma: no cover
+    logger.warning("python-docx zip writer not found - python-docx documents use the default profile")
+
+
+# ============================================
+# ARCHIVE RECOMPRESSOR CLASS
+# ============================================
+
+class ArchiveRecompressor:
+    """
+    Background task moving aged documents to the archive profile
+
+    Documents are queued when they are written with stored or fast and
+    recompressed once they are older than the configured delay. The
+    document is locked while it is rewritten, so a section edit waits
+    (and is never lost). Documents already archived by another worker
+    are skipped.
+
+    Attributes:
+        profile (str): Archive profile name (None if the tier is disabled)
+        delay_seconds (float): Age before recompression
+    """
+
+    def __init__(self, profile=None, delay_seconds=None):
+        archive_profile = os.getenv('DOCX_ARCHIVE_PROFILE', 'max').strip().lower()
+        self.profile = profile or (None if archive_profile in ('', 'none', 'off') else
+                                   _configured_profile('DOCX_ARCHIVE_PROFILE', 'max'))
+        self.delay_seconds = float(
+            delay_seconds if delay_seconds is not None else os.getenv('DOCX_ARCHIVE_DELAY_SECONDS', 600)
+        )
+
+        self._queue = []  # (due time, file_id, filepath)
+        self._condition = threading.Condition()
+        self._worker = None
+
+        self._scheduled = 0
+        self._archived = 0
+        self._skipped = 0
+        self._bytes_saved = 0
+
+    def schedule(self, file_id, filepath, profile):
+        """
+        Queue a document for recompression if its tier is cheaper
+
+        Args:
+            file_id (str): Document ID (for the catalog)
+            filepath (str): The .docx file
+            profile (str): Profile the document was written with
+
+        Returns:
+            bool: True if the document was queued
+        """
+        if self.profile is None:
+            return False
+
+        if profile not in self._cheap_profiles():
+            return False
+
+        self._push(time.time() + self.delay_seconds, file_id, filepath)
+        return True
+
+    def resume_pending(self, output_dir='outputs'):
+        """
+        Queue the documents earlier processes did not archive yet
+
+        The queue is kept in memory; the catalog's compression column is
+        what survives a restart. Each document is due its delay after its
+        creation time. Every worker may call this: a document archived by
+        one of them is skipped by the others.
+
+        Args:
+            output_dir (str): Directory holding the documents
+
+        Returns:
+            int: Documents queued
+        """
+        if self.profile is None:
+            return 0
+
+        pending = [
+            (file_id, os.path.join(output_dir, filename), created_at)
+            for file_id, filename, created_at in document_catalog.with_compression(self._cheap_profiles())
+        ]
+        # Deleted documents stay in the catalog
+        pending = [entry for entry in pending if os.path.isfile(entry[1])]
+        for file_id, filepath, created_at in pending:
+            self._push(created_at + self.delay_seconds, file_id, filepath)
+
+        if pending:
+            logger.info(f"Archive tier: {len(pending)} document(s) from earlier processes queued")
+        return len(pending)
+
+    def get_stats(self):
+        """
+        Get archive tier statistics
+
+        Returns:
+            dict: Profile, delay, pending/archived/skipped counts and bytes saved
+        """
+        with self._condition:
+            return {
+                'profile': self.profile,
+                'delay_seconds': self.delay_seconds,
+                'pending': len(self._queue),
+                'scheduled': self._scheduled,
+                'archived': self._archived,
+                'skipped': self._skipped,
+                'bytes_saved': self._bytes_saved
+            }
+
+    # ----------------------------------------
+    # Worker
+    # ----------------------------------------
+
+    def _cheap_profiles(self):
+        """Profiles that are archived: below python-docx's level and the archive profile"""
+        # Recompressing 'default' output would save only a few percent
+        threshold = min(COMPRESSION_PROFILES[PYTHON_DOCX_PROFILE].rank, COMPRESSION_PROFILES[self.profile].rank)
+        return [name for name, settings in COMPRESSION_PROFILES.items() if settings.rank < threshold]
+
+    def _push(self, due_at, file_id, filepath):
+        """Queue one document and make sure the worker thread runs"""
+        with self._condition:
+            heapq.heappush(self._queue, (due_at, file_id, filepath))
+            self._scheduled += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='docx-archive', daemon=True)
+                self._worker.start()
+            self._condition.notify()
+
+    def _run(self):
+        """Recompress queued documents as they come due"""
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.time():
+                    timeout = self._queue[0][0] - time.time() if self._queue else None
+                    self._condition.wait(timeout)
+                _, file_id, filepath = heapq.heappop(self._queue)
+
+            self._archive(file_id, filepath)
+
+    def _archive(self, file_id, filepath):
+        """Recompress one document unless it was deleted or already archived"""
+        temp_path = f"{filepath}.recompress"
+        try:
+            with document_lock(filepath):
+                document = document_catalog.get(file_id)
+                if document is not None and document['compression'] not in (None, *self._cheap_profiles()):
+                    # Another worker (or an edit) got there first
+                    with self._condition:
+                        self._skipped += 1
+                    return
+
+                old_size = os.path.getsize(filepath)
+                _write_recompressed(filepath, temp_path, self.profile)
+                os.replace(temp_path, filepath)
+                new_size = os.path.getsize(filepath)
+                document_catalog.update_file_size(file_id, new_size, compression=self.profile)
+
+            with self._condition:
+                self._archived += 1
+                self._bytes_saved += old_size - new_size
+            logger.info(f"Archived {os.path.basename(filepath)}: {old_size} -> {new_size} bytes ({self.profile})")
+
+        except FileNotFoundError:
+            # Deleted before it came due
+            with self._condition:
+                self._skipped += 1
+
+        except Exception as e:
+            logger.warning(f"Could not recompress {filepath}: {str(e)}")
+            with self._condition:
+                self._skipped += 1
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+archive_recompressor = ArchiveRecompressor()
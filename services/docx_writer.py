@@ -0,0 +1,421 @@
+"""
+Fragment DOCX Writer
+====================
+
+Builds a complete blackbook .docx from pre-serialized OOXML.
+
+python-docx rebuilds the same element trees for every document: styles,
+the title page layout, the TOC field, the footer page number field. Here
+all of those invariant parts are serialized once (at import time) and
+only the variable strings - title, date, section text - are escaped and
+spliced in when a document is assembled.
+
+Package layout:
+    [Content_Types].xml, _rels/.rels, docProps/app.xml    static bytes
+    word/styles.xml, word/settings.xml, word/footer1.xml  static bytes
+    word/_rels/document.xml.rels                          static bytes
+    docProps/core.xml                                     template (title, dates)
+    word/document.xml                                     fragments (ooxml_fragments)
+
+The result has the same interface as `DocumentGenerator.create_blackbook()`
+and the same document structure as section edits, so it can be patched
+by the section patcher.
+
+Both builders accept a compression profile (services/docx_compression.py)
+and zip with it directly: python-docx saves inside
+python_docx_compression(), so no package is written twice.
+
+Configuration (environment variables):
+    DOCX_ENGINE   fragments (default) | python-docx - which builder
+                  document_builder refers to
+
+The fragment writer is the default: test_docx_layout.py resolves the
+effective formatting of every paragraph (styles, title page, TOC,
+sections, footer, page setup) and compares it with the DocumentGenerator
+documents in outputs/. The one structural difference is that the TOC
+entries sit inside a TOC field, so Word can update the page numbers.
+
+Usage:
+    from services.docx_writer import document_builder
+
+    result = document_builder.create_blackbook(title=topic, sections_dict=sections)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import io
+import os
+import re
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+
+# Local imports
+from services.doc_generator import document_generator
+from services.docx_compression import (
+    COMPRESSION_PROFILES, DEFAULT_PROFILE, archive_recompressor, compression_report, normalize_profile,
+    python_docx_compression
+)
+from services.document_layout import format_document_date, iter_sections, toc_entries
+from services.ooxml_fragments import (
+    BODY_SIZE, FONT_NAME, HEADING_SIZE, render_section, render_title_page, render_toc, xml_text
+)
+from services.section_content import is_structured, section_blocks
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_OUTPUT_DIR = 'outputs'
+SUPPORTED_ENGINES = ('python-docx', 'fragments')
+
+# Maximum title characters used in the filename
+FILENAME_TITLE_LENGTH = 30
+
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+R_NAMESPACE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+
+# ============================================
+# PRE-SERIALIZED PACKAGE PARTS
+# ============================================
+
+CONTENT_TYPES_XML = (
+    XML_DECLARATION +
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '<Override PartName="/word/settings.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.settings+xml"/>'
+    '<Override PartName="/word/footer1.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.footer+xml"/>'
+    '<Override PartName="/docProps/core.xml" ContentType="application/'
+    'vnd.openxmlformats-package.core-properties+xml"/>'
+    '<Override PartName="/docProps/app.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.extended-properties+xml"/>'
+    '</Types>'
+).encode('utf-8')
+
+PACKAGE_RELS_XML = (
+    XML_DECLARATION +
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/'
+    'relationships/metadata/core-properties" Target="docProps/core.xml"/>'
+    '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/extended-properties" Target="docProps/app.xml"/>'
+    '</Relationships>'
+).encode('utf-8')
+
+DOCUMENT_RELS_XML = (
+    XML_DECLARATION +
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/styles" Target="styles.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/settings" Target="settings.xml"/>'
+    '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/footer" Target="footer1.xml"/>'
+    '</Relationships>'
+).encode('utf-8')
+
+APP_XML = (
+    XML_DECLARATION +
+    '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+    '<Application>AI Blackbook Generator</Application></Properties>'
+).encode('utf-8')
+
+SETTINGS_XML = (
+    XML_DECLARATION +
+    f'<w:settings xmlns:w="{W_NAMESPACE}">'
+    '<w:defaultTabStop w:val="720"/><w:compat>'
+    '<w:compatSetting w:name="compatibilityMode" w:uri="http://schemas.microsoft.com/office/word" w:val="15"/>'
+    '</w:compat></w:settings>'
+).encode('utf-8')
+
+_RUN_FONTS = f'<w:rFonts w:ascii="{FONT_NAME}" w:hAnsi="{FONT_NAME}" w:cs="{FONT_NAME}"/>'
+
+# Times New Roman 12pt body, Heading 1 (outline level 0 feeds the TOC field)
+# and Footer, with the values python-docx's default template gives DocumentGenerator
+STYLES_XML = (
+    XML_DECLARATION +
+    f'<w:styles xmlns:w="{W_NAMESPACE}">'
+    f'<w:docDefaults><w:rPrDefault><w:rPr>{_RUN_FONTS}'
+    f'<w:sz w:val="{BODY_SIZE}"/><w:szCs w:val="{BODY_SIZE}"/><w:lang w:val="en-US"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="360" w:lineRule="auto"/></w:pPr></w:pPrDefault>'
+    '</w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>'
+    '<w:next w:val="Normal"/><w:qFormat/><w:pPr><w:keepNext/><w:keepLines/><w:spacing w:before="240" w:after="120"/>'
+    f'<w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="{HEADING_SIZE}"/>'
+    f'<w:szCs w:val="{HEADING_SIZE}"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Footer"><w:name w:val="footer"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:tabs><w:tab w:val="center" w:pos="4680"/><w:tab w:val="right" w:pos="9360"/></w:tabs>'
+    '<w:spacing w:after="0" w:line="240" w:lineRule="auto"/></w:pPr></w:style>'
+    '</w:styles>'
+).encode('utf-8')
+
+# Centered "Page N" footer with a PAGE field, in the same runs DocumentGenerator writes
+_FOOTER_RUN_PROPERTIES = f'<w:rPr>{_RUN_FONTS}<w:sz w:val="20"/></w:rPr>'
+FOOTER_XML = (
+    XML_DECLARATION +
+    f'<w:ftr xmlns:w="{W_NAMESPACE}"><w:p><w:pPr><w:pStyle w:val="Footer"/><w:jc w:val="center"/></w:pPr>'
+    f'<w:r>{_FOOTER_RUN_PROPERTIES}<w:t xml:space="preserve">Page </w:t></w:r>'
+    f'<w:r>{_FOOTER_RUN_PROPERTIES}<w:fldChar w:fldCharType="begin"/></w:r>'
+    f'<w:r>{_FOOTER_RUN_PROPERTIES}<w:instrText xml:space="preserve">PAGE</w:instrText></w:r>'
+    f'<w:r>{_FOOTER_RUN_PROPERTIES}<w:fldChar w:fldCharType="end"/></w:r></w:p></w:ftr>'
+).encode('utf-8')
+
+CORE_XML_TEMPLATE = (
+    XML_DECLARATION +
+    '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+    '<dc:title>{title}</dc:title><dc:creator>AI Blackbook Generator</dc:creator>'
+    '<dcterms:created xsi:type="dcterms:W3CDTF">{created}</dcterms:created>'
+    '<dcterms:modified xsi:type="dcterms:W3CDTF">{created}</dcterms:modified>'
+    '</cp:coreProperties>'
+)
+
+DOCUMENT_HEAD = XML_DECLARATION + f'<w:document xmlns:w="{W_NAMESPACE}" xmlns:r="{R_NAMESPACE}"><w:body>'
+
+# Letter page, 1 inch margins, footer with page numbers
+DOCUMENT_TAIL = (
+    '<w:sectPr><w:footerReference w:type="default" r:id="rId3"/>'
+    '<w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+    'w:header="720" w:footer="720" w:gutter="0"/></w:sectPr></w:body></w:document>'
+)
+
+# Static parts in package order
+STATIC_PARTS = (
+    ('[Content_Types].xml', CONTENT_TYPES_XML),
+    ('_rels/.rels', PACKAGE_RELS_XML),
+    ('docProps/app.xml', APP_XML),
+    ('word/_rels/document.xml.rels', DOCUMENT_RELS_XML),
+    ('word/styles.xml', STYLES_XML),
+    ('word/settings.xml', SETTINGS_XML),
+    ('word/footer1.xml', FOOTER_XML)
+)
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def build_package(title, sections, created_at=None, output=None, section_keys=None, compression='default',
+                  text_stats=None):
+    """
+    Write a complete .docx package
+
+    word/document.xml is streamed into the archive one fragment at a
+    time, so only one section is rendered in memory at once. `sections`
+    may be any mapping whose items() produce the texts lazily (e.g. a
+    spool file of an uploaded document).
+
+    Args:
+        title (str): Document title
+        sections (dict): Section key -> text or content blocks
+            (services/section_content.py)
+        created_at (float): Unix timestamp for the date line and properties
+        output (str | file): Path or binary file object (default: new BytesIO)
+        section_keys (list): Non-empty section keys in order, if known
+            without reading the texts (used for the TOC)
+        compression (str): Compression profile name
+        text_stats (dict): analyze_sections() result for these sections;
+            its paragraph lists are used instead of splitting the texts again
+
+    Returns:
+        str | file: The output that was written to
+    """
+    created_at = created_at or time.time()
+    output = output if output is not None else io.BytesIO()
+    created_iso = datetime.fromtimestamp(created_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    # The TOC only needs each section's key and whether it is non-empty
+    toc_source = sections if section_keys is None else dict.fromkeys(section_keys, True)
+    core_xml = CORE_XML_TEMPLATE.format(title=xml_text(title), created=created_iso)
+    settings = COMPRESSION_PROFILES[compression]
+
+    with zipfile.ZipFile(output, 'w', settings.compress_type, compresslevel=settings.compresslevel) as archive:
+        for name, data in STATIC_PARTS:
+            archive.writestr(name, data)
+        archive.writestr('docProps/core.xml', core_xml)
+
+        with archive.open('word/document.xml', 'w') as part:
+            part.write((
+                DOCUMENT_HEAD
+                + render_title_page(title, format_document_date(created_at))
+                + render_toc(toc_entries(toc_source))
+            ).encode('utf-8'))
+            for _, key, section_title, content in iter_sections(sections):
+                part.write(render_section(section_title, _blocks(content, key, text_stats)).encode('utf-8'))
+            part.write(DOCUMENT_TAIL.encode('utf-8'))
+
+    return output
+
+
+def _blocks(content, key, text_stats):
+    """Render blocks of a section, reusing precomputed paragraphs of plain text"""
+    if text_stats and isinstance(content, str) and key in text_stats['sections']:
+        return text_stats['sections'][key]['paragraphs']
+    return section_blocks(content, key)
+
+
+def _finish_compression(filepath, filename, profile, write_ms):
+    """Report the profile used and hand cheap profiles to the archive tier"""
+    report = compression_report(filepath, profile, write_ms)
+
+    file_id = filename.rsplit('_', 1)[-1].replace('.docx', '')
+    if archive_recompressor.schedule(file_id, filepath, profile):
+        report['archive_profile'] = archive_recompressor.profile
+        report['archive_after_seconds'] = archive_recompressor.delay_seconds
+
+    return report
+
+
+# ============================================
+# FRAGMENT DOCX WRITER CLASS
+# ============================================
+
+class FragmentDocxWriter:
+    """
+    Drop-in replacement for DocumentGenerator.create_blackbook()
+
+    Attributes:
+        output_dir (str): Directory for generated documents
+    """
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR):
+        self.output_dir = output_dir
+
+    def create_blackbook(self, title, sections_dict, section_keys=None, compression=None, text_stats=None):
+        """
+        Create a blackbook document from pre-serialized fragments
+
+        Args:
+            title (str): Document title
+            sections_dict (dict): Section key -> text or content blocks
+            section_keys (list): Non-empty section keys (see build_package)
+            compression (str): Compression profile (default: DOCX_COMPRESSION_PROFILE)
+            text_stats (dict): analyze_sections() result, if already computed
+
+        Returns:
+            dict: success, filepath, filename, title, sections_count, file_size,
+                compression (or success=False and error)
+        """
+        try:
+            profile = normalize_profile(compression) or DEFAULT_PROFILE
+            start_time = time.perf_counter()
+
+            os.makedirs(self.output_dir, exist_ok=True)
+
+            safe_title = re.sub(r'[^\w\s-]', '', title).strip()
+            safe_title = re.sub(r'\s+', '_', safe_title)[:FILENAME_TITLE_LENGTH] or 'Blackbook'
+            filename = f"{safe_title}_{uuid.uuid4().hex[:8]}.docx"
+            filepath = os.path.join(self.output_dir, filename)
+
+            build_package(title, sections_dict, output=filepath, section_keys=section_keys, compression=profile,
+                          text_stats=text_stats)
+            write_ms = (time.perf_counter() - start_time) * 1000
+            counted = sections_dict if section_keys is None else dict.fromkeys(section_keys, True)
+
+            return {
+                'success': True,
+                'filepath': filepath,
+                'filename': filename,
+                'title': title,
+                'sections_count': sum(1 for _ in iter_sections(counted)),
+                'file_size': os.path.getsize(filepath),
+                'compression': _finish_compression(filepath, filename, profile, write_ms)
+            }
+
+        except Exception as e:
+            logger.error(f"Fragment document creation failed: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+
+# ============================================
+# PYTHON-DOCX BUILDER CLASS
+# ============================================
+
+class PythonDocxBuilder:
+    """
+    DocumentGenerator with compression profiles
+
+    DocumentGenerator's save runs inside python_docx_compression(), so
+    python-docx zips the package with the requested profile.
+
+    DocumentGenerator only writes plain paragraphs, so documents with
+    tables, lists or references are built by the fragment writer, whose
+    bulk table markup is also far faster than python-docx's per-cell API.
+    Its title page, TOC, headings and body paragraphs are formatted like
+    DocumentGenerator's (test_docx_layout.py), so both kinds of document
+    look the same on this engine too.
+
+    Attributes:
+        generator (DocumentGenerator): The python-docx document generator
+        rich_content_writer (FragmentDocxWriter): Builder for documents
+            with structured sections
+    """
+
+    def __init__(self, generator, rich_content_writer):
+        self.generator = generator
+        self.rich_content_writer = rich_content_writer
+
+    def create_blackbook(self, title, sections_dict, compression=None, text_stats=None):
+        """
+        Create a blackbook document with python-docx
+
+        Args:
+            title (str): Document title
+            sections_dict (dict): Section key -> text or content blocks
+            compression (str): Compression profile (default: DOCX_COMPRESSION_PROFILE)
+            text_stats (dict): analyze_sections() result, passed on to the
+                fragment writer (DocumentGenerator splits the texts itself)
+
+        Returns:
+            dict: DocumentGenerator result plus compression
+        """
+        if any(is_structured(content) for content in sections_dict.values()):
+            return self.rich_content_writer.create_blackbook(
+                title, sections_dict, compression=compression, text_stats=text_stats
+            )
+
+        profile = normalize_profile(compression) or DEFAULT_PROFILE
+        start_time = time.perf_counter()
+
+        with python_docx_compression(profile) as profile:
+            result = self.generator.create_blackbook(title=title, sections_dict=sections_dict)
+        if not result.get('success'):
+            return result
+
+        write_ms = (time.perf_counter() - start_time) * 1000
+        result['compression'] = _finish_compression(result['filepath'], result['filename'], profile, write_ms)
+        return result
+
+
+# ============================================
+# GLOBAL INSTANCES
+# ============================================
+
+fragment_docx_writer = FragmentDocxWriter()
+python_docx_builder = PythonDocxBuilder(document_generator, fragment_docx_writer)
+
+# Builder used for new documents (DOCX_ENGINE selects it)
+_engine = os.getenv('DOCX_ENGINE', 'fragments').lower()
+if _engine not in SUPPORTED_ENGINES:
+    logger.warning(f"Unknown DOCX_ENGINE '{_engine}' - using fragments")
+document_builder = python_docx_builder if _engine == 'python-docx' else fragment_docx_writer
@@ -0,0 +1,356 @@
+"""
+File Server
+===========
+
+Fast serving of generated files for the download routes.
+
+Validation, lookups and logging stay in Flask; only the byte transfer
+changes. There are three modes:
+
+    off         Flask sends the bytes (default). The body is the WSGI
+                server's file wrapper, so gunicorn transmits it with
+                os.sendfile() (zero-copy) when it can; other servers
+                read it in large blocks.
+    x-accel     nginx: an empty response with an X-Accel-Redirect header
+                naming an internal location that maps to the output
+                directory. nginx sends the file itself.
+    x-sendfile  Apache mod_xsendfile / lighttpd: an X-Sendfile header
+                with the absolute file path.
+
+Stat results are kept in a small file index (one os.stat() per file per
+TTL instead of exists / isfile / getsize on every request). The index
+only ever caches files that exist; a file that disappears is dropped
+from the index the moment opening it fails.
+
+Stat entries stay per process (os.stat() is cheaper than a shared cache
+round trip). File ID lookups that need a scan of the output directory
+are shared between workers through the shared cache tier. File IDs that
+match no file are remembered per process for FILE_ID_MISS_TTL_SECONDS,
+so repeated requests for an unknown ID do not rescan the directory.
+
+nginx example (DOWNLOAD_OFFLOAD=x-accel, DOWNLOAD_ACCEL_PREFIX=/protected-outputs/):
+
+    location /protected-outputs/ {
+        internal;
+        alias /srv/blackbook/outputs/;
+    }
+
+Configuration (environment variables):
+    DOWNLOAD_OFFLOAD              off | x-accel | x-sendfile (default: off)
+    DOWNLOAD_ACCEL_PREFIX         Internal nginx location (default: /protected-outputs/)
+    FILE_INDEX_TTL_SECONDS        Seconds a stat result is reused (default: 30)
+    FILE_INDEX_MAX_ENTRIES        Files kept in the index (default: 10000)
+    FILE_ID_MISS_TTL_SECONDS      Seconds an unknown file ID is not looked up again (default: 10)
+
+Usage:
+    from services.file_server import file_server
+
+    entry = file_server.index.stat('Topic_a1b2c3d4.docx')
+    if entry is None:
+        return not_found()
+    return file_server.send(entry, download_name=entry.filename, mimetype=OUTPUT_FORMATS['docx'][1])
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import os
+import stat
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, namedtuple
+from urllib.parse import quote
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+from services.shared_cache import shared_cache
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+OFFLOAD_MODES = ('off', 'x-accel', 'x-sendfile')
+
+DEFAULT_OUTPUT_DIR = 'outputs'
+DEFAULT_ACCEL_PREFIX = '/protected-outputs/'
+DEFAULT_INDEX_TTL_SECONDS = 30
+DEFAULT_INDEX_MAX_ENTRIES = 10000
+DEFAULT_MISS_TTL_SECONDS = 10
+
+# Read size when the WSGI server has no sendfile-capable file wrapper
+# (the Werkzeug default is 8 KB)
+FALLBACK_BLOCK_SIZE = 1024 * 1024
+
+FileEntry = namedtuple('FileEntry', ['filename', 'filepath', 'size', 'mtime'])
+
+
+# ============================================
+# FILE INDEX CLASS
+# ============================================
+
+class FileIndex:
+    """
+    Cache of stat() results for files in the output directory
+
+    Attributes:
+        root (str): Directory the relative names are resolved against
+        ttl (float): Seconds a cached entry is trusted
+        max_entries (int): Bound on cached entries (least recently used out)
+        miss_ttl (float): Seconds a file ID without a file is not scanned for again
+    """
+
+    def __init__(self, root=DEFAULT_OUTPUT_DIR, ttl=None, max_entries=None, miss_ttl=None):
+        self.root = root
+        self.ttl = float(ttl if ttl is not None else os.getenv('FILE_INDEX_TTL_SECONDS', DEFAULT_INDEX_TTL_SECONDS))
+        self.max_entries = int(max_entries or os.getenv('FILE_INDEX_MAX_ENTRIES', DEFAULT_INDEX_MAX_ENTRIES))
+        self.miss_ttl = float(
+            miss_ttl if miss_ttl is not None else os.getenv('FILE_ID_MISS_TTL_SECONDS', DEFAULT_MISS_TTL_SECONDS)
+        )
+
+        self._entries = OrderedDict()  # relative name -> (FileEntry, expires_at)
+        self._missing_ids = OrderedDict()  # file ID -> expires_at
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'not_found': 0, 'id_scans': 0, 'id_misses_cached': 0}
+
+    def stat(self, name):
+        """
+        Look up a regular file by its name relative to the root
+
+        Args:
+            name (str): Relative path (e.g. 'Topic_a1b2c3d4.docx' or
+                'previews/a1b2c3d4.pdf'); must not leave the root
+
+        Returns:
+            FileEntry: Path, size and mtime, or None if there is no such
+                regular file
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(name)
+            if cached is not None and cached[1] > now:
+                self._entries.move_to_end(name)
+                self._stats['hits'] += 1
+                return cached[0]
+
+        filepath = os.path.join(self.root, name)
+        try:
+            result = os.stat(filepath)
+        except (OSError, ValueError):
+            result = None
+
+        with self._lock:
+            if result is None or not stat.S_ISREG(result.st_mode):
+                self._entries.pop(name, None)
+                self._stats['not_found'] += 1
+                return None
+
+            entry = FileEntry(os.path.basename(name), filepath, result.st_size, result.st_mtime)
+            self._entries[name] = (entry, now + self.ttl)
+            self._entries.move_to_end(name)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stats['misses'] += 1
+        return entry
+
+    def find_by_file_id(self, file_id):
+        """
+        Find the document file whose name contains a file ID
+
+        Used for documents that are not in the catalog. The directory scan
+        runs once across all workers; its result is kept in the shared
+        cache until the file disappears. An ID that matches nothing is
+        not scanned for again in this process for miss_ttl seconds.
+
+        Args:
+            file_id (str): Validated file ID
+
+        Returns:
+            FileEntry: The matching .docx file, or None
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._missing_ids.get(file_id)
+            if expires_at is not None and expires_at > now:
+                self._stats['id_misses_cached'] += 1
+                return None
+
+        key = shared_cache.key('file-id', f"{os.path.abspath(self.root)}:{file_id}")
+        filename, was_cached = shared_cache.get_or_compute(
+            key, lambda: self._scan_for(file_id), store_if=bool
+        )
+        entry = self.stat(filename) if filename else None
+
+        if entry is None and was_cached:
+            # Stale shared entry: the file was deleted or renamed
+            shared_cache.delete(key)
+            filename = self._scan_for(file_id)
+            entry = self.stat(filename) if filename else None
+
+        with self._lock:
+            if entry is not None:
+                self._missing_ids.pop(file_id, None)
+            elif self.miss_ttl > 0:
+                self._missing_ids[file_id] = now + self.miss_ttl
+                self._missing_ids.move_to_end(file_id)
+                if len(self._missing_ids) > self.max_entries:
+                    self._missing_ids.popitem(last=False)
+        return entry
+
+    def _scan_for(self, file_id):
+        """First .docx filename in the root that contains file_id (or None)"""
+        with self._lock:
+            self._stats['id_scans'] += 1
+        try:
+            names = sorted(os.listdir(self.root))
+        except OSError:
+            return None
+        for filename in names:
+            if filename.endswith('.docx') and file_id in filename:
+                return filename
+        return None
+
+    def invalidate(self, name=None):
+        """
+        Drop one cached entry, or all of them
+
+        Args:
+            name (str): Relative name (None clears the index)
+        """
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._missing_ids.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['missing_ids'] = len(self._missing_ids)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# ============================================
+# FILE SERVER CLASS
+# ============================================
+
+class FileServer:
+    """
+    Builds download responses in the configured offload mode
+
+    Attributes:
+        mode (str): 'off', 'x-accel' or 'x-sendfile'
+        accel_prefix (str): Internal location for X-Accel-Redirect
+        index (FileIndex): Stat cache for the output directory
+    """
+
+    def __init__(self, root=DEFAULT_OUTPUT_DIR, mode=None, accel_prefix=None):
+        mode = (mode or os.getenv('DOWNLOAD_OFFLOAD', 'off')).strip().lower()
+        self.mode = mode if mode in OFFLOAD_MODES else 'off'
+        prefix = accel_prefix or os.getenv('DOWNLOAD_ACCEL_PREFIX', DEFAULT_ACCEL_PREFIX)
+        self.accel_prefix = '/' + prefix.strip('/') + '/'
+        self.index = FileIndex(root)
+
+        self._lock = threading.Lock()
+        self._stats = {mode_name: 0 for mode_name in OFFLOAD_MODES}
+        self._stats['bytes_sent_by_python'] = 0
+
+    # ----------------------------------------
+    # Responses
+    # ----------------------------------------
+
+    def send(self, entry, download_name, mimetype):
+        """
+        Build the download response for an indexed file
+
+        Args:
+            entry (FileEntry): File from index.stat()
+            download_name (str): Filename offered to the client
+            mimetype (str): Content type
+
+        Returns:
+            Response: Offload response or file response
+
+        Raises:
+            FileNotFoundError: If the file disappeared since it was indexed
+                (the entry is dropped from the index first)
+        """
+        if self.mode == 'x-accel':
+            response = Response(mimetype=mimetype)
+            relative = os.path.relpath(entry.filepath, self.index.root).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = self.accel_prefix + quote(relative)
+        elif self.mode == 'x-sendfile':
+            response = Response(mimetype=mimetype)
+            response.headers['X-Sendfile'] = os.path.abspath(entry.filepath)
+        else:
+            response = self._file_response(entry, mimetype)
+
+        self._set_disposition(response, download_name)
+        with self._lock:
+            self._stats[self.mode] += 1
+            if self.mode == 'off':
+                self._stats['bytes_sent_by_python'] += response.content_length or 0
+        return response
+
+    def _file_response(self, entry, mimetype):
+        """File body through the server's file wrapper, with Range and ETag support"""
+        try:
+            file = open(entry.filepath, 'rb')
+        except FileNotFoundError:
+            self.index.invalidate(os.path.relpath(entry.filepath, self.index.root))
+            raise
+
+        # Size and validators come from the open file, so a file replaced
+        # since it was indexed is still sent with a matching length
+        result = os.fstat(file.fileno())
+        response = Response(
+            wrap_file(request.environ, file, FALLBACK_BLOCK_SIZE),
+            mimetype=mimetype,
+            direct_passthrough=True
+        )
+        response.content_length = result.st_size
+        response.last_modified = result.st_mtime
+        response.set_etag(f"{result.st_ino:x}-{result.st_size:x}-{int(result.st_mtime * 1000):x}")
+        response.cache_control.no_cache = True
+        return response.make_conditional(request.environ, accept_ranges=True, complete_length=result.st_size)
+
+    @staticmethod
+    def _set_disposition(response, download_name):
+        """Attachment header with an RFC 5987 fallback for non-ASCII names"""
+        try:
+            download_name.encode('ascii')
+        except UnicodeEncodeError:
+            simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+            response.headers.set(
+                'Content-Disposition', 'attachment',
+                filename=simple, **{'filename*': "UTF-8''" + quote(download_name, safe="!#$&+-.^_`|~")}
+            )
+        else:
+            response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+
+    def get_stats(self):
+        """
+        Get download counters
+
+        Returns:
+            dict: Mode, responses per mode, bytes sent by Python, file index
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['mode'] = self.mode
+        stats['file_index'] = self.index.get_stats()
+        return stats
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+file_server = FileServer()
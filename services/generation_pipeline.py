@@ -0,0 +1,363 @@
+"""
+Generation Pipeline
+===================
+
+The stages behind `/generate`, written so that a job can be resumed from
+any completed stage.
+
+    1. AI content        (Gemini, through the semantic cache + scheduler)
+    2. Word document     (docx only)
+    3. Stored sections   (content store, used for re-renders and previews)
+    4. Response          (the JSON returned to the client)
+
+Every stage's output is written to the job journal before the next stage
+starts. `run()` skips stages a job has already completed, so the same code
+serves a fresh request, a client retry with an idempotency key and the
+startup recovery of jobs orphaned by a crashed worker.
+
+Usage:
+    from services.generation_pipeline import generation_pipeline
+
+    job = generation_pipeline.new_job(topic, output_format='docx')
+    response_data = generation_pipeline.run(job, generate_function)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import os
+import uuid
+
+# Local imports
+from services.ai_client import gemini_client
+from services.circuit_breaker import ai_circuit
+from services.content_store import content_store
+from services.document_catalog import document_catalog
+from services.docx_writer import document_builder
+from services.generation_plan import generate_for_plan, resolve_plan
+from services.generation_scheduler import generation_scheduler
+from services.job_journal import STAGES, job_journal
+from services.output_formats import output_formats
+from services.prompt_builder import prompt_builder
+from services.topic_warmer import topic_warmer
+from utils.structured_logger import logger
+from utils.text_stats import analyze_sections, public_section_stats
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class GenerationError(Exception):
+    """
+    Raised when a pipeline stage fails
+
+    Attributes:
+        error_code (str): API error code for format_api_response()
+        status_code (int): HTTP status to return
+    """
+
+    def __init__(self, message, error_code, status_code=500):
+        super().__init__(message)
+        self.error_code = error_code
+        self.status_code = status_code
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def scheduled_generator(client_id, priority):
+    """
+    Build a generation function that waits for a scheduler slot
+
+    Args:
+        client_id (str): Tenant / API client identifier
+        priority (str): 'interactive' or 'batch'
+
+    Returns:
+        callable: topic -> AI result, running the model call inside a slot
+            (with the prompt's input tokens added to its metadata)
+
+    Raises:
+        CircuitOpenError: From the returned function, while the AI
+            provider's circuit breaker is open
+    """
+    def generate(topic):
+        # Fail fast during an outage instead of queueing for a slot
+        ai_circuit.raise_if_open()
+        with generation_scheduler.slot(client_id, priority):
+            if priority == 'interactive':
+                # Keeps every worker's topic warmer off while live traffic runs
+                topic_warmer.note_live_call()
+            try:
+                result = ai_circuit.call(gemini_client.generate_academic_content, topic)
+            finally:
+                if priority == 'interactive':
+                    topic_warmer.note_live_call()
+
+        prompt_call = prompt_builder.take_last_call()
+        if prompt_call and isinstance(result, dict):
+            result.setdefault('metadata', {})['prompt'] = prompt_call
+        return result
+
+    return generate
+
+
+def _reached(job, stage):
+    """True if the job has already completed the given stage"""
+    return STAGES.index(job['stage']) >= STAGES.index(stage)
+
+
+# ============================================
+# GENERATION PIPELINE CLASS
+# ============================================
+
+class GenerationPipeline:
+    """
+    Runs (or resumes) the stages of a generation job
+    """
+
+    def new_job(self, topic, output_format='docx', client_id=None, priority='interactive', job_id=None,
+                options=None):
+        """
+        Record a new job in the journal
+
+        Args:
+            topic (str): Academic topic
+            output_format (str): docx, html, markdown or pdf
+            client_id (str): Scheduler client ID
+            priority (str): Scheduler priority class
+            job_id (str): Optional caller-chosen ID (idempotency key)
+            options (dict): Request options kept with the job: compression,
+                length and sections
+
+        Returns:
+            dict: The job, at stage 'pending', or None if a job with this
+                ID already exists (a concurrent request with the same key)
+        """
+        options = options or {}
+        job_id = job_journal.create(
+            topic, output_format=output_format, client_id=client_id,
+            priority=priority, job_id=job_id, options=options
+        )
+        if job_id is None:
+            return None
+        return {
+            'job_id': job_id,
+            'topic': topic,
+            'output_format': output_format,
+            'client_id': client_id,
+            'priority': priority,
+            'stage': 'pending',
+            'ai_result': None,
+            'doc_result': None,
+            'file_id': None,
+            'options': options
+        }
+
+    def run(self, job, generate_function=None):
+        """
+        Run every stage the job has not completed yet
+
+        Args:
+            job (dict): Job from new_job() or the journal
+            generate_function (callable): topic -> AI result (default: a
+                scheduler-slot call with the job's client and priority)
+
+        Returns:
+            dict: Response data for the client
+
+        Raises:
+            GenerationError: If a stage fails (the job is marked failed)
+            SchedulerRejected: If the model queue is over its time budget
+        """
+        try:
+            return self._run_stages(job, generate_function)
+        except Exception as e:
+            # The job keeps its completed stages; a retry resumes from there
+            job_journal.fail(job['job_id'], str(e), getattr(e, 'error_code', 'INTERNAL_SERVER_ERROR'))
+            raise
+
+    # ----------------------------------------
+    # Stages
+    # ----------------------------------------
+
+    def _run_stages(self, job, generate_function):
+        """Execute the remaining stages and return the response data"""
+        job_id, topic, output_format = job['job_id'], job['topic'], job['output_format']
+        options = job.get('options') or {}
+
+        # Stage 1: AI content
+        if _reached(job, 'ai_done'):
+            ai_result = job['ai_result']
+            logger.info(f"Job {job_id}: reusing stored AI content (stage '{job['stage']}')")
+        else:
+            if not gemini_client:
+                raise GenerationError("Gemini API is not configured", "API_NOT_CONFIGURED")
+
+            generate_function = generate_function or scheduled_generator(
+                job.get('client_id') or 'recovery', job.get('priority') or 'batch'
+            )
+            # Only the requested sections and lengths are generated; similar
+            # topics are served from the semantic cache without a model call
+            plan = resolve_plan(options.get('length'), options.get('sections'))
+            ai_result = generate_for_plan(topic, plan, generate_function)
+
+            if not ai_result.get('success'):
+                raise GenerationError(ai_result.get('error', 'Unknown error'), "AI_GENERATION_FAILED")
+
+            logger.success("AI content generated successfully")
+            self._advance(job, 'ai_done', ai_result=ai_result)
+
+        sections = {
+            key: value for key, value in ai_result.get('content', {}).items()
+            if key != 'full_text'
+        }
+        if not sections:
+            raise GenerationError("AI generated content but no sections were found", "NO_SECTIONS_FOUND")
+
+        logger.info(f"Found {len(sections)} sections: {', '.join(sections.keys())}")
+
+        # Tokenize every section once; counts and paragraph splits are reused below
+        text_stats = analyze_sections(sections)
+
+        # Stage 2: Word document (preview formats are rendered from the sections)
+        doc_result = job['doc_result']
+        if output_format == 'docx' and not _reached(job, 'docx_written'):
+            # The profile is journaled with the job: a resumed job is written
+            # with the one the client asked for, not the server default
+            compression = options.get('compression')
+
+            # A warmed trending topic is copied instead of rendered again
+            doc_result = topic_warmer.copy_prerendered(topic, sections, compression)
+            if doc_result is None:
+                logger.info("Creating Word document...")
+                doc_result = document_builder.create_blackbook(
+                    title=topic, sections_dict=sections, compression=compression, text_stats=text_stats
+                )
+
+            if not doc_result.get('success'):
+                raise GenerationError(doc_result.get('error', 'Unknown error'), "DOCUMENT_CREATION_FAILED")
+
+            logger.success(f"Document created: {doc_result['filename']}")
+            file_id = doc_result['filename'].rsplit('_', 1)[-1].replace('.docx', '')
+            self._advance(job, 'docx_written', doc_result=doc_result, file_id=file_id)
+
+        # Stage 3: Stored sections (for re-renders without the model)
+        if not _reached(job, 'sections_stored'):
+            file_id = job['file_id'] or uuid.uuid4().hex[:8]
+            extra = {'filename': doc_result['filename']} if doc_result else {}
+            content_store.save(file_id, title=topic, sections=sections, topic=topic, **extra)
+            self._advance(job, 'sections_stored', file_id=file_id)
+
+        # Stage 4: Response
+        if output_format == 'docx':
+            response_data = self._docx_response(job, doc_result, sections, text_stats, ai_result)
+        else:
+            response_data = self._preview_response(job, sections, text_stats, ai_result)
+
+        # The profile lets a restarted worker find documents the archive tier has not reached
+        written_with = response_data['document_info'].get('compression') or {}
+        document_catalog.record(
+            job['file_id'], title=topic, topic=topic, filename=response_data.get('filename'),
+            output_format=output_format, file_size=response_data['document_info']['file_size'],
+            sections=sections.keys(), compression=written_with.get('profile')
+        )
+        self._advance(job, 'completed', response=response_data)
+        logger.success(f"Generation complete! File ID: {job['file_id']} ({output_format})")
+
+        return response_data
+
+    def _advance(self, job, stage, **fields):
+        """Persist a completed stage and mirror it on the job dict"""
+        job_journal.advance(job['job_id'], stage, **fields)
+        job['stage'] = stage
+        job.update(fields)
+
+    # ----------------------------------------
+    # Responses
+    # ----------------------------------------
+
+    def _docx_response(self, job, doc_result, sections, text_stats, ai_result):
+        """Build the /generate response for a Word document"""
+        file_id, filename = job['file_id'], doc_result['filename']
+
+        return {
+            "success": True,
+            "message": "Document generated successfully",
+            "topic": job['topic'],
+            "job_id": job['job_id'],
+            "file_id": file_id,
+            "filename": filename,
+            "download_link": f"/download/{file_id}",
+            "download_url": f"http://localhost:5000/download/{file_id}",
+            "download_link_full": f"/api/download/{filename}",
+            "download_url_full": f"http://localhost:5000/api/download/{filename}",
+            "document_info": {
+                "file_size": doc_result['file_size'],
+                "file_size_kb": round(doc_result['file_size'] / 1024, 2),
+                "sections_count": doc_result['sections_count'],
+                "sections": list(sections.keys()),
+                "section_stats": public_section_stats(text_stats),
+                "compression": doc_result.get('compression')
+            },
+            "ai_metadata": self._ai_metadata(ai_result, text_stats)
+        }
+
+    def _preview_response(self, job, sections, text_stats, ai_result):
+        """
+        Render a preview format and build its /generate response
+
+        The sections are already in the content store, so the DOCX can
+        still be built later with POST /documents/<file_id>/render.
+        """
+        file_id, output_format = job['file_id'], job['output_format']
+
+        filepath = output_formats.get_or_render(file_id, output_format)
+        file_size = os.path.getsize(filepath)
+
+        return {
+            "success": True,
+            "message": "Document generated successfully",
+            "topic": job['topic'],
+            "job_id": job['job_id'],
+            "file_id": file_id,
+            "format": output_format,
+            "download_link": f"/download/{file_id}?format={output_format}",
+            "document_info": {
+                "file_size": file_size,
+                "file_size_kb": round(file_size / 1024, 2),
+                "sections_count": len(sections),
+                "sections": list(sections.keys()),
+                "section_stats": public_section_stats(text_stats)
+            },
+            "ai_metadata": self._ai_metadata(ai_result, text_stats)
+        }
+
+    @staticmethod
+    def _ai_metadata(ai_result, text_stats):
+        """AI metadata block shared by both response shapes"""
+        metadata = ai_result.get('metadata', {})
+        cache_hit = (metadata.get('semantic_cache') or {}).get('hit')
+        return {
+            "model": metadata.get('model', 'gemini-pro'),
+            "word_count": text_stats['word_count'],
+            "character_count": text_stats['character_count'],
+            "paragraph_count": text_stats['paragraph_count'],
+            "semantic_cache": metadata.get('semantic_cache'),
+            "plan": metadata.get('plan'),
+            # Served from a similar cached topic while the AI provider was down
+            "degraded": metadata.get('degraded'),
+            # Served from the cache: no prompt was sent for this request
+            "prompt": None if cache_hit else metadata.get('prompt')
+        }
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+generation_pipeline = GenerationPipeline()
@@ -0,0 +1,399 @@
+"""
+Generation Plan
+===============
+
+Which sections to generate and how long each may be.
+
+Every request used to get the full six-section blackbook, even when the
+caller only wanted an abstract to preview a topic. A plan selects the
+sections and a length preset, turns them into per-section token budgets
+and a max-output-token limit for the model call, and trims the result to
+the requested sections.
+
+Length presets:
+    preview    Abstract only, standard length
+    short      Every requested section at half length
+    standard   The full lengths (default)
+    long       One and a half times the full lengths
+
+Standard-length requests for a subset of sections are served from a
+cached full result for the topic when there is one. The semantic cache
+only holds full blackbooks. While the AI provider's circuit breaker is
+open, any plan is served from a cached blackbook for the same topic (or a
+semantic cache hit at the normal threshold) if there is one.
+
+Behind the per-process semantic cache, results can be shared between
+worker processes (services.shared_cache, SHARED_CACHE_GENERATIONS): full
+blackbooks under the topic, other plans under the topic, length and
+sections. Each is then generated once per host, and concurrent requests
+for the same new topic and plan wait for that one model call.
+
+Usage:
+    from services.generation_plan import resolve_plan, generate_for_plan
+
+    plan = resolve_plan(length='short', sections=['abstract', 'conclusion'])
+    result = generate_for_plan(topic, plan, generate_function)
+
+    is_cached(topic, plan)    # answered without a model call?
+    warm_topic(topic, generate_function)    # topic warmer: fill every tier
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+from services.circuit_breaker import CircuitOpenError, ai_circuit
+from services.document_layout import section_title
+from services.prompt_builder import prompt_builder
+from services.semantic_cache import semantic_cache
+from services.shared_cache import generation_cache
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Sections of a full blackbook with their target length (upper bound, words)
+SECTION_WORD_TARGETS = {
+    'abstract': 200,
+    'introduction': 400,
+    'literature_review': 500,
+    'methodology': 300,
+    'results': 400,
+    'conclusion': 300
+}
+
+# Preset -> (length factor, default sections)
+LENGTH_PRESETS = {
+    'preview': (1.0, ('abstract',)),
+    'short': (0.5, None),
+    'standard': (1.0, None),
+    'long': (1.5, None)
+}
+
+DEFAULT_LENGTH = 'standard'
+
+# Output tokens per English word, per section heading, and headroom for
+# the model's formatting so the last section is not cut off
+TOKENS_PER_WORD = 1.35
+SECTION_HEADING_TOKENS = 16
+OUTPUT_TOKEN_HEADROOM = 1.15
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class PlanError(ValueError):
+    """
+    Raised for an unknown length preset or section name
+
+    Attributes:
+        error_code (str): API error code for format_api_response()
+    """
+
+    def __init__(self, message, error_code):
+        super().__init__(message)
+        self.error_code = error_code
+
+
+# ============================================
+# GENERATION PLAN CLASS
+# ============================================
+
+class GenerationPlan:
+    """
+    Requested sections with their word and token budgets
+
+    Attributes:
+        length (str): Length preset name
+        sections (tuple): Section keys in document order
+        section_words (dict): Section key -> target words
+        section_tokens (dict): Section key -> output token budget
+        max_output_tokens (int): Limit for the model call (None for the
+            default full plan, which keeps the model's own limit)
+    """
+
+    def __init__(self, length, sections):
+        factor = LENGTH_PRESETS[length][0]
+
+        self.length = length
+        self.factor = factor
+        self.sections = tuple(sections)
+        self.section_words = {key: round(SECTION_WORD_TARGETS[key] * factor) for key in self.sections}
+        self.section_tokens = {
+            key: int(words * TOKENS_PER_WORD) + SECTION_HEADING_TOKENS
+            for key, words in self.section_words.items()
+        }
+        self.max_output_tokens = None if self.is_default else int(
+            sum(self.section_tokens.values()) * OUTPUT_TOKEN_HEADROOM
+        )
+
+    @property
+    def is_default(self):
+        """True for the full-length blackbook with every section"""
+        return self.factor == 1.0 and self.sections == tuple(SECTION_WORD_TARGETS)
+
+    def prompt_instructions(self):
+        """
+        Instructions appended to the prompt for a non-default plan
+
+        Returns:
+            str: Section selection and length targets (None for the default plan)
+        """
+        if self.is_default:
+            return None
+
+        names = ', '.join(section_title(key) for key in self.sections)
+        targets = '; '.join(
+            f"{section_title(key)}: about {words} words" for key, words in self.section_words.items()
+        )
+        return (
+            f"Write ONLY these sections, in this order: {names}. "
+            f"Leave out every other section but keep the section heading format described above.\n"
+            f"Target lengths - {targets}."
+        )
+
+    def apply(self, result):
+        """
+        Keep only the planned sections of a generation result
+
+        Args:
+            result (dict): AI client result
+
+        Returns:
+            dict: The same result with its content reduced to the plan
+                and the plan added to its metadata
+        """
+        if not result.get('success'):
+            return result
+
+        content = result.get('content', {})
+        sections = {key: content[key] for key in self.sections if content.get(key)}
+        sections['full_text'] = '\n\n'.join(
+            f"{section_title(key)}\n\n{text}" for key, text in sections.items()
+        )
+        result['content'] = sections
+        result.setdefault('metadata', {})['plan'] = self.to_dict()
+        return result
+
+    def to_dict(self):
+        return {
+            'length': self.length,
+            'sections': list(self.sections),
+            'section_tokens': self.section_tokens,
+            'max_output_tokens': self.max_output_tokens
+        }
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def resolve_plan(length=None, sections=None):
+    """
+    Build a plan from request options
+
+    Args:
+        length (str): Length preset (default: standard)
+        sections (list | str): Section keys, or a comma-separated string
+            (default: the preset's sections, else all)
+
+    Returns:
+        GenerationPlan: The plan
+
+    Raises:
+        PlanError: For an unknown preset or section, or an empty selection
+    """
+    length = str(length or DEFAULT_LENGTH).strip().lower()
+    if length not in LENGTH_PRESETS:
+        raise PlanError(f"Unsupported length. Use one of: {', '.join(LENGTH_PRESETS)}", "INVALID_LENGTH")
+
+    if sections is None or sections == '':
+        sections = LENGTH_PRESETS[length][1] or tuple(SECTION_WORD_TARGETS)
+    elif isinstance(sections, str):
+        sections = sections.split(',')
+    elif not isinstance(sections, (list, tuple)):
+        raise PlanError("'sections' must be a list of section names", "INVALID_SECTIONS")
+
+    requested = {str(name).strip().lower().replace(' ', '_') for name in sections if str(name).strip()}
+    unknown = sorted(requested - set(SECTION_WORD_TARGETS))
+    if unknown:
+        raise PlanError(
+            f"Unknown sections: {', '.join(unknown)}. Available: {', '.join(SECTION_WORD_TARGETS)}",
+            "INVALID_SECTIONS"
+        )
+    if not requested:
+        raise PlanError("At least one section is required", "INVALID_SECTIONS")
+
+    # Always document order, whatever order they were requested in
+    return GenerationPlan(length, [key for key in SECTION_WORD_TARGETS if key in requested])
+
+
+def generate_for_plan(topic, plan, generate_function):
+    """
+    Generate (or reuse) content for a plan
+
+    While the AI provider's circuit breaker is open, a cached blackbook
+    for the same topic is served instead (marked as degraded).
+
+    Args:
+        topic (str): Academic topic
+        plan (GenerationPlan): Sections and lengths
+        generate_function (callable): topic -> AI result
+
+    Returns:
+        dict: AI result reduced to the planned sections
+
+    Raises:
+        CircuitOpenError: If the provider is unavailable and nothing
+            similar is cached
+    """
+    try:
+        return _generate_for_plan(topic, plan, generate_function)
+    except CircuitOpenError:
+        cached_result = _cached_during_outage(topic)
+        if cached_result is None or not all(cached_result['content'].get(key) for key in plan.sections):
+            raise
+
+        ai_circuit.record_degraded()
+        return plan.apply(cached_result)
+
+
+def is_cached(topic, plan):
+    """
+    Check whether generate_for_plan() would answer without a model call
+
+    Used by admission control to let cache hits through while model calls
+    are being shed. Does not count towards the cache hit rate.
+
+    Args:
+        topic (str): Academic topic (already normalized by the validator)
+        plan (GenerationPlan): Sections and lengths
+
+    Returns:
+        bool: True if a cached result covers the plan
+    """
+    if plan.factor == 1.0:
+        for cached_result in (semantic_cache.lookup(topic, record_stats=False),
+                              generation_cache.get(_shared_key(topic), record_stats=False)):
+            if cached_result is not None and all(cached_result['content'].get(key) for key in plan.sections):
+                return True
+
+    return not plan.is_default and generation_cache.get(_shared_key(topic, plan), record_stats=False) is not None
+
+
+def warm_topic(topic, generate_function):
+    """
+    Cache a topic's full blackbook in every tier (for the topic warmer)
+
+    The model call goes through the shared cache's compute lock, so a
+    live request for the same topic waits for it instead of calling the
+    model as well.
+
+    Args:
+        topic (str): Academic topic
+        generate_function (callable): topic -> AI result
+
+    Returns:
+        tuple: (result, generated) - generated is False when the topic
+            was already cached
+    """
+    cached_result = semantic_cache.lookup(topic, record_stats=False)
+    if cached_result is not None:
+        return cached_result, False
+
+    result, was_cached = generation_cache.get_or_compute(
+        _shared_key(topic), lambda: generate_function(topic), store_if=lambda result: result.get('success')
+    )
+    if result.get('success'):
+        semantic_cache.store(topic, result)
+    return result, not was_cached
+
+
+def _cached_during_outage(topic):
+    """
+    Cached full blackbook for a topic while the model is unavailable
+
+    Only the normal cache matches are used: the semantic cache at its own
+    threshold, then the same (normalized) topic in the shared cache.
+
+    Returns:
+        dict: Result marked as degraded, or None
+    """
+    cached_result = semantic_cache.lookup(topic)
+    if cached_result is not None:
+        match = cached_result['metadata']['semantic_cache']
+        matched_topic, similarity = match['matched_topic'], match['similarity']
+    else:
+        cached_result = generation_cache.get(_shared_key(topic))
+        if not cached_result or not cached_result.get('success'):
+            return None
+        cached_result['topic'] = topic
+        cached_result.setdefault('metadata', {}).pop('prompt', None)
+        matched_topic, similarity = topic, 1.0
+
+    cached_result['metadata']['degraded'] = {
+        'reason': 'ai_unavailable',
+        'matched_topic': matched_topic,
+        'similarity': similarity
+    }
+    return cached_result
+
+
+def _generate_for_plan(topic, plan, generate_function):
+    """Cache lookup and model call for a plan (see generate_for_plan)"""
+    if plan.is_default:
+        return semantic_cache.get_or_generate(topic, lambda topic: _shared_generate(topic, generate_function))
+
+    # A cached full blackbook contains every standard-length section
+    if plan.factor == 1.0:
+        cached_result = semantic_cache.lookup(topic)
+        if cached_result is None:
+            cached_result = generation_cache.get(_shared_key(topic))
+            if cached_result is not None:
+                _mark_shared_hit(topic, cached_result)
+        if cached_result is not None and all(cached_result['content'].get(key) for key in plan.sections):
+            return plan.apply(cached_result)
+
+    def generate():
+        with prompt_builder.request(
+            instructions=plan.prompt_instructions(), max_output_tokens=plan.max_output_tokens
+        ):
+            return plan.apply(generate_function(topic))
+
+    result, was_cached = generation_cache.get_or_compute(
+        _shared_key(topic, plan), generate, store_if=lambda result: result.get('success')
+    )
+    if was_cached:
+        _mark_shared_hit(topic, result)
+    return result
+
+
+def _shared_generate(topic, generate_function):
+    """Full blackbook from the cross-process cache, generated once on a miss"""
+    result, was_cached = generation_cache.get_or_compute(
+        _shared_key(topic), lambda: generate_function(topic), store_if=lambda result: result.get('success')
+    )
+
+    if was_cached:
+        _mark_shared_hit(topic, result)
+    return result
+
+
+def _mark_shared_hit(topic, result):
+    """Adapt a result from the cross-process cache to this request"""
+    # Another worker's model call: its prompt stats do not apply here
+    result['topic'] = topic
+    metadata = result.setdefault('metadata', {})
+    metadata.pop('prompt', None)
+    metadata['shared_cache'] = {'hit': True}
+
+
+def _shared_key(topic, plan=None):
+    """Cross-process cache key of a topic's full blackbook (or of a plan's result)"""
+    identity = ' '.join(topic.casefold().split())
+    if plan is not None and not plan.is_default:
+        # Presets with the same factor and sections produce the same request
+        identity += f"|{plan.factor:g}x|{','.join(plan.sections)}"
+    return generation_cache.key('generation', identity)
@@ -0,0 +1,564 @@
+"""
+Generation Scheduler
+====================
+
+Priority and fairness scheduling in front of the AI generation stage.
+
+Only a fixed number of model calls run at once. Requests beyond that wait
+in a queue that is:
+
+    - Prioritized: 'interactive' requests are always dispatched before
+      'batch' requests, and some slots are reserved for interactive work
+      so batch traffic can never occupy the whole model quota.
+    - Fair: inside each priority class, clients are served by weighted
+      fair queuing (WFQ). A client that submits hundreds of requests
+      only gets its weighted share, not the whole queue.
+    - Budgeted: every class has a queue-time SLO. Requests that would
+      wait longer are rejected immediately with a Retry-After hint
+      instead of piling up.
+
+Scope:
+    The scheduler lives in each worker process; queues, WFQ state and the
+    interactive reserve are not shared between processes. The slot count
+    and the reserve are host-wide totals split evenly between the worker
+    processes (SCHEDULER_WORKER_PROCESSES, else gunicorn's WEB_CONCURRENCY),
+    with at least one slot per process. Fairness and priority therefore
+    hold within each worker: a client's share is its share of every
+    worker's queue, which matches the host-wide share as long as the
+    server spreads requests evenly. With more workers than slots, each
+    worker still runs one call, so the host may run more than
+    SCHEDULER_MAX_CONCURRENT calls and batch work may use a worker's only
+    slot.
+
+Configuration (environment variables):
+    SCHEDULER_MAX_CONCURRENT        Concurrent model calls per host (default: 4)
+    SCHEDULER_INTERACTIVE_RESERVED  Slots batch work may not use, per host (default: 1)
+    SCHEDULER_WORKER_PROCESSES      Worker processes sharing those slots
+                                    (default: WEB_CONCURRENCY, else 1)
+    SCHEDULER_INTERACTIVE_SLO       Max queue seconds, interactive (default: 10)
+    SCHEDULER_BATCH_SLO             Max queue seconds, batch (default: 300)
+    SCHEDULER_CLIENT_WEIGHTS        e.g. "premium=4,bulk-import=0.5" (default weight 1)
+    SCHEDULER_API_KEYS              e.g. "key1=premium,key2=bulk-import": X-API-Key
+                                    value -> client ID (unknown keys use the
+                                    remote address)
+
+Usage:
+    from services.generation_scheduler import generation_scheduler
+
+    with generation_scheduler.slot(client_id, 'interactive'):
+        result = gemini_client.generate_academic_content(topic)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import heapq
+import hmac
+import itertools
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+PRIORITY_CLASSES = ('interactive', 'batch')
+DEFAULT_PRIORITY = 'interactive'
+
+# Initial guess for one model call before real timings exist (seconds)
+INITIAL_SERVICE_TIME = 15.0
+
+# A call running past the service-time estimate is assumed to need this
+# fraction of it again (it is probably close to finishing)
+OVERDUE_REMAINING_FRACTION = 0.1
+
+# Drop idle clients' WFQ state after this many dispatches (or when the
+# class queue drains)
+CLIENT_PRUNE_INTERVAL = 256
+
+# Smoothing factor for the service-time moving average
+SERVICE_TIME_SMOOTHING = 0.2
+
+# Recent queue waits kept per class for percentiles
+WAIT_HISTORY_SIZE = 500
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class SchedulerRejected(Exception):
+    """
+    Raised when a request would exceed its class's queue-time budget
+
+    Attributes:
+        retry_after (int): Suggested seconds before retrying
+        priority (str): Priority class of the rejected request
+    """
+
+    def __init__(self, message, retry_after, priority):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.priority = priority
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def parse_client_weights(value):
+    """
+    Parse a "client=weight,client=weight" string
+
+    Args:
+        value (str): Weight configuration
+
+    Returns:
+        dict: Client ID -> positive weight
+
+    Example:
+        >>> parse_client_weights("premium=4,bulk=0.5")
+        {'premium': 4.0, 'bulk': 0.5}
+    """
+    weights = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        client_id, weight = item.split('=', 1)
+        try:
+            if float(weight) > 0:
+                weights[client_id.strip()] = float(weight)
+        except ValueError:
+            continue
+    return weights
+
+
+def parse_api_keys(value):
+    """
+    Parse a "api-key=client,api-key=client" string
+
+    Args:
+        value (str): API key configuration
+
+    Returns:
+        dict: API key -> client ID
+    """
+    keys = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        api_key, client_id = item.split('=', 1)
+        if api_key.strip() and client_id.strip():
+            keys[api_key.strip()] = client_id.strip()
+    return keys
+
+
+def _percentile(values, fraction):
+    """Return the given percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(math.ceil(fraction * len(ordered))) - 1, len(ordered) - 1)
+    return ordered[max(index, 0)]
+
+
+# ============================================
+# TICKET CLASS
+# ============================================
+
+class _Ticket:
+    """A queued request waiting for a model slot"""
+
+    __slots__ = ('client_id', 'priority', 'finish_tag', 'enqueued_at', 'event', 'cancelled')
+
+    def __init__(self, client_id, priority, finish_tag):
+        self.client_id = client_id
+        self.priority = priority
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.cancelled = False
+
+
+# ============================================
+# SCHEDULER CLASS
+# ============================================
+
+class GenerationScheduler:
+    """
+    Weighted fair, priority-aware admission to the model
+
+    Attributes:
+        host_max_concurrent (int): Model calls allowed at once on the host
+        worker_processes (int): Processes the host's slots are split between
+        max_concurrent (int): Model calls allowed at once in this process
+        interactive_reserved (int): Slots only interactive requests may use
+            (in this process)
+        slo_seconds (dict): Priority class -> maximum queue time
+        client_weights (dict): Client ID -> WFQ weight
+        api_keys (dict): API key -> client ID
+    """
+
+    def __init__(self, max_concurrent=None, interactive_reserved=None,
+                 slo_seconds=None, client_weights=None, api_keys=None, worker_processes=None):
+        """
+        Initialize the scheduler
+
+        Args:
+            max_concurrent (int): Concurrent model calls on the host
+                (default: SCHEDULER_MAX_CONCURRENT)
+            interactive_reserved (int): Reserved interactive slots on the host
+            slo_seconds (dict): Queue-time budget per class
+            client_weights (dict): Client ID -> weight
+            api_keys (dict): API key -> client ID (default: SCHEDULER_API_KEYS)
+            worker_processes (int): Processes sharing the host's slots
+                (default: SCHEDULER_WORKER_PROCESSES, else WEB_CONCURRENCY, else 1)
+        """
+        self.host_max_concurrent = int(max_concurrent or os.getenv('SCHEDULER_MAX_CONCURRENT', 4))
+        self.worker_processes = max(int(
+            worker_processes or os.getenv('SCHEDULER_WORKER_PROCESSES') or os.getenv('WEB_CONCURRENCY') or 1
+        ), 1)
+        self.max_concurrent = max(self.host_max_concurrent // self.worker_processes, 1)
+        reserved = interactive_reserved if interactive_reserved is not None else \
+            int(os.getenv('SCHEDULER_INTERACTIVE_RESERVED', 1))
+        self.interactive_reserved = min(math.ceil(reserved / self.worker_processes), self.max_concurrent - 1)
+        self.slo_seconds = slo_seconds or {
+            'interactive': float(os.getenv('SCHEDULER_INTERACTIVE_SLO', 10)),
+            'batch': float(os.getenv('SCHEDULER_BATCH_SLO', 300))
+        }
+        self.client_weights = client_weights if client_weights is not None else \
+            parse_client_weights(os.getenv('SCHEDULER_CLIENT_WEIGHTS', ''))
+        self.api_keys = api_keys if api_keys is not None else \
+            parse_api_keys(os.getenv('SCHEDULER_API_KEYS', ''))
+
+        self._lock = threading.Lock()
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._queues = {priority: [] for priority in PRIORITY_CLASSES}
+        self._queued = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._client_finish = {priority: defaultdict(float) for priority in PRIORITY_CLASSES}
+        self._dispatches = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._sequence = itertools.count()
+        self._service_time = INITIAL_SERVICE_TIME
+        self._service_measured = False
+        self._started_at = []  # monotonic start time of every running call
+
+        self._waits = {priority: deque(maxlen=WAIT_HISTORY_SIZE) for priority in PRIORITY_CLASSES}
+        self._counters = defaultdict(int)
+
+    # ----------------------------------------
+    # Public methods
+    # ----------------------------------------
+
+    def identify_client(self, api_key, remote_address=None):
+        """
+        Client ID for a request, decided on the server
+
+        Only a configured API key selects a named client (and its weight);
+        anything else is identified by its remote address, so a caller
+        cannot claim another client's share.
+
+        Args:
+            api_key (str): X-API-Key header value (may be empty)
+            remote_address (str): Remote address of the request
+
+        Returns:
+            str: Client ID
+        """
+        if api_key:
+            for configured_key, client_id in self.api_keys.items():
+                if hmac.compare_digest(api_key.encode(), configured_key.encode()):
+                    return client_id
+        return remote_address or 'anonymous'
+
+    def slot(self, client_id, priority=DEFAULT_PRIORITY):
+        """
+        Context manager that holds a model slot for the wrapped block
+
+        Args:
+            client_id (str): Tenant / API client identifier
+            priority (str): 'interactive' or 'batch'
+
+        Returns:
+            contextmanager: Acquires on enter, releases on exit
+
+        Raises:
+            SchedulerRejected: If the queue is over its time budget
+        """
+        return _SlotContext(self, client_id, priority)
+
+    def acquire(self, client_id, priority=DEFAULT_PRIORITY):
+        """
+        Wait for a model slot (see slot())
+
+        Returns:
+            float: Seconds spent waiting in the queue
+        """
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+
+        with self._lock:
+            # Fast path: free slot and nobody of this class waiting
+            if not self._queues[priority] and self._has_free_slot(priority):
+                self._running[priority] += 1
+                self._started_at.append(time.monotonic())
+                self._record_wait(priority, 0.0)
+                return 0.0
+
+            # Reject early if the estimated wait already breaks the SLO
+            # (only once real call timings exist - the initial service time
+            # is a guess and must not turn every early request away)
+            estimated_wait = self._estimate_wait(priority)
+            budget = self.slo_seconds[priority]
+            if self._service_measured and estimated_wait > budget:
+                self._counters[f'{priority}_rejected'] += 1
+                raise SchedulerRejected(
+                    f"{priority.capitalize()} queue is over its {budget:.0f}s budget",
+                    retry_after=max(int(estimated_wait - budget) + 1, 1),
+                    priority=priority
+                )
+
+            ticket = self._enqueue(client_id, priority)
+
+        # Wait outside the lock until dispatched or out of budget
+        if ticket.event.wait(timeout=budget):
+            waited = time.monotonic() - ticket.enqueued_at
+            with self._lock:
+                self._record_wait(priority, waited)
+            return waited
+
+        with self._lock:
+            if ticket.event.is_set():
+                # Dispatched just as the budget ran out - take the slot
+                waited = time.monotonic() - ticket.enqueued_at
+                self._record_wait(priority, waited)
+                return waited
+            ticket.cancelled = True
+            self._queued[priority] -= 1
+            self._counters[f'{priority}_timed_out'] += 1
+
+        raise SchedulerRejected(
+            f"Waited longer than the {budget:.0f}s {priority} queue budget",
+            retry_after=max(int(self._service_time), 1),
+            priority=priority
+        )
+
+    def release(self, priority, service_seconds=None):
+        """
+        Free a model slot and dispatch the next queued request
+
+        Args:
+            priority (str): Class the slot was acquired for
+            service_seconds (float): How long the slot was held (updates estimates)
+        """
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+
+        with self._lock:
+            self._running[priority] -= 1
+            self._forget_start(service_seconds)
+            if service_seconds is not None:
+                self._service_time += SERVICE_TIME_SMOOTHING * (service_seconds - self._service_time)
+                self._service_measured = True
+            self._dispatch()
+
+    def get_stats(self):
+        """
+        Get queue depths, wait percentiles and rejection counts
+
+        Returns:
+            dict: Scheduler statistics per priority class
+        """
+        with self._lock:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = list(self._waits[priority])
+                classes[priority] = {
+                    'running': self._running[priority],
+                    'queued': self._queued[priority],
+                    'slo_seconds': self.slo_seconds[priority],
+                    'wait_p50_ms': round(_percentile(waits, 0.50) * 1000, 1),
+                    'wait_p95_ms': round(_percentile(waits, 0.95) * 1000, 1),
+                    'admitted': self._counters[f'{priority}_admitted'],
+                    'rejected': self._counters[f'{priority}_rejected'],
+                    'timed_out': self._counters[f'{priority}_timed_out']
+                }
+            return {
+                'max_concurrent': self.max_concurrent,
+                'host_max_concurrent': self.host_max_concurrent,
+                'worker_processes': self.worker_processes,
+                'interactive_reserved': self.interactive_reserved,
+                'estimated_service_seconds': round(self._service_time, 2),
+                'classes': classes
+            }
+
+    def estimate_wait(self, priority=DEFAULT_PRIORITY):
+        """
+        Estimated queue time for a new request of the given class
+
+        Args:
+            priority (str): 'interactive' or 'batch'
+
+        Returns:
+            float: Seconds (0.0 when a slot is free and nobody is waiting)
+        """
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+        with self._lock:
+            if not self._queues[priority] and self._has_free_slot(priority):
+                return 0.0
+            return self._estimate_wait(priority)
+
+    def queue_depth(self):
+        """Total number of queued requests across all classes"""
+        with self._lock:
+            return sum(self._queued.values())
+
+    def load_snapshot(self):
+        """
+        Cheap view of the current load (e.g. for background work)
+
+        Returns:
+            dict: queued, running, saturated (all slots busy) and the
+                estimated interactive queue wait in seconds
+        """
+        with self._lock:
+            running = sum(self._running.values())
+            return {
+                'queued': sum(self._queued.values()),
+                'running': running,
+                'saturated': running >= self.max_concurrent,
+                'estimated_wait_seconds': self._estimate_wait('interactive')
+                if running >= self.max_concurrent else 0.0
+            }
+
+    # ----------------------------------------
+    # Internal methods (caller holds the lock)
+    # ----------------------------------------
+
+    def _has_free_slot(self, priority):
+        running_total = sum(self._running.values())
+        if priority == 'interactive':
+            return running_total < self.max_concurrent
+        # Batch may not use the reserved interactive slots
+        return running_total < self.max_concurrent - self.interactive_reserved
+
+    def _estimate_wait(self, priority):
+        """
+        Estimate queue time for a new request of this class
+
+        Each running call is expected to need the rest of its service time;
+        a usable slot frees up when enough of them have finished. The
+        queued requests ahead take those slots first, one service time per
+        round.
+        """
+        ahead = self._queued['interactive']
+        slots = self.max_concurrent
+        if priority == 'batch':
+            ahead += self._queued['batch']
+            slots = self.max_concurrent - self.interactive_reserved
+        slots = max(slots, 1)
+
+        now = time.monotonic()
+        floor = self._service_time * OVERDUE_REMAINING_FRACTION
+        remaining = sorted(
+            max(self._service_time - (now - started_at), floor) for started_at in self._started_at
+        )
+        # With more calls running than usable slots (batch behind the
+        # reserved slots), a slot frees only when the excess calls are done
+        free_at = [0.0] * max(slots - len(remaining), 0) + remaining[max(len(remaining) - slots, 0):]
+        rounds, position = divmod(ahead, slots)
+        return free_at[position] + rounds * self._service_time
+
+    def _forget_start(self, service_seconds):
+        """Drop the start time of a finished call (the closest match)"""
+        if not self._started_at:
+            return
+        if service_seconds is None:
+            self._started_at.remove(min(self._started_at))
+            return
+        started_at = time.monotonic() - service_seconds
+        self._started_at.remove(min(self._started_at, key=lambda value: abs(value - started_at)))
+
+    def _enqueue(self, client_id, priority):
+        """Add a ticket with its WFQ finish tag"""
+        weight = self.client_weights.get(client_id, 1.0)
+        start_tag = max(self._virtual_time[priority], self._client_finish[priority][client_id])
+        finish_tag = start_tag + 1.0 / weight
+        self._client_finish[priority][client_id] = finish_tag
+
+        ticket = _Ticket(client_id, priority, finish_tag)
+        heapq.heappush(self._queues[priority], (finish_tag, next(self._sequence), ticket))
+        self._queued[priority] += 1
+        return ticket
+
+    def _dispatch(self):
+        """Hand free slots to queued tickets, interactive first"""
+        for priority in PRIORITY_CLASSES:
+            queue_heap = self._queues[priority]
+            while queue_heap and self._has_free_slot(priority):
+                finish_tag, _, ticket = heapq.heappop(queue_heap)
+                if ticket.cancelled:
+                    continue
+                self._virtual_time[priority] = finish_tag
+                self._queued[priority] -= 1
+                self._running[priority] += 1
+                self._started_at.append(time.monotonic())
+                self._dispatches[priority] += 1
+                ticket.event.set()
+                if not queue_heap or self._dispatches[priority] % CLIENT_PRUNE_INTERVAL == 0:
+                    self._prune_clients(priority)
+
+    def _prune_clients(self, priority):
+        """
+        Forget WFQ finish tags that no longer matter
+
+        A client whose last finish tag is not ahead of the class's virtual
+        time would start from the virtual time anyway, so its entry can go.
+        """
+        virtual_time = self._virtual_time[priority]
+        self._client_finish[priority] = defaultdict(float, {
+            client_id: finish_tag
+            for client_id, finish_tag in self._client_finish[priority].items()
+            if finish_tag > virtual_time
+        })
+
+    def _record_wait(self, priority, waited):
+        self._waits[priority].append(waited)
+        self._counters[f'{priority}_admitted'] += 1
+
+
+class _SlotContext:
+    """Context manager returned by GenerationScheduler.slot()"""
+
+    def __init__(self, scheduler, client_id, priority):
+        self._scheduler = scheduler
+        self._client_id = client_id
+        self._priority = priority if priority in PRIORITY_CLASSES else DEFAULT_PRIORITY
+        self._started = None
+        self.wait_seconds = 0.0
+
+    def __enter__(self):
+        self.wait_seconds = self._scheduler.acquire(self._client_id, self._priority)
+        if self.wait_seconds > 1:
+            logger.info(f"Queued {self.wait_seconds:.1f}s for a model slot ({self._priority})")
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._scheduler.release(self._priority, time.monotonic() - self._started)
+        return False
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+generation_scheduler = GenerationScheduler()
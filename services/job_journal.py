@@ -0,0 +1,441 @@
+"""
+Job Journal
+===========
+
+Durable, local record of every `/generate` request in progress.
+
+A deploy or an OOM kill used to lose all generations in flight, including
+the Gemini output already paid for. Each request now becomes a job row in
+a SQLite database, and the result of every completed stage is written
+before the next one starts:
+
+    pending -> ai_done -> docx_written -> sections_stored -> completed
+
+When a worker starts it claims the jobs left behind by dead workers and
+resumes them from their last completed stage, so the model is not called
+again for content that was already generated.
+
+Features:
+    - SQLite in WAL mode, one connection per thread
+    - Leases with compare-and-set claims, safe with several workers
+    - Idempotency keys: a client retrying with the same key gets the
+      stored result (or a resume) instead of a second model call; of two
+      concurrent requests with the same new key, only one creates the job
+    - Recovery time and model calls avoided in get_stats()
+
+Configuration (environment variables):
+    JOB_JOURNAL_ENABLED      "true" / "false" (default: true)
+    JOB_JOURNAL_PATH         SQLite file (default: cache/jobs.sqlite3)
+    JOB_LEASE_SECONDS        How long a running job is owned (default: 600)
+    JOB_RETENTION_HOURS      Finished jobs are pruned after this (default: 24)
+
+Usage:
+    from services.job_journal import job_journal
+
+    job_id = job_journal.create(topic, output_format='docx')
+    job_journal.advance(job_id, 'ai_done', ai_result=ai_result)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Pipeline stages in order; a job resumes after its current stage
+STAGES = ('pending', 'ai_done', 'docx_written', 'sections_stored', 'completed')
+
+DEFAULT_JOURNAL_PATH = os.path.join('cache', 'jobs.sqlite3')
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_RETENTION_HOURS = 24
+
+# Columns stored as JSON text
+JSON_COLUMNS = ('options', 'ai_result', 'doc_result', 'response')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id        TEXT PRIMARY KEY,
+    topic         TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    client_id     TEXT,
+    priority      TEXT,
+    options       TEXT,
+    stage         TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    ai_result     TEXT,
+    doc_result    TEXT,
+    file_id       TEXT,
+    response      TEXT,
+    error         TEXT,
+    error_code    TEXT,
+    attempts      INTEGER NOT NULL DEFAULT 1,
+    owner         TEXT,
+    lease_until   REAL,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_lease ON jobs (status, lease_until);
+"""
+
+
+# ============================================
+# JOB JOURNAL CLASS
+# ============================================
+
+class JobJournal:
+    """
+    SQLite-backed journal of generation jobs
+
+    Attributes:
+        enabled (bool): False when disabled by config
+        path (str): SQLite database file
+        lease_seconds (float): Ownership period of a running job
+        owner (str): This process's owner token (host:pid:boot)
+    """
+
+    def __init__(self, path=None, lease_seconds=None, retention_hours=None, enabled=None):
+        """
+        Initialize the journal and create the schema
+
+        Args:
+            path (str): Database file (default: JOB_JOURNAL_PATH)
+            lease_seconds (float): Default JOB_LEASE_SECONDS
+            retention_hours (float): Default JOB_RETENTION_HOURS
+            enabled (bool): Force on or off (default: JOB_JOURNAL_ENABLED)
+        """
+        if enabled is None:
+            enabled = os.getenv('JOB_JOURNAL_ENABLED', 'true').lower() == 'true'
+
+        self.enabled = enabled
+        self.path = path or os.getenv('JOB_JOURNAL_PATH', DEFAULT_JOURNAL_PATH)
+        self.lease_seconds = float(lease_seconds or os.getenv('JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+        self.retention_seconds = 3600 * float(
+            retention_hours or os.getenv('JOB_RETENTION_HOURS', DEFAULT_RETENTION_HOURS)
+        )
+
+        # A restarted container can reuse the PID, so the token also has a boot ID
+        self.hostname = socket.gethostname()
+        self.owner = f"{self.hostname}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'recovered': 0,
+            'recovery_failed': 0,
+            'recovery_seconds': 0.0,
+            'model_calls_avoided': 0,
+            'replayed': 0
+        }
+
+        if self.enabled:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._connection().executescript(SCHEMA)
+            except sqlite3.Error as e:
+                logger.warning(f"Job journal disabled: {str(e)}")
+                self.enabled = False
+
+    # ----------------------------------------
+    # Job lifecycle
+    # ----------------------------------------
+
+    def create(self, topic, output_format='docx', client_id=None, priority=None, job_id=None, options=None):
+        """
+        Record a new job owned by this process
+
+        Args:
+            topic (str): Academic topic
+            output_format (str): Requested output format
+            client_id (str): Scheduler client ID
+            priority (str): Scheduler priority class
+            job_id (str): Caller-chosen ID (e.g. an idempotency key)
+            options (dict): Request options needed to resume the job
+
+        Returns:
+            str: The job ID, or None if a job with this ID already exists
+                (a concurrent request with the same idempotency key won;
+                use claim() or get() for it)
+        """
+        job_id = job_id or uuid.uuid4().hex
+        if not self.enabled:
+            return job_id
+
+        now = time.time()
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, topic, output_format, client_id, priority, options, stage, "
+                "status, owner, lease_until, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'pending', 'running', ?, ?, ?, ?)",
+                (job_id, topic, output_format, client_id, priority,
+                 json.dumps(options or {}, ensure_ascii=False),
+                 self.owner, now + self.lease_seconds, now, now)
+            )
+        return job_id if cursor.rowcount == 1 else None
+
+    def advance(self, job_id, stage, **fields):
+        """
+        Record that a stage finished and renew the lease
+
+        Args:
+            job_id (str): Job to update
+            stage (str): Completed stage (one of STAGES)
+            **fields: Stage output (ai_result, doc_result, file_id, response)
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        values = {
+            'stage': stage,
+            'status': 'completed' if stage == 'completed' else 'running',
+            'lease_until': now + self.lease_seconds,
+            'updated_at': now
+        }
+        for key, value in fields.items():
+            values[key] = json.dumps(value, ensure_ascii=False) if key in JSON_COLUMNS else value
+
+        assignments = ', '.join(f"{key} = ?" for key in values)
+        with self._connection() as connection:
+            connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (*values.values(), job_id)
+            )
+
+    def fail(self, job_id, error, error_code):
+        """
+        Mark a job as failed (it keeps its last completed stage)
+
+        Args:
+            job_id (str): Job to update
+            error (str): Error message
+            error_code (str): API error code
+        """
+        if not self.enabled:
+            return
+
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, error_code = ?, owner = NULL, "
+                "lease_until = NULL, updated_at = ? WHERE job_id = ?",
+                (error, error_code, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        """
+        Load a job
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            dict: Job row with JSON columns decoded, or None
+        """
+        if not self.enabled:
+            return None
+
+        row = self._connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def claim(self, job_id):
+        """
+        Take over a job that no live worker owns
+
+        Running jobs are claimable when their lease expired or their owner
+        process is gone; failed jobs are always claimable (a retry).
+
+        Args:
+            job_id (str): Job ID
+
+        Returns:
+            dict: The claimed job (completed jobs are returned unchanged),
+                or None if it does not exist or another worker owns it
+        """
+        job = self.get(job_id)
+        if job is None or job['status'] == 'completed':
+            return job
+        if job['status'] == 'running' and not self._is_stale(job):
+            return None
+
+        now = time.time()
+        with self._connection() as connection:
+            # Compare-and-set on the old owner so two workers cannot both win
+            cursor = connection.execute(
+                "UPDATE jobs SET owner = ?, lease_until = ?, status = 'running', "
+                "attempts = attempts + 1, updated_at = ? "
+                "WHERE job_id = ? AND owner IS ? AND status = ?",
+                (self.owner, now + self.lease_seconds, now, job_id, job['owner'], job['status'])
+            )
+        if cursor.rowcount != 1:
+            return None
+
+        return self.get(job_id)
+
+    # ----------------------------------------
+    # Recovery
+    # ----------------------------------------
+
+    def recover(self, run_job):
+        """
+        Resume orphaned jobs on a background thread
+
+        Every worker runs this at startup; no leader is needed. Each job is
+        taken with a compare-and-set claim, so when several workers find
+        the same orphaned job exactly one of them resumes it, and a job
+        whose owner is still alive is left alone. Running it in every
+        worker also spreads a large backlog over the workers.
+
+        Args:
+            run_job (callable): Called with each claimed job dict; runs the
+                remaining stages (exceptions mark the job failed)
+
+        Returns:
+            threading.Thread: The recovery thread (None when disabled)
+        """
+        if not self.enabled:
+            return None
+
+        thread = threading.Thread(target=self._recover_loop, args=(run_job,), name='job-recovery', daemon=True)
+        thread.start()
+        return thread
+
+    def record_resume(self, job, replayed=False):
+        """
+        Count a job picked up after its AI stage (no model call needed)
+
+        Args:
+            job (dict): The resumed job
+            replayed (bool): True if a completed response was returned as-is
+        """
+        with self._stats_lock:
+            if replayed:
+                self._stats['replayed'] += 1
+            if STAGES.index(job['stage']) >= STAGES.index('ai_done'):
+                self._stats['model_calls_avoided'] += 1
+
+    def get_stats(self):
+        """
+        Get job counts and recovery statistics
+
+        Returns:
+            dict: Jobs by status, recovered jobs, recovery time and model
+                calls avoided
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['recovery_seconds'] = round(stats['recovery_seconds'], 3)
+
+        if self.enabled:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            stats['jobs'] = {status: count for status, count in rows}
+        return stats
+
+    # ----------------------------------------
+    # Internal methods
+    # ----------------------------------------
+
+    def _recover_loop(self, run_job):
+        """Claim and resume every orphaned job once, then prune old jobs"""
+        start_time = time.perf_counter()
+        rows = self._connection().execute(
+            "SELECT job_id FROM jobs WHERE status = 'running' AND (owner IS NULL OR owner != ?)",
+            (self.owner,)
+        ).fetchall()
+
+        recovered = failed = 0
+        for (job_id,) in rows:
+            job = self.claim(job_id)
+            if job is None or job['status'] == 'completed':
+                continue
+
+            logger.info(f"Resuming job {job_id} from stage '{job['stage']}'")
+            self.record_resume(job)
+            try:
+                run_job(job)
+                recovered += 1
+            except Exception as e:
+                failed += 1
+                error_code = getattr(e, 'error_code', 'INTERNAL_SERVER_ERROR')
+                self.fail(job_id, str(e), error_code)
+                logger.error(f"Job {job_id} could not be resumed: {str(e)}")
+
+        elapsed = time.perf_counter() - start_time
+        with self._stats_lock:
+            self._stats['recovered'] += recovered
+            self._stats['recovery_failed'] += failed
+            self._stats['recovery_seconds'] = elapsed
+
+        if rows:
+            logger.success(f"Job recovery finished: {recovered} resumed, {failed} failed in {elapsed:.2f}s")
+
+        self._prune()
+
+    def _is_stale(self, job):
+        """True if a running job's owner is gone or its lease expired"""
+        if job['owner'] is None or (job['lease_until'] or 0) < time.time():
+            return True
+
+        host, pid, boot_id = (job['owner'].split(':') + ['', '', ''])[:3]
+        if job['owner'] == self.owner or host != self.hostname:
+            return False
+        if pid == str(os.getpid()):
+            # Same PID, different boot ID: the container restarted
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except (ProcessLookupError, ValueError):
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def _prune(self):
+        """Delete finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ?",
+                (cutoff,)
+            )
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _decode(row):
+        """Convert a row into a dict with JSON columns parsed"""
+        job = dict(row)
+        for key in JSON_COLUMNS:
+            if job.get(key):
+                job[key] = json.loads(job[key])
+        return job
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+job_journal = JobJournal()
@@ -0,0 +1,491 @@
+"""
+OOXML Fragments
+===============
+
+Renders the body parts of a blackbook directly as WordprocessingML
+strings: the title page, the table of contents and each content section.
+
+Working with strings instead of python-docx element trees makes it cheap
+to render one section on its own, cache the result, and splice it back
+into `word/document.xml` next to untouched fragments.
+
+Sections may contain tables, bulleted lists and numbered references
+(services/section_content.py). Tables are built in bulk: the row and
+cell markup is serialized once and each cell only costs an escape and a
+join, so a 1,000-row table renders in milliseconds instead of the
+seconds python-docx's per-cell API takes. Bullets and reference numbers
+are literal text with a hanging indent, so fragments need no numbering
+part and can be spliced into any existing blackbook. Fonts, sizes,
+colors and spacing are direct properties, so a fragment looks the same
+in a python-docx package, whose own styles differ.
+
+The invariant parts (title page layout, TOC heading and field, section
+headings, body paragraph formatting) are serialized once at import time
+as FragmentTemplate objects. Rendering a document only escapes the
+variable strings and joins them with the pre-built XML.
+
+Formatting follows FORMATTING_GUIDE.md and matches DocumentGenerator's
+documents paragraph by paragraph (test_docx_layout.py compares them):
+    - Title page: 18pt bold uppercase title, 14pt subtitle, 12pt date, centered
+    - TOC heading: 16pt, bold, centered; entries with leader dots
+    - Section headings (Heading 1): 14pt, bold, 12pt before, keep with next
+    - Body: Times New Roman 12pt, justified, 1.5 line spacing, 6pt after;
+      an empty paragraph closes each section
+    - Tables: 10pt single-spaced cells, bold shaded header row repeated
+      on every page, bold caption above the table
+    - Lists: bullets and [n] reference numbers with a hanging indent
+
+Usage:
+    from services.ooxml_fragments import render_section
+
+    xml = render_section('Introduction', paragraphs)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import re
+from xml.sax.saxutils import escape
+
+from services.document_layout import DOCUMENT_SUBTITLE, TOC_HEADING
+from services.section_content import BulletList, ReferenceList, Table
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+FONT_NAME = 'Times New Roman'
+
+# Sizes are in half-points (24 = 12pt)
+TITLE_SIZE = 36
+SUBTITLE_SIZE = 28
+TOC_HEADING_SIZE = 32
+HEADING_SIZE = 28
+BODY_SIZE = 24
+
+# Spacing is in twentieths of a point (120 = 6pt); 360 = 1.5 lines
+BODY_LINE_SPACING = 360
+PARAGRAPH_SPACE_AFTER = 120
+HEADING_SPACE_BEFORE = 240
+
+# Headings are explicitly black rather than the package's Heading 1 color
+HEADING_COLOR = '000000'
+
+# Right tab stop for TOC page numbers (6.5 inch text width in twips)
+TOC_TAB_POSITION = 9350
+TOC_INDENT = 720
+
+# Tables span the text width; cells use 10pt single-spaced text
+TABLE_WIDTH = 9360
+TABLE_CELL_SIZE = 20
+TABLE_HEADER_FILL = 'D9D9D9'
+
+# Hanging indents for list markers
+BULLET_INDENT = 720
+BULLET_HANGING = 360
+REFERENCE_INDENT = 720
+LIST_SPACE_AFTER = 60
+
+# Characters that are not allowed in XML 1.0 documents
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+EMPTY_PARAGRAPH = '<w:p/>'
+
+
+# ============================================
+# LOW-LEVEL HELPERS
+# ============================================
+
+def xml_text(text):
+    """
+    Escape text for use inside a w:t element
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        str: XML-safe text
+    """
+    return escape(INVALID_XML_CHARS.sub('', text))
+
+
+def run(text, size=BODY_SIZE, bold=False, color=None):
+    """
+    Render a run; single newlines inside the text become line breaks
+
+    Args:
+        text (str): Run text
+        size (int): Font size in half-points
+        bold (bool): Bold text
+        color (str): Hex RGB color (default: inherited)
+
+    Returns:
+        str: w:r element
+    """
+    color_property = f'<w:color w:val="{color}"/>' if color else ''
+    properties = (
+        f'<w:rPr><w:rFonts w:ascii="{FONT_NAME}" w:hAnsi="{FONT_NAME}" w:cs="{FONT_NAME}"/>'
+        f'{"<w:b/>" if bold else ""}{color_property}<w:sz w:val="{size}"/><w:szCs w:val="{size}"/></w:rPr>'
+    )
+    lines = text.split('\n')
+    content = '<w:br/>'.join(
+        f'<w:t xml:space="preserve">{xml_text(line)}</w:t>' for line in lines
+    )
+    return f'<w:r>{properties}{content}</w:r>'
+
+
+def paragraph(text, size=BODY_SIZE, bold=False, align='both', style=None,
+              space_before=0, space_after=PARAGRAPH_SPACE_AFTER,
+              line=BODY_LINE_SPACING, keep_next=False, color=None):
+    """
+    Render a single formatted paragraph
+
+    Args:
+        text (str): Paragraph text
+        size (int): Font size in half-points
+        bold (bool): Bold text
+        align (str): w:jc value ('both', 'center', 'left')
+        style (str): Paragraph style ID, e.g. 'Heading1'
+        space_before (int): Space before in twips
+        space_after (int): Space after in twips
+        line (int): Line spacing in 240ths of a line
+        keep_next (bool): Keep with next paragraph
+        color (str): Hex RGB text color (default: inherited)
+
+    Returns:
+        str: w:p element
+    """
+    properties = ''
+    if style:
+        properties += f'<w:pStyle w:val="{style}"/>'
+    if keep_next:
+        properties += '<w:keepNext/>'
+    properties += (
+        f'<w:spacing w:before="{space_before}" w:after="{space_after}" '
+        f'w:line="{line}" w:lineRule="auto"/><w:jc w:val="{align}"/>'
+    )
+    return f'<w:p><w:pPr>{properties}</w:pPr>{run(text, size, bold, color)}</w:p>'
+
+
+# ============================================
+# PRE-SERIALIZED TEMPLATES
+# ============================================
+
+class FragmentTemplate:
+    """
+    A fragment serialized once, with slots for its variable strings
+
+    The builder is called a single time with placeholder strings; the
+    result is split into static XML chunks around the placeholders.
+    Slot values are XML-escaped on render, and newlines become line
+    breaks exactly as in run().
+
+    Attributes:
+        slot_names (tuple): Slot names in document order
+    """
+
+    SLOT_PATTERN = re.compile(r'\{\{([A-Z_]+)\}\}')
+
+    def __init__(self, builder, *slot_names):
+        """
+        Serialize the template
+
+        Args:
+            builder (callable): Renderer taking one string per slot
+            *slot_names (str): Upper-case slot names (they survive .upper())
+        """
+        pieces = self.SLOT_PATTERN.split(builder(*(f'{{{{{name}}}}}' for name in slot_names)))
+        self._static = pieces[0::2]
+        self.slot_names = tuple(pieces[1::2])
+
+    def render(self, **values):
+        """
+        Fill the slots
+
+        Args:
+            **values (str): Raw (unescaped) text for each slot
+
+        Returns:
+            str: WordprocessingML fragment
+        """
+        parts = [self._static[0]]
+        for name, static in zip(self.slot_names, self._static[1:]):
+            parts.append(slot_text(values[name]))
+            parts.append(static)
+        return ''.join(parts)
+
+
+def slot_text(text):
+    """
+    Escape a slot value the way run() renders text inside w:t
+
+    Args:
+        text (str): Raw text
+
+    Returns:
+        str: Escaped text with newlines turned into w:br breaks
+    """
+    return xml_text(text).replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+
+
+# ============================================
+# TEMPLATE BUILDERS
+# ============================================
+
+def _build_title_page(title, date_text):
+    """Title page layout (title is expected in upper case)"""
+    parts = [EMPTY_PARAGRAPH] * 8
+    parts.append(paragraph(title, TITLE_SIZE, bold=True, align='center'))
+    parts.extend([EMPTY_PARAGRAPH] * 2)
+    parts.append(paragraph(DOCUMENT_SUBTITLE, SUBTITLE_SIZE, align='center'))
+    parts.extend([EMPTY_PARAGRAPH] * 3)
+    parts.append(paragraph(date_text, BODY_SIZE, align='center'))
+    parts.append(PAGE_BREAK)
+    return ''.join(parts)
+
+
+def _build_toc_entry(title, number):
+    """TOC line with leader dots and a page number placeholder"""
+    return (
+        '<w:p><w:pPr><w:tabs>'
+        f'<w:tab w:val="right" w:leader="dot" w:pos="{TOC_TAB_POSITION}"/></w:tabs>'
+        f'<w:spacing w:before="0" w:after="{PARAGRAPH_SPACE_AFTER}"/>'
+        f'<w:ind w:left="{TOC_INDENT}"/></w:pPr>'
+        f'{run(title)}<w:r><w:tab/></w:r>{run(number)}</w:p>'
+    )
+
+
+def _build_heading(title):
+    """Heading 1 paragraph of a content section"""
+    return paragraph(title, HEADING_SIZE, bold=True, align='left', style='Heading1',
+                     space_before=HEADING_SPACE_BEFORE, keep_next=True, color=HEADING_COLOR)
+
+
+def _build_list_item(marker, text, indent, hanging):
+    """List paragraph: marker, tab, text with a hanging indent"""
+    return (
+        f'<w:p><w:pPr><w:spacing w:before="0" w:after="{LIST_SPACE_AFTER}" '
+        f'w:line="{BODY_LINE_SPACING}" w:lineRule="auto"/>'
+        f'<w:ind w:left="{indent}" w:hanging="{hanging}"/><w:jc w:val="left"/></w:pPr>'
+        f'{run(marker)}<w:r><w:tab/></w:r>{run(text)}</w:p>'
+    )
+
+
+def _build_caption(text):
+    """Table caption, kept on the same page as its table"""
+    return paragraph(text, BODY_SIZE, bold=True, align='center', space_before=PARAGRAPH_SPACE_AFTER,
+                     line=240, keep_next=True)
+
+
+def _build_table_cell(text, bold=False, fill=None):
+    """One table cell with a single-spaced paragraph"""
+    properties = f'<w:tcPr><w:shd w:val="clear" w:color="auto" w:fill="{fill}"/></w:tcPr>' if fill else ''
+    return (
+        f'<w:tc>{properties}<w:p><w:pPr><w:spacing w:before="0" w:after="0" w:line="240" w:lineRule="auto"/>'
+        f'</w:pPr>{run(text, TABLE_CELL_SIZE, bold)}</w:p></w:tc>'
+    )
+
+
+def _table_start(column_count):
+    """Table properties and column grid (fixed layout, equal columns, single borders)"""
+    borders = ''.join(
+        f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+        for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV')
+    )
+    column = f'<w:gridCol w:w="{TABLE_WIDTH // column_count}"/>'
+    return (
+        f'<w:tbl><w:tblPr><w:tblW w:w="5000" w:type="pct"/><w:jc w:val="center"/>'
+        f'<w:tblBorders>{borders}</w:tblBorders><w:tblLayout w:type="fixed"/>'
+        f'<w:tblCellMar><w:left w:w="80" w:type="dxa"/><w:right w:w="80" w:type="dxa"/></w:tblCellMar>'
+        f'</w:tblPr><w:tblGrid>{column * column_count}</w:tblGrid>'
+    )
+
+
+TITLE_PAGE_TEMPLATE = FragmentTemplate(_build_title_page, 'TITLE', 'DATE')
+TOC_ENTRY_TEMPLATE = FragmentTemplate(_build_toc_entry, 'TITLE', 'NUMBER')
+HEADING_TEMPLATE = FragmentTemplate(_build_heading, 'TITLE')
+BODY_PARAGRAPH_TEMPLATE = FragmentTemplate(paragraph, 'TEXT')
+CAPTION_TEMPLATE = FragmentTemplate(_build_caption, 'TEXT')
+BULLET_TEMPLATE = FragmentTemplate(
+    lambda text: _build_list_item('\u2022', text, BULLET_INDENT, BULLET_HANGING), 'TEXT'
+)
+REFERENCE_TEMPLATE = FragmentTemplate(
+    lambda number, text: _build_list_item(number, text, REFERENCE_INDENT, REFERENCE_INDENT), 'NUMBER', 'TEXT'
+)
+
+# Table markup around the escaped cell texts (a row is
+# ROW_START + CELL_START + text + (CELL_BETWEEN + text)... + CELL_END + ROW_END)
+TABLE_ROW_START = '<w:tr><w:trPr><w:cantSplit/></w:trPr>'
+TABLE_HEADER_ROW_START = '<w:tr><w:trPr><w:cantSplit/><w:tblHeader/></w:trPr>'
+TABLE_ROW_END = '</w:tr>'
+TABLE_END = '</w:tbl>'
+TABLE_CELL_START, TABLE_CELL_END = _build_table_cell('{{TEXT}}').split('{{TEXT}}')
+TABLE_HEADER_CELL_START, TABLE_HEADER_CELL_END = _build_table_cell(
+    '{{TEXT}}', bold=True, fill=TABLE_HEADER_FILL
+).split('{{TEXT}}')
+TABLE_CELL_BETWEEN = TABLE_CELL_END + TABLE_CELL_START
+TABLE_HEADER_CELL_BETWEEN = TABLE_HEADER_CELL_END + TABLE_HEADER_CELL_START
+
+# Word merges adjacent tables; a small paragraph keeps them apart
+TABLE_SPACER = '<w:p><w:pPr><w:spacing w:before="0" w:after="0" w:line="240" w:lineRule="auto"/></w:pPr></w:p>'
+
+# Fully static parts of the table of contents (the heading is formatted
+# like Heading 1 without the style, so an updated TOC field skips it)
+TOC_HEADING_XML = paragraph(TOC_HEADING, TOC_HEADING_SIZE, bold=True, align='center',
+                            space_before=HEADING_SPACE_BEFORE, keep_next=True) + EMPTY_PARAGRAPH
+TOC_FIELD_BEGIN = (
+    '<w:r><w:fldChar w:fldCharType="begin"/></w:r>'
+    '<w:r><w:instrText xml:space="preserve"> TOC \\o "1-1" \\h \\z \\u </w:instrText></w:r>'
+    '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+)
+TOC_FIELD_END = '<w:r><w:fldChar w:fldCharType="end"/></w:r>'
+
+
+# ============================================
+# DOCUMENT PART RENDERERS
+# ============================================
+
+def render_title_page(title, date_text):
+    """
+    Render the title page followed by a page break
+
+    Args:
+        title (str): Document title
+        date_text (str): Date line
+
+    Returns:
+        str: WordprocessingML fragment
+    """
+    return TITLE_PAGE_TEMPLATE.render(TITLE=title.upper(), DATE=date_text)
+
+
+def render_toc_entry(entry):
+    """
+    Render one TOC line with leader dots and a page number placeholder
+
+    Args:
+        entry (dict): Entry from document_layout.toc_entries()
+
+    Returns:
+        str: w:p element
+    """
+    return TOC_ENTRY_TEMPLATE.render(TITLE=entry['title'], NUMBER=str(entry['number']))
+
+
+def render_toc(entries):
+    """
+    Render the table of contents page followed by a page break
+
+    Entries sit inside a Word TOC field so "Update Field" replaces the
+    placeholder numbers with real page numbers.
+
+    Args:
+        entries (list): Entries from document_layout.toc_entries()
+
+    Returns:
+        str: WordprocessingML fragment
+    """
+    rendered_entries = [render_toc_entry(entry) for entry in entries]
+
+    # Field start/end wrap the cached entries
+    if rendered_entries:
+        rendered_entries[0] = rendered_entries[0].replace('</w:pPr>', '</w:pPr>' + TOC_FIELD_BEGIN, 1)
+        rendered_entries[-1] = rendered_entries[-1][:-len('</w:p>')] + TOC_FIELD_END + '</w:p>'
+
+    return TOC_HEADING_XML + ''.join(rendered_entries) + PAGE_BREAK
+
+
+def render_table(table):
+    """
+    Render a table with its caption
+
+    Every cell is escaped and joined with pre-built markup; no element
+    objects are created.
+
+    Args:
+        table (Table): Table from section_content.section_blocks()
+
+    Returns:
+        str: WordprocessingML fragment
+    """
+    column_count = len(table.columns) or len(table.rows[0])
+    parts = [CAPTION_TEMPLATE.render(TEXT=table.caption)] if table.caption else []
+    parts.append(_table_start(column_count))
+
+    if table.columns:
+        parts.append(
+            TABLE_HEADER_ROW_START + TABLE_HEADER_CELL_START
+            + TABLE_HEADER_CELL_BETWEEN.join(map(slot_text, table.columns))
+            + TABLE_HEADER_CELL_END + TABLE_ROW_END
+        )
+
+    row_start = TABLE_ROW_START + TABLE_CELL_START
+    row_end = TABLE_CELL_END + TABLE_ROW_END
+    join_cells = TABLE_CELL_BETWEEN.join
+    parts.extend(row_start + join_cells(map(slot_text, row)) + row_end for row in table.rows)
+
+    parts.append(TABLE_END)
+    parts.append(TABLE_SPACER)
+    return ''.join(parts)
+
+
+def render_bullets(bullets):
+    """
+    Render a bulleted list
+
+    Args:
+        bullets (BulletList): List from section_content.section_blocks()
+
+    Returns:
+        str: WordprocessingML fragment
+    """
+    return ''.join(BULLET_TEMPLATE.render(TEXT=item) for item in bullets.items)
+
+
+def render_references(references):
+    """
+    Render a numbered reference list ([1], [2], ...)
+
+    Args:
+        references (ReferenceList): List from section_content.section_blocks()
+
+    Returns:
+        str: WordprocessingML fragment
+    """
+    return ''.join(
+        REFERENCE_TEMPLATE.render(NUMBER=f'[{number}]', TEXT=item)
+        for number, item in enumerate(references.items, 1)
+    )
+
+
+BLOCK_RENDERERS = {
+    Table: render_table,
+    BulletList: render_bullets,
+    ReferenceList: render_references
+}
+
+
+def render_section(title, blocks):
+    """
+    Render one content section: a Heading 1, its body and a closing
+    empty paragraph
+
+    Args:
+        title (str): Section heading
+        blocks (list): Paragraph strings and content blocks
+            (see services.section_content.section_blocks)
+
+    Returns:
+        str: WordprocessingML fragment
+    """
+    parts = [HEADING_TEMPLATE.render(TITLE=title)]
+    for block in blocks:
+        if isinstance(block, str):
+            parts.append(BODY_PARAGRAPH_TEMPLATE.render(TEXT=block))
+        else:
+            parts.append(BLOCK_RENDERERS[type(block)](block))
+    parts.append(EMPTY_PARAGRAPH)
+    return ''.join(parts)
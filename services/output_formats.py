@@ -0,0 +1,344 @@
+"""
+Output Formats
+==============
+
+Renders the stored section model of a document to lightweight preview
+formats (HTML, Markdown and PDF) and caches each format per file ID.
+
+All renderers share the document structure from `document_layout`
+(section order, headings, TOC entries) and the content blocks from
+`section_content`, so every format matches the Word document.
+
+Features:
+    - HTML: standalone page with TOC links and academic styling
+    - Markdown: headings, TOC, paragraphs, tables and lists
+    - PDF: pure-Python writer (services/pdf_writer.py); tables and lists
+      are written as plain lines
+    - On-disk cache per file ID and format (outputs/previews/)
+
+Usage:
+    from services.output_formats import output_formats
+
+    filepath = output_formats.get_or_render(file_id, 'html')
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import html
+import os
+import re
+import threading
+
+# Local imports
+from services.content_store import content_store
+from services.document_layout import (
+    DOCUMENT_SUBTITLE, TOC_HEADING, format_document_date, iter_sections, toc_entries
+)
+from services.pdf_writer import build_pdf
+from services.section_content import BulletList, Table, block_paragraphs, section_blocks
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_PREVIEW_DIR = os.path.join('outputs', 'previews')
+
+# Format name -> (file extension, MIME type)
+OUTPUT_FORMATS = {
+    'docx': ('.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    'html': ('.html', 'text/html; charset=utf-8'),
+    'markdown': ('.md', 'text/markdown; charset=utf-8'),
+    'pdf': ('.pdf', 'application/pdf')
+}
+
+# Accepted aliases for the ?format= parameter
+FORMAT_ALIASES = {'md': 'markdown', 'htm': 'html'}
+
+HTML_STYLE = (
+    'body{font-family:"Times New Roman",serif;font-size:12pt;line-height:1.5;'
+    'max-width:6.5in;margin:1in auto;color:#000}'
+    '.title-page{text-align:center;margin:2in 0}'
+    '.title-page h1{font-size:18pt;text-transform:uppercase}'
+    '.subtitle{font-size:14pt}'
+    'nav h2{text-align:center;font-size:16pt}nav ol{padding-left:.5in}'
+    'h2{font-size:14pt;margin:12pt 0 6pt}p{text-align:justify;margin:0 0 6pt}'
+    'table{width:100%;border-collapse:collapse;margin:6pt 0 12pt;font-size:10pt}'
+    'caption{font-weight:bold;margin-bottom:4pt}th,td{border:1px solid #000;padding:2pt 4pt;text-align:left}'
+    'th{background:#d9d9d9}ul,ol{margin:0 0 6pt}'
+)
+
+
+# ============================================
+# FORMAT HELPERS
+# ============================================
+
+def normalize_format(format_name):
+    """
+    Resolve a ?format= value to a supported format name
+
+    Args:
+        format_name (str): Requested format (case-insensitive, may be None)
+
+    Returns:
+        str: Supported format name, or None if unsupported
+    """
+    name = (format_name or 'docx').strip().lower()
+    name = FORMAT_ALIASES.get(name, name)
+    return name if name in OUTPUT_FORMATS else None
+
+
+def _section_model(sections_dict):
+    """Build (key, heading, blocks) tuples shared by all renderers"""
+    return [
+        (key, title, section_blocks(content, key))
+        for _, key, title, content in iter_sections(sections_dict)
+    ]
+
+
+def _markdown_cell(text):
+    """Table cell text that cannot break the Markdown row"""
+    return text.replace('|', '\\|').replace('\n', '<br>')
+
+
+def _markdown_block(block):
+    """Markdown lines of one block (without the trailing blank line)"""
+    if isinstance(block, str):
+        return [block]
+    if isinstance(block, Table):
+        lines = [f"**{block.caption}**", ""] if block.caption else []
+        header = block.columns or ('',) * len(block.rows[0])
+        lines.append('| ' + ' | '.join(map(_markdown_cell, header)) + ' |')
+        lines.append('|' + ' --- |' * len(header))
+        lines.extend('| ' + ' | '.join(map(_markdown_cell, row)) + ' |' for row in block.rows)
+        return lines
+    if isinstance(block, BulletList):
+        return [f"- {item}" for item in block.items]
+    # Numbered references, one per line (hard line breaks)
+    return ['  \n'.join(f"\\[{number}\\] {item}" for number, item in enumerate(block.items, 1))]
+
+
+def _html_block(block):
+    """HTML of one block"""
+    if isinstance(block, str):
+        return '<p>' + html.escape(block).replace('\n', '<br>') + '</p>'
+    if isinstance(block, Table):
+        parts = ['<table>']
+        if block.caption:
+            parts.append(f'<caption>{html.escape(block.caption)}</caption>')
+        if block.columns:
+            parts.append('<thead><tr>' + ''.join(f'<th>{html.escape(cell)}</th>' for cell in block.columns)
+                         + '</tr></thead>')
+        parts.append('<tbody>')
+        parts.extend(
+            '<tr>' + ''.join(f'<td>{html.escape(cell)}</td>' for cell in row) + '</tr>' for row in block.rows
+        )
+        parts.append('</tbody></table>')
+        return ''.join(parts)
+    items = ''.join(f'<li>{html.escape(item)}</li>' for item in block.items)
+    if isinstance(block, BulletList):
+        return f'<ul>{items}</ul>'
+    return f'<ol class="references">{items}</ol>'
+
+
+# ============================================
+# RENDERERS
+# ============================================
+
+def render_markdown(title, sections_dict, created_at=None):
+    """
+    Render a document as Markdown
+
+    Args:
+        title (str): Document title
+        sections_dict (dict): Section key -> content
+        created_at (float): Creation timestamp for the date line
+
+    Returns:
+        str: Markdown text
+    """
+    lines = [f"# {title}", "", f"*{DOCUMENT_SUBTITLE}* — {format_document_date(created_at)}", ""]
+
+    lines.append(f"## {TOC_HEADING}")
+    lines.append("")
+    for entry in toc_entries(sections_dict):
+        lines.append(f"{entry['number']}. [{entry['title']}](#{entry['anchor']})")
+    lines.append("")
+
+    for key, heading, blocks in _section_model(sections_dict):
+        lines.append(f'<a id="section-{key.replace("_", "-")}"></a>')
+        lines.append(f"## {heading}")
+        lines.append("")
+        for block in blocks:
+            lines.extend(_markdown_block(block))
+            lines.append("")
+
+    return '\n'.join(lines)
+
+
+def render_html(title, sections_dict, created_at=None):
+    """
+    Render a document as a standalone HTML page
+
+    Args:
+        title (str): Document title
+        sections_dict (dict): Section key -> content
+        created_at (float): Creation timestamp for the date line
+
+    Returns:
+        str: HTML document
+    """
+    escaped_title = html.escape(title)
+    parts = [
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        f'<title>{escaped_title}</title><style>{HTML_STYLE}</style></head><body>',
+        f'<header class="title-page"><h1>{escaped_title}</h1>',
+        f'<p class="subtitle">{DOCUMENT_SUBTITLE}</p>',
+        f'<p>{html.escape(format_document_date(created_at))}</p></header>',
+        f'<nav><h2>{TOC_HEADING}</h2><ol>'
+    ]
+    parts.extend(
+        f'<li><a href="#{entry["anchor"]}">{html.escape(entry["title"])}</a></li>'
+        for entry in toc_entries(sections_dict)
+    )
+    parts.append('</ol></nav><main>')
+
+    for key, heading, blocks in _section_model(sections_dict):
+        parts.append(f'<section id="section-{key.replace("_", "-")}"><h2>{html.escape(heading)}</h2>')
+        parts.extend(_html_block(block) for block in blocks)
+        parts.append('</section>')
+
+    parts.append('</main></body></html>')
+    return ''.join(parts)
+
+
+def render_pdf(title, sections_dict, created_at=None):
+    """
+    Render a document as PDF
+
+    Args:
+        title (str): Document title
+        sections_dict (dict): Section key -> content
+        created_at (float): Creation timestamp for the date line
+
+    Returns:
+        bytes: PDF file content
+    """
+    sections = [
+        (key, heading, block_paragraphs(blocks))
+        for key, heading, blocks in _section_model(sections_dict)
+    ]
+    return build_pdf(title, format_document_date(created_at), toc_entries(sections_dict), sections)
+
+
+RENDERERS = {
+    'html': render_html,
+    'markdown': render_markdown,
+    'pdf': render_pdf
+}
+
+
+# ============================================
+# FORMAT CACHE CLASS
+# ============================================
+
+class OutputFormatCache:
+    """
+    Renders preview formats from stored content and caches them on disk
+
+    Attributes:
+        preview_dir (str): Directory holding rendered previews
+    """
+
+    def __init__(self, preview_dir=None):
+        """
+        Initialize the format cache
+
+        Args:
+            preview_dir (str): Preview directory (default: PREVIEW_DIR or outputs/previews)
+        """
+        self.preview_dir = preview_dir or os.getenv('PREVIEW_DIR', DEFAULT_PREVIEW_DIR)
+        self._lock = threading.Lock()
+
+    def get_or_render(self, file_id, format_name, record=None):
+        """
+        Return the path of a rendered preview, rendering it on first use
+
+        Args:
+            file_id (str): Document file ID
+            format_name (str): 'html', 'markdown' or 'pdf'
+            record (dict): Stored content record (loaded if not given)
+
+        Returns:
+            str: Path to the rendered file, or None if there is no stored content
+        """
+        extension, _ = OUTPUT_FORMATS[format_name]
+        filepath = os.path.join(self.preview_dir, os.path.basename(file_id) + extension)
+
+        if os.path.isfile(filepath):
+            return filepath
+
+        if record is None:
+            record = content_store.load(file_id)
+        if record is None:
+            return None
+
+        rendered = RENDERERS[format_name](
+            record['title'], record['sections'], record.get('created_at')
+        )
+        data = rendered.encode('utf-8') if isinstance(rendered, str) else rendered
+
+        with self._lock:
+            os.makedirs(self.preview_dir, exist_ok=True)
+            temp_path = f"{filepath}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, filepath)
+
+        logger.info(f"Rendered {format_name} preview for {file_id} ({len(data)} bytes)")
+        return filepath
+
+    def invalidate(self, file_id):
+        """
+        Delete cached previews of a document (after its content changed)
+
+        Args:
+            file_id (str): Document file ID
+        """
+        for format_name, (extension, _) in OUTPUT_FORMATS.items():
+            if format_name == 'docx':
+                continue
+            filepath = os.path.join(self.preview_dir, os.path.basename(file_id) + extension)
+            if os.path.isfile(filepath):
+                os.remove(filepath)
+
+    @staticmethod
+    def download_name(record, file_id, format_name):
+        """
+        Build the download filename for a preview
+
+        Args:
+            record (dict): Stored content record
+            file_id (str): Document file ID
+            format_name (str): Output format
+
+        Returns:
+            str: Filename like 'AI_in_Education_a1b2c3d4.html'
+        """
+        extension, _ = OUTPUT_FORMATS[format_name]
+        if record.get('filename'):
+            return os.path.splitext(record['filename'])[0] + extension
+
+        safe_title = re.sub(r'[^A-Za-z0-9]+', '_', record.get('title', '')).strip('_')[:30]
+        return f"{safe_title or 'document'}_{file_id}{extension}"
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+output_formats = OutputFormatCache()
@@ -0,0 +1,272 @@
+"""
+PDF Writer
+==========
+
+Minimal pure-Python PDF writer for blackbook previews.
+
+It lays out the same structure as the Word document (title page, table
+of contents, content sections, "Page X" footer) using the built-in
+Times-Roman fonts, so no font files or third-party packages are needed.
+Because the layout is done here, the table of contents shows real page
+numbers.
+
+Limitations:
+    - Text outside Windows-1252 (the fonts' WinAnsiEncoding) is replaced
+      with '?'
+    - Line breaking uses approximate glyph widths
+
+Usage:
+    from services.pdf_writer import build_pdf
+
+    pdf_bytes = build_pdf(title, date_text, toc, sections)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import zlib
+
+from services.document_layout import DOCUMENT_SUBTITLE, TOC_HEADING
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# US Letter with 1 inch margins (points)
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 72
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+BODY_SIZE = 12
+BODY_LEADING = 18          # 1.5 line spacing
+PARAGRAPH_GAP = 6
+HEADING_SIZE = 14
+HEADING_GAP_BEFORE = 12
+FOOTER_SIZE = 10
+
+REGULAR_FONT = 'F1'        # Times-Roman
+BOLD_FONT = 'F2'           # Times-Bold
+
+# Approximate Times-Roman glyph widths (1/1000 em) by character class
+NARROW_CHARS = set(" .,;:'!|ilIjt()[]{}-`\"f/r")
+WIDE_CHARS = set('mwMW@%')
+
+
+# ============================================
+# TEXT HELPERS
+# ============================================
+
+def _text_width(text, size):
+    """Estimate the rendered width of a string in points"""
+    width = 0
+    for char in text:
+        if char in NARROW_CHARS:
+            width += 300
+        elif char in WIDE_CHARS:
+            width += 900
+        elif char.isupper():
+            width += 680
+        else:
+            width += 500
+    return width * size / 1000
+
+
+def _wrap(text, size, max_width=TEXT_WIDTH):
+    """Break a paragraph into lines that fit the text width"""
+    lines = []
+    for source_line in text.split('\n'):
+        current = ''
+        for word in source_line.split():
+            candidate = f"{current} {word}" if current else word
+            if current and _text_width(candidate, size) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+
+def _pdf_string(text):
+    """Encode text as a PDF literal string (WinAnsiEncoding bytes, one char per byte)"""
+    # cp1252, not Latin-1: bullets, dashes and curly quotes are in the font encoding
+    encoded = text.encode('cp1252', errors='replace').decode('latin-1')
+    return '(' + encoded.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+# ============================================
+# LAYOUT
+# ============================================
+
+class _PageLayout:
+    """Collects positioned text lines and breaks them into pages"""
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        """Start a new page at the top margin"""
+        self.pages.append([])
+        self.y = PAGE_HEIGHT - MARGIN
+
+    @property
+    def page_number(self):
+        return len(self.pages)
+
+    def line(self, text, size=BODY_SIZE, font=REGULAR_FONT, leading=BODY_LEADING, align='left'):
+        """Add one line of text, starting a new page when needed"""
+        if self.y - leading < MARGIN:
+            self.new_page()
+        self.y -= leading
+
+        if align == 'center':
+            x = (PAGE_WIDTH - _text_width(text, size)) / 2
+        elif align == 'right':
+            x = PAGE_WIDTH - MARGIN - _text_width(text, size)
+        else:
+            x = MARGIN
+        self.pages[-1].append((font, size, x, self.y, text))
+
+    def space(self, points):
+        """Add vertical space"""
+        self.y -= points
+
+
+def _layout_document(title, date_text, toc, sections):
+    """
+    Lay out all pages
+
+    Sections are laid out before the TOC page is filled in so the TOC
+    can show the page each section starts on.
+    """
+    layout = _PageLayout()
+
+    # Title page
+    layout.space(8 * BODY_LEADING)
+    for line in _wrap(title.upper(), 18):
+        layout.line(line, 18, BOLD_FONT, leading=26, align='center')
+    layout.space(2 * BODY_LEADING)
+    layout.line(DOCUMENT_SUBTITLE, 14, align='center')
+    layout.space(3 * BODY_LEADING)
+    layout.line(date_text, BODY_SIZE, align='center')
+
+    # Reserve the TOC page(s); filled after section page numbers are known
+    layout.new_page()
+    toc_page_index = len(layout.pages) - 1
+
+    # Content sections
+    start_pages = {}
+    layout.new_page()
+    for key, heading, paragraphs in sections:
+        layout.space(HEADING_GAP_BEFORE)
+        # Keep a heading with at least two lines of its first paragraph
+        if layout.y - (HEADING_SIZE + 2 * BODY_LEADING) < MARGIN:
+            layout.new_page()
+        layout.line(heading, HEADING_SIZE, BOLD_FONT, leading=HEADING_SIZE + 6)
+        start_pages[key] = layout.page_number
+        layout.space(PARAGRAPH_GAP)
+        for text in paragraphs:
+            for line in _wrap(text, BODY_SIZE):
+                layout.line(line)
+            layout.space(PARAGRAPH_GAP)
+
+    # Fill the TOC page
+    toc_lines = []
+    toc_y = PAGE_HEIGHT - MARGIN - 24
+    toc_lines.append((BOLD_FONT, 16, (PAGE_WIDTH - _text_width(TOC_HEADING, 16)) / 2, toc_y, TOC_HEADING))
+    toc_y -= 12
+    for entry in toc:
+        toc_y -= BODY_LEADING
+        page_label = str(start_pages.get(entry['key'], ''))
+        left_x = MARGIN + 36
+        right_x = PAGE_WIDTH - MARGIN - _text_width(page_label, BODY_SIZE)
+        dots_width = right_x - left_x - _text_width(entry['title'], BODY_SIZE) - 8
+        dots = '.' * max(int(dots_width / _text_width('.', BODY_SIZE)), 0)
+        toc_lines.append((REGULAR_FONT, BODY_SIZE, left_x, toc_y, f"{entry['title']} {dots}"))
+        toc_lines.append((REGULAR_FONT, BODY_SIZE, right_x, toc_y, page_label))
+    layout.pages[toc_page_index] = toc_lines
+
+    return layout.pages
+
+
+# ============================================
+# PDF SERIALIZATION
+# ============================================
+
+def build_pdf(title, date_text, toc, sections):
+    """
+    Build a complete PDF document
+
+    Args:
+        title (str): Document title
+        date_text (str): Date shown on the title page
+        toc (list): Entries from document_layout.toc_entries()
+        sections (list): (key, heading, paragraphs) tuples in order
+
+    Returns:
+        bytes: PDF file content
+    """
+    pages = _layout_document(title, date_text, toc, sections)
+
+    objects = []
+
+    def add_object(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add_object(None)
+    pages_id = add_object(None)
+    regular_font_id = add_object(b'<< /Type /Font /Subtype /Type1 /BaseFont /Times-Roman /Encoding /WinAnsiEncoding >>')
+    bold_font_id = add_object(b'<< /Type /Font /Subtype /Type1 /BaseFont /Times-Bold /Encoding /WinAnsiEncoding >>')
+    resources = (
+        f'<< /Font << /{REGULAR_FONT} {regular_font_id} 0 R /{BOLD_FONT} {bold_font_id} 0 R >> >>'
+    )
+
+    page_ids = []
+    for number, lines in enumerate(pages, start=1):
+        commands = ['BT']
+        for font, size, x, y, text in lines:
+            commands.append(f'/{font} {size} Tf 1 0 0 1 {x:.2f} {y:.2f} Tm {_pdf_string(text)} Tj')
+
+        # Footer page number (title page has none)
+        if number > 1:
+            footer = f'Page {number}'
+            footer_x = (PAGE_WIDTH - _text_width(footer, FOOTER_SIZE)) / 2
+            commands.append(f'/{REGULAR_FONT} {FOOTER_SIZE} Tf 1 0 0 1 {footer_x:.2f} 36 Tm {_pdf_string(footer)} Tj')
+        commands.append('ET')
+
+        stream = zlib.compress('\n'.join(commands).encode('latin-1'))
+        content_id = add_object(
+            f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode('latin-1')
+            + stream + b'\nendstream'
+        )
+        page_ids.append(add_object(
+            f'<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources {resources} /Contents {content_id} 0 R >>'.encode('latin-1')
+        ))
+
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    objects[pages_id - 1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode('latin-1')
+    objects[catalog_id - 1] = f'<< /Type /Catalog /Pages {pages_id} 0 R >>'.encode('latin-1')
+
+    # Write objects and the cross-reference table
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for object_id, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f'{object_id} 0 obj\n'.encode('latin-1') + body + b'\nendobj\n'
+
+    xref_offset = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    for offset in offsets:
+        output += f'{offset:010d} 00000 n \n'.encode('latin-1')
+    output += (
+        f'trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n'
+        f'startxref\n{xref_offset}\n%%EOF\n'
+    ).encode('latin-1')
+
+    return bytes(output)
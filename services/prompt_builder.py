@@ -0,0 +1,542 @@
+"""
+Prompt Builder
+==============
+
+Compiled, token-budgeted prompts for the Gemini client.
+
+`GeminiAIClient._create_academic_prompt()` formats the same long
+instruction block for every topic. The builder calls it once at startup
+with a placeholder topic and keeps the result as a compiled template.
+Each request then only joins the template parts around the topic.
+
+Features:
+    - Static instructions compiled once and placed first, so every prompt
+      starts with the same prefix (Gemini reuses cached prefixes
+      implicitly; with PROMPT_CONTEXT_CACHE the prefix is also uploaded as
+      explicit cached content and only the rest is sent per request)
+    - Token estimate per prompt; optional instructions (off by default,
+      see PROMPT_OPTIONAL_INSTRUCTIONS) are dropped lowest priority first
+      when a prompt would exceed the budget. The budget only ever trims
+      those: the client's prompt, the topic and per-request instructions
+      are sent whole, and a prompt still over budget is logged and counted
+      (over_budget) rather than cut or rejected
+    - Input tokens per request (from the API's usage metadata when
+      available) and model latency as a function of input tokens
+    - Per-request instructions and max-output-token limits (see
+      services/generation_plan.py), appended after the shared prefix
+
+Configuration (environment variables):
+    PROMPT_TOKEN_BUDGET            Input tokens above which optional instructions are dropped
+                                   (default: 4000, 0 = no limit)
+    PROMPT_OPTIONAL_INSTRUCTIONS   Add the optional style instructions (default: false,
+                                   prompts are then exactly the client's own prompt)
+    PROMPT_CONTEXT_CACHE           Upload the prefix as Gemini cached content (default: false)
+    PROMPT_CACHE_TTL_SECONDS       Lifetime of the cached content (default: 3600)
+
+Usage:
+    from services.prompt_builder import prompt_builder
+
+    prompt_builder.install(gemini_client)
+
+    with prompt_builder.request(instructions="Write only the abstract.", max_output_tokens=400):
+        gemini_client.generate_academic_content(topic)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import datetime
+import functools
+from contextlib import contextmanager
+import os
+import threading
+import time
+
+# Local imports
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Stand-in topic used to split the client's prompt into static parts
+TOPIC_PLACEHOLDER = '\u0000TOPIC\u0000'
+
+# Average characters per token for English text (Gemini's documented rule
+# of thumb); refined at runtime from the API's reported token counts
+CHARS_PER_TOKEN = 4.0
+
+# Weight of a new observation in the token estimate calibration
+CALIBRATION_WEIGHT = 0.1
+
+# Upper bounds of the latency-by-input-tokens buckets
+TOKEN_BUCKETS = (1000, 2000, 4000, 8000, 16000)
+
+# Refresh explicit cached content this long before it expires
+CACHE_REFRESH_MARGIN_SECONDS = 60
+
+# Optional instructions: (name, priority, text), only added with
+# PROMPT_OPTIONAL_INSTRUCTIONS=true. Higher priorities are kept longer when
+# a prompt has to be trimmed to the token budget.
+OPTIONAL_INSTRUCTIONS = (
+    ('plain_text', 30,
+     "Write plain text only: no Markdown symbols such as #, * or ** and no bullet characters."),
+    ('paragraphs', 20,
+     "Separate paragraphs within a section with a blank line."),
+    ('register', 10,
+     "Use a formal academic register, define technical terms on first use "
+     "and avoid first-person statements."),
+)
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def estimate_tokens(text, chars_per_token=CHARS_PER_TOKEN):
+    """
+    Estimate the number of tokens in a text
+
+    Args:
+        text (str): Prompt text
+        chars_per_token (float): Characters per token
+
+    Returns:
+        int: Estimated token count
+    """
+    return int(len(text) / chars_per_token) + 1 if text else 0
+
+
+def _usage_tokens(response):
+    """(prompt tokens, cached tokens) from a Gemini response, if reported"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None, 0
+    return getattr(usage, 'prompt_token_count', None), getattr(usage, 'cached_content_token_count', 0) or 0
+
+
+# ============================================
+# PROMPT TEMPLATE CLASS
+# ============================================
+
+class PromptTemplate:
+    """
+    A prompt split into static parts around every occurrence of the topic
+
+    Attributes:
+        parts (list): Static text between topic occurrences
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    @classmethod
+    def compile(cls, build_prompt):
+        """
+        Compile a prompt function into a template
+
+        Args:
+            build_prompt (callable): topic -> prompt string
+
+        Returns:
+            PromptTemplate: The template, or None if the prompt does not
+                contain the topic verbatim (it is then built per request)
+        """
+        prompt = build_prompt(TOPIC_PLACEHOLDER)
+        if not isinstance(prompt, str) or TOPIC_PLACEHOLDER not in prompt:
+            return None
+        return cls(prompt.split(TOPIC_PLACEHOLDER))
+
+    @property
+    def prefix(self):
+        """Static text before the first topic occurrence"""
+        return self.parts[0]
+
+    def render(self, topic):
+        return topic.join(self.parts)
+
+
+# ============================================
+# PROVIDER CONTEXT CACHE CLASS
+# ============================================
+
+class ContextCache:
+    """
+    Gemini cached content holding the static prompt prefix
+
+    Requests whose prompt starts with the prefix are sent to a model bound
+    to the cached content with only the remainder of the prompt. That
+    model carries the client model's generation config, safety settings
+    and system instruction, so cached calls run with the same settings. Any
+    failure (SDK without caching support, prefix below the provider's
+    minimum size, ...) disables the cache and prompts are sent in full.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.prefix = None
+        self.disabled_reason = None
+
+        self._model = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def model_for(self, model, prefix):
+        """
+        Get a model bound to cached content for a prefix
+
+        Args:
+            model: The client's GenerativeModel
+            prefix (str): Static prompt prefix
+
+        Returns:
+            GenerativeModel: Cached-content model, or None to send the full prompt
+        """
+        if self.disabled_reason:
+            return None
+
+        with self._lock:
+            if self._model is not None and self.prefix == prefix and \
+                    time.time() < self._expires_at - CACHE_REFRESH_MARGIN_SECONDS:
+                return self._model
+
+            try:
+                import google.generativeai as genai
+                from google.generativeai import caching
+
+                cached = caching.CachedContent.create(
+                    model=model.model_name,
+                    system_instruction=getattr(model, '_system_instruction', None),
+                    contents=[prefix],
+                    ttl=datetime.timedelta(seconds=self.ttl_seconds)
+                )
+                # from_cached_content() starts from the SDK defaults otherwise
+                self._model = genai.GenerativeModel.from_cached_content(
+                    cached_content=cached,
+                    generation_config=getattr(model, '_generation_config', None) or None,
+                    safety_settings=getattr(model, '_safety_settings', None) or None
+                )
+                self._expires_at = time.time() + self.ttl_seconds
+                self.prefix = prefix
+                logger.info(f"Prompt prefix uploaded as cached content ({len(prefix)} characters)")
+                return self._model
+
+            except Exception as e:
+                self.disabled_reason = str(e)
+                logger.warning(f"Prompt context cache disabled: {str(e)}")
+                return None
+
+
+# ============================================
+# PROMPT BUILDER CLASS
+# ============================================
+
+class PromptBuilder:
+    """
+    Builds prompts from a compiled template within a token budget
+
+    Attributes:
+        token_budget (int): Maximum input tokens per prompt (0 = no limit)
+        instructions (list): Optional (name, priority, text) instructions
+    """
+
+    def __init__(self, token_budget=None, optional_instructions=None, context_cache=None):
+        self.token_budget = int(
+            token_budget if token_budget is not None else os.getenv('PROMPT_TOKEN_BUDGET', 4000)
+        )
+        if optional_instructions is None:
+            optional_instructions = os.getenv('PROMPT_OPTIONAL_INSTRUCTIONS', 'false').lower() == 'true'
+        self.instructions = list(OPTIONAL_INSTRUCTIONS) if optional_instructions else []
+
+        if context_cache is None:
+            context_cache = os.getenv('PROMPT_CONTEXT_CACHE', 'false').lower() == 'true'
+        self.context_cache = ContextCache(int(os.getenv('PROMPT_CACHE_TTL_SECONDS', 3600))) if context_cache else None
+
+        self.template = None
+        self._build_prompt = None
+        self._static_block = ''
+        self._chars_per_token = CHARS_PER_TOKEN
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            'prompts': 0,
+            'trimmed_prompts': 0,
+            'instructions_dropped': 0,
+            'over_budget': 0,
+            'model_calls': 0,
+            'input_tokens': 0,
+            'cached_tokens': 0,
+            'reported_calls': 0,
+            'context_cache_calls': 0
+        }
+        # Least-squares sums for latency = a + b * tokens
+        self._fit = [0, 0.0, 0.0, 0.0, 0.0]  # n, sum x, sum y, sum xy, sum xx
+        self._buckets = [[0, 0, 0.0] for _ in range(len(TOKEN_BUCKETS) + 1)]  # calls, tokens, latency
+
+    # ----------------------------------------
+    # Installation
+    # ----------------------------------------
+
+    def install(self, client):
+        """
+        Take over prompt construction and measure model calls of a client
+
+        Args:
+            client (GeminiAIClient): The Gemini client
+
+        Returns:
+            bool: True if the client's prompt could be compiled
+        """
+        original = getattr(client, '_create_academic_prompt', None)
+        if original is None or getattr(original, '_prompt_builder', False):
+            return False
+
+        self._build_prompt = original
+        self.template = PromptTemplate.compile(original)
+        self._static_block = self._render_instructions(self.instructions)
+
+        def build(topic):
+            return self.build(topic)
+        build._prompt_builder = True
+        client._create_academic_prompt = build
+
+        model = getattr(client, 'model', None)
+        if model is not None and callable(getattr(model, 'generate_content', None)):
+            model.generate_content = self._measured(model, model.generate_content)
+
+        if self.template is None:
+            logger.warning("Prompt does not contain the topic verbatim - building it per request")
+        else:
+            prefix_tokens = estimate_tokens(self.static_prefix)
+            logger.info(f"Prompt template compiled: {prefix_tokens} static prefix tokens (estimated)")
+        return self.template is not None
+
+    @property
+    def static_prefix(self):
+        """The prefix shared by all prompts built with every instruction"""
+        return self._static_block + (self.template.prefix if self.template else '')
+
+    # ----------------------------------------
+    # Building
+    # ----------------------------------------
+
+    @contextmanager
+    def request(self, instructions=None, max_output_tokens=None):
+        """
+        Apply per-request options to model calls made by this thread
+
+        Args:
+            instructions (str): Required instructions appended to the prompt
+            max_output_tokens (int): Output token limit for the model call
+        """
+        previous = getattr(self._local, 'request', None)
+        self._local.request = {'instructions': instructions, 'max_output_tokens': max_output_tokens}
+        try:
+            yield
+        finally:
+            self._local.request = previous
+
+    def build(self, topic):
+        """
+        Build the prompt for a topic within the token budget
+
+        Per-request instructions are appended after the client's prompt
+        (keeping the shared prefix intact). Only the optional instructions
+        are trimmed to the budget; a prompt that is over budget without
+        them is sent as it is and counted in over_budget.
+
+        Args:
+            topic (str): Academic topic
+
+        Returns:
+            str: Prompt text
+        """
+        body = self.template.render(topic) if self.template else self._build_prompt(topic)
+        request_options = getattr(self._local, 'request', None) or {}
+        if request_options.get('instructions'):
+            body = f"{body}\n\n{request_options['instructions']}"
+        prompt = self._static_block + body
+        tokens = self._estimate(prompt)
+
+        # Drop optional instructions, lowest priority first, until it fits
+        dropped = []
+        if self.token_budget and tokens > self.token_budget:
+            kept = list(self.instructions)
+            for instruction in sorted(self.instructions, key=lambda instruction: instruction[1]):
+                if tokens <= self.token_budget:
+                    break
+                kept.remove(instruction)
+                dropped.append(instruction[0])
+                prompt = self._render_instructions(kept) + body
+                tokens = self._estimate(prompt)
+
+        with self._lock:
+            self._stats['prompts'] += 1
+            if dropped:
+                self._stats['trimmed_prompts'] += 1
+                self._stats['instructions_dropped'] += len(dropped)
+            if self.token_budget and tokens > self.token_budget:
+                self._stats['over_budget'] += 1
+
+        if self.token_budget and tokens > self.token_budget:
+            logger.warning(f"Prompt for '{topic[:40]}' is ~{tokens} tokens (budget {self.token_budget})")
+
+        self._local.last_prompt = {'estimated_tokens': tokens, 'dropped_instructions': dropped}
+        return prompt
+
+    def take_last_call(self):
+        """
+        Get (and clear) the prompt and usage details of this thread's last model call
+
+        Returns:
+            dict: estimated_tokens, input_tokens, cached_tokens, latency_ms,
+                dropped_instructions (None if no call was made)
+        """
+        call = getattr(self._local, 'last_call', None)
+        self._local.last_call = None
+        return call
+
+    @staticmethod
+    def _render_instructions(instructions):
+        """Static instruction block placed before the client's prompt"""
+        if not instructions:
+            return ''
+        lines = '\n'.join(f"- {text}" for _, _, text in instructions)
+        return f"General writing instructions:\n{lines}\n\n"
+
+    def _estimate(self, text):
+        return estimate_tokens(text, self._chars_per_token)
+
+    # ----------------------------------------
+    # Model call measurement
+    # ----------------------------------------
+
+    def _measured(self, model, generate_content):
+        """Wrap generate_content to record input tokens and latency"""
+
+        @functools.wraps(generate_content)
+        def measured(prompt, *args, **kwargs):
+            target, sent = generate_content, prompt
+
+            request_options = getattr(self._local, 'request', None) or {}
+            if request_options.get('max_output_tokens') and 'generation_config' not in kwargs:
+                # Merged with the model's own generation config by the SDK
+                kwargs['generation_config'] = {'max_output_tokens': request_options['max_output_tokens']}
+
+            prefix = self.static_prefix
+            if self.context_cache and isinstance(prompt, str) and prefix and prompt.startswith(prefix):
+                cached_model = self.context_cache.model_for(model, prefix)
+                if cached_model is not None:
+                    target, sent = cached_model.generate_content, prompt[len(prefix):]
+
+            start_time = time.perf_counter()
+            response = target(sent, *args, **kwargs)
+            latency_ms = (time.perf_counter() - start_time) * 1000
+
+            self._record_call(prompt, response, latency_ms, cached_model=target is not generate_content)
+            return response
+
+        return measured
+
+    def _record_call(self, prompt, response, latency_ms, cached_model=False):
+        """Update token, latency and calibration statistics for one call"""
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        estimated = self._estimate(text)
+        reported, cached_tokens = _usage_tokens(response)
+        tokens = reported or estimated
+
+        with self._lock:
+            stats = self._stats
+            stats['model_calls'] += 1
+            stats['input_tokens'] += tokens
+            stats['cached_tokens'] += cached_tokens
+            if cached_model:
+                stats['context_cache_calls'] += 1
+
+            if reported and not cached_model:
+                # Refine the characters-per-token estimate from real counts
+                stats['reported_calls'] += 1
+                observed = len(text) / reported
+                self._chars_per_token += CALIBRATION_WEIGHT * (observed - self._chars_per_token)
+
+            fit = self._fit
+            fit[0] += 1
+            fit[1] += tokens
+            fit[2] += latency_ms
+            fit[3] += tokens * latency_ms
+            fit[4] += tokens * tokens
+
+            index = next((i for i, bound in enumerate(TOKEN_BUCKETS) if tokens <= bound), len(TOKEN_BUCKETS))
+            bucket = self._buckets[index]
+            bucket[0] += 1
+            bucket[1] += tokens
+            bucket[2] += latency_ms
+
+        last_prompt = getattr(self._local, 'last_prompt', None) or {}
+        self._local.last_call = {
+            'estimated_tokens': last_prompt.get('estimated_tokens', estimated),
+            'input_tokens': tokens,
+            'cached_tokens': cached_tokens,
+            'latency_ms': round(latency_ms, 1),
+            'dropped_instructions': last_prompt.get('dropped_instructions', [])
+        }
+        self._local.last_prompt = None
+
+    # ----------------------------------------
+    # Statistics
+    # ----------------------------------------
+
+    def get_stats(self):
+        """
+        Get prompt and input token statistics
+
+        Returns:
+            dict: Budget, prefix size, trimming counts, input tokens per call,
+                latency per token bucket and the fitted latency per 1k tokens
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            n, sum_x, sum_y, sum_xy, sum_xx = self._fit
+            buckets = [list(bucket) for bucket in self._buckets]
+            chars_per_token = self._chars_per_token
+
+        calls = stats['model_calls']
+        denominator = n * sum_xx - sum_x * sum_x
+        slope = (n * sum_xy - sum_x * sum_y) / denominator if n > 1 and denominator else None
+
+        bucket_stats = {}
+        for index, (count, tokens, latency) in enumerate(buckets):
+            if not count:
+                continue
+            label = f"<={TOKEN_BUCKETS[index]}" if index < len(TOKEN_BUCKETS) else f">{TOKEN_BUCKETS[-1]}"
+            bucket_stats[label] = {
+                'calls': count,
+                'avg_input_tokens': round(tokens / count),
+                'avg_latency_ms': round(latency / count, 1)
+            }
+
+        stats.update({
+            'token_budget': self.token_budget,
+            'template_compiled': self.template is not None,
+            'static_prefix_tokens': self._estimate(self.static_prefix),
+            'chars_per_token': round(chars_per_token, 2),
+            'avg_input_tokens': round(stats['input_tokens'] / calls) if calls else 0,
+            'latency_by_input_tokens': bucket_stats,
+            'latency_ms_per_1k_tokens': round(slope * 1000, 1) if slope is not None else None,
+            'context_cache': None if self.context_cache is None else {
+                'active': self.context_cache.prefix is not None and not self.context_cache.disabled_reason,
+                'disabled_reason': self.context_cache.disabled_reason
+            }
+        })
+        return stats
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,257 @@
+"""
+Section Content
+===============
+
+The section model accepted by `create_blackbook()` and
+`/api/create-document`.
+
+A section's content is either plain text (paragraphs separated by blank
+lines, as the AI returns it) or a list of content blocks:
+
+    "results": [
+        "Paragraphs of text, exactly like a plain text section.",
+        {"type": "table", "caption": "Table 1: Accuracy by model",
+         "columns": ["Model", "Accuracy"], "rows": [["CNN", 0.91], ["SVM", 0.84]]},
+        {"type": "bullets", "items": ["First finding", "Second finding"]}
+    ],
+    "references": {"type": "references", "items": ["Smith, J. (2024). Title. Journal, 1(2), 3-4."]}
+
+Block types:
+    paragraph   {"text": "..."} - same as a plain string item
+    bullets     {"items": [...]} - bulleted list
+    references  {"items": [...]} - numbered [1], [2], ... reference list
+    table       {"columns": [...], "rows": [[...], ...], "caption": "..."}
+                Cells may be strings or numbers; short rows are padded.
+
+A single block may be given without the surrounding list. Plain text
+sections are unchanged: they still render as paragraphs only.
+
+Functions:
+    - section_blocks(): Validated blocks of one section, ready to render
+    - validate_sections(): Check a whole sections dict (raises ContentError)
+    - block_paragraphs(): Plain text lines for writers without tables/lists
+
+Usage:
+    from services.section_content import section_blocks
+
+    for block in section_blocks(content):
+        if isinstance(block, str):
+            ...  # paragraph
+        elif isinstance(block, Table):
+            ...
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+from collections import namedtuple
+
+from utils.text_stats import analyze_section
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Word's own limit for table columns
+MAX_TABLE_COLUMNS = 63
+MAX_TABLE_ROWS = 100000
+MAX_LIST_ITEMS = 10000
+
+BLOCK_TYPES = ('paragraph', 'bullets', 'references', 'table')
+
+Table = namedtuple('Table', ['columns', 'rows', 'caption'])
+BulletList = namedtuple('BulletList', ['items'])
+ReferenceList = namedtuple('ReferenceList', ['items'])
+
+# Scalar cell / item values accepted besides strings
+_SCALAR_TYPES = (int, float, bool)
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class ContentError(ValueError):
+    """
+    Raised for section content that does not match the section model
+
+    Attributes:
+        error_code (str): API error code for format_api_response()
+    """
+
+    error_code = 'INVALID_SECTIONS'
+
+
+# ============================================
+# PARSING FUNCTIONS
+# ============================================
+
+def section_blocks(content, section_name='section'):
+    """
+    Turn one section's content into render blocks
+
+    Args:
+        content (str | list | dict): Section content
+        section_name (str): Section key for error messages
+
+    Returns:
+        list: Paragraph strings, Table, BulletList and ReferenceList
+            tuples in document order (a plain text section gives the same
+            paragraph list as analyze_section())
+
+    Raises:
+        ContentError: If the content does not match the section model
+    """
+    if content is None:
+        return []
+    if isinstance(content, str):
+        return analyze_section(content)['paragraphs']
+    if isinstance(content, dict):
+        content = [content]
+    elif not isinstance(content, list):
+        raise ContentError(f"Section '{section_name}' must be text or a list of content blocks")
+
+    blocks = []
+    for position, item in enumerate(content, 1):
+        if isinstance(item, str):
+            blocks.extend(analyze_section(item)['paragraphs'])
+        elif isinstance(item, dict):
+            block = _parse_block(item, f"Section '{section_name}', block {position}")
+            if isinstance(block, list):
+                blocks.extend(block)
+            elif block is not None:
+                blocks.append(block)
+        else:
+            raise ContentError(
+                f"Section '{section_name}', block {position} must be a string or an object with a 'type'"
+            )
+    return blocks
+
+
+def validate_sections(sections_dict):
+    """
+    Check every section of a create-document request
+
+    Plain text sections need no work; structured sections are parsed
+    once to find errors before anything is written.
+
+    Args:
+        sections_dict (dict): Section key -> content
+
+    Raises:
+        ContentError: For the first section that does not match the model
+    """
+    for name, content in sections_dict.items():
+        if not isinstance(content, str):
+            section_blocks(content, name)
+
+
+def is_structured(content):
+    """True for content given as blocks rather than plain text"""
+    return content is not None and not isinstance(content, str)
+
+
+def block_paragraphs(blocks):
+    """
+    Flatten blocks into plain paragraphs
+
+    For writers without native tables or lists (e.g. the PDF preview):
+    bullets become "• item", references "[n] item" and each table row one
+    line with " | " between the cells.
+
+    Args:
+        blocks (list): Result of section_blocks()
+
+    Returns:
+        list: Paragraph strings
+    """
+    paragraphs = []
+    for block in blocks:
+        if isinstance(block, str):
+            paragraphs.append(block)
+        elif isinstance(block, Table):
+            if block.caption:
+                paragraphs.append(block.caption)
+            paragraphs.append('\n'.join(
+                ' | '.join(row) for row in [block.columns, *block.rows] if row
+            ))
+        elif isinstance(block, BulletList):
+            paragraphs.extend(f"• {item}" for item in block.items)
+        else:
+            paragraphs.extend(f"[{number}] {item}" for number, item in enumerate(block.items, 1))
+    return paragraphs
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def _parse_block(item, where):
+    """Validate one block object"""
+    block_type = str(item.get('type', 'paragraph')).strip().lower()
+
+    if block_type == 'paragraph':
+        text = item.get('text', '')
+        if not isinstance(text, str):
+            raise ContentError(f"{where}: 'text' must be a string")
+        return analyze_section(text)['paragraphs']
+
+    if block_type in ('bullets', 'references'):
+        items = [_cell_text(value, where) for value in _list_field(item, 'items', where, MAX_LIST_ITEMS)]
+        items = [text.strip() for text in items if text.strip()]
+        if not items:
+            return None
+        return BulletList(tuple(items)) if block_type == 'bullets' else ReferenceList(tuple(items))
+
+    if block_type == 'table':
+        columns = [
+            _cell_text(value, where)
+            for value in _list_field(item, 'columns', where, MAX_TABLE_COLUMNS, required=False)
+        ]
+        rows = _list_field(item, 'rows', where, MAX_TABLE_ROWS, required=False)
+        width = len(columns) or max((len(row) for row in rows if isinstance(row, list)), default=0)
+        if not width:
+            raise ContentError(f"{where}: a table needs 'columns' or at least one row")
+        if width > MAX_TABLE_COLUMNS:
+            raise ContentError(f"{where}: tables are limited to {MAX_TABLE_COLUMNS} columns")
+
+        parsed_rows = []
+        for number, row in enumerate(rows, 1):
+            if not isinstance(row, list) or len(row) > width:
+                raise ContentError(f"{where}: row {number} must be a list of at most {width} cells")
+            cells = [_cell_text(value, where) for value in row]
+            if len(cells) < width:
+                cells.extend([''] * (width - len(cells)))
+            parsed_rows.append(tuple(cells))
+
+        caption = item.get('caption') or ''
+        if not isinstance(caption, str):
+            raise ContentError(f"{where}: 'caption' must be a string")
+        return Table(tuple(columns), parsed_rows, caption.strip())
+
+    raise ContentError(f"{where}: unknown block type '{block_type}'. Use one of: {', '.join(BLOCK_TYPES)}")
+
+
+def _list_field(item, field, where, max_length, required=True):
+    """A list-valued field of a block, bounded in length"""
+    value = item.get(field)
+    if value is None and not required:
+        return []
+    if not isinstance(value, list):
+        raise ContentError(f"{where}: '{field}' must be a list")
+    if len(value) > max_length:
+        raise ContentError(f"{where}: '{field}' is limited to {max_length} entries")
+    return value
+
+
+def _cell_text(value, where):
+    """Text of a table cell or list item"""
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ''
+    if isinstance(value, _SCALAR_TYPES):
+        return str(value)
+    raise ContentError(f"{where}: cells and items must be strings or numbers")
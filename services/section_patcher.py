@@ -0,0 +1,451 @@
+"""
+Section Patcher
+===============
+
+Applies single-section edits to an existing blackbook without rebuilding
+the whole document.
+
+Each document's body is kept as a list of WordprocessingML fragments
+(title page, table of contents, one fragment per section). They are cut
+from the existing `word/document.xml` at the Heading 1 paragraphs, so
+documents written by the fragment writer and by python-docx
+(DocumentGenerator) are patched the same way. Editing a section
+re-renders only that fragment; untouched sections keep their original
+XML and the table of contents is regenerated only when the section list
+changes. The new `word/document.xml` is spliced from the fragments and
+written back into the existing DOCX, whose styles, footer and page setup
+are reused. Rendered fragments carry their formatting as direct
+properties, so they look the same in either package.
+
+A body whose headings do not match the stored sections (e.g. a file
+replaced by hand) is rendered again from the stored record once.
+
+Features:
+    - Per-document fragment cache (LRU, bounded by PATCH_CACHE_MAX_DOCUMENTS),
+      keyed on a hash of the stored record so an edit made by another
+      worker is never overwritten with stale fragments
+    - Re-renders only the changed section and affected TOC entries
+    - Read, splice and atomic replacement (temp file + rename) all happen
+      under the document lock shared with the archive tier and other
+      workers, so no writer overwrites another
+
+Usage:
+    from services.section_patcher import section_patcher
+
+    result = section_patcher.patch_section(file_id, 'introduction', new_text)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+
+# Local imports
+from services.content_store import content_store
+from services.document_catalog import document_catalog
+from services.document_layout import format_document_date, iter_sections, toc_entries
+from services.docx_compression import document_lock
+from services.ooxml_fragments import TOC_HEADING, render_section, render_title_page, render_toc
+from services.output_formats import output_formats
+from services.section_content import section_blocks
+from utils.structured_logger import logger
+from utils.text_stats import analyze_section
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DOCUMENT_PART = 'word/document.xml'
+DEFAULT_OUTPUT_DIR = 'outputs'
+DEFAULT_MAX_DOCUMENTS = 64
+
+BODY_START = '<w:body>'
+BODY_END = '</w:body>'
+HEADING_STYLE = '<w:pStyle w:val="Heading1"/>'
+
+# Start, end and self-closing tags (attribute values never contain '>')
+TAG_PATTERN = re.compile(r'<(/?)[A-Za-z][^>]*?(/?)>')
+# Text of a w:t element (not w:tab, w:tbl, ...)
+TEXT_PATTERN = re.compile(r'<w:t(?: [^>]*)?>([^<]*)</w:t>')
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class PatchError(Exception):
+    """
+    Raised when a section edit cannot be applied
+
+    Attributes:
+        error_code (str): API error code for format_api_response()
+        status_code (int): HTTP status to return
+    """
+
+    def __init__(self, message, error_code, status_code=400):
+        super().__init__(message)
+        self.error_code = error_code
+        self.status_code = status_code
+
+
+# ============================================
+# SECTION PATCHER CLASS
+# ============================================
+
+class SectionPatcher:
+    """
+    Incremental section editor for generated documents
+
+    Attributes:
+        output_dir (str): Directory holding the generated .docx files
+        max_documents (int): Number of documents kept in the fragment cache
+    """
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR, max_documents=None):
+        """
+        Initialize the patcher
+
+        Args:
+            output_dir (str): Directory with generated documents
+            max_documents (int): Fragment cache size (default: PATCH_CACHE_MAX_DOCUMENTS)
+        """
+        self.output_dir = output_dir
+        self.max_documents = int(
+            max_documents or os.getenv('PATCH_CACHE_MAX_DOCUMENTS', DEFAULT_MAX_DOCUMENTS)
+        )
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ----------------------------------------
+    # Public methods
+    # ----------------------------------------
+
+    def patch_section(self, file_id, section_name, content):
+        """
+        Replace (or add) one section of a stored document
+
+        Args:
+            file_id (str): Document file ID
+            section_name (str): Section key, e.g. 'introduction'
+            content (str): New section text ('' removes the section)
+
+        Returns:
+            dict: Patch summary (file info, timings, what was re-rendered)
+
+        Raises:
+            PatchError: If the document, its stored content or the section
+                to remove is missing
+        """
+        start_time = time.perf_counter()
+
+        with self._lock:
+            filepath = self._document_path(file_id)
+
+            with document_lock(filepath):
+                # ----------------------------------------
+                # STEP 1: Load stored content and fragments
+                # ----------------------------------------
+                # Loaded under the lock: another worker may have just
+                # patched this document
+                record = content_store.load(file_id)
+                if record is None:
+                    raise PatchError(
+                        f"No stored content found for file ID: {file_id}",
+                        "CONTENT_NOT_FOUND", 404
+                    )
+
+                sections = record['sections']
+                is_new_section = not sections.get(section_name)
+                if is_new_section and not content:
+                    raise PatchError(
+                        f"Section '{section_name}' does not exist in document {file_id}",
+                        "SECTION_NOT_FOUND", 404
+                    )
+
+                fragments, full_rebuild = self._get_fragments(file_id, record, filepath)
+
+                try:
+                    # ----------------------------------------
+                    # STEP 2: Re-render only the changed section
+                    # ----------------------------------------
+                    stats = analyze_section(content)
+                    if content:
+                        sections[section_name] = content
+                        fragments['sections'][section_name] = render_section(
+                            _title_for(sections, section_name), section_blocks(content, section_name)
+                        )
+                    else:
+                        sections.pop(section_name)
+                        fragments['sections'].pop(section_name, None)
+
+                    # TOC entries only change when a section appears or disappears
+                    toc_updated = is_new_section or not content
+                    if toc_updated:
+                        fragments['toc'] = render_toc(toc_entries(sections))
+
+                    if full_rebuild:
+                        sections_rendered = sum(1 for _ in iter_sections(sections))
+                    else:
+                        sections_rendered = 1 if content else 0
+
+                    # ----------------------------------------
+                    # STEP 3: Splice document.xml and re-zip
+                    # ----------------------------------------
+                    file_size = _replace_document_part(filepath, self._assemble(fragments, sections))
+                    fragments['version'] = _record_version(record)
+                    content_store.save_record(record)
+                except BaseException:
+                    # The cached fragments may be half updated
+                    self._fragments.pop(file_id, None)
+                    raise
+
+            output_formats.invalidate(file_id)
+            document_catalog.record(
+                file_id, title=record['title'], topic=record.get('topic'),
+                filename=record['filename'], file_size=file_size,
+                sections=[key for key, value in sections.items() if value]
+            )
+
+        patch_ms = (time.perf_counter() - start_time) * 1000
+        logger.info(f"Patched section '{section_name}' of {file_id} in {patch_ms:.1f} ms")
+
+        return {
+            'file_id': file_id,
+            'filename': record['filename'],
+            'section': section_name,
+            'section_added': is_new_section,
+            'sections_rendered': sections_rendered,
+            'full_rebuild': full_rebuild,
+            'toc_updated': toc_updated,
+            'file_size': file_size,
+            'patch_time_ms': round(patch_ms, 2),
+            'section_stats': {
+                'word_count': stats['word_count'],
+                'character_count': stats['character_count'],
+                'paragraph_count': stats['paragraph_count']
+            }
+        }
+
+    def invalidate(self, file_id):
+        """Drop the cached fragments of a document"""
+        with self._lock:
+            self._fragments.pop(file_id, None)
+
+    # ----------------------------------------
+    # Fragment cache
+    # ----------------------------------------
+
+    def _document_path(self, file_id):
+        """Path of a stored document (PatchError 404 if either is missing)"""
+        record = content_store.load(file_id)
+        if record is None:
+            raise PatchError(
+                f"No stored content found for file ID: {file_id}",
+                "CONTENT_NOT_FOUND", 404
+            )
+
+        filepath = os.path.join(self.output_dir, os.path.basename(record.get('filename', '')))
+        if not record.get('filename') or not os.path.isfile(filepath):
+            raise PatchError(
+                f"No document found with file ID: {file_id}",
+                "FILE_NOT_FOUND", 404
+            )
+        return filepath
+
+    def _get_fragments(self, file_id, record, filepath):
+        """
+        Get the fragments of a document, cutting them from its body on first use
+
+        Cached fragments are only used while they match the stored record
+        (another worker may have edited the document since).
+
+        Returns:
+            tuple: (fragments dict, True if the body had to be rendered
+                from the record)
+        """
+        version = _record_version(record)
+        fragments = self._fragments.get(file_id)
+        if fragments is not None and fragments['version'] == version:
+            self._fragments.move_to_end(file_id)
+            return fragments, False
+
+        with zipfile.ZipFile(filepath) as archive:
+            head, elements, tail = _split_body(archive.read(DOCUMENT_PART).decode('utf-8'))
+
+        sections = record['sections']
+        fragments = _cut_fragments(elements, sections)
+        full_rebuild = fragments is None
+        if full_rebuild:
+            logger.warning(f"Headings of {file_id} do not match its stored sections - rendering the body again")
+            fragments = {
+                'front': render_title_page(record['title'], format_document_date(record.get('created_at'))),
+                'toc': render_toc(toc_entries(sections)),
+                'sections': {
+                    key: render_section(title, section_blocks(content, key))
+                    for _, key, title, content in iter_sections(sections)
+                }
+            }
+        fragments.update(version=version, head=head, tail=tail)
+
+        self._fragments[file_id] = fragments
+        while len(self._fragments) > self.max_documents:
+            self._fragments.popitem(last=False)
+
+        return fragments, full_rebuild
+
+    @staticmethod
+    def _assemble(fragments, sections):
+        """Join cached fragments into a complete document.xml string"""
+        parts = [fragments['head'], fragments['front'], fragments['toc']]
+        parts.extend(
+            fragments['sections'][key]
+            for _, key, _, _ in iter_sections(sections)
+            if key in fragments['sections']
+        )
+        parts.append(fragments['tail'])
+        return ''.join(parts)
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def _title_for(sections, section_name):
+    """Look up the display title of one section"""
+    for _, key, title, _ in iter_sections(sections):
+        if key == section_name:
+            return title
+    return section_name
+
+
+def _record_version(record):
+    """Hash of everything in a stored record that the fragments depend on"""
+    payload = json.dumps(
+        [record.get('filename'), record.get('title'), record.get('created_at'), record['sections']],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _split_body(document_xml):
+    """
+    Split document.xml into its head, top-level body elements and tail
+
+    Returns:
+        tuple: (everything up to <w:body>, list of element strings,
+            final section properties and closing tags)
+    """
+    body_start = document_xml.find(BODY_START)
+    body_end = document_xml.rfind(BODY_END)
+    if body_start < 0 or body_end < body_start:
+        raise PatchError("Document body could not be read", "INVALID_DOCUMENT", 500)
+    body_start += len(BODY_START)
+    body = document_xml[body_start:body_end]
+
+    elements = []
+    depth = 0
+    element_start = 0
+    for match in TAG_PATTERN.finditer(body):
+        closing, self_closing = match.groups()
+        if closing:
+            depth -= 1
+            if depth == 0:
+                elements.append(body[element_start:match.end()])
+        elif self_closing:
+            if depth == 0:
+                elements.append(match.group(0))
+        else:
+            if depth == 0:
+                element_start = match.start()
+            depth += 1
+
+    tail = document_xml[body_end:]
+    if elements and elements[-1].startswith('<w:sectPr'):
+        tail = elements.pop() + tail
+    return document_xml[:body_start], elements, tail
+
+
+def _paragraph_text(element):
+    """Unescaped text of a top-level paragraph"""
+    return ''.join(html.unescape(text) for text in TEXT_PATTERN.findall(element))
+
+
+def _cut_fragments(elements, sections):
+    """
+    Group body elements into title page, TOC and one fragment per section
+
+    A section runs from its Heading 1 paragraph up to the next one (or
+    the end of the body); the TOC from its heading up to the first
+    section.
+
+    Returns:
+        dict: front, toc and sections (key -> XML), or None if the TOC
+            heading is missing or the headings do not match the sections
+    """
+    toc_index = next(
+        (index for index, element in enumerate(elements)
+         if element.startswith('<w:p') and _paragraph_text(element) == TOC_HEADING),
+        None
+    )
+    if toc_index is None:
+        return None
+
+    headings = [
+        index for index in range(toc_index + 1, len(elements))
+        if elements[index].startswith(('<w:p>', '<w:p ')) and HEADING_STYLE in elements[index]
+    ]
+    expected = [(key, title) for _, key, title, _ in iter_sections(sections)]
+    if [_paragraph_text(elements[index]) for index in headings] != [title for _, title in expected]:
+        return None
+
+    bounds = headings + [len(elements)]
+    return {
+        'front': ''.join(elements[:toc_index]),
+        'toc': ''.join(elements[toc_index:bounds[0]]),
+        'sections': {
+            key: ''.join(elements[bounds[number]:bounds[number + 1]])
+            for number, (key, _) in enumerate(expected)
+        }
+    }
+
+
+def _replace_document_part(filepath, document_xml):
+    """
+    Write a new document.xml into an existing DOCX
+
+    All other package parts are copied over unchanged with their original
+    compression settings. The caller holds document_lock(filepath).
+
+    Returns:
+        int: New file size in bytes
+    """
+    temp_path = f"{filepath}.tmp"
+
+    with zipfile.ZipFile(filepath) as source, \
+            zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            if item.filename == DOCUMENT_PART:
+                target.writestr(item, document_xml.encode('utf-8'))
+            else:
+                target.writestr(item, source.read(item))
+
+    os.replace(temp_path, filepath)
+    return os.path.getsize(filepath)
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+section_patcher = SectionPatcher()
@@ -0,0 +1,536 @@
+"""
+Semantic Topic Cache
+====================
+
+Near-duplicate topic cache that sits in front of
+`GeminiAIClient.generate_academic_content()`.
+
+Exact-match caching misses topics that are worded differently but ask for
+the same blackbook ("Impact of AI on Education" vs. "AI's impact in modern
+education"). This module turns every topic into a small local vector using
+the hashing trick, keeps all vectors in one NumPy matrix and answers
+lookups with a single vectorized dot product. The most similar entry
+above the similarity threshold is reused (and the model call skipped)
+unless the two topics name different subjects: hashed vectors also rate
+"... in Maharashtra" and "... in Gujarat" as close, and serving one for
+the other is worse than a model call. A hit is therefore rejected when
+both topics have a content word the other lacks (a substitution), or
+when words only one of them has make up more than a quarter of its
+content words ("Blockchain in rural healthcare" is not "Blockchain in
+healthcare", but "AI's impact in modern education" is "Impact of AI on
+Education").
+
+Features:
+    - Hashing-trick embeddings (word stems + character trigrams), no model needed
+    - Append-only on-disk log (one JSON line per entry) in cache/, shared
+      by all worker processes: entries stored by another worker are picked
+      up on the next lookup, and compaction writes a temp file and renames it
+    - Vectorized nearest-neighbour search with NumPy
+    - Hit rate and lookup latency statistics
+
+Configuration (environment variables):
+    SEMANTIC_CACHE_ENABLED      "true" / "false" (default: false)
+    SEMANTIC_CACHE_THRESHOLD    Cosine similarity needed for a hit (default: 0.75)
+    SEMANTIC_CACHE_MAX_ENTRIES  Oldest entries are evicted above this (default: 1000)
+    SEMANTIC_CACHE_DIR          Index location (default: cache)
+
+NumPy is optional: without it the layer disables itself and every call goes
+straight to the model.
+
+Usage:
+    from services.semantic_cache import semantic_cache
+
+    result = semantic_cache.get_or_generate(
+        topic, gemini_client.generate_academic_content
+    )
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import copy
+import json
+import os
+from contextlib import contextmanager
+import re
+import threading
+import time
+import unicodedata
+import zlib
+
+# Third-party imports (optional)
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on environment
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: appends are not serialized
+    fcntl = None
+
+# Local imports
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# Number of hash buckets in each topic vector
+EMBEDDING_DIMENSIONS = 1024
+
+# Default configuration values
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_CACHE_DIR = 'cache'
+
+# File names inside the cache directory
+LOG_FILENAME = 'semantic_entries.jsonl'
+LOCK_FILENAME = 'semantic_entries.lock'
+
+# The log is compacted to max_entries lines once it is this many times larger
+COMPACT_FACTOR = 2
+
+# Words that carry no meaning for topic similarity (grammar only: words
+# like "analysis" or "role" change what a blackbook is about)
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'in', 'into',
+    'is', 'its', 'of', 'on', 'or', 's', 'the', 'their', 'to', 'using', 'via', 'with'
+})
+
+# Share of a topic's content words that may be missing from the other
+# topic of a hit (one word in four)
+MAX_UNMATCHED_SHARE = 0.25
+
+# Stems that differ only after a shared prefix of at least this many
+# characters are the same word ("educational" / "education")
+MIN_SHARED_PREFIX = 5
+
+# Suffixes stripped by the light stemmer (longest first)
+STEM_SUFFIXES = ('ational', 'ations', 'ation', 'ings', 'ing', 'ies', 'es', 's')
+
+
+# ============================================
+# SEMANTIC CACHE CLASS
+# ============================================
+
+class SemanticTopicCache:
+    """
+    Similarity cache for AI generation results
+
+    Each stored entry holds the original topic and the full result dict
+    returned by `generate_academic_content()`. Vectors for all entries are
+    kept in one matrix so a lookup is a single matrix-vector product.
+
+    Attributes:
+        enabled (bool): False when disabled by config or NumPy is missing
+        threshold (float): Minimum cosine similarity for a cache hit
+        max_entries (int): Maximum number of cached topics
+        cache_dir (str): Directory holding the on-disk index
+    """
+
+    def __init__(self, cache_dir=None, threshold=None, max_entries=None, enabled=None):
+        """
+        Initialize the cache and load any existing on-disk log
+
+        Args:
+            cache_dir (str): Index directory (default: SEMANTIC_CACHE_DIR or 'cache')
+            threshold (float): Similarity threshold (default: SEMANTIC_CACHE_THRESHOLD)
+            max_entries (int): Entry limit (default: SEMANTIC_CACHE_MAX_ENTRIES)
+            enabled (bool): Force the cache on or off (default: SEMANTIC_CACHE_ENABLED)
+        """
+        if enabled is None:
+            enabled = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+
+        self.enabled = enabled and np is not None
+        self.threshold = float(
+            threshold if threshold is not None
+            else os.getenv('SEMANTIC_CACHE_THRESHOLD', DEFAULT_THRESHOLD)
+        )
+        self.max_entries = int(
+            max_entries if max_entries is not None
+            else os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        )
+        self.cache_dir = cache_dir or os.getenv('SEMANTIC_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+        # In-memory index: entries[i] belongs to row i of vectors
+        self._entries = []
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        # Position in the on-disk log (its inode changes when compacted)
+        self._log_path = os.path.join(self.cache_dir, LOG_FILENAME)
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_lines = 0
+
+        # Statistics
+        self._lookups = 0
+        self._hits = 0
+        self._total_lookup_ms = 0.0
+        self._last_lookup_ms = 0.0
+
+        if enabled and np is None:
+            logger.warning("NumPy not installed - semantic topic cache disabled")
+
+        if self.enabled:
+            with self._lock:
+                self._refresh()
+            if self._entries:
+                logger.info(f"Semantic cache loaded: {len(self._entries)} topics")
+
+    # ----------------------------------------
+    # Public cache methods
+    # ----------------------------------------
+
+    def get_or_generate(self, topic, generate_function):
+        """
+        Return cached content for a similar topic, or generate and cache it
+
+        Args:
+            topic (str): The requested academic topic
+            generate_function (callable): Called with the topic on a miss,
+                normally `gemini_client.generate_academic_content`
+
+        Returns:
+            dict: Generation result in the same shape as the AI client returns,
+                with a 'semantic_cache' entry added to its metadata
+        """
+        if not self.enabled:
+            return generate_function(topic)
+
+        cached_result = self.lookup(topic)
+        if cached_result is not None:
+            return cached_result
+
+        result = generate_function(topic)
+
+        if result.get('success'):
+            self.store(topic, result)
+            result.setdefault('metadata', {})['semantic_cache'] = {
+                'hit': False,
+                'lookup_ms': round(self._last_lookup_ms, 3)
+            }
+
+        return result
+
+    def lookup(self, topic, record_stats=True):
+        """
+        Find the most similar cached topic
+
+        Args:
+            topic (str): The requested academic topic
+            record_stats (bool): Count the lookup in the hit rate (False
+                for background checks such as the topic warmer)
+
+        Returns:
+            dict: Copy of the cached result if similarity >= threshold, else None
+        """
+        if not self.enabled:
+            return None
+
+        start_time = time.perf_counter()
+        query_words = self._content_words(topic)
+        query_vector = self.embed(topic)
+
+        with self._lock:
+            # Pick up entries other workers stored since the last lookup
+            self._refresh()
+            cached_entry, best_score = None, 0.0
+
+            if self._entries:
+                # Vectors are L2-normalized, so the dot product is the cosine
+                scores = self._vectors @ query_vector
+                candidates = np.flatnonzero(scores >= self.threshold)
+                for index in candidates[np.argsort(-scores[candidates], kind='stable')]:
+                    entry = self._entries[index]
+                    if self._same_subject(query_words, self._content_words(entry['topic'])):
+                        cached_entry, best_score = entry, float(scores[index])
+                        break
+
+            is_hit = cached_entry is not None
+
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            if record_stats:
+                self._lookups += 1
+                self._total_lookup_ms += elapsed_ms
+                self._last_lookup_ms = elapsed_ms
+                if is_hit:
+                    self._hits += 1
+
+        if not is_hit:
+            return None
+
+        logger.info(
+            f"Semantic cache hit: '{topic}' ~ '{cached_entry['topic']}' "
+            f"(similarity {best_score:.3f})"
+        )
+
+        # Callers modify the content dict, so never hand out the stored one
+        result = copy.deepcopy(cached_entry['result'])
+        result['topic'] = topic
+        result.setdefault('metadata', {})['semantic_cache'] = {
+            'hit': True,
+            'matched_topic': cached_entry['topic'],
+            'similarity': round(best_score, 4),
+            'lookup_ms': round(elapsed_ms, 3)
+        }
+        return result
+
+    def store(self, topic, result):
+        """
+        Add a successful generation result to the cache
+
+        The entry is appended to the shared log and read back with any
+        entries other workers appended in the meantime.
+
+        Args:
+            topic (str): The topic the result was generated for
+            result (dict): The result returned by the AI client
+        """
+        if not self.enabled:
+            return
+
+        entry = {
+            'topic': topic,
+            'result': copy.deepcopy(result),
+            'created_at': time.time()
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+        with self._lock:
+            written = False
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with self._log_file_lock():
+                    with open(self._log_path, 'a', encoding='utf-8') as f:
+                        f.write(line)
+                    written = True
+                    self._refresh()
+                    if self._log_lines > COMPACT_FACTOR * self.max_entries:
+                        self._compact()
+            except Exception as e:
+                logger.warning(f"Could not save semantic cache entry: {str(e)}")
+                if not written:
+                    # Still serve it from this worker's memory
+                    self._add_entries([entry])
+
+    def get_stats(self):
+        """
+        Get hit rate and latency statistics
+
+        Returns:
+            dict: Cache statistics for API responses and monitoring
+        """
+        with self._lock:
+            misses = self._lookups - self._hits
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'threshold': self.threshold,
+                'lookups': self._lookups,
+                'hits': self._hits,
+                'misses': misses,
+                'hit_rate': round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+                'avg_lookup_ms': round(self._total_lookup_ms / self._lookups, 3) if self._lookups else 0.0,
+                'last_lookup_ms': round(self._last_lookup_ms, 3)
+            }
+
+    # ----------------------------------------
+    # Embedding methods
+    # ----------------------------------------
+
+    def embed(self, topic):
+        """
+        Convert a topic into an L2-normalized hashing-trick vector
+
+        Word stems carry most of the weight; character trigrams make the
+        vector tolerant to small spelling and inflection differences.
+
+        Args:
+            topic (str): Topic text
+
+        Returns:
+            numpy.ndarray: float32 vector of EMBEDDING_DIMENSIONS values
+        """
+        vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+
+        for feature, weight in self._extract_features(topic):
+            hashed = zlib.crc32(feature.encode('utf-8'))
+            bucket = hashed % EMBEDDING_DIMENSIONS
+            # Signed hashing keeps collisions from only adding up
+            sign = 1.0 if (hashed >> 31) & 1 else -1.0
+            vector[bucket] += sign * weight
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def _extract_features(self, topic):
+        """
+        Split a topic into weighted word-stem and trigram features
+
+        Args:
+            topic (str): Topic text
+
+        Returns:
+            list: (feature, weight) tuples
+        """
+        features = []
+        for stem in self._stems(topic):
+            features.append((f"w:{stem}", 1.0))
+            padded = f"#{stem}#"
+            for i in range(len(padded) - 2):
+                features.append((f"c:{padded[i:i + 3]}", 0.25))
+        return features
+
+    def _stems(self, topic):
+        """Stems of a topic's content words, in order"""
+        normalized = unicodedata.normalize('NFKC', topic).lower()
+        words = re.findall(r"[a-z0-9]+", normalized)
+        return [self._stem(word) for word in words if word not in STOP_WORDS]
+
+    def _content_words(self, topic):
+        """Set of content-word stems"""
+        return frozenset(self._stems(topic))
+
+    def _same_subject(self, query_words, cached_words):
+        """
+        Check that two similar topics ask for the same blackbook
+
+        Args:
+            query_words (frozenset): Content-word stems of the requested topic
+            cached_words (frozenset): Content-word stems of the cached topic
+
+        Returns:
+            bool: False for a substituted word or too many added words
+        """
+        def unmatched(words, others):
+            return [word for word in words
+                    if not any(self._same_word(word, other) for other in others)]
+
+        only_query = unmatched(query_words, cached_words)
+        only_cached = unmatched(cached_words, query_words)
+        if only_query and only_cached:
+            return False
+        extra, words = (only_query, query_words) if only_query else (only_cached, cached_words)
+        return len(extra) <= MAX_UNMATCHED_SHARE * len(words)
+
+    @staticmethod
+    def _same_word(stem, other):
+        """Equal stems, or inflections the light stemmer leaves apart"""
+        if stem == other:
+            return True
+        shared = len(os.path.commonprefix([stem, other]))
+        return shared >= MIN_SHARED_PREFIX and shared >= min(len(stem), len(other)) - 1
+
+    @staticmethod
+    def _stem(word):
+        """Strip a common English suffix from a word"""
+        for suffix in STEM_SUFFIXES:
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                return word[:-len(suffix)]
+        return word
+
+    # ----------------------------------------
+    # Persistence methods
+    # ----------------------------------------
+
+    def _refresh(self):
+        """
+        Read log lines appended since the last refresh (caller holds the lock)
+
+        A log that was replaced by compaction (new inode) or truncated is
+        read again from the start.
+        """
+        try:
+            log_stat = os.stat(self._log_path)
+        except FileNotFoundError:
+            return
+        if log_stat.st_ino == self._log_inode and log_stat.st_size == self._log_offset:
+            return
+
+        try:
+            with open(self._log_path, 'rb') as f:
+                file_stat = os.fstat(f.fileno())
+                if file_stat.st_ino != self._log_inode or file_stat.st_size < self._log_offset:
+                    self._entries, self._vectors = [], None
+                    self._log_inode, self._log_offset, self._log_lines = file_stat.st_ino, 0, 0
+                f.seek(self._log_offset)
+                data = f.read()
+        except OSError as e:
+            logger.warning(f"Could not read semantic cache log: {str(e)}")
+            return
+
+        # A line still being written by another worker is read next time
+        complete = data.rfind(b'\n') + 1
+        self._log_offset += complete
+
+        entries = []
+        for line in data[:complete].splitlines():
+            if not line.strip():
+                continue
+            self._log_lines += 1
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping a damaged semantic cache log line")
+        self._add_entries(entries)
+
+    def _add_entries(self, entries):
+        """Embed entries into the in-memory index (caller holds the lock)"""
+        if not entries:
+            return
+
+        vectors = np.stack([self.embed(entry['topic']) for entry in entries])
+        self._entries.extend(entries)
+        self._vectors = vectors if self._vectors is None else np.vstack([self._vectors, vectors])
+
+        # Evict the oldest entries once over the limit
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            self._entries = self._entries[overflow:]
+            self._vectors = self._vectors[overflow:]
+
+    def _compact(self):
+        """
+        Rewrite the log with only the entries still in the index
+
+        Caller holds both locks. Written to a temp file and renamed, so
+        readers see either the old or the new log; other workers notice
+        the new inode and reload.
+        """
+        temp_path = f"{self._log_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(temp_path, self._log_path)
+
+        log_stat = os.stat(self._log_path)
+        self._log_inode, self._log_offset, self._log_lines = log_stat.st_ino, log_stat.st_size, len(self._entries)
+
+    @contextmanager
+    def _log_file_lock(self):
+        """Exclusive lock across worker processes for appends and compaction"""
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self.cache_dir, LOCK_FILENAME), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+# Shared cache instance used by app.py
+semantic_cache = SemanticTopicCache()
@@ -0,0 +1,585 @@
+"""
+Shared Cache
+============
+
+A cache tier shared by every worker process on a host (or, with Redis,
+by every host).
+
+Each gunicorn worker keeps its own in-process caches, so with 16 workers
+the same topic can be generated 16 times and every worker warms up on its
+own. This tier sits behind those caches and is visible to all workers:
+
+    - Downloads: file ID -> filename lookups that need a scan of the
+      output directory are done once and shared.
+    - Generations (opt-in, SHARED_CACHE_GENERATIONS): one model call per
+      exact topic across all workers, kept for SHARED_CACHE_TTL_SECONDS.
+      Concurrent requests for the same new topic wait for the first one
+      instead of calling Gemini in parallel (atomic get-or-compute).
+      Off by default, since a cached blackbook is served to every
+      later request for the topic until it expires.
+
+Backends:
+    sqlite  One SQLite file in WAL mode per host (default). Entries are
+            evicted least-recently-used first once SHARED_CACHE_MAX_MB is
+            exceeded; a trigger keeps the running byte total.
+    redis   Any server that speaks the Redis protocol (RESP), through a
+            small built-in client (no extra dependency). Eviction is the
+            server's job: set maxmemory and maxmemory-policy allkeys-lru.
+    off     Every call goes straight to the compute function. This turns
+            off file ID sharing as well; to stop sharing generations
+            only, leave SHARED_CACHE_GENERATIONS off.
+
+Values are stored as JSON. A backend error never fails a request: the
+cache is skipped and counted in get_stats().
+
+Configuration (environment variables):
+    SHARED_CACHE_BACKEND        sqlite | redis | off (default: sqlite)
+    SHARED_CACHE_GENERATIONS    Share AI generations between workers (default: false)
+    SHARED_CACHE_PATH           SQLite file (default: cache/shared_cache.sqlite3)
+    SHARED_CACHE_URL            redis://[:password@]host:port/db (default: redis://localhost:6379/0)
+    SHARED_CACHE_MAX_MB         Size bound of the SQLite store (default: 256)
+    SHARED_CACHE_TTL_SECONDS    Default entry lifetime (default: 86400)
+    SHARED_CACHE_LOCK_SECONDS   How long a worker may hold a compute lock (default: 180)
+
+Usage:
+    from services.shared_cache import generation_cache, shared_cache
+
+    key = generation_cache.key('generation', topic.casefold())
+    result, was_cached = generation_cache.get_or_compute(
+        key, lambda: generate(topic), store_if=lambda result: result.get('success')
+    )
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import unquote, urlparse
+
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_PATH = os.path.join('cache', 'shared_cache.sqlite3')
+DEFAULT_REDIS_URL = 'redis://localhost:6379/0'
+DEFAULT_MAX_MB = 256
+DEFAULT_TTL_SECONDS = 86400
+DEFAULT_LOCK_SECONDS = 180
+
+KEY_NAMESPACE = 'blackbook'
+
+# Reads refresh an entry's LRU position at most this often (saves a write per hit)
+TOUCH_INTERVAL_SECONDS = 5
+
+# Eviction frees space down to this fraction of the bound, in batches
+EVICT_TARGET_RATIO = 0.9
+EVICT_BATCH = 64
+
+# Poll interval while another worker computes a value
+WAIT_INITIAL_SECONDS = 0.05
+WAIT_MAX_SECONDS = 1.0
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key          TEXT PRIMARY KEY,
+    value        BLOB NOT NULL,
+    size         INTEGER NOT NULL,
+    expires_at   REAL,
+    accessed_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS locks (
+    key          TEXT PRIMARY KEY,
+    owner        TEXT NOT NULL,
+    expires_at   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    id           INTEGER PRIMARY KEY CHECK (id = 1),
+    bytes        INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, bytes) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET bytes = bytes + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET bytes = bytes - old.size + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET bytes = bytes - old.size WHERE id = 1;
+END;
+"""
+
+
+# ============================================
+# SQLITE DRIVER
+# ============================================
+
+class SQLiteCacheDriver:
+    """
+    Host-local store: SQLite in WAL mode, size-bounded LRU
+
+    Attributes:
+        path (str): Database file
+        max_bytes (int): Bound on the stored value bytes
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or os.getenv('SHARED_CACHE_PATH', DEFAULT_PATH)
+        self.max_bytes = int(max_bytes or float(os.getenv('SHARED_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self._local = threading.local()
+        self._evictions = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SQLITE_SCHEMA)
+
+    def get(self, key):
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < now):
+            return None
+
+        if now - row[2] > TOUCH_INTERVAL_SECONDS:
+            with connection:
+                connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return False
+
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            # An upsert (not INSERT OR REPLACE) so the size triggers fire
+            connection.execute(
+                "INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, value, len(value), now + ttl if ttl else None, now)
+            )
+            if self._total_bytes(connection) > self.max_bytes:
+                self._evict(connection, now)
+        return True
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def acquire_lock(self, key, owner, ttl):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("DELETE FROM locks WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO locks (key, owner, expires_at) VALUES (?, ?, ?)", (key, owner, now + ttl)
+            )
+            return cursor.rowcount == 1
+
+    def release_lock(self, key, owner):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+    def get_stats(self):
+        connection = self._connection()
+        entries = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            'backend': self.name,
+            'entries': entries,
+            'bytes': self._total_bytes(connection),
+            'max_bytes': self.max_bytes,
+            'evictions': self._evictions
+        }
+
+    # ----------------------------------------
+    # Internal methods
+    # ----------------------------------------
+
+    @staticmethod
+    def _total_bytes(connection):
+        return connection.execute("SELECT bytes FROM totals WHERE id = 1").fetchone()[0]
+
+    def _evict(self, connection, now):
+        """Drop expired entries, then least recently used ones (inside the caller's transaction)"""
+        cursor = connection.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        evicted = cursor.rowcount
+
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        while self._total_bytes(connection) > target:
+            cursor = connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (EVICT_BATCH,)
+            )
+            if cursor.rowcount <= 0:
+                break
+            evicted += cursor.rowcount
+
+        self._evictions += evicted
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+
+# ============================================
+# REDIS PROTOCOL DRIVER
+# ============================================
+
+class RedisProtocolError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RedisCacheDriver:
+    """
+    Shared store on any Redis-protocol server (minimal RESP2 client)
+
+    Attributes:
+        host (str): Server host
+        port (int): Server port
+        db (int): Database number
+    """
+
+    name = 'redis'
+
+    def __init__(self, url=None, timeout=2.0):
+        parsed = urlparse(url or os.getenv('SHARED_CACHE_URL', DEFAULT_REDIS_URL))
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int((parsed.path or '/0').strip('/') or 0)
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self, key):
+        return self._command('GET', key)
+
+    def set(self, key, value, ttl):
+        if ttl:
+            self._command('SET', key, value, 'PX', int(ttl * 1000))
+        else:
+            self._command('SET', key, value)
+        return True
+
+    def delete(self, key):
+        self._command('DEL', key)
+
+    def acquire_lock(self, key, owner, ttl):
+        return self._command('SET', key, owner, 'NX', 'PX', int(ttl * 1000)) == 'OK'
+
+    def release_lock(self, key, owner):
+        # Only the owner releases; an expired lock may already belong to someone else
+        if self._command('GET', key) == owner.encode('utf-8'):
+            self._command('DEL', key)
+
+    def get_stats(self):
+        return {
+            'backend': self.name,
+            'server': f"{self.host}:{self.port}/{self.db}",
+            'entries': self._command('DBSIZE')
+        }
+
+    # ----------------------------------------
+    # Protocol
+    # ----------------------------------------
+
+    def _command(self, *args):
+        """Send one command and read its reply (reconnects once on a dropped connection)"""
+        for attempt in (1, 2):
+            connection = self._connection()
+            try:
+                connection[0].sendall(self._encode(args))
+                return self._read_reply(connection[1])
+            except (OSError, EOFError):
+                self._close()
+                if attempt == 2:
+                    raise
+
+    @staticmethod
+    def _encode(args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        return b''.join(parts)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise EOFError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RedisProtocolError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise RedisProtocolError(f"Unexpected reply: {line[:40]!r}")
+
+    def _connection(self):
+        """Get this thread's (socket, reader), connecting on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            connection = (sock, sock.makefile('rb'))
+            self._local.connection = connection
+            try:
+                if self.password:
+                    self._command('AUTH', self.password)
+                if self.db:
+                    self._command('SELECT', self.db)
+            except RedisProtocolError:
+                self._close()
+                raise
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection[1].close()
+                connection[0].close()
+            except OSError:
+                pass
+
+
+# ============================================
+# SHARED CACHE CLASS
+# ============================================
+
+class SharedCache:
+    """
+    JSON cache over a shared backend with atomic get-or-compute
+
+    Attributes:
+        driver: Backend driver (None when the tier is off)
+        ttl (float): Default entry lifetime in seconds
+        lock_seconds (float): Lease of a compute lock
+    """
+
+    def __init__(self, driver=None, ttl=None, lock_seconds=None):
+        self.driver = driver
+        self.ttl = float(ttl or os.getenv('SHARED_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+        self.lock_seconds = float(lock_seconds or os.getenv('SHARED_CACHE_LOCK_SECONDS', DEFAULT_LOCK_SECONDS))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'computed': 0, 'waited': 0, 'errors': 0}
+        self._last_error_log = 0.0
+
+    @staticmethod
+    def key(kind, identity):
+        """
+        Build a cache key
+
+        Args:
+            kind (str): Value kind, e.g. 'generation' or 'file-id'
+            identity (str): What identifies the value within its kind
+
+        Returns:
+            str: Short namespaced key
+        """
+        digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:32]
+        return f"{KEY_NAMESPACE}:{kind}:{digest}"
+
+    # ----------------------------------------
+    # Public cache methods
+    # ----------------------------------------
+
+    def get(self, key, record_stats=True):
+        """
+        Look up a value
+
+        Args:
+            key (str): Key from key()
+            record_stats (bool): Count the lookup in the hit rate (False
+                for checks that do not serve a request)
+
+        Returns:
+            The stored value, or None
+        """
+        data = self._backend('get', key)
+        value = json.loads(data) if data is not None else None
+        if record_stats:
+            self._count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a JSON-serializable value
+
+        Args:
+            key (str): Key from key()
+            value: Value to store
+            ttl (float): Lifetime in seconds (default: SHARED_CACHE_TTL_SECONDS)
+        """
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._backend('set', key, data, ttl or self.ttl)
+
+    def delete(self, key):
+        """Remove a value"""
+        self._backend('delete', key)
+
+    def get_or_compute(self, key, compute, ttl=None, store_if=None):
+        """
+        Return the cached value, or compute it once across all workers
+
+        The first worker to miss takes a compute lock; the others wait for
+        its value instead of computing it too. A worker that holds the
+        lock longer than SHARED_CACHE_LOCK_SECONDS loses it.
+
+        Args:
+            key (str): Key from key()
+            compute (callable): Produces the value on a miss
+            ttl (float): Lifetime of a stored value
+            store_if (callable): value -> bool; results it rejects (e.g.
+                failed generations) are returned but not stored
+
+        Returns:
+            tuple: (value, was_cached)
+        """
+        if self.driver is None:
+            return compute(), False
+
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.lock_seconds
+        delay = WAIT_INITIAL_SECONDS
+
+        while True:
+            # Backend down: compute without coordination
+            acquired = self._backend('acquire_lock', lock_key, self.owner, self.lock_seconds, default=True)
+            if acquired:
+                try:
+                    # Another worker may have stored it between our miss and the lock
+                    data = self._backend('get', key)
+                    if data is not None:
+                        return json.loads(data), True
+
+                    value = compute()
+                    self._count('computed')
+                    if store_if is None or store_if(value):
+                        self.set(key, value, ttl)
+                    return value, False
+                finally:
+                    self._backend('release_lock', lock_key, self.owner)
+
+            time.sleep(delay)
+            delay = min(delay * 2, WAIT_MAX_SECONDS)
+
+            data = self._backend('get', key)
+            if data is not None:
+                self._count('waited')
+                return json.loads(data), True
+
+            if time.monotonic() > deadline:
+                self._count('computed')
+                return compute(), False
+
+    def get_stats(self):
+        """
+        Get hit / compute counters and backend usage
+
+        Returns:
+            dict: Counters, hit rate and the backend's own stats
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['backend'] = self._backend('get_stats', default=None) if self.driver else {'backend': 'off'}
+        return stats
+
+    # ----------------------------------------
+    # Internal methods
+    # ----------------------------------------
+
+    def _backend(self, method, *args, default=None):
+        """Call the driver; errors are logged (at most once a minute) and skipped"""
+        if self.driver is None:
+            return default
+        try:
+            return getattr(self.driver, method)(*args)
+        except Exception as e:
+            self._count('errors')
+            now = time.monotonic()
+            if now - self._last_error_log > 60:
+                self._last_error_log = now
+                logger.warning(f"Shared cache ({self.driver.name}) unavailable: {str(e)}")
+            return default
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def create_shared_cache():
+    """
+    Build the shared cache for SHARED_CACHE_BACKEND
+
+    Returns:
+        SharedCache: The cache (a pass-through one if the backend is off
+            or cannot be opened)
+    """
+    backend = os.getenv('SHARED_CACHE_BACKEND', 'sqlite').strip().lower()
+    try:
+        if backend == 'sqlite':
+            return SharedCache(SQLiteCacheDriver())
+        if backend == 'redis':
+            return SharedCache(RedisCacheDriver())
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Shared cache disabled: {str(e)}")
+    return SharedCache(None)
+
+
+# ============================================
+# GLOBAL INSTANCES
+# ============================================
+
+shared_cache = create_shared_cache()
+
+# AI generations go through this one: the shared cache when
+# SHARED_CACHE_GENERATIONS is on, a pass-through cache otherwise
+if os.getenv('SHARED_CACHE_GENERATIONS', 'false').lower() == 'true':
+    generation_cache = shared_cache
+else:
+    generation_cache = SharedCache(None)
@@ -0,0 +1,556 @@
+"""
+Streaming Document Ingest
+=========================
+
+Memory-bounded handling of large `/api/create-document` payloads.
+
+`request.get_json()` keeps the raw body, the parsed dict and every
+section string in memory at once, and python-docx then builds another
+full copy. A handful of 20 MB uploads could exhaust a worker.
+
+The streaming path instead:
+
+    1. Reads the body in 64 KiB chunks with an incremental JSON scanner
+       that only understands the create-document shape
+       ({"title": "...", "sections": {"name": "text" or [blocks], ...}})
+    2. Spools each section to a temporary file as soon as it is complete
+    3. Streams word/document.xml into the DOCX one section at a time
+       (services/docx_writer.py) and the content record likewise
+
+At most one section (plus one read chunk) is held in memory, so a
+request's footprint is bounded by the per-section limit rather than the
+body size. Requests also reserve an estimate of that footprint from a
+shared memory budget and are turned away when the budget is exhausted.
+
+Configuration (environment variables):
+    CREATE_DOCUMENT_MAX_BYTES          Body size limit (default: 25 MB)
+    CREATE_DOCUMENT_MAX_SECTION_BYTES  Single section limit (default: 5 MB)
+    CREATE_DOCUMENT_MAX_SECTIONS       Number of sections (default: 200)
+    CREATE_DOCUMENT_STREAM_THRESHOLD   Bodies above this are streamed (default: 1 MB)
+    CREATE_DOCUMENT_MEMORY_BUDGET      Shared budget of all requests (default: 256 MB)
+
+Usage:
+    from services.streaming_ingest import MemoryMeter, SectionSpool, ingest_limits, parse_document_stream
+
+    spool = SectionSpool()
+    for event in parse_document_stream(request.stream, ingest_limits, MemoryMeter()):
+        if event[0] == 'section':
+            spool.add(event[1], event[2])
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import codecs
+import json
+import os
+import tempfile
+import threading
+
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+MB = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+# Keys and titles are short; anything longer is rejected early
+MAX_KEY_CHARS = 256
+MAX_TITLE_CHARS = 1000
+
+# Other top-level fields (options) are read if their value fits in this many characters
+MAX_OPTION_VALUE_CHARS = 64 * 1024
+
+# Copies of the largest section alive at once: raw JSON, decoded text,
+# rendered XML and its encoded bytes
+SECTION_MEMORY_FACTOR = 4
+
+JSON_WHITESPACE = ' \t\r\n'
+
+
+# ============================================
+# EXCEPTIONS
+# ============================================
+
+class IngestError(Exception):
+    """
+    Raised when an uploaded document is rejected
+
+    Attributes:
+        error_code (str): API error code for format_api_response()
+        status_code (int): HTTP status to return
+    """
+
+    def __init__(self, message, error_code, status_code=400):
+        super().__init__(message)
+        self.error_code = error_code
+        self.status_code = status_code
+
+
+# ============================================
+# LIMITS AND MEMORY BUDGET
+# ============================================
+
+class IngestLimits:
+    """
+    Size limits and the shared memory budget for document uploads
+
+    Attributes:
+        max_bytes (int): Maximum request body size
+        max_section_bytes (int): Maximum size of one section
+        max_sections (int): Maximum number of sections
+        stream_threshold (int): Bodies larger than this are streamed
+        memory_budget (int): Bytes all uploads may reserve together
+    """
+
+    def __init__(self):
+        self.max_bytes = int(float(os.getenv('CREATE_DOCUMENT_MAX_BYTES', 25 * MB)))
+        self.max_section_bytes = int(float(os.getenv('CREATE_DOCUMENT_MAX_SECTION_BYTES', 5 * MB)))
+        self.max_sections = int(os.getenv('CREATE_DOCUMENT_MAX_SECTIONS', 200))
+        self.stream_threshold = int(float(os.getenv('CREATE_DOCUMENT_STREAM_THRESHOLD', 1 * MB)))
+        self.memory_budget = int(float(os.getenv('CREATE_DOCUMENT_MEMORY_BUDGET', 256 * MB)))
+
+        self._reserved = 0
+        self._peak_reserved = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, content_length, streamed):
+        """
+        Estimate the memory one request needs
+
+        Args:
+            content_length (int): Body size (None if unknown)
+            streamed (bool): True for the streaming path
+
+        Returns:
+            int: Bytes to reserve
+        """
+        body = content_length if content_length is not None else self.max_bytes
+        largest = min(body, self.max_section_bytes) if streamed else body
+        return SECTION_MEMORY_FACTOR * largest + READ_CHUNK_SIZE
+
+    def reserve(self, amount):
+        """
+        Reserve memory from the shared budget
+
+        Args:
+            amount (int): Bytes to reserve
+
+        Returns:
+            bool: False if the budget cannot cover the request right now
+        """
+        with self._lock:
+            if self._reserved + amount > self.memory_budget and self._reserved > 0:
+                self._rejected += 1
+                return False
+            self._reserved += amount
+            self._peak_reserved = max(self._peak_reserved, self._reserved)
+            return True
+
+    def release(self, amount):
+        """Return a reservation to the budget"""
+        with self._lock:
+            self._reserved = max(self._reserved - amount, 0)
+
+    def get_stats(self):
+        """
+        Get budget usage
+
+        Returns:
+            dict: Budget, reserved and peak reserved bytes, rejections
+        """
+        with self._lock:
+            return {
+                'memory_budget_mb': round(self.memory_budget / MB, 1),
+                'reserved_mb': round(self._reserved / MB, 2),
+                'peak_reserved_mb': round(self._peak_reserved / MB, 2),
+                'rejected': self._rejected,
+                'max_bytes': self.max_bytes,
+                'max_section_bytes': self.max_section_bytes,
+                'stream_threshold': self.stream_threshold
+            }
+
+
+# ============================================
+# MEMORY METER
+# ============================================
+
+def current_rss_bytes():
+    """
+    Resident set size of this process
+
+    Returns:
+        int: RSS in bytes (0 if it cannot be measured on this platform)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the high-water mark (KiB on Linux, bytes on macOS)
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if usage > 1 << 32 else usage * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class MemoryMeter:
+    """
+    Samples process RSS while a request runs
+
+    RSS is process-wide, so concurrent requests show up in each other's
+    numbers; buffered_peak is this request's own largest buffer.
+    """
+
+    def __init__(self):
+        self.start_rss = current_rss_bytes()
+        self.peak_rss = self.start_rss
+        self.buffered_peak = 0
+
+    def sample(self, buffered=0):
+        """Record the current RSS and the caller's buffered bytes"""
+        self.peak_rss = max(self.peak_rss, current_rss_bytes())
+        self.buffered_peak = max(self.buffered_peak, buffered)
+
+    def report(self):
+        """
+        Summarize the request's memory use
+
+        Returns:
+            dict: Start and peak RSS, peak growth and largest buffer (MB)
+        """
+        self.sample()
+        return {
+            'rss_start_mb': round(self.start_rss / MB, 2),
+            'peak_rss_mb': round(self.peak_rss / MB, 2),
+            'peak_rss_growth_mb': round((self.peak_rss - self.start_rss) / MB, 2),
+            'peak_buffered_mb': round(self.buffered_peak / MB, 2)
+        }
+
+
+# ============================================
+# SECTION SPOOL
+# ============================================
+
+class SectionSpool:
+    """
+    Temporary file holding uploaded sections until the document is built
+
+    Behaves like a read-only dict of section name -> content whose
+    items() reads one section back at a time. A repeated name replaces
+    the earlier content but keeps its position (like json.loads).
+    Content blocks (lists and objects) are spooled as JSON.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._index = {}
+
+    def add(self, name, content):
+        """Append a section; empty sections are dropped"""
+        if not content:
+            self._index.pop(name, None)
+            return
+        structured = not isinstance(content, str)
+        data = (json.dumps(content, ensure_ascii=False) if structured else content).encode('utf-8')
+        self._file.seek(0, os.SEEK_END)
+        self._index[name] = (self._file.tell(), len(data), structured)
+        self._file.write(data)
+
+    def keys(self):
+        return list(self._index)
+
+    def items(self):
+        for name, (offset, length, structured) in self._index.items():
+            self._file.seek(offset)
+            text = self._file.read(length).decode('utf-8')
+            yield name, json.loads(text) if structured else text
+
+    def __len__(self):
+        return len(self._index)
+
+    def close(self):
+        self._file.close()
+
+
+# ============================================
+# INCREMENTAL JSON SCANNER
+# ============================================
+
+class _JsonStreamScanner:
+    """Reads JSON tokens from a byte stream, buffering as little as possible"""
+
+    def __init__(self, stream, max_bytes, meter):
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._meter = meter
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _fill(self):
+        """Read one more chunk; returns False at end of body"""
+        if self._eof:
+            return False
+
+        chunk = self._stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            self._buffer = self._buffer[self._pos:] + self._decoder.decode(b'', final=True)
+            self._pos = 0
+            return False
+
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self._max_bytes:
+            raise IngestError(
+                f"Request body exceeds {self._max_bytes} bytes", "PAYLOAD_TOO_LARGE", 413
+            )
+
+        # Drop the consumed prefix before appending
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(chunk)
+        self._pos = 0
+        self._meter.sample(len(self._buffer))
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of body)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in JSON_WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise IngestError(f"Invalid JSON: expected '{character}'", "INVALID_JSON")
+        self._pos += 1
+
+    def consume(self):
+        self._pos += 1
+
+    def read_string(self, max_chars, error_code, what):
+        """
+        Read a complete JSON string
+
+        Data scanned before a refill is moved out of the buffer into a
+        list of parts and joined once at the closing quote, so a long
+        string is copied a constant number of times.
+
+        Args:
+            max_chars (int): Longest raw string accepted
+            error_code (str): Error code when it is longer
+            what (str): Description for error messages
+
+        Returns:
+            str: Decoded string
+        """
+        if self.peek() != '"':
+            raise IngestError(f"Invalid JSON: {what} must be a string", "INVALID_JSON")
+
+        parts = []
+        length = 0
+        # Backslashes ending the moved-out parts (an escape may span a chunk boundary)
+        carried = 0
+        scan = self._pos + 1
+        while True:
+            quote = self._buffer.find('"', scan)
+            if quote != -1:
+                index = quote - 1
+                while index >= self._pos and self._buffer[index] == '\\':
+                    index -= 1
+                backslashes = quote - 1 - index
+                if index < self._pos:
+                    backslashes += carried
+                if backslashes % 2 == 0:
+                    break
+                scan = quote + 1
+                continue
+
+            piece = self._buffer[self._pos:]
+            trailing = len(piece) - len(piece.rstrip('\\'))
+            carried = carried + trailing if trailing == len(piece) else trailing
+            parts.append(piece)
+            length += len(piece)
+            if length > max_chars:
+                raise IngestError(f"{what} exceeds {max_chars} characters", error_code, 413)
+
+            self._buffer = ''
+            self._pos = 0
+            if not self._fill():
+                raise IngestError("Invalid JSON: unterminated string", "INVALID_JSON")
+            self._meter.sample(length + len(self._buffer))
+            scan = 0
+
+        parts.append(self._buffer[self._pos:quote + 1])
+        raw = ''.join(parts)
+        if len(raw) - 2 > max_chars:
+            raise IngestError(f"{what} exceeds {max_chars} characters", error_code, 413)
+        self._pos = quote + 1
+
+        try:
+            return json.loads(raw)
+        except ValueError:
+            raise IngestError(f"Invalid JSON in {what}", "INVALID_JSON")
+
+    def read_structured(self, max_chars, error_code, what):
+        """
+        Read a complete JSON array or object
+
+        Decoding is retried each time the buffered data has doubled, so
+        a large value is parsed a bounded number of times.
+
+        Args:
+            max_chars (int): Longest raw value accepted
+            error_code (str): Error code when it is longer
+            what (str): Description for error messages
+
+        Returns:
+            list | dict: Decoded value
+        """
+        self.peek()
+        decoder = json.JSONDecoder()
+        next_attempt = 0
+        while True:
+            available = len(self._buffer) - self._pos
+            if available >= next_attempt or self._eof:
+                try:
+                    value, end = decoder.raw_decode(self._buffer, self._pos)
+                except ValueError:
+                    if self._eof:
+                        raise IngestError(f"Invalid JSON in {what}", "INVALID_JSON")
+                    next_attempt = available * 2
+                else:
+                    if end - self._pos > max_chars:
+                        raise IngestError(f"{what} exceeds {max_chars} characters", error_code, 413)
+                    self._pos = end
+                    return value
+
+            if available > max_chars:
+                raise IngestError(f"{what} exceeds {max_chars} characters", error_code, 413)
+            self._fill()
+
+    def read_value(self):
+        """Read a small value of any other field (e.g. an option)"""
+        self.peek()
+        decoder = json.JSONDecoder()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._eof:
+                    raise IngestError("Invalid JSON", "INVALID_JSON")
+            if len(self._buffer) - self._pos > MAX_OPTION_VALUE_CHARS:
+                raise IngestError("Unsupported large field in request body", "INVALID_JSON", 413)
+            self._fill()
+
+    def at_end(self):
+        return self.peek() == ''
+
+
+# ============================================
+# DOCUMENT PARSER
+# ============================================
+
+def parse_document_stream(stream, limits, meter):
+    """
+    Parse a create-document body incrementally
+
+    Args:
+        stream (file): Request body stream (e.g. request.stream)
+        limits (IngestLimits): Size limits
+        meter (MemoryMeter): Receives buffer sizes
+
+    Yields:
+        tuple: ('title', text), ('section', name, content) or
+            ('option', key, value) for other small fields, in body order
+
+    Raises:
+        IngestError: On invalid JSON, a wrong shape or exceeded limits
+    """
+    scanner = _JsonStreamScanner(stream, limits.max_bytes, meter)
+    section_count = 0
+
+    scanner.expect('{')
+    if scanner.peek() == '}':
+        scanner.consume()
+    else:
+        while True:
+            key = scanner.read_string(MAX_KEY_CHARS, "INVALID_JSON", "field name")
+            scanner.expect(':')
+
+            if key == 'title':
+                yield ('title', scanner.read_string(MAX_TITLE_CHARS, "TITLE_TOO_LONG", "title"))
+
+            elif key == 'sections':
+                if scanner.peek() != '{':
+                    raise IngestError("Sections must be a non-empty dictionary", "INVALID_SECTIONS")
+                scanner.consume()
+                if scanner.peek() == '}':
+                    scanner.consume()
+                else:
+                    while True:
+                        name = scanner.read_string(MAX_KEY_CHARS, "INVALID_SECTIONS", "section name")
+                        scanner.expect(':')
+                        if scanner.peek() == '"':
+                            content = scanner.read_string(
+                                limits.max_section_bytes, "SECTION_TOO_LARGE", f"Section '{name}'"
+                            )
+                        elif scanner.peek() in ('[', '{'):
+                            # Content blocks (tables, lists, references)
+                            content = scanner.read_structured(
+                                limits.max_section_bytes, "SECTION_TOO_LARGE", f"Section '{name}'"
+                            )
+                        else:
+                            raise IngestError(
+                                f"Section '{name}' must be text or a list of content blocks", "INVALID_SECTIONS"
+                            )
+
+                        section_count += 1
+                        if section_count > limits.max_sections:
+                            raise IngestError(
+                                f"Too many sections (maximum {limits.max_sections})", "TOO_MANY_SECTIONS"
+                            )
+                        yield ('section', name, content)
+
+                        separator = scanner.peek()
+                        scanner.consume()
+                        if separator == '}':
+                            break
+                        if separator != ',':
+                            raise IngestError("Invalid JSON in sections", "INVALID_JSON")
+            else:
+                yield ('option', key, scanner.read_value())
+
+            separator = scanner.peek()
+            scanner.consume()
+            if separator == '}':
+                break
+            if separator != ',':
+                raise IngestError("Invalid JSON: expected ',' or '}'", "INVALID_JSON")
+
+    if not scanner.at_end():
+        raise IngestError("Invalid JSON: unexpected data after the document", "INVALID_JSON")
+
+    logger.info(f"Streamed document body: {scanner.bytes_read} bytes, {section_count} sections")
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+ingest_limits = IngestLimits()
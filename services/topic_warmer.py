@@ -0,0 +1,520 @@
+"""
+Trending Topic Warmer
+=====================
+
+Pre-generates popular topics while the model has spare capacity.
+
+Traffic is peaky: around syllabus deadlines the same few dozen topics
+are requested over and over. The warmer ranks recent topics from the
+document catalog by frequency and recency, and when the scheduler is
+idle (optionally only during off-peak hours) it generates the top topics
+that are not cached yet. The result is stored in the shared cache (and
+the semantic cache when it is enabled), and a DOCX is pre-rendered.
+
+During a peak, a request for a warmed topic is then served from the
+cache without a model call, by any worker. Its document is a copy of the
+pre-rendered file instead of a fresh render.
+
+One warmer per host:
+    Every worker starts the warm loop, but only the worker holding an
+    exclusive lock on WARMER_LOCK_PATH warms; the others retry the lock
+    each cycle and take over when that worker exits. The hourly model
+    call budget is kept in the shared cache, so it survives the takeover.
+    The leader warms only while its own scheduler is quiet and no worker
+    has started or finished a live generation within WARMER_QUIET_SECONDS
+    (every worker notes its live calls in the shared cache).
+
+Ranking:
+    score = sum over the topic's recent documents of 0.5 ** (age / half-life)
+            + DOWNLOAD_WEIGHT * downloads
+
+Configuration (environment variables):
+    WARMER_ENABLED              "true" / "false" (default: false - uses model quota)
+    WARMER_INTERVAL_SECONDS     Time between warm cycles (default: 300)
+    WARMER_OFF_PEAK_HOURS       Local hours to warm in, e.g. "0-7" (default: any hour)
+    WARMER_MAX_RUNNING          Warm only while at most this many generations run (default: 1)
+    WARMER_QUIET_SECONDS        Warm only this long after the last live generation on any worker (default: 120)
+    WARMER_MAX_PER_HOUR         Model calls per hour for warming (default: 20)
+    WARMER_TOP_TOPICS           Candidates considered per cycle (default: 30)
+    WARMER_MIN_REQUESTS         Requests within the window to count as trending (default: 2)
+    WARMER_WINDOW_DAYS          How far back topics are mined (default: 7)
+    WARMER_HALF_LIFE_HOURS      Recency half-life of a request (default: 24)
+    WARMER_MAX_PRERENDERED      Pre-rendered documents kept (default: 100)
+    WARMER_LOCK_PATH            Lock file electing the host's warmer (default: cache/topic_warmer.lock)
+
+Usage:
+    from services.topic_warmer import topic_warmer
+
+    topic_warmer.start(generate_function)
+    topic_warmer.note_live_call()    # around every live model call
+    doc_result = topic_warmer.copy_prerendered(topic, sections, compression)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+# Standard library imports
+import hashlib
+import json
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: a single process warms
+    fcntl = None
+
+# Local imports
+from services.circuit_breaker import ai_circuit
+from services.document_catalog import document_catalog
+from services.docx_compression import compression_report, normalize_profile
+from services.docx_writer import document_builder
+from services.generation_plan import warm_topic
+from services.generation_scheduler import generation_scheduler
+from services.shared_cache import shared_cache
+from utils.structured_logger import logger
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_PRERENDER_DIR = os.path.join('outputs', 'prerendered')
+DEFAULT_LOCK_PATH = os.path.join('cache', 'topic_warmer.lock')
+
+# Shared cache keys: last live generation on any worker, warming model calls
+LIVE_CALL_KEY = shared_cache.key('warmer', 'live-call')
+MODEL_CALLS_KEY = shared_cache.key('warmer', 'model-calls')
+
+# Documents scanned from the catalog per cycle
+MAX_SCANNED_DOCUMENTS = 5000
+
+# Score added per download of a topic's documents
+DOWNLOAD_WEIGHT = 0.25
+
+# Candidates kept in get_stats()
+REPORTED_CANDIDATES = 10
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def topic_key(topic):
+    """Case- and whitespace-insensitive key of a topic"""
+    return re.sub(r'\s+', ' ', topic).strip().lower()
+
+
+def sections_fingerprint(sections):
+    """Hash of a sections dict (identifies the content a document was built from)"""
+    encoded = json.dumps(sections, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _prerendered_key(topic):
+    """Shared cache key of a pre-rendered document (the file is local to this host)"""
+    return shared_cache.key('prerendered', f"{socket.gethostname()}:{topic_key(topic)}")
+
+
+def _parse_hours(value):
+    """'22-6' -> set of local hours (wraps around midnight); '' -> None"""
+    if not value:
+        return None
+    start, _, end = value.partition('-')
+    start, end = int(start) % 24, int(end or start) % 24
+    if start == end:
+        return set(range(24))
+    return {hour % 24 for hour in range(start, start + (end - start) % 24)}
+
+
+# ============================================
+# TOPIC WARMER CLASS
+# ============================================
+
+class TopicWarmer:
+    """
+    Background warmer for trending topics
+
+    Attributes:
+        enabled (bool): Whether start() launches the warm loop
+        interval_seconds (float): Time between cycles
+        off_peak_hours (set): Local hours in which warming may run (None = any)
+        lock_path (str): Lock file; its holder is the host's warmer
+    """
+
+    def __init__(self, prerender_dir=DEFAULT_PRERENDER_DIR, lock_path=None):
+        self.enabled = os.getenv('WARMER_ENABLED', 'false').lower() == 'true'
+        self.interval_seconds = float(os.getenv('WARMER_INTERVAL_SECONDS', 300))
+        self.off_peak_hours = _parse_hours(os.getenv('WARMER_OFF_PEAK_HOURS', ''))
+        self.max_running = int(os.getenv('WARMER_MAX_RUNNING', 1))
+        self.quiet_seconds = float(os.getenv('WARMER_QUIET_SECONDS', 120))
+        self.max_per_hour = int(os.getenv('WARMER_MAX_PER_HOUR', 20))
+        self.top_topics = int(os.getenv('WARMER_TOP_TOPICS', 30))
+        self.min_requests = int(os.getenv('WARMER_MIN_REQUESTS', 2))
+        self.window_seconds = 86400 * float(os.getenv('WARMER_WINDOW_DAYS', 7))
+        self.half_life_seconds = 3600 * float(os.getenv('WARMER_HALF_LIFE_HOURS', 24))
+        self.max_prerendered = int(os.getenv('WARMER_MAX_PRERENDERED', 100))
+        self.prerender_dir = prerender_dir
+        self.lock_path = lock_path or os.getenv('WARMER_LOCK_PATH', DEFAULT_LOCK_PATH)
+
+        # Documents this process pre-rendered (topic key -> file path), oldest first;
+        # their entries for copy_prerendered() are in the shared cache
+        self._prerendered = OrderedDict()
+        self._model_calls = []  # timestamps within the last hour
+        self._candidates = []
+        self._thread = None
+        self._lock_file = None  # open while this process is the host's warmer
+        self._lock = threading.Lock()
+
+        self._stats = {
+            'cycles': 0,
+            'cycles_skipped_follower': 0,
+            'cycles_skipped_busy': 0,
+            'cycles_skipped_hours': 0,
+            'warmed': 0,
+            'already_cached': 0,
+            'prerendered': 0,
+            'served_prerendered': 0,
+            'errors': 0
+        }
+
+    # ----------------------------------------
+    # Lifecycle
+    # ----------------------------------------
+
+    def start(self, generate_function):
+        """
+        Launch the warm loop (no-op unless WARMER_ENABLED)
+
+        Called in every worker; only the holder of the lock file warms.
+
+        Args:
+            generate_function (callable): topic -> AI result; should run in
+                the scheduler's batch class so live traffic goes first
+
+        Returns:
+            threading.Thread: The warmer thread, or None when disabled
+        """
+        if not self.enabled or self._thread is not None:
+            return None
+
+        self._prune_stale_files()
+
+        self._thread = threading.Thread(
+            target=self._run, args=(generate_function,), name='topic-warmer', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Topic warmer started (every {self.interval_seconds:.0f}s)")
+        return self._thread
+
+    def _run(self, generate_function):
+        while True:
+            time.sleep(self.interval_seconds)
+            try:
+                if self._is_leader():
+                    self.warm_cycle(generate_function)
+                else:
+                    with self._lock:
+                        self._stats['cycles_skipped_follower'] += 1
+            except Exception as e:
+                logger.warning(f"Topic warmer cycle failed: {str(e)}")
+
+    def _is_leader(self):
+        """
+        Hold (or try to take) the host's warmer lock
+
+        The lock stays held until the process exits, when the kernel
+        releases it for the next worker.
+
+        Returns:
+            bool: True if this process is the host's warmer
+        """
+        if self._lock_file is not None or fcntl is None:
+            return True
+
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        # Calls made by the previous warmer count against this hour's budget
+        with self._lock:
+            self._model_calls = shared_cache.get(MODEL_CALLS_KEY, record_stats=False) or []
+        logger.info(f"Topic warmer: this worker (pid {os.getpid()}) is the host's warmer")
+        return True
+
+    def note_live_call(self):
+        """
+        Record a live (non-warming) model call for every worker's warmer
+
+        Called when a live generation starts and when it ends; the warmer
+        stays off for WARMER_QUIET_SECONDS after the last note.
+        """
+        if self.enabled:
+            shared_cache.set(LIVE_CALL_KEY, time.time(), ttl=self.quiet_seconds)
+
+    # ----------------------------------------
+    # Warming
+    # ----------------------------------------
+
+    def rank_topics(self, now=None):
+        """
+        Rank recent topics by frequency and recency
+
+        Args:
+            now (float): Reference time (default: now)
+
+        Returns:
+            list: Dicts with topic, score and requests, best first
+        """
+        now = now or time.time()
+        ranked = {}
+
+        for topic, created_at, downloads in document_catalog.recent_topics(
+                now - self.window_seconds, MAX_SCANNED_DOCUMENTS):
+            entry = ranked.get(topic_key(topic))
+            if entry is None:
+                # Rows are newest first, so this is the latest spelling
+                entry = ranked[topic_key(topic)] = {'topic': topic, 'score': 0.0, 'requests': 0}
+            entry['requests'] += 1
+            entry['score'] += 0.5 ** ((now - created_at) / self.half_life_seconds)
+            entry['score'] += DOWNLOAD_WEIGHT * downloads
+
+        candidates = [entry for entry in ranked.values() if entry['requests'] >= self.min_requests]
+        candidates.sort(key=lambda entry: entry['score'], reverse=True)
+        return candidates[:self.top_topics]
+
+    def warm_cycle(self, generate_function):
+        """
+        Warm the best uncached topics while capacity is idle
+
+        Args:
+            generate_function (callable): topic -> AI result
+
+        Returns:
+            int: Topics generated in this cycle
+        """
+        with self._lock:
+            self._stats['cycles'] += 1
+
+        if self.off_peak_hours is not None and time.localtime().tm_hour not in self.off_peak_hours:
+            with self._lock:
+                self._stats['cycles_skipped_hours'] += 1
+            return 0
+
+        candidates = self.rank_topics()
+        with self._lock:
+            self._candidates = [
+                {'topic': entry['topic'], 'score': round(entry['score'], 3), 'requests': entry['requests']}
+                for entry in candidates[:REPORTED_CANDIDATES]
+            ]
+
+        warmed = 0
+        for entry in candidates:
+            topic = entry['topic']
+
+            # Re-check before every topic: live traffic may have started
+            if not self._has_idle_capacity():
+                with self._lock:
+                    self._stats['cycles_skipped_busy'] += 1
+                break
+
+            cached_result, generated = warm_topic(topic, self._counted(generate_function))
+            if not cached_result.get('success'):
+                with self._lock:
+                    self._stats['errors'] += 1
+                continue
+
+            if generated:
+                warmed += 1
+                with self._lock:
+                    self._stats['warmed'] += 1
+                logger.info(f"Warmed trending topic: {topic} (score {entry['score']:.2f})")
+            else:
+                with self._lock:
+                    self._stats['already_cached'] += 1
+
+            if topic_key(topic) not in self._prerendered:
+                self._prerender(topic, cached_result)
+
+        return warmed
+
+    def _counted(self, generate_function):
+        """Wrap the generate function to charge its calls to the hourly budget"""
+        def generate(topic):
+            with self._lock:
+                self._model_calls.append(time.time())
+                model_calls = list(self._model_calls)
+            shared_cache.set(MODEL_CALLS_KEY, model_calls, ttl=3600)
+            return generate_function(topic)
+
+        return generate
+
+    def _has_idle_capacity(self):
+        """True if the host is quiet, the provider healthy and the hourly budget has room"""
+        if ai_circuit.state != 'closed':
+            return False
+
+        load = generation_scheduler.load_snapshot()
+        if load['queued'] or load['running'] > self.max_running:
+            return False
+
+        # Other workers' schedulers are not visible here: their live calls are
+        if shared_cache.get(LIVE_CALL_KEY, record_stats=False) is not None:
+            return False
+
+        cutoff = time.time() - 3600
+        with self._lock:
+            self._model_calls = [timestamp for timestamp in self._model_calls if timestamp > cutoff]
+            return len(self._model_calls) < self.max_per_hour
+
+    # ----------------------------------------
+    # Pre-rendered documents
+    # ----------------------------------------
+
+    def _prerender(self, topic, result):
+        """Build the DOCX for a warmed topic and keep it for copying"""
+        sections = {key: value for key, value in result.get('content', {}).items() if key != 'full_text'}
+        if not sections:
+            return
+
+        profile = normalize_profile(None)
+        doc_result = document_builder.create_blackbook(title=topic, sections_dict=sections, compression=profile)
+        if not doc_result.get('success'):
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+
+        os.makedirs(self.prerender_dir, exist_ok=True)
+        filepath = os.path.join(self.prerender_dir, doc_result['filename'])
+        os.replace(doc_result['filepath'], filepath)
+
+        shared_cache.set(_prerendered_key(topic), {
+            'filepath': filepath,
+            'fingerprint': sections_fingerprint(sections),
+            'profile': profile,
+            'sections_count': doc_result['sections_count']
+        }, ttl=self.window_seconds)
+
+        evicted = []
+        with self._lock:
+            self._prerendered[topic_key(topic)] = (topic, filepath)
+            self._stats['prerendered'] += 1
+            while len(self._prerendered) > self.max_prerendered:
+                evicted.append(self._prerendered.popitem(last=False)[1])
+
+        for evicted_topic, path in evicted:
+            shared_cache.delete(_prerendered_key(evicted_topic))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def copy_prerendered(self, topic, sections, compression=None, output_dir='outputs'):
+        """
+        Get a private copy of a pre-rendered document
+
+        Only used when the document was built from exactly these sections
+        for this topic with the same compression profile. Works in every
+        worker: the host's warmer publishes its documents in the shared cache.
+
+        Args:
+            topic (str): Requested topic (the document title)
+            sections (dict): Sections the response is built from
+            compression (str): Requested compression profile
+            output_dir (str): Directory for the copy
+
+        Returns:
+            dict: create_blackbook()-style result, or None if nothing matches
+        """
+        if not self.enabled:
+            return None
+
+        entry = shared_cache.get(_prerendered_key(topic), record_stats=False)
+        if entry is None or entry['profile'] != normalize_profile(compression):
+            return None
+        if entry['fingerprint'] != sections_fingerprint(sections):
+            return None
+
+        # Each request gets its own file ID, so section edits stay private
+        prefix = os.path.basename(entry['filepath']).rsplit('_', 1)[0]
+        filename = f"{prefix}_{uuid.uuid4().hex[:8]}.docx"
+        filepath = os.path.join(output_dir, filename)
+        start_time = time.perf_counter()
+        try:
+            shutil.copyfile(entry['filepath'], filepath)
+        except OSError as e:
+            # Evicted by the warmer in the meantime
+            logger.warning(f"Could not copy pre-rendered document: {str(e)}")
+            return None
+
+        with self._lock:
+            self._stats['served_prerendered'] += 1
+
+        return {
+            'success': True,
+            'filepath': filepath,
+            'filename': filename,
+            'title': topic,
+            'sections_count': entry['sections_count'],
+            'file_size': os.path.getsize(filepath),
+            'compression': compression_report(filepath, entry['profile'], (time.perf_counter() - start_time) * 1000),
+            'prerendered': True
+        }
+
+    def _prune_stale_files(self):
+        """Delete pre-rendered files left behind by processes that are gone"""
+        cutoff = time.time() - self.window_seconds
+        try:
+            with os.scandir(self.prerender_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.docx') and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    # ----------------------------------------
+    # Statistics
+    # ----------------------------------------
+
+    def get_stats(self):
+        """
+        Get warmer statistics
+
+        Returns:
+            dict: Counters, whether this worker is the host's warmer, its
+                pre-rendered document count, model calls in the last hour
+                and the current top candidates
+        """
+        cutoff = time.time() - 3600
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'enabled': self.enabled,
+                'leader': self._lock_file is not None,
+                'prerendered_documents': len(self._prerendered),
+                'model_calls_last_hour': sum(1 for timestamp in self._model_calls if timestamp > cutoff),
+                'max_per_hour': self.max_per_hour,
+                'top_candidates': list(self._candidates)
+            })
+        return stats
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+topic_warmer = TopicWarmer()
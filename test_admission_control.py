@@ -0,0 +1,115 @@
+"""
+Test script for admission control
+Saturated scheduler, per-class estimates, breaker signal and requests
+answered without a model call
+"""
+
+import time
+
+from services.admission_control import AdmissionController
+from services.circuit_breaker import CircuitBreaker
+from services.generation_scheduler import GenerationScheduler
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def saturated_scheduler(started_seconds_ago):
+    """Four busy slots, 30 s service time, calls started the given seconds ago"""
+    scheduler = GenerationScheduler(max_concurrent=4, interactive_reserved=1,
+                                    slo_seconds={'interactive': 10, 'batch': 300}, client_weights={})
+    scheduler._service_time = 30.0
+    scheduler._service_measured = True
+    for _ in range(4):
+        scheduler.acquire('a', 'interactive')
+    now = time.monotonic()
+    scheduler._started_at = [now - seconds for seconds in started_seconds_ago]
+    return scheduler
+
+
+print("\n" + "="*60)
+print("🧪 Testing Admission Control")
+print("="*60 + "\n")
+
+# ============================================
+# SATURATION
+# ============================================
+
+print("1️⃣ Saturated scheduler...")
+scheduler = saturated_scheduler([25, 20, 15, 10])
+controller = AdmissionController(scheduler=scheduler, max_in_flight=32, max_queue=64, max_queue_seconds=20)
+decision = controller.try_admit('interactive')
+check("interactive admitted: the next slot frees in about 5 s", decision.admitted)
+
+decision = controller.try_admit('batch')
+check("batch admitted: its own estimate (about 10 s) is within the limit", decision.admitted)
+
+controller = AdmissionController(scheduler=scheduler, max_in_flight=32, max_queue=64, max_queue_seconds=8)
+check("8 s limit: interactive still admitted", controller.try_admit('interactive').admitted)
+decision = controller.try_admit('batch')
+check("8 s limit: batch shed on its own estimate", not decision.admitted and decision.reason == 'queue_latency')
+
+scheduler = saturated_scheduler([1, 1, 1, 1])
+controller = AdmissionController(scheduler=scheduler, max_in_flight=32, max_queue=64, max_queue_seconds=20)
+decision = controller.try_admit('interactive')
+check(f"shed when the next slot is far away (reason {decision.reason}, Retry-After {decision.retry_after}s)",
+      not decision.admitted and decision.reason == 'queue_latency' and decision.retry_after >= 1)
+
+decision = controller.try_admit('interactive', without_model=lambda: True)
+check("cache hit / replay let through anyway", decision.admitted and decision.reason == 'without_model')
+controller.release()
+
+asked = []
+controller = AdmissionController(scheduler=GenerationScheduler(max_concurrent=4, client_weights={}),
+                                 max_in_flight=32, max_queue=64, max_queue_seconds=20)
+decision = controller.try_admit('interactive', without_model=lambda: asked.append(1) or True)
+check("idle server: cache check never asked", decision.admitted and not asked)
+controller.release()
+print()
+
+print("2️⃣ In-flight limit...")
+controller = AdmissionController(max_in_flight=2, max_queue=64, max_queue_seconds=20)
+decisions = [controller.try_admit() for _ in range(3)]
+check("third request shed", [d.admitted for d in decisions] == [True, True, False]
+      and decisions[2].reason == 'in_flight')
+check("cached request still admitted", controller.try_admit(without_model=lambda: True).admitted)
+for _ in range(3):
+    controller.release()
+check("slots released", controller.get_stats()['in_flight'] == 0)
+print()
+
+# ============================================
+# BREAKER SIGNAL
+# ============================================
+
+print("3️⃣ Circuit breaker signal...")
+breaker = CircuitBreaker('test', enabled=True)
+breaker.min_calls = 2
+breaker.open_seconds = 5
+controller = AdmissionController(max_in_flight=32, max_queue=64, max_queue_seconds=20)
+controller.add_signal('ai_unavailable', breaker.open_retry_after)
+check("closed breaker: admitted", controller.try_admit().admitted)
+
+for _ in range(2):
+    breaker.call(lambda: {'success': False, 'error': 'provider down', 'error_code': 'AI_UNAVAILABLE'})
+decision = controller.try_admit()
+check(f"open breaker: shed (reason {decision.reason}, Retry-After {decision.retry_after}s)",
+      not decision.admitted and decision.reason == 'ai_unavailable' and 1 <= decision.retry_after <= 5)
+
+stats = controller.get_stats()
+check("shed counted by reason", stats['shed_by_reason'].get('ai_unavailable') == 1)
+print()
+
+print("="*60)
+print("✅ All admission control tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,111 @@
+"""
+Test script for the bulk ZIP export
+Documents located through the catalog and the file index, and files that
+are replaced or removed while the archive is being streamed
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['JOB_JOURNAL_PATH'] = os.path.join(TEMP_DIR, 'jobs.sqlite3')
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+os.environ['SHARED_CACHE_PATH'] = os.path.join(TEMP_DIR, 'shared.sqlite3')
+
+from services.bulk_export import MANIFEST_NAME, find_documents, stream_zip
+from services.document_catalog import document_catalog
+from services.file_server import FileIndex, file_server
+
+file_server.index = FileIndex(root=TEMP_DIR)
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def write_document(filename, data):
+    """A document file in TEMP_DIR"""
+    filepath = os.path.join(TEMP_DIR, filename)
+    with open(filepath, 'wb') as handle:
+        handle.write(data)
+    return filepath
+
+
+def read_archive(chunks):
+    """{name: bytes} of a streamed ZIP (fails on a truncated archive)"""
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        check("archive is complete and CRCs match", archive.testzip() is None)
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+print("\n" + "="*60)
+print("🧪 Testing Bulk Export")
+print("="*60 + "\n")
+
+# ============================================
+# LOOKUP
+# ============================================
+
+print("1️⃣ Finding documents...")
+write_document('Renamed_by_hand.docx', b'cataloged')
+document_catalog.record('cat00001', title='Cataloged', topic='Cataloged', filename='Renamed_by_hand.docx',
+                        file_size=9, sections=['abstract'], compression='default')
+write_document('Old_Topic_old00001.docx', b'uncataloged')
+found, missing = find_documents(['cat00001', 'old00001', 'none0001', 'cat00001'])
+check("cataloged filename used as is",
+      found[0] == ('Renamed_by_hand.docx', os.path.join(TEMP_DIR, 'Renamed_by_hand.docx')))
+check("uncataloged document found by the index", [name for name, _ in found[1:]] == ['Old_Topic_old00001.docx'])
+check("unknown ID reported once, duplicates ignored", missing == ['none0001'])
+
+scans = file_server.index.get_stats()['id_scans']
+find_documents(['cat00001', 'none0001'])
+check("no directory scan for cataloged or recently missing IDs",
+      file_server.index.get_stats()['id_scans'] == scans)
+print()
+
+# ============================================
+# STREAMING
+# ============================================
+
+print("2️⃣ Files that change after the export started...")
+documents = [
+    ('A.docx', write_document('A.docx', b'a' * 200_000)),
+    ('B.docx', write_document('B.docx', b'b' * 1000)),
+    ('C.docx', write_document('C.docx', b'c' * 1000)),
+]
+stream = stream_zip(documents, chunk_size=4096)
+first = next(stream)
+os.replace(write_document('new.docx', b'replacement'), documents[0][1])
+os.remove(documents[1][1])
+contents = read_archive([first, *stream])
+check("replaced file streamed as it was when opened", contents['A.docx'] == b'a' * 200_000)
+check("deleted file still complete", contents['B.docx'] == b'b' * 1000)
+check("no manifest when nothing vanished", MANIFEST_NAME not in contents)
+print()
+
+print("3️⃣ Files that vanished before...")
+stream = stream_zip(documents)
+os.remove(documents[2][1])
+contents = read_archive(stream)
+check("remaining documents exported", contents['A.docx'] == b'replacement' and 'C.docx' in contents)
+check("vanished document named in the manifest",
+      'B.docx' not in contents and contents[MANIFEST_NAME].decode().splitlines()[1:] == ['B.docx'])
+print()
+
+shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+print("="*60)
+print("✅ All bulk export tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,240 @@
+"""
+Test script for the AI circuit breaker
+State transitions and the cached responses served while it is open
+"""
+
+import os
+import tempfile
+import time
+
+os.environ['SHARED_CACHE_BACKEND'] = 'sqlite'
+os.environ['SHARED_CACHE_GENERATIONS'] = 'true'
+os.environ['SHARED_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'shared.sqlite3')
+os.environ['SEMANTIC_CACHE_ENABLED'] = 'false'
+
+from services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ai_circuit, is_provider_error
+)
+from services.generation_plan import generate_for_plan, resolve_plan
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def make_breaker():
+    """Breaker with short periods for the tests"""
+    breaker = CircuitBreaker('test', enabled=True)
+    breaker.min_calls = 4
+    breaker.failure_rate = 0.5
+    breaker.slow_call_seconds = 0.05
+    breaker.slow_call_rate = 0.75
+    breaker.open_seconds = 0.2
+    breaker._current_open_seconds = 0.2
+    breaker.max_open_seconds = 0.3
+    breaker.half_open_probes = 2
+    return breaker
+
+
+def succeed():
+    return {'success': True}
+
+
+def fail():
+    return {'success': False, 'error': 'quota exceeded', 'error_code': 'AI_RATE_LIMITED'}
+
+
+class ServiceUnavailable(Exception):
+    """Named like google.api_core's 503 error"""
+
+
+class APIError(Exception):
+    """API error that only carries its HTTP status"""
+
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class Client:
+    """Gemini client stand-in: model errors become failed results"""
+
+    def __init__(self):
+        self.model = type('Model', (), {})()
+        self.model.generate_content = self._reply
+        self.error = None
+
+    def _reply(self, prompt):
+        if self.error is not None:
+            raise self.error
+        return prompt
+
+    def generate_academic_content(self, topic):
+        try:
+            self.model.generate_content(topic)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+        return {'success': True}
+
+
+def raising(error):
+    """Provider call that raises error"""
+    def call():
+        raise error
+    return call
+
+
+def counted_as_failure(function):
+    """True if a closed breaker records the call as a failure"""
+    breaker = make_breaker()
+    try:
+        breaker.call(function)
+    except Exception:
+        pass
+    return breaker.get_stats()['failures'] == 1
+
+
+def raises_open(breaker, function):
+    try:
+        breaker.call(function)
+        return False
+    except CircuitOpenError:
+        return True
+
+
+print("\n" + "="*60)
+print("🧪 Testing Circuit Breaker")
+print("="*60 + "\n")
+
+# ============================================
+# STATE TRANSITIONS
+# ============================================
+
+print("1️⃣ Closed -> open...")
+breaker = make_breaker()
+for function in (succeed, fail, succeed):
+    breaker.call(function)
+check("below min_calls: stays closed", breaker.state == CLOSED)
+breaker.call(fail)
+check("2 of 4 calls failed: opens", breaker.state == OPEN)
+check("open: fails fast without calling the provider", raises_open(breaker, succeed))
+check("open: retry-after reported", breaker.open_retry_after() >= 1)
+
+breaker = make_breaker()
+for _ in range(4):
+    breaker.call(lambda: time.sleep(0.06) or {'success': True})
+check("slow calls alone open it", breaker.state == OPEN)
+print()
+
+print("2️⃣ Open -> half-open -> closed...")
+time.sleep(0.25)
+check("after the open period: half-open", breaker.state == HALF_OPEN)
+check("no retry-after while half-open", breaker.open_retry_after() == 0)
+breaker.call(succeed)
+check("one good probe is not enough", breaker.state == HALF_OPEN)
+breaker.call(succeed)
+check("two good probes close it", breaker.state == CLOSED)
+print()
+
+print("3️⃣ Half-open -> open again...")
+breaker = make_breaker()
+for _ in range(4):
+    breaker.call(fail)
+time.sleep(0.25)
+check("half-open", breaker.state == HALF_OPEN)
+breaker.call(fail)
+check("failed probe reopens it", breaker.state == OPEN)
+check("open period doubled, capped at max_open_seconds", breaker._current_open_seconds == 0.3)
+
+breaker = make_breaker()
+breaker.half_open_probes = 1
+for _ in range(4):
+    breaker.call(fail)
+time.sleep(0.25)
+probe_results = []
+breaker.call(lambda: probe_results.append(raises_open(breaker, succeed)) or {'success': True})
+check("while the probe runs, other calls fail fast", probe_results == [True])
+check("the probe's success closes it", breaker.state == CLOSED)
+print()
+
+print("4️⃣ Which failures count...")
+check("transport and 5xx / 429 errors are provider errors",
+      all(is_provider_error(error) for error in (ConnectionResetError(), TimeoutError(), ServiceUnavailable(),
+                                                 APIError(503), APIError(429))))
+check("other errors are not", not any(is_provider_error(error) for error in (ValueError(), KeyError(), APIError(400))))
+check("raised provider error counts", counted_as_failure(raising(ConnectionResetError())))
+check("raised parsing error does not", not counted_as_failure(raising(KeyError('abstract'))))
+check("failed result with a provider error_code counts", counted_as_failure(fail))
+check("failed result without one does not",
+      not counted_as_failure(lambda: {'success': False, 'error': 'Could not parse the response'}))
+
+client = Client()
+breaker = make_breaker()
+check("watch() wraps the model once", breaker.watch(client.model) and not breaker.watch(client.model))
+client.error = ServiceUnavailable("503 overloaded")
+breaker.call(client.generate_academic_content, 'topic')
+check("provider error caught by the client still counts", breaker.get_stats()['failures'] == 1
+      and breaker.get_stats()['last_error'] == "503 overloaded")
+client.error = ValueError("response blocked by safety filters")
+breaker.call(client.generate_academic_content, 'topic')
+client.error = None
+breaker.call(client.generate_academic_content, 'topic')
+check("blocked prompt does not, and the noted error is not carried over", breaker.get_stats()['failures'] == 1)
+print()
+
+print("5️⃣ Disabled breaker...")
+breaker = CircuitBreaker('test', enabled=False)
+for _ in range(10):
+    breaker.call(fail)
+check("never opens", breaker.state == CLOSED and breaker.open_retry_after() == 0)
+print()
+
+# ============================================
+# DEGRADED RESPONSES
+# ============================================
+
+print("6️⃣ Cached responses while open...")
+sections = {key: f"{key} text" for key in
+            ('abstract', 'introduction', 'literature_review', 'methodology', 'results', 'conclusion')}
+plan = resolve_plan()
+generate_for_plan('Renewable Energy Adoption in Maharashtra', plan,
+                  lambda topic: {'success': True, 'topic': topic, 'content': dict(sections), 'metadata': {}})
+
+ai_circuit.enabled = True
+ai_circuit._open(time.monotonic(), 30)
+
+
+def generate(topic):
+    return ai_circuit.call(lambda: {'success': True, 'content': dict(sections)})
+
+
+result = generate_for_plan('renewable energy  adoption in MAHARASHTRA', plan, generate)
+check("same topic (normalized): shared cache hit, no model call needed",
+      result['success'] and result['metadata']['shared_cache']['hit'])
+
+try:
+    generate_for_plan('Renewable Energy Adoption in Gujarat', plan, generate)
+    check("different topic is not served", False)
+except CircuitOpenError:
+    check("different topic is not served (503 instead)", True)
+
+result = generate_for_plan('Renewable Energy Adoption in Maharashtra', resolve_plan(sections=['abstract']), generate)
+check("standard-length subset answered from the cached full blackbook",
+      list(result['content']) == ['abstract', 'full_text'] and 'degraded' not in result['metadata'])
+result = generate_for_plan('Renewable Energy Adoption in Maharashtra', resolve_plan(length='short'), generate)
+check("other lengths served from it while open, marked degraded",
+      result['success'] and result['metadata']['degraded']['similarity'] == 1.0)
+print()
+
+print("="*60)
+print("✅ All circuit breaker tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,193 @@
+"""
+Test script for the document catalog
+Keyset pagination across runs of equal sort values, full-text queries
+with FTS5 syntax in them, and the startup backfill running next to live
+requests and other workers
+"""
+
+import os
+import tempfile
+import threading
+
+from services.document_catalog import CatalogQueryError, DocumentCatalog
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def make_catalog():
+    """Empty catalog in its own directory"""
+    return DocumentCatalog(path=os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3'))
+
+
+def all_pages(catalog, limit, **options):
+    """File IDs of every page in order, and the number of pages"""
+    file_ids, pages, cursor = [], 0, None
+    while True:
+        page = catalog.search(limit=limit, cursor=cursor, **options)
+        file_ids.extend(document['file_id'] for document in page['documents'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return file_ids, pages
+
+
+def found(catalog, query):
+    """File IDs matching a query (None if the query raised)"""
+    try:
+        return {document['file_id'] for document in catalog.search(query=query, limit=100)['documents']}
+    except Exception:
+        return None
+
+
+def query_error(catalog, **options):
+    """True if search() rejects the options with CatalogQueryError"""
+    try:
+        catalog.search(**options)
+    except CatalogQueryError:
+        return True
+    return False
+
+
+print("\n" + "="*60)
+print("🧪 Testing Document Catalog")
+print("="*60 + "\n")
+
+# ============================================
+# KEYSET PAGINATION
+# ============================================
+
+print("1️⃣ Pages across equal created_at values...")
+catalog = make_catalog()
+# Runs of 3 documents per timestamp, so page ends fall inside a run
+for index in range(12):
+    catalog.record(f"doc{index:05d}", title=f"Document {index}", created_at=1_700_000_000 + index // 3)
+
+for limit in (1, 2, 3, 4, 5, 12):
+    file_ids, pages = all_pages(catalog, limit)
+    check(f"page size {limit}: every document exactly once in {pages} page(s)",
+          sorted(file_ids) == [f"doc{index:05d}" for index in range(12)] and len(file_ids) == 12
+          and pages == -(-12 // limit))
+
+newest, _ = all_pages(catalog, 2)
+oldest, _ = all_pages(catalog, 2, sort='oldest')
+check("oldest is exactly newest reversed (ties broken by row ID)", oldest == newest[::-1])
+check("ties listed newest row first", newest[:3] == ['doc00011', 'doc00010', 'doc00009'])
+
+for index in (4, 7):
+    catalog.increment_downloads(f"doc{index:05d}")
+by_downloads, _ = all_pages(catalog, 2, sort='downloads')
+check("downloads: ranked documents, then the rest of the ties in order",
+      by_downloads[:2] == ['doc00007', 'doc00004'] and sorted(by_downloads) == sorted(newest))
+
+page = catalog.search(limit=3, created_after=1_700_000_001, created_before=1_700_000_003)
+check("filters and cursor combine",
+      catalog.search(limit=3, cursor=page['next_cursor'], created_after=1_700_000_001,
+                     created_before=1_700_000_003)['documents'][-1]['file_id'] == 'doc00003')
+print()
+
+print("2️⃣ Invalid cursors...")
+cursor = catalog.search(limit=2)['next_cursor']
+check("cursor from another sort order", query_error(catalog, cursor=cursor, sort='oldest'))
+check("garbage cursor", query_error(catalog, cursor='not-a-cursor!'))
+check("tampered cursor", query_error(catalog, cursor=cursor[:-4]))
+check("unknown sort", query_error(catalog, sort='title'))
+print()
+
+# ============================================
+# FULL-TEXT SEARCH
+# ============================================
+
+print("3️⃣ FTS5 syntax in queries...")
+catalog = make_catalog()
+catalog.record('ml000001', title="Machine Learning in Agriculture", topic="machine learning crops")
+catalog.record('ml000002', title="Deep Learning NOT Machine Learning", topic="neural networks")
+catalog.record('ev000001', title="Electric Vehicles: Adoption in India", topic="EV adoption")
+catalog.record('hi000001', title="सौर ऊर्जा का भविष्य", topic="solar energy")
+
+check("prefix match on every word", found(catalog, "mach learn") == {'ml000001', 'ml000002'})
+check("all words must match", found(catalog, "learning agriculture") == {'ml000001'})
+for query in ('"machine', 'machine OR deep', 'NOT machine', 'title:electric', 'learn*', 'NEAR(machine learning)',
+              '(machine', 'machine -learning', "Vehicles: adoption", "'; DROP TABLE documents; --"):
+    check(f"{query!r} searched as plain words", found(catalog, query) is not None)
+check("operators are words, not syntax", found(catalog, "NOT machine") == {'ml000002'})
+check("no column filter: 'title' is one more word to match",
+      found(catalog, "title:electric") == set() and found(catalog, "electric") == {'ev000001'})
+check("non-Latin scripts", found(catalog, "ऊर्जा") == {'hi000001'})
+check("catalog intact", catalog.count() == 4)
+print()
+
+# ============================================
+# BACKFILL
+# ============================================
+
+print("4️⃣ Backfill thread next to live requests...")
+output_dir = tempfile.mkdtemp()
+for index in range(200):
+    open(os.path.join(output_dir, f"Old_Topic_{index}_old{index:05d}.docx"), 'wb').close()
+for name in ('notes.txt', 'NoUnderscore.docx'):
+    open(os.path.join(output_dir, name), 'wb').close()
+os.mkdir(os.path.join(output_dir, 'previews_x.docx'))
+
+catalog = make_catalog()
+catalog.record('new00000', title="Recorded before the backfill started", filename='New_new00000.docx')
+records = {'old00007': {'title': 'Stored Title', 'topic': 'Stored topic', 'sections': {'abstract': 'x'}}}
+added = []
+backfill = threading.Thread(target=lambda: added.append(catalog.backfill(output_dir, records.get)),
+                            name='catalog-backfill')
+backfill.start()
+for index in range(1, 50):
+    catalog.record(f"new{index:05d}", title=f"Live {index}", created_at=2_000_000_000)
+catalog.record('old00003', title="Edited while the backfill ran", created_at=2_000_000_000)
+backfill.join(30)
+
+check("not skipped because a document was recorded first", added and added[0] >= 199)
+check("old and new documents cataloged", catalog.count() == 250)
+check("live metadata kept", catalog.get('new00001')['title'] == "Live 1"
+      and catalog.get('old00003')['title'] == "Edited while the backfill ran")
+document = catalog.get('old00007')
+check("stored content record used for title, topic and sections",
+      document['title'] == 'Stored Title' and document['topic'] == 'Stored topic'
+      and document['sections'] == ['abstract'])
+check("title from the filename otherwise", catalog.get('old00008')['title'] == 'Old Topic 8')
+check("directories and other files skipped", catalog.get('x') is None and catalog.get('NoUnderscore') is None)
+
+open(os.path.join(output_dir, 'Later_old99999.docx'), 'wb').close()
+check("runs once per database", catalog.backfill(output_dir) == 0 and catalog.get('old99999') is None)
+print()
+
+print("5️⃣ Several workers starting at once...")
+path = os.path.join(tempfile.mkdtemp(), 'catalog.sqlite3')
+workers = [DocumentCatalog(path=path) for _ in range(4)]
+results, errors = [], []
+
+
+def start_worker(catalog):
+    try:
+        results.append(catalog.backfill(output_dir))
+    except Exception as e:
+        errors.append(str(e))
+
+
+threads = [threading.Thread(target=start_worker, args=(catalog,)) for catalog in workers]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join(30)
+check(f"no errors ({errors[:1]})", not errors)
+check("each document added by exactly one worker", sum(results) == 201 and workers[0].count() == 201)
+print()
+
+print("="*60)
+print("✅ All document catalog tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
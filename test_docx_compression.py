@@ -0,0 +1,213 @@
+"""
+Test script for DOCX compression profiles
+Profiles of resumed jobs, python-docx saves, and the archive tier across
+restarts and concurrent section edits
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
+import docx
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['JOB_JOURNAL_PATH'] = os.path.join(TEMP_DIR, 'jobs.sqlite3')
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+os.environ['SHARED_CACHE_PATH'] = os.path.join(TEMP_DIR, 'shared.sqlite3')
+os.environ['CONTENT_STORE_DIR'] = os.path.join(TEMP_DIR, 'content')
+os.environ['DOCX_ARCHIVE_PROFILE'] = 'none'
+
+from services.document_catalog import document_catalog
+from services.docx_compression import ArchiveRecompressor, document_lock, python_docx_compression
+from services.docx_writer import PythonDocxBuilder, fragment_docx_writer
+from services.generation_pipeline import generation_pipeline
+from services.job_journal import job_journal
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def stored_document(title):
+    """A 'stored' document in outputs/, cataloged like /generate does"""
+    result = fragment_docx_writer.create_blackbook(title, dict(SECTIONS), compression='stored')
+    file_id = result['filename'].rsplit('_', 1)[-1].replace('.docx', '')
+    document_catalog.record(file_id, title=title, filename=result['filename'],
+                            file_size=result['file_size'], sections=SECTIONS, compression='stored')
+    return file_id, result['filepath']
+
+
+def document_xml(filepath):
+    with zipfile.ZipFile(filepath) as archive:
+        return archive.read('word/document.xml').decode('utf-8')
+
+
+class SavingGenerator:
+    """DocumentGenerator stand-in that saves a python-docx document"""
+
+    def __init__(self):
+        self.saved_inodes = []
+
+    def create_blackbook(self, title, sections_dict):
+        document = docx.Document()
+        for text in sections_dict.values():
+            document.add_paragraph(text * 40)
+        filepath = os.path.join(TEMP_DIR, f"{title}.docx")
+        document.save(filepath)
+        self.saved_inodes.append(os.stat(filepath).st_ino)
+        return {'success': True, 'filepath': filepath, 'filename': f"{title}.docx",
+                'file_size': os.path.getsize(filepath)}
+
+
+def part_sizes(filepath):
+    """(compress types, compressed bytes of word/document.xml)"""
+    with zipfile.ZipFile(filepath) as archive:
+        return ({item.compress_type for item in archive.infolist()},
+                archive.getinfo('word/document.xml').compress_size)
+
+
+SECTIONS = {
+    'abstract': "This study compares compression levels for generated reports.",
+    'introduction': "Generated documents are usually downloaded once.\n\nSize matters less than CPU.",
+    'conclusion': "Cheap profiles are a good default for fresh documents."
+}
+
+print("\n" + "="*60)
+print("🧪 Testing DOCX Compression")
+print("="*60 + "\n")
+
+# ============================================
+# RESUMED JOBS
+# ============================================
+
+print("1️⃣ Resumed job keeps its profile...")
+job = generation_pipeline.new_job('Compression of Generated Reports', options={'compression': 'stored'})
+# The worker died right after the model call: stage journaled, lease runs out
+job_journal.advance(job['job_id'], 'ai_done', ai_result={'success': True, 'content': dict(SECTIONS), 'metadata': {}})
+with job_journal._connection() as connection:
+    connection.execute("UPDATE jobs SET lease_until = 0 WHERE job_id = ?", (job['job_id'],))
+
+resumed = job_journal.claim(job['job_id'])
+response = generation_pipeline.run(resumed, generate_function=lambda topic: None)
+compression = response['document_info']['compression']
+check(f"written with the requested profile ({compression['profile']})", compression['profile'] == 'stored')
+check("no deflate used (ratio about 1)", compression['ratio'] is not None and compression['ratio'] < 1.2)
+os.remove(os.path.join('outputs', response['filename']))
+print()
+
+# ============================================
+# ARCHIVE TIER
+# ============================================
+
+print("2️⃣ Archive queue survives a restart...")
+file_id, filepath = stored_document('Archive After Restart')
+stored_size = os.path.getsize(filepath)
+# The process that wrote it is gone; a new worker starts
+recompressor = ArchiveRecompressor(profile='max', delay_seconds=0)
+check("pending document found in the catalog", recompressor.resume_pending() == 1)
+check("recompressed", wait_for(lambda: recompressor.get_stats()['archived'] == 1))
+document = document_catalog.get(file_id)
+check(f"catalog updated ({stored_size} -> {document['file_size']} bytes, {document['compression']})",
+      document['compression'] == 'max' and document['file_size'] == os.path.getsize(filepath) < stored_size)
+check("nothing left for the next worker", ArchiveRecompressor(profile='max', delay_seconds=0).resume_pending() == 0)
+os.remove(filepath)
+print()
+
+print("3️⃣ Two workers, one document...")
+file_id, filepath = stored_document('Archive Once')
+workers = [ArchiveRecompressor(profile='max', delay_seconds=0) for _ in range(2)]
+for worker in workers:
+    worker.schedule(file_id, filepath, 'stored')
+check("one archives, the other skips", wait_for(
+    lambda: sorted((w.get_stats()['archived'], w.get_stats()['skipped']) for w in workers) == [(0, 1), (1, 0)]
+))
+os.remove(filepath)
+print()
+
+print("4️⃣ Section edit while the archive tier runs...")
+file_id, filepath = stored_document('Archive During Edit')
+edit_started, release_edit = threading.Event(), threading.Event()
+
+
+def edit():
+    """What the section patcher does: rewrite under the lock, rename over"""
+    with document_lock(filepath):
+        edit_started.set()
+        release_edit.wait(5)
+        edited_path = f"{filepath}.tmp"
+        shutil.copyfile(filepath, edited_path)
+        with zipfile.ZipFile(filepath) as source, zipfile.ZipFile(edited_path, 'w', zipfile.ZIP_STORED) as target:
+            for item in source.infolist():
+                data = source.read(item)
+                if item.filename == 'word/document.xml':
+                    data = data.replace(b'Cheap profiles', b'EDITED profiles')
+                target.writestr(item, data)
+        os.replace(edited_path, filepath)
+
+
+editor = threading.Thread(target=edit)
+editor.start()
+edit_started.wait(5)
+recompressor = ArchiveRecompressor(profile='max', delay_seconds=0)
+recompressor.schedule(file_id, filepath, 'stored')
+time.sleep(0.2)
+check("archive tier waits for the edit", recompressor.get_stats()['archived'] == 0)
+release_edit.set()
+editor.join(5)
+check("then recompresses", wait_for(lambda: recompressor.get_stats()['archived'] == 1))
+check("the edit survived", 'EDITED profiles' in document_xml(filepath))
+with zipfile.ZipFile(filepath) as archive:
+    check("and the file is deflated", all(item.compress_type == zipfile.ZIP_DEFLATED for item in archive.infolist()))
+os.remove(filepath)
+print()
+
+# ============================================
+# PYTHON-DOCX
+# ============================================
+
+print("5️⃣ python-docx saves with the profile...")
+generator = SavingGenerator()
+builder = PythonDocxBuilder(generator, fragment_docx_writer)
+results = {profile: builder.create_blackbook(f"python_docx_{profile}", SECTIONS, compression=profile)
+           for profile in ('stored', 'fast', 'default')}
+sizes = {profile: part_sizes(result['filepath']) for profile, result in results.items()}
+check("stored parts are not deflated", sizes['stored'][0] == {zipfile.ZIP_STORED})
+check("fast and default are deflated at different levels",
+      sizes['fast'][0] == sizes['default'][0] == {zipfile.ZIP_DEFLATED} and sizes['fast'][1] > sizes['default'][1])
+check("written once (the saved file is the result)",
+      [os.stat(result['filepath']).st_ino for result in results.values()] == generator.saved_inodes)
+check("profile reported", [result['compression']['profile'] for result in results.values()]
+      == ['stored', 'fast', 'default'])
+
+other_thread = []
+saver = threading.Thread(target=lambda: other_thread.append(generator.create_blackbook('other_thread', SECTIONS)))
+with python_docx_compression('stored'):
+    saver.start()
+    saver.join(5)
+check("other threads keep the default", part_sizes(other_thread[0]['filepath'])[0] == {zipfile.ZIP_DEFLATED})
+generator.create_blackbook('after', SECTIONS)
+check("default again after the block", part_sizes(os.path.join(TEMP_DIR, 'after.docx'))[0] == {zipfile.ZIP_DEFLATED})
+print()
+
+print("="*60)
+print("✅ All DOCX compression tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,228 @@
+"""
+Test script for the fragment writer's layout
+Rebuilds every DocumentGenerator document in outputs/ with the fragment
+writer and compares the effective formatting of each paragraph (styles
+resolved), the footer and the page setup; also a section spliced into a
+DocumentGenerator document by the section patcher
+"""
+
+import glob
+import io
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+os.environ['CONTENT_STORE_DIR'] = os.path.join(TEMP_DIR, 'content')
+
+import docx
+from lxml import etree
+
+from services.content_store import content_store
+from services.docx_writer import build_package
+from services.section_patcher import SectionPatcher
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+TOC_HEADING = 'Table of Contents'
+
+
+def w(tag):
+    return f'{{{W_NAMESPACE}}}{tag}'
+
+
+# ============================================
+# EFFECTIVE FORMATTING
+# ============================================
+
+def style_chain(styles, style_id):
+    """The style and the styles it is based on, nearest first"""
+    chain = []
+    while style_id:
+        style = styles.find(f'{w("style")}[@{w("styleId")}="{style_id}"]')
+        if style is None:
+            break
+        chain.append(style)
+        based_on = style.find(w('basedOn'))
+        style_id = based_on.get(w('val')) if based_on is not None else None
+    return chain
+
+
+def resolve(sources, tag, attribute=None):
+    """First value of tag (or a toggle's state) in sources, nearest first"""
+    for source in sources:
+        element = source.find(w(tag)) if source is not None else None
+        if element is None:
+            continue
+        if attribute is None:
+            return element.get(w('val'), 'true') not in ('0', 'false')
+        if element.get(w(attribute)) is not None:
+            return element.get(w(attribute))
+    return None
+
+
+def paragraph_layout(styles, paragraph):
+    """Effective formatting of a paragraph and its first text run"""
+    properties = paragraph.find(w('pPr'))
+    style = properties.find(w('pStyle')) if properties is not None else None
+    chain = style_chain(styles, style.get(w('val')) if style is not None else 'Normal')
+    defaults = styles.find(w('docDefaults'))
+    paragraph_sources = [properties] + [s.find(w('pPr')) for s in chain] + [defaults.find(f'{w("pPrDefault")}/{w("pPr")}')]
+
+    texts = []
+    for element in paragraph.iter(w('t'), w('tab')):
+        texts.append('\t' if element.tag == w('tab') else element.text or '')
+    # DocumentGenerator writes TOC leaders as dots, the fragment writer as a dotted tab
+    text = re.sub(r' \.{5,} ', '\t', ''.join(texts)).strip()
+
+    layout = {
+        'text': text,
+        'page_break': any(br.get(w('type')) == 'page' for br in paragraph.iter(w('br'))),
+        'align': resolve(paragraph_sources, 'jc', 'val') or 'left',
+        'before': int(resolve(paragraph_sources, 'spacing', 'before') or 0),
+        'after': int(resolve(paragraph_sources, 'spacing', 'after') or 0),
+        'line': int(resolve(paragraph_sources, 'spacing', 'line') or 240),
+        'keep_next': bool(resolve(paragraph_sources, 'keepNext')),
+        'indent': int(resolve(paragraph_sources, 'ind', 'left') or 0),
+    }
+    run = next((r for r in paragraph.iter(w('r')) if r.find(w('t')) is not None), None)
+    if text and run is not None:
+        run_sources = [run.find(w('rPr'))] + [s.find(w('rPr')) for s in chain] + [defaults.find(f'{w("rPrDefault")}/{w("rPr")}')]
+        layout.update({
+            'bold': bool(resolve(run_sources, 'b')),
+            'size': int(resolve(run_sources, 'sz', 'val') or 20),
+            'font': resolve(run_sources, 'rFonts', 'ascii'),
+            'color': (resolve(run_sources, 'color', 'val') or '000000').replace('auto', '000000'),
+        })
+    return layout
+
+
+def document_layout(package):
+    """(body paragraphs, footer paragraphs, page setup, footer fields) of a .docx"""
+    with zipfile.ZipFile(package) as archive:
+        styles = etree.fromstring(archive.read('word/styles.xml'))
+        body = etree.fromstring(archive.read('word/document.xml')).find(w('body'))
+        footer = etree.fromstring(archive.read('word/footer1.xml'))
+    section = body.find(w('sectPr'))
+    return (
+        [paragraph_layout(styles, p) for p in body if p.tag == w('p')],
+        [paragraph_layout(styles, p) for p in footer.iter(w('p'))],
+        (dict(section.find(w('pgSz')).attrib), dict(section.find(w('pgMar')).attrib)),
+        ''.join(instruction.text for instruction in footer.iter(w('instrText'))).strip(),
+    )
+
+
+def document_content(path):
+    """Title, creation time and sections of a DocumentGenerator document"""
+    paragraphs = docx.Document(path).paragraphs
+    texts = [p.text for p in paragraphs if p.text.strip()]
+    sections, current = {}, None
+    for p in paragraphs:
+        if p.style.style_id == 'Heading1' and p.text != TOC_HEADING:
+            current = p.text.lower().replace(' ', '_')
+            sections[current] = []
+        elif current and p.text.strip():
+            sections[current].append(p.text)
+    created_at = datetime.strptime(texts[2], '%B %d, %Y').timestamp()
+    return texts[0], created_at, {key: '\n\n'.join(texts) for key, texts in sections.items()}
+
+
+def first_difference(expected, actual):
+    """Index and both values of the first differing paragraph (None if equal)"""
+    for index, (left, right) in enumerate(zip(expected, actual)):
+        if left != right:
+            return index, left, right
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual)), len(expected), len(actual)
+    return None
+
+
+print("\n" + "="*60)
+print("🧪 Testing Fragment Writer Layout")
+print("="*60 + "\n")
+
+# ============================================
+# COMPARISON WITH DOCUMENTGENERATOR
+# ============================================
+
+# Documents from before the TOC and footer were added are not references
+references = [
+    path for path in sorted(glob.glob('outputs/*.docx'))
+    if any(p.text == TOC_HEADING for p in docx.Document(path).paragraphs)
+]
+
+print("1️⃣ Reference documents...")
+check(f"{len(references)} DocumentGenerator documents with a TOC in outputs/", len(references) >= 5)
+print()
+
+print("2️⃣ Paragraph by paragraph...")
+for path in references:
+    title, created_at, sections = document_content(path)
+    package = io.BytesIO()
+    build_package(title, sections, created_at=created_at, output=package)
+    package.seek(0)
+
+    body, footer, page, fields = document_layout(package)
+    expected_body, expected_footer, expected_page, expected_fields = document_layout(path)
+    difference = first_difference(expected_body, body)
+    if difference:
+        print(f"      paragraph {difference[0]}:\n      expected {difference[1]}\n      actual   {difference[2]}")
+    name = path.split('/')[-1]
+    check(f"{name}: {len(body)} paragraphs (title page, TOC, {len(sections)} sections)", difference is None)
+    check(f"{name}: footer and page setup", footer == expected_footer and page == expected_page
+          and fields == expected_fields == 'PAGE')
+print()
+
+print("3️⃣ Styles...")
+with zipfile.ZipFile(package) as archive:
+    styles = etree.fromstring(archive.read('word/styles.xml'))
+    document = archive.read('word/document.xml').decode('utf-8')
+heading = style_chain(styles, 'Heading1')[0].find(w('pPr'))
+check("Heading 1 keeps with next and keeps lines together",
+      heading.find(w('keepNext')) is not None and heading.find(w('keepLines')) is not None)
+check("Heading 1 is outline level 0 (feeds the TOC field)",
+      heading.find(w('outlineLvl')).get(w('val')) == '0')
+check("TOC entries sit inside a TOC field", 'TOC \\o "1-1"' in document)
+check("only section headings use Heading 1 (an updated TOC lists no TOC heading)",
+      document.count('<w:pStyle w:val="Heading1"/>') == len(sections))
+print()
+
+print("4️⃣ Section spliced into a DocumentGenerator document...")
+path = shutil.copy(references[0], TEMP_DIR)
+title, created_at, sections = document_content(path)
+content_store.save('layout01', title, sections, filename=os.path.basename(path), created_at=created_at)
+edited_key = list(sections)[1]
+sections[edited_key] = "An edited section.\n\nWith a second paragraph."
+SectionPatcher(output_dir=TEMP_DIR).patch_section('layout01', edited_key, sections[edited_key])
+
+package = io.BytesIO()
+build_package(title, sections, created_at=created_at, output=package)
+package.seek(0)
+body, footer, page, fields = document_layout(path)
+difference = first_difference(document_layout(package)[0], body)
+if difference:
+    print(f"      paragraph {difference[0]}:\n      expected {difference[1]}\n      actual   {difference[2]}")
+check(f"'{edited_key}' formatted like the rest of the document", difference is None)
+shutil.rmtree(TEMP_DIR, ignore_errors=True)
+print()
+
+print("="*60)
+print("✅ All fragment layout tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,128 @@
+"""
+Test script for generation plans
+Plan resolution, and subset or other-length plans cached per topic and
+plan in the shared tier (shared by every worker process)
+"""
+
+import os
+import tempfile
+
+os.environ['SHARED_CACHE_BACKEND'] = 'sqlite'
+os.environ['SHARED_CACHE_GENERATIONS'] = 'true'
+os.environ['SHARED_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(), 'shared.sqlite3')
+os.environ['SEMANTIC_CACHE_ENABLED'] = 'false'
+
+from services.generation_plan import PlanError, generate_for_plan, is_cached, resolve_plan
+from services.prompt_builder import prompt_builder
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def plan_error(**options):
+    """The PlanError code for request options (None if they resolve)"""
+    try:
+        resolve_plan(**options)
+    except PlanError as error:
+        return error.error_code
+    return None
+
+
+SECTIONS = ('abstract', 'introduction', 'literature_review', 'methodology', 'results', 'conclusion')
+calls = []
+
+
+def generate(topic):
+    """Model stand-in that records the per-request options it was called with"""
+    calls.append((topic, getattr(prompt_builder._local, 'request', None)))
+    return {'success': True, 'topic': topic, 'content': {key: f"{key} of {topic}" for key in SECTIONS},
+            'metadata': {'prompt': {'tokens': 100}}}
+
+
+def failing(topic):
+    calls.append((topic, None))
+    return {'success': False, 'error': 'model error'}
+
+
+print("\n" + "="*60)
+print("🧪 Testing Generation Plans")
+print("="*60 + "\n")
+
+# ============================================
+# RESOLUTION
+# ============================================
+
+print("1️⃣ Resolving plans...")
+plan = resolve_plan(sections='Conclusion, abstract')
+check("document order, whatever the request order", plan.sections == ('abstract', 'conclusion'))
+check("default plan keeps the model's own limit",
+      resolve_plan().is_default and resolve_plan().max_output_tokens is None)
+check("preview is the abstract only", resolve_plan(length='preview').sections == ('abstract',))
+check("unknown length", plan_error(length='huge') == 'INVALID_LENGTH')
+check("unknown section", plan_error(sections=['appendix']) == 'INVALID_SECTIONS')
+check("empty selection", plan_error(sections=[' ']) == 'INVALID_SECTIONS')
+print()
+
+# ============================================
+# SHARED CACHE
+# ============================================
+
+print("2️⃣ Subset plans are cached per topic and plan...")
+topic = "Impact of AI on Education"
+short = resolve_plan(length='short', sections=['abstract', 'conclusion'])
+check("not cached before the first request", not is_cached(topic, short))
+result = generate_for_plan(topic, short, generate)
+check("generated with the plan's instructions and token limit",
+      len(calls) == 1 and calls[0][1]['max_output_tokens'] == short.max_output_tokens
+      and 'Abstract, Conclusion' in calls[0][1]['instructions'])
+check("reduced to the plan", list(result['content']) == ['abstract', 'conclusion', 'full_text'])
+check("cached afterwards", is_cached(topic, short))
+
+result = generate_for_plan("impact of AI  on education", short, generate)
+check("same topic and plan: no second model call", len(calls) == 1)
+check("marked as a shared hit without the other call's prompt stats",
+      result['metadata']['shared_cache']['hit'] and 'prompt' not in result['metadata']
+      and result['topic'] == "impact of AI  on education")
+
+generate_for_plan(topic, resolve_plan(length='long', sections=['abstract', 'conclusion']), generate)
+generate_for_plan(topic, resolve_plan(length='short', sections=['abstract']), generate)
+check("other lengths and sections generated separately", len(calls) == 3)
+
+generate_for_plan(topic, resolve_plan(sections=['results']), generate)
+generate_for_plan(topic, resolve_plan(length='preview'), generate)
+generate_for_plan(topic, resolve_plan(sections=['abstract']), generate)
+check("presets with the same sections and length share an entry", len(calls) == 5)
+print()
+
+print("3️⃣ Full blackbooks...")
+topic = "Blockchain in Healthcare"
+generate_for_plan(topic, resolve_plan(), generate)
+calls.clear()
+plan = resolve_plan(sections=['methodology', 'results'])
+check("standard-length subset counted as cached", is_cached(topic, plan))
+result = generate_for_plan(topic, plan, generate)
+check("and served from the full blackbook",
+      not calls and list(result['content']) == ['methodology', 'results', 'full_text'])
+check("other lengths are not", not is_cached(topic, resolve_plan(length='short')))
+print()
+
+print("4️⃣ Failed generations...")
+plan = resolve_plan(length='short')
+generate_for_plan("Cyber Security in Banking", plan, failing)
+generate_for_plan("Cyber Security in Banking", plan, failing)
+check("not stored", len(calls) == 2 and not is_cached("Cyber Security in Banking", plan))
+print()
+
+print("="*60)
+print("✅ All generation plan tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
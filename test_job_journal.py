@@ -0,0 +1,122 @@
+"""
+Test script for the job journal
+Concurrent requests with the same Idempotency-Key and recovery by
+several workers at once (each worker is a separate process)
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+from services.job_journal import JobJournal
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+JOURNAL_PATH = os.path.join(tempfile.mkdtemp(), 'jobs.sqlite3')
+WORKERS = 6
+
+# Worker processes share the parent's state via fork
+context = multiprocessing.get_context('fork')
+
+
+def create_worker(barrier, results):
+    """One worker handling a request with the shared key"""
+    journal = JobJournal(path=JOURNAL_PATH, enabled=True)
+    barrier.wait()
+    try:
+        job_id = journal.create('Edge Computing in Smart Grids', job_id='retry-key-1')
+        claimed = journal.claim('retry-key-1') if job_id is None else None
+        results.put(('created' if job_id else 'existing', claimed is None))
+    except Exception as e:
+        results.put(('error', str(e)))
+    # The winner stays alive (and owns its lease) until everyone checked
+    barrier.wait()
+
+
+def recovery_worker(barrier, results):
+    """One freshly started worker running startup recovery"""
+    journal = JobJournal(path=JOURNAL_PATH, enabled=True)
+    barrier.wait()
+
+    def run_job(job):
+        results.put(job['job_id'])
+        time.sleep(0.05)
+        journal.advance(job['job_id'], 'completed')
+
+    thread = journal.recover(run_job)
+    thread.join(timeout=30)
+
+
+print("\n" + "="*60)
+print("🧪 Testing Job Journal")
+print("="*60 + "\n")
+
+# ============================================
+# IDEMPOTENCY
+# ============================================
+
+print(f"1️⃣ {WORKERS} concurrent requests with the same new key...")
+barrier, results = context.Barrier(WORKERS), context.Queue()
+processes = [context.Process(target=create_worker, args=(barrier, results)) for _ in range(WORKERS)]
+for process in processes:
+    process.start()
+outcomes = [results.get(timeout=30) for _ in range(WORKERS)]
+for process in processes:
+    process.join(timeout=30)
+
+check(f"no errors ({[o for o in outcomes if o[0] == 'error']})", all(o[0] != 'error' for o in outcomes))
+check("exactly one request created the job", sum(o[0] == 'created' for o in outcomes) == 1)
+check("the others found it owned by a live worker (409)",
+      all(not_claimed for outcome, not_claimed in outcomes if outcome == 'existing'))
+
+journal = JobJournal(path=JOURNAL_PATH, enabled=True)
+check("one job row", journal.get_stats()['jobs'] == {'running': 1})
+job = journal.claim('retry-key-1')
+check("a retry after the owner died resumes it", job is not None and job['attempts'] == 2)
+print()
+
+print("2️⃣ Disabled journal...")
+disabled = JobJournal(path=JOURNAL_PATH, enabled=False)
+check("create() still hands out the key", disabled.create('Topic', job_id='retry-key-1') == 'retry-key-1')
+print()
+
+# ============================================
+# RECOVERY
+# ============================================
+
+print(f"3️⃣ {WORKERS} workers recovering the same orphaned jobs...")
+orphaned = [journal.create(f'Orphaned topic {number}') for number in range(20)]
+with journal._connection() as connection:
+    connection.execute("UPDATE jobs SET lease_until = 0 WHERE status = 'running'")
+
+barrier, results = context.Barrier(WORKERS), context.Queue()
+processes = [context.Process(target=recovery_worker, args=(barrier, results)) for _ in range(WORKERS)]
+for process in processes:
+    process.start()
+for process in processes:
+    process.join(timeout=60)
+
+resumed = []
+while not results.empty():
+    resumed.append(results.get())
+expected = sorted(orphaned + ['retry-key-1'])
+check(f"every orphaned job resumed ({len(set(resumed))} of {len(expected)})", sorted(set(resumed)) == expected)
+check("no job resumed twice", len(resumed) == len(set(resumed)))
+print()
+
+print("="*60)
+print("✅ All job journal tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,201 @@
+"""
+Test script for the preview output formats
+HTML, Markdown and PDF rendered from the same section model as the Word
+document: structure, escaping, the PDF's cross-reference table and TOC
+page numbers, and the on-disk preview cache
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import zlib
+from html.parser import HTMLParser
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+os.environ['CONTENT_STORE_DIR'] = os.path.join(TEMP_DIR, 'content')
+
+from services.content_store import content_store
+from services.output_formats import (
+    OutputFormatCache, normalize_format, render_html, render_markdown, render_pdf
+)
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+class TagCollector(HTMLParser):
+    """Open / close tag balance, element IDs and link targets of a page"""
+
+    VOID_TAGS = {'meta', 'br'}
+
+    def __init__(self):
+        super().__init__()
+        self.stack, self.errors, self.ids, self.links = [], [], set(), []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if 'id' in attrs:
+            self.ids.add(attrs['id'])
+        if tag == 'a' and 'href' in attrs:
+            self.links.append(attrs['href'])
+        if tag not in self.VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack.pop() != tag:
+            self.errors.append(tag)
+
+
+def pdf_pages(data):
+    """Text shown on each page of a PDF from build_pdf(), after checking its xref table"""
+    offsets = [int(offset) for offset in re.findall(rb'(\d{10}) 00000 n', data)]
+    xref_valid = all(
+        data[offset:].startswith(f'{number} 0 obj'.encode()) for number, offset in enumerate(offsets, 1)
+    )
+    startxref = int(re.search(rb'startxref\s+(\d+)', data).group(1))
+
+    streams = {}
+    for number, body in re.findall(rb'(\d+) 0 obj\n(.*?)\nendobj', data, re.S):
+        match = re.search(rb'stream\n(.*)\nendstream', body, re.S)
+        if match:
+            streams[int(number)] = zlib.decompress(match.group(1)).decode('cp1252', errors='replace')
+    kids = re.search(rb'/Kids \[([^\]]*)\]', data).group(1)
+    contents = {
+        int(page): int(content)
+        for page, content in re.findall(rb'(\d+) 0 obj\n<< /Type /Page .*?/Contents (\d+) 0 R', data)
+    }
+    shown = re.compile(r'\(((?:\\.|[^\\)])*)\) Tj')
+    pages = [
+        [re.sub(r'\\(.)', r'\1', text) for text in shown.findall(streams[contents[int(page)]])]
+        for page in re.findall(rb'(\d+) 0 R', kids)
+    ]
+    return pages, xref_valid and data[startxref:].startswith(b'xref') and data.rstrip().endswith(b'%%EOF')
+
+
+SECTIONS = {
+    'abstract': "A <b>short</b> abstract & summary.",
+    'introduction': "Background.\n\nMotivation with a | pipe.",
+    'literature_review': "Prior work. " * 400,
+    'results': [
+        {"type": "table", "caption": "Table 1: Scores", "columns": ["Model", "F1 | macro"],
+         "rows": [["<script>alert(1)</script>", "0.9"]]},
+        {"type": "bullets", "items": ["First", "Second"]}
+    ],
+    'references': {"type": "references", "items": ["Smith (2024) [preprint]", "Rao (2023)"]},
+    'conclusion': "",
+    'full_text': "never rendered"
+}
+HEADINGS = ['Abstract', 'Introduction', 'Literature Review', 'Results', 'References']
+TITLE = 'AI & "Education" <2024>'
+
+
+print("\n" + "="*60)
+print("🧪 Testing Output Formats")
+print("="*60 + "\n")
+
+# ============================================
+# FORMAT NAMES
+# ============================================
+
+print("1️⃣ ?format= values...")
+check("default is docx", normalize_format(None) == 'docx' and normalize_format('') == 'docx')
+check("case and aliases", normalize_format(' MD ') == 'markdown' and normalize_format('htm') == 'html'
+      and normalize_format('PDF') == 'pdf')
+check("unsupported", normalize_format('odt') is None and normalize_format('../docx') is None)
+print()
+
+# ============================================
+# RENDERERS
+# ============================================
+
+print("2️⃣ Markdown...")
+markdown = render_markdown(TITLE, SECTIONS, created_at=0)
+check("section headings in document order, empty and helper keys skipped",
+      re.findall(r'^## (.+)$', markdown, re.M) == ['Table of Contents'] + HEADINGS)
+anchors = re.findall(r'\]\(#([\w-]+)\)', markdown)
+check("every TOC link has its anchor", len(anchors) == 5
+      and all(f'<a id="{anchor}"></a>' in markdown for anchor in anchors))
+check("table with escaped pipes", '| Model | F1 \\| macro |\n| --- | --- |' in markdown)
+check("bullets and numbered references",
+      '- First\n- Second' in markdown and '\\[1\\] Smith (2024) [preprint]  \n\\[2\\] Rao (2023)' in markdown)
+print()
+
+print("3️⃣ HTML...")
+page = render_html(TITLE, SECTIONS, created_at=0)
+tags = TagCollector()
+tags.feed(page)
+check("tags balanced", not tags.errors and not tags.stack)
+check("title and cells escaped", '<script>' not in page and '&lt;script&gt;' in page
+      and '<title>AI &amp; &quot;Education&quot; &lt;2024&gt;</title>' in page)
+check("every TOC link points at a section",
+      len(tags.links) == 5 and all(link[1:] in tags.ids for link in tags.links))
+check("same headings as Markdown",
+      re.findall(r'<h2>(.*?)</h2>', page) == ['Table of Contents'] + HEADINGS)
+check("table caption, header and list", '<caption>Table 1: Scores</caption>' in page
+      and '<th>F1 | macro</th>' in page and '<ul><li>First</li><li>Second</li></ul>' in page)
+print()
+
+print("4️⃣ PDF...")
+data = render_pdf(TITLE, SECTIONS, created_at=0)
+pages, structure_valid = pdf_pages(data)
+check("header, xref offsets, startxref and %%EOF", data.startswith(b'%PDF-1.4') and structure_valid)
+check(f"title page, TOC and {len(pages) - 2} content page(s)",
+      len(pages) >= 4 and 'AI & "EDUCATION" <2024>' in pages[0])
+toc = pages[1]
+check("TOC lists every section",
+      [heading for heading in HEADINGS if any(line.startswith(heading) for line in toc)] == HEADINGS)
+toc_pages = {heading: int(toc[index + 1]) for index, line in enumerate(toc) for heading in HEADINGS
+             if line.startswith(heading + ' .')}
+check(f"TOC page numbers are where the headings are ({toc_pages})",
+      all(heading in pages[number - 1] for heading, number in toc_pages.items())
+      and toc_pages['Results'] > toc_pages['Literature Review'])
+check("footer page numbers, none on the title page",
+      all(f"Page {number}" in pages[number - 1] for number in range(2, len(pages) + 1))
+      and not any(line.startswith('Page ') for line in pages[0]))
+results = sum(pages[toc_pages['Results'] - 1:toc_pages['References']], [])
+check("table and list flattened to lines", 'Model | F1 | macro' in results and '• First' in results)
+non_latin, _ = pdf_pages(render_pdf('सौर ऊर्जा', {'abstract': 'Énergie — 🌞'}, created_at=0))
+check("WinAnsi punctuation kept, other text replaced rather than an error",
+      '??? ?????' in non_latin[0] and 'Énergie — ?' in non_latin[2])
+print()
+
+# ============================================
+# PREVIEW CACHE
+# ============================================
+
+print("5️⃣ Preview cache...")
+cache = OutputFormatCache(preview_dir=os.path.join(TEMP_DIR, 'previews'))
+content_store.save('fmt00001', TITLE, SECTIONS, filename='AI_Education_fmt00001.docx', created_at=0)
+filepath = cache.get_or_render('fmt00001', 'html')
+first = os.stat(filepath)
+check("rendered on first use", filepath.endswith('fmt00001.html') and open(filepath, encoding='utf-8').read() == page)
+check("served from disk afterwards", cache.get_or_render('fmt00001', 'html') == filepath
+      and os.stat(filepath).st_mtime_ns == first.st_mtime_ns and os.stat(filepath).st_ino == first.st_ino)
+check("no stored content -> None", cache.get_or_render('none0001', 'pdf') is None)
+cache.get_or_render('fmt00001', 'pdf')
+cache.invalidate('fmt00001')
+check("invalidate removes every format", not os.listdir(os.path.join(TEMP_DIR, 'previews')))
+check("file ID cannot leave the preview directory",
+      os.path.dirname(cache.get_or_render('../fmt00001', 'markdown') or '') == os.path.join(TEMP_DIR, 'previews'))
+check("download names", OutputFormatCache.download_name({'filename': 'AI_Education_fmt00001.docx'}, 'fmt00001', 'pdf')
+      == 'AI_Education_fmt00001.pdf'
+      and OutputFormatCache.download_name({'title': TITLE}, 'fmt00001', 'markdown') == 'AI_Education_2024_fmt00001.md')
+print()
+
+shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+print("="*60)
+print("✅ All output format tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,164 @@
+"""
+Test script for rich section content
+Tables, bullet and reference lists: parsing, rendering through the
+fragment writer, and the layout of the surrounding text compared with a
+plain document
+"""
+
+import io
+import os
+import tempfile
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['JOB_JOURNAL_PATH'] = os.path.join(TEMP_DIR, 'jobs.sqlite3')
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+os.environ['SHARED_CACHE_PATH'] = os.path.join(TEMP_DIR, 'shared.sqlite3')
+os.environ['DOCX_ARCHIVE_PROFILE'] = 'none'
+
+import docx
+
+from services.docx_writer import FragmentDocxWriter, PythonDocxBuilder, build_package
+from services.section_content import (
+    BulletList, ContentError, ReferenceList, Table, block_paragraphs, section_blocks, validate_sections
+)
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def content_error(content):
+    """The ContentError message a section raises (None if it parses)"""
+    try:
+        section_blocks(content, 'results')
+    except ContentError as error:
+        return str(error)
+    return None
+
+
+def build(sections):
+    """python-docx Document of a fragment package built in memory"""
+    package = io.BytesIO()
+    build_package('Rich Content', sections, created_at=0, output=package)
+    package.seek(0)
+    return docx.Document(package)
+
+
+def paragraph_formats(document):
+    """(style, text, alignment, spacing) of every body paragraph outside tables"""
+    return [
+        (p.style.style_id, p.text, p.alignment, p.paragraph_format.space_after, p.paragraph_format.line_spacing)
+        for p in document.paragraphs
+    ]
+
+
+class RecordingGenerator:
+    """DocumentGenerator stand-in that records which documents reach it"""
+
+    def __init__(self):
+        self.titles = []
+
+    def create_blackbook(self, title, sections_dict):
+        self.titles.append(title)
+        return {'success': False, 'error': 'not written'}
+
+
+RESULTS = [
+    "Accuracy was measured on the held-out set.",
+    {"type": "table", "caption": "Table 1: Accuracy by model",
+     "columns": ["Model", "Accuracy"], "rows": [["CNN", 0.91], ["SVM <linear> & co"]]},
+    {"type": "bullets", "items": ["First finding", "  ", "Second finding"]},
+    "The CNN was best.",
+]
+REFERENCES = {"type": "references", "items": ["Smith, J. (2024). Title.", "Rao, A. (2023). Other."]}
+
+
+print("\n" + "="*60)
+print("🧪 Testing Rich Section Content")
+print("="*60 + "\n")
+
+# ============================================
+# PARSING
+# ============================================
+
+print("1️⃣ Section model...")
+blocks = section_blocks(RESULTS, 'results')
+check("paragraphs, table and list in document order",
+      [type(block) for block in blocks] == [str, Table, BulletList, str])
+table = blocks[1]
+check("numbers become text and short rows are padded",
+      table.rows == [('CNN', '0.91'), ('SVM <linear> & co', '')])
+check("empty list items dropped", blocks[2].items == ('First finding', 'Second finding'))
+check("a single block needs no list", isinstance(section_blocks(REFERENCES)[0], ReferenceList))
+check("plain text unchanged", section_blocks("One.\n\nTwo.") == ["One.", "Two."])
+print()
+
+print("2️⃣ Invalid content...")
+check("unknown block type", 'unknown block type' in (content_error({"type": "chart"}) or ''))
+check("row wider than the columns",
+      'row 1' in (content_error({"type": "table", "columns": ["A"], "rows": [["1", "2"]]}) or ''))
+check("table without columns or rows", content_error({"type": "table"}) is not None)
+check("nested objects in cells", content_error({"type": "bullets", "items": [{"x": 1}]}) is not None)
+try:
+    validate_sections({'abstract': 'Plain', 'results': [42]})
+    check("validate_sections rejects the bad section", False)
+except ContentError as error:
+    check("validate_sections rejects the bad section", "'results'" in str(error))
+print()
+
+print("3️⃣ Flattened for writers without tables...")
+check("bullets, table rows and references as lines",
+      block_paragraphs(blocks + section_blocks(REFERENCES))[1:5] == [
+          "Table 1: Accuracy by model", "Model | Accuracy\nCNN | 0.91\nSVM <linear> & co | ",
+          "• First finding", "• Second finding"]
+      and block_paragraphs(section_blocks(REFERENCES))[0] == "[1] Smith, J. (2024). Title.")
+print()
+
+# ============================================
+# RENDERING
+# ============================================
+
+print("4️⃣ Rendered document...")
+document = build({'abstract': "Plain abstract.", 'results': RESULTS, 'references': REFERENCES})
+check("one table", len(document.tables) == 1)
+rows = [[cell.text for cell in row.cells] for row in document.tables[0].rows]
+check("header row and escaped cells", rows == [['Model', 'Accuracy'], ['CNN', '0.91'], ['SVM <linear> & co', '']])
+texts = [p.text for p in document.paragraphs]
+check("caption before the table", "Table 1: Accuracy by model" in texts)
+check("bullets", "•\tFirst finding" in texts and "•\tSecond finding" in texts)
+check("numbered references", "[2]\tRao, A. (2023). Other." in texts)
+check("text after the table kept", "The CNN was best." in texts)
+print()
+
+print("5️⃣ Same layout as a plain document...")
+plain = paragraph_formats(build({'abstract': "Plain abstract.", 'results': "Accuracy was measured on the held-out set."}))
+rich = paragraph_formats(build({'abstract': "Plain abstract.", 'results': RESULTS}))
+check("title page and TOC identical", plain[:22] == rich[:22])
+heading = next(p for p in rich if p[1] == 'Results')
+check("section heading identical", heading == next(p for p in plain if p[1] == 'Results'))
+body = [p for p in rich if p[1] == "Accuracy was measured on the held-out set."]
+check("body paragraph identical", body == [p for p in plain if p[1] == body[0][1]])
+print()
+
+print("6️⃣ python-docx engine...")
+generator = RecordingGenerator()
+builder = PythonDocxBuilder(generator, FragmentDocxWriter(output_dir=TEMP_DIR))
+result = builder.create_blackbook('Rich', {'results': RESULTS})
+check("rich documents go to the fragment writer", result['success'] and generator.titles == []
+      and os.path.exists(result['filepath']))
+builder.create_blackbook('Plain', {'abstract': "Text."})
+check("plain documents go to DocumentGenerator", generator.titles == ['Plain'])
+print()
+
+print("="*60)
+print("✅ All rich content tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
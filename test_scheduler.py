@@ -0,0 +1,184 @@
+"""
+Test script for the generation scheduler
+Saturation, queue-wait estimates, fairness state, client identity and
+the host's slots split between worker processes
+"""
+
+import os
+import threading
+import time
+
+os.environ.pop('SCHEDULER_WORKER_PROCESSES', None)
+os.environ.pop('WEB_CONCURRENCY', None)
+
+from services.generation_scheduler import GenerationScheduler, SchedulerRejected
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def measured_scheduler(service_seconds, **options):
+    """Scheduler whose service-time estimate has settled at service_seconds"""
+    scheduler = GenerationScheduler(max_concurrent=4, interactive_reserved=1,
+                                    slo_seconds={'interactive': 10, 'batch': 300}, client_weights={}, **options)
+    scheduler._service_time = service_seconds
+    scheduler._service_measured = True
+    return scheduler
+
+
+print("\n" + "="*60)
+print("🧪 Testing Generation Scheduler")
+print("="*60 + "\n")
+
+# ============================================
+# SATURATION
+# ============================================
+
+print("1️⃣ All slots busy, empty queue...")
+scheduler = measured_scheduler(15.0)
+for _ in range(4):
+    scheduler.acquire('a', 'interactive')
+# The four calls have been running for 12 s of their 15 s
+scheduler._started_at = [time.monotonic() - 12] * 4
+
+estimate = scheduler.estimate_wait('interactive')
+check(f"interactive estimate is the remaining time ({estimate:.1f}s), not a full service time",
+      2.5 < estimate < 3.5)
+
+result = {}
+
+
+def waiter():
+    try:
+        result['waited'] = scheduler.acquire('b', 'interactive')
+    except SchedulerRejected as error:
+        result['rejected'] = error
+
+
+thread = threading.Thread(target=waiter)
+thread.start()
+time.sleep(0.2)
+check("request is queued, not rejected", scheduler.get_stats()['classes']['interactive']['queued'] == 1)
+scheduler.release('interactive', 12.0)
+thread.join(timeout=5)
+check("queued request gets the freed slot", 'waited' in result and 'rejected' not in result)
+
+# Freshly started calls: the remaining time really is over budget
+scheduler._started_at = [time.monotonic()] * 4
+try:
+    scheduler.acquire('c', 'interactive')
+    check("over-budget request rejected", False)
+except SchedulerRejected as error:
+    check(f"over-budget request rejected (Retry-After {error.retry_after}s)", error.retry_after >= 1)
+print()
+
+print("2️⃣ Cold start (no measured calls yet)...")
+scheduler = GenerationScheduler(max_concurrent=2, interactive_reserved=1,
+                                slo_seconds={'interactive': 0.3, 'batch': 1}, client_weights={})
+scheduler.acquire('a', 'interactive')
+scheduler.acquire('a', 'interactive')
+started = time.monotonic()
+try:
+    scheduler.acquire('b', 'interactive')
+except SchedulerRejected:
+    pass
+check("initial guess does not reject on arrival (waits for its budget)", time.monotonic() - started >= 0.25)
+print()
+
+# ============================================
+# QUEUE ESTIMATES
+# ============================================
+
+print("3️⃣ Estimates with a queue...")
+scheduler = measured_scheduler(10.0)
+check("free slot: no wait", scheduler.estimate_wait('interactive') == 0.0)
+for _ in range(4):
+    scheduler.acquire('a', 'interactive')
+now = time.monotonic()
+scheduler._started_at = [now - 9, now - 6, now - 3, now]
+check("interactive waits for the first call to finish", abs(scheduler.estimate_wait('interactive') - 1) < 0.2)
+check("batch waits for the second call (one slot is reserved)",
+      abs(scheduler.estimate_wait('batch') - 4) < 0.2)
+
+scheduler._queued['interactive'] = 5
+check("five queued ahead: one full round plus the second slot",
+      abs(scheduler.estimate_wait('interactive') - (4 + 10)) < 0.2)
+scheduler._queued['interactive'] = 0
+
+scheduler._started_at = [now - 60] * 4
+check("overdue calls are expected to finish soon", 0 < scheduler.estimate_wait('interactive') <= 1.0)
+print()
+
+# ============================================
+# FAIRNESS STATE
+# ============================================
+
+print("4️⃣ Idle clients are pruned...")
+scheduler = measured_scheduler(0.01)
+scheduler.max_concurrent = 1
+scheduler.interactive_reserved = 0
+scheduler.acquire('holder', 'interactive')
+
+
+def short_call(client_id):
+    with scheduler.slot(client_id, 'interactive'):
+        pass
+
+
+threads = [threading.Thread(target=short_call, args=(f'client-{number}',)) for number in range(50)]
+for thread in threads:
+    thread.start()
+time.sleep(0.3)
+scheduler.release('interactive', 0.01)
+for thread in threads:
+    thread.join(timeout=5)
+check("all 50 clients served", scheduler.get_stats()['classes']['interactive']['admitted'] == 51)
+check(f"finish tags of idle clients dropped ({len(scheduler._client_finish['interactive'])} left)",
+      len(scheduler._client_finish['interactive']) == 0)
+print()
+
+# ============================================
+# CLIENT IDENTITY
+# ============================================
+
+print("5️⃣ Client identity...")
+scheduler = GenerationScheduler(client_weights={'premium': 4}, api_keys={'k-123': 'premium'})
+check("configured API key selects its client", scheduler.identify_client('k-123', '10.0.0.1') == 'premium')
+check("unknown API key falls back to the remote address",
+      scheduler.identify_client('premium', '10.0.0.1') == '10.0.0.1')
+check("no key, no address", scheduler.identify_client('', None) == 'anonymous')
+print()
+
+# ============================================
+# WORKER PROCESSES
+# ============================================
+
+print("6️⃣ Slots split between worker processes...")
+scheduler = GenerationScheduler(max_concurrent=8, interactive_reserved=2, worker_processes=4)
+check("8 host slots over 4 workers: 2 each, 1 reserved",
+      scheduler.max_concurrent == 2 and scheduler.interactive_reserved == 1)
+scheduler = GenerationScheduler(max_concurrent=4, interactive_reserved=1, worker_processes=16)
+check("more workers than slots: 1 each, nothing reserved",
+      scheduler.max_concurrent == 1 and scheduler.interactive_reserved == 0)
+os.environ['WEB_CONCURRENCY'] = '2'
+scheduler = GenerationScheduler(max_concurrent=4, interactive_reserved=1)
+check("worker count taken from WEB_CONCURRENCY", scheduler.worker_processes == 2 and scheduler.max_concurrent == 2)
+os.environ['SCHEDULER_WORKER_PROCESSES'] = '4'
+stats = GenerationScheduler(max_concurrent=4, interactive_reserved=1).get_stats()
+check("SCHEDULER_WORKER_PROCESSES wins, stats show both counts",
+      stats['worker_processes'] == 4 and stats['max_concurrent'] == 1 and stats['host_max_concurrent'] == 4)
+print()
+
+print("="*60)
+print("✅ All scheduler tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,256 @@
+"""
+Test script for the section patcher
+Splicing sections into fragment and python-docx (DocumentGenerator)
+packages, the stale-cache check between workers, and the document lock
+shared with the archive tier
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['JOB_JOURNAL_PATH'] = os.path.join(TEMP_DIR, 'jobs.sqlite3')
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+os.environ['SHARED_CACHE_PATH'] = os.path.join(TEMP_DIR, 'shared.sqlite3')
+os.environ['CONTENT_STORE_DIR'] = os.path.join(TEMP_DIR, 'content')
+os.environ['DOCX_ARCHIVE_PROFILE'] = 'none'
+
+import docx
+
+from services.content_store import content_store
+from services.docx_compression import ArchiveRecompressor, document_lock
+from services.docx_writer import build_package
+from services.section_patcher import PatchError, SectionPatcher
+
+REFERENCE = 'outputs/Enhanced_Academic_Blackbook_Te_71678dc0.docx'
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def document_xml(filepath):
+    with zipfile.ZipFile(filepath) as archive:
+        return archive.read('word/document.xml').decode('utf-8')
+
+
+def section_xml(filepath, heading):
+    """XML from a section's heading up to the next heading (or the section properties)"""
+    xml = document_xml(filepath)
+    start = xml.index(f'>{heading}</w:t>')
+    start = xml.rindex('<w:p>', 0, start)
+    following = xml.find('<w:pStyle w:val="Heading1"/>', xml.find('</w:p>', start))
+    end = xml.rindex('<w:p>', 0, following) if following >= 0 else xml.index('<w:sectPr')
+    return xml[start:end]
+
+
+def texts(filepath):
+    return [p.text for p in docx.Document(filepath).paragraphs if p.text.strip()]
+
+
+def patch_error(patcher, *args):
+    """The PatchError a patch raises (None if it succeeds)"""
+    try:
+        patcher.patch_section(*args)
+    except PatchError as error:
+        return error
+    return None
+
+
+def fragment_document(file_id, sections):
+    """A fragment package in TEMP_DIR with its content record"""
+    filename = f"Fragments_{file_id}.docx"
+    created_at = time.time()
+    build_package('Fragment Document', sections, created_at=created_at, output=os.path.join(TEMP_DIR, filename))
+    content_store.save(file_id, 'Fragment Document', dict(sections), filename=filename, created_at=created_at)
+    return os.path.join(TEMP_DIR, filename)
+
+
+def python_docx_document(file_id):
+    """A copy of a DocumentGenerator document with its content record"""
+    filename = f"PythonDocx_{file_id}.docx"
+    filepath = os.path.join(TEMP_DIR, filename)
+    shutil.copy(REFERENCE, filepath)
+
+    sections, current = {}, None
+    for paragraph in docx.Document(filepath).paragraphs:
+        if paragraph.style.style_id == 'Heading1' and paragraph.text != 'Table of Contents':
+            current = paragraph.text.lower().replace(' ', '_')
+            sections[current] = []
+        elif current and paragraph.text.strip():
+            sections[current].append(paragraph.text)
+    title, _, date_text = texts(filepath)[:3]
+    content_store.save(file_id, title, {key: '\n\n'.join(value) for key, value in sections.items()},
+                       filename=filename, created_at=datetime.strptime(date_text, '%B %d, %Y').timestamp())
+    return filepath
+
+
+SECTIONS = {
+    'abstract': "Patching one section should not touch the others.",
+    'introduction': "Documents are edited one section at a time.\n\nThe rest stays as it was.",
+    'conclusion': "Splicing is cheaper than rebuilding."
+}
+
+print("\n" + "="*60)
+print("🧪 Testing Section Patcher")
+print("="*60 + "\n")
+
+# ============================================
+# FRAGMENT PACKAGES
+# ============================================
+
+print("1️⃣ Fragment package...")
+patcher = SectionPatcher(output_dir=TEMP_DIR)
+filepath = fragment_document('frag0001', SECTIONS)
+abstract_before = section_xml(filepath, 'Abstract')
+result = patcher.patch_section('frag0001', 'introduction', "EDITED introduction.")
+check("spliced, one section rendered, TOC kept",
+      not result['full_rebuild'] and result['sections_rendered'] == 1 and not result['toc_updated'])
+check("untouched section byte for byte", section_xml(filepath, 'Abstract') == abstract_before)
+
+expected_path = os.path.join(TEMP_DIR, 'expected.docx')
+record = content_store.load('frag0001')
+build_package('Fragment Document', record['sections'], created_at=record['created_at'], output=expected_path)
+check("same document.xml as a fresh build", document_xml(filepath) == document_xml(expected_path))
+print()
+
+# ============================================
+# PYTHON-DOCX PACKAGES
+# ============================================
+
+print("2️⃣ python-docx package...")
+filepath = python_docx_document('pydx0001')
+before = texts(filepath)
+kept = {heading: section_xml(filepath, heading) for heading in ('Abstract', 'Conclusion')}
+result = patcher.patch_section('pydx0001', 'methodology', "EDITED methodology.")
+check("spliced, not rebuilt", not result['full_rebuild'] and result['sections_rendered'] == 1)
+check("DocumentGenerator's XML kept for untouched sections",
+      all(section_xml(filepath, heading) == xml for heading, xml in kept.items()))
+after = texts(filepath)
+position = before.index('Methodology')
+check("only the edited section's text changed",
+      after[:position + 1] == before[:position + 1] and after[position + 1] == "EDITED methodology."
+      and after[position + 2:] == before[before.index('Results'):])
+check("styles and footer untouched", all(
+    zipfile.ZipFile(REFERENCE).read(part) == zipfile.ZipFile(filepath).read(part)
+    for part in ('word/styles.xml', 'word/footer1.xml', 'docProps/app.xml')
+))
+
+result = patcher.patch_section('pydx0001', 'appendix', "A new appendix.")
+check("new section appended and listed in the TOC",
+      result['toc_updated'] and texts(filepath)[-2:] == ['Appendix', "A new appendix."]
+      and any(text.startswith('Appendix') for text in texts(filepath)[:20]))
+result = patcher.patch_section('pydx0001', 'appendix', "")
+check("removed again", result['toc_updated'] and 'Appendix' not in texts(filepath))
+check("python-docx can still open it", len(docx.Document(filepath).paragraphs) > 0)
+print()
+
+print("3️⃣ Headings that do not match the record...")
+filepath = python_docx_document('pydx0002')
+record = content_store.load('pydx0002')
+record['sections'] = {'summary': "Only a summary.", **record['sections']}
+content_store.save_record(record)
+result = patcher.patch_section('pydx0002', 'abstract', "EDITED abstract.")
+check("body rendered from the record", result['full_rebuild']
+      and result['sections_rendered'] == len(record['sections']))
+check("with every section", {'Summary', "EDITED abstract.", 'Conclusion'} <= set(texts(filepath)))
+print()
+
+# ============================================
+# CACHE AND ERRORS
+# ============================================
+
+print("4️⃣ Another worker edited the document...")
+filepath = fragment_document('frag0002', SECTIONS)
+worker_a = SectionPatcher(output_dir=TEMP_DIR)
+worker_b = SectionPatcher(output_dir=TEMP_DIR)
+worker_a.patch_section('frag0002', 'abstract', "Edit by A.")
+worker_b.patch_section('frag0002', 'conclusion', "Edit by B.")
+worker_a.patch_section('frag0002', 'introduction', "Second edit by A.")
+check("stale fragments not reused (B's edit kept)",
+      {"Edit by A.", "Edit by B.", "Second edit by A."} <= set(texts(filepath)))
+print()
+
+print("5️⃣ Errors...")
+error = patch_error(patcher, 'missing1', 'abstract', "x")
+check("unknown file ID -> 404 CONTENT_NOT_FOUND", error and error.status_code == 404
+      and error.error_code == 'CONTENT_NOT_FOUND')
+error = patch_error(patcher, 'frag0002', 'appendix', "")
+check("removing a missing section -> 404 SECTION_NOT_FOUND", error and error.error_code == 'SECTION_NOT_FOUND')
+before = document_xml(filepath)
+try:
+    patcher.patch_section('frag0002', 'abstract', [42])
+except Exception:
+    pass
+check("failed render leaves the document alone", document_xml(filepath) == before)
+patcher.patch_section('frag0002', 'conclusion', "After the failure.")
+check("and the next patch uses fresh fragments",
+      "Edit by A." in texts(filepath) and "After the failure." in texts(filepath))
+os.remove(filepath)
+error = patch_error(patcher, 'frag0002', 'abstract', "x")
+check("deleted file -> 404 FILE_NOT_FOUND", error and error.error_code == 'FILE_NOT_FOUND')
+print()
+
+# ============================================
+# LOCKING
+# ============================================
+
+print("6️⃣ Document lock...")
+filepath = python_docx_document('pydx0003')
+release = threading.Event()
+locked = threading.Event()
+
+
+def hold_lock():
+    with document_lock(filepath):
+        locked.set()
+        release.wait(5)
+
+
+holder = threading.Thread(target=hold_lock)
+holder.start()
+locked.wait(5)
+done = []
+editor = threading.Thread(target=lambda: done.append(patcher.patch_section('pydx0003', 'abstract', "Locked edit.")))
+editor.start()
+time.sleep(0.2)
+check("patch waits for the lock holder", not done)
+release.set()
+holder.join(5)
+editor.join(5)
+check("then applies", done and "Locked edit." in texts(filepath))
+
+recompressor = ArchiveRecompressor(profile='max', delay_seconds=0)
+recompressor.schedule('pydx0003', filepath, 'stored')
+check("archive tier replaces the file", wait_for(lambda: recompressor.get_stats()['archived'] == 1))
+patcher.patch_section('pydx0003', 'conclusion', "Edit after archiving.")
+check("edits on both sides of the archive survive",
+      {"Locked edit.", "Edit after archiving."} <= set(texts(filepath)))
+print()
+
+shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+print("="*60)
+print("✅ All section patcher tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
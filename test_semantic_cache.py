@@ -0,0 +1,134 @@
+"""
+Test script for the semantic topic cache
+Real paraphrase and non-paraphrase topic pairs, and entries shared
+between worker processes through the on-disk log
+"""
+
+import tempfile
+
+from services.semantic_cache import SemanticTopicCache
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def make_cache(cache_dir=None):
+    """Enabled cache in its own directory"""
+    return SemanticTopicCache(cache_dir=cache_dir or tempfile.mkdtemp(), enabled=True)
+
+
+def generated(topic):
+    return {'success': True, 'topic': topic, 'content': {'abstract': f"About {topic}"}, 'metadata': {}}
+
+
+def hits(cached_topic, requested_topic):
+    """True if a cache holding cached_topic serves requested_topic"""
+    cache = make_cache()
+    cache.store(cached_topic, generated(cached_topic))
+    return cache.lookup(requested_topic) is not None
+
+
+PARAPHRASES = [
+    ("Impact of AI on Education", "AI's impact in modern education"),
+    ("Impact of AI on Education", "impact of ai on EDUCATION"),
+    ("Machine Learning for Crop Disease Detection", "Crop disease detection using machine learning"),
+    ("Educational impact of artificial intelligence", "Impact of artificial intelligence on education"),
+    ("Electric vehicles adoption in India", "Adoption of electric vehicle in India"),
+    ("Role of Social Media in Marketing", "Social media marketing: the role"),
+]
+
+DIFFERENT_SUBJECTS = [
+    ("Renewable Energy Adoption in Maharashtra", "Renewable Energy Adoption in Gujarat"),
+    ("Deep Learning for Crop Disease Detection", "Machine Learning for Crop Disease Detection"),
+    ("Blockchain in Healthcare", "Blockchain in rural healthcare"),
+    ("Impact of AI on Education", "AI in Education"),
+    ("Impact of Social Media on Students", "Impact of Social Media on Teenagers"),
+    ("Cyber Security in Banking", "Cyber Security in Healthcare"),
+]
+
+
+print("\n" + "="*60)
+print("🧪 Testing Semantic Topic Cache")
+print("="*60 + "\n")
+
+# ============================================
+# MATCHING
+# ============================================
+
+print("1️⃣ Paraphrases are served from the cache...")
+for cached_topic, requested_topic in PARAPHRASES:
+    check(f"'{requested_topic}' ~ '{cached_topic}'", hits(cached_topic, requested_topic))
+print()
+
+print("2️⃣ Different subjects are not...")
+for cached_topic, requested_topic in DIFFERENT_SUBJECTS:
+    check(f"'{requested_topic}' != '{cached_topic}'", not hits(cached_topic, requested_topic))
+print()
+
+print("3️⃣ Best match wins...")
+cache = make_cache()
+for topic in ("Renewable Energy Adoption in Gujarat", "Renewable Energy Adoption in Maharashtra"):
+    cache.store(topic, generated(topic))
+result = cache.lookup("Adoption of renewable energy in Maharashtra")
+check("served the Maharashtra entry, not its Gujarat neighbour",
+      result is not None and result['metadata']['semantic_cache']['matched_topic'].endswith('Maharashtra'))
+check("result carries the requested topic", result is not None
+      and result['topic'] == "Adoption of renewable energy in Maharashtra")
+print()
+
+# ============================================
+# GENERATION AND SHARING
+# ============================================
+
+print("4️⃣ get_or_generate...")
+cache_dir = tempfile.mkdtemp()
+cache = make_cache(cache_dir)
+calls = []
+
+
+def generate(topic):
+    calls.append(topic)
+    return generated(topic)
+
+
+cache.get_or_generate("Impact of AI on Education", generate)
+result = cache.get_or_generate("AI's impact in modern education", generate)
+check("paraphrase answered without a second model call", len(calls) == 1)
+result['content']['abstract'] = 'edited by the caller'
+check("callers get a copy", cache.lookup("Impact of AI on Education")['content']['abstract']
+      == "About Impact of AI on Education")
+cache.get_or_generate("AI in Education", generate)
+check("different subject generated", len(calls) == 2)
+
+stats = cache.get_stats()
+check(f"hit rate counted ({stats['hits']} of {stats['lookups']})", stats['hits'] == 2 and stats['lookups'] == 4)
+print()
+
+print("5️⃣ Another worker reads the shared log...")
+other_worker = make_cache(cache_dir)
+check("entries stored by the first worker are loaded", other_worker.get_stats()['entries'] == 2)
+cache.store("Cyber Security in Banking", generated("Cyber Security in Banking"))
+check("a later store is picked up on the next lookup",
+      other_worker.lookup("Banking cyber security") is not None)
+print()
+
+print("6️⃣ Disabled cache...")
+disabled = SemanticTopicCache(cache_dir=cache_dir, enabled=False)
+calls.clear()
+disabled.get_or_generate("Impact of AI on Education", generate)
+check("always calls the model", calls == ["Impact of AI on Education"] and disabled.lookup("x") is None)
+print()
+
+print("="*60)
+print("✅ All semantic cache tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
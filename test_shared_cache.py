@@ -0,0 +1,230 @@
+"""
+Test script for the shared cache tier
+Runs the SQLite driver and the Redis-protocol driver (against a small
+in-process stand-in server) through the same checks, then the opt-in
+switch for generations and the file ID lookups that use the tier
+"""
+
+import os
+import socketserver
+import tempfile
+import threading
+import time
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['SHARED_CACHE_PATH'] = os.path.join(TEMP_DIR, 'shared.sqlite3')
+os.environ.pop('SHARED_CACHE_GENERATIONS', None)
+
+from services.file_server import FileIndex
+from services.shared_cache import RedisCacheDriver, SharedCache, SQLiteCacheDriver, generation_cache, shared_cache
+
+
+# ============================================
+# REDIS STAND-IN SERVER
+# ============================================
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of a Redis server: PING, AUTH, SELECT, GET, SET (NX/PX), DEL, DBSIZE"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, password=None):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.password = password
+        self.data = {}  # key -> (value, expires_at)
+        self.lock = threading.Lock()
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        authenticated = self.server.password is None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+
+            command = args[0].decode().upper()
+            if command == 'AUTH':
+                authenticated = args[1].decode() == self.server.password
+                self.wfile.write(b'+OK\r\n' if authenticated else b'-WRONGPASS invalid password\r\n')
+            elif not authenticated:
+                self.wfile.write(b'-NOAUTH Authentication required.\r\n')
+            else:
+                self.wfile.write(self.execute(command, args[1:]))
+
+    def execute(self, command, args):
+        now = time.monotonic()
+        with self.server.lock:
+            data = self.server.data
+            for key in [key for key, (_, expires_at) in data.items() if expires_at and expires_at < now]:
+                del data[key]
+
+            if command in ('PING', 'SELECT'):
+                return b'+OK\r\n'
+            if command == 'GET':
+                value = data.get(args[0])
+                return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value[0]), value[0])
+            if command == 'SET':
+                options = [arg.decode().upper() for arg in args[2:]]
+                if 'NX' in options and args[0] in data:
+                    return b'$-1\r\n'
+                expires_at = now + int(options[options.index('PX') + 1]) / 1000 if 'PX' in options else None
+                data[args[0]] = (args[1], expires_at)
+                return b'+OK\r\n'
+            if command == 'DEL':
+                return b':%d\r\n' % (1 if data.pop(args[0], None) else 0)
+            if command == 'DBSIZE':
+                return b':%d\r\n' % len(data)
+            return b'-ERR unknown command\r\n'
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def run_checks(cache):
+    key = cache.key('test', 'Machine Learning')
+
+    # Get / set round trip
+    check("miss before set", cache.get(key) is None)
+    cache.set(key, {'topic': 'Machine Learning', 'sections': ['abstract']})
+    check("hit after set", cache.get(key) == {'topic': 'Machine Learning', 'sections': ['abstract']})
+    cache.delete(key)
+    check("miss after delete", cache.get(key) is None)
+
+    # Expiry
+    cache.set(key, 'short-lived', ttl=0.2)
+    time.sleep(0.3)
+    check("expired entry is a miss", cache.get(key) is None)
+
+    # Concurrent get-or-compute runs the computation once
+    calls = []
+
+    def slow_compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'success': True, 'value': 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute(cache.key('test', 'once'), slow_compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check("8 concurrent callers, 1 computation", len(calls) == 1)
+    check("every caller got the value", all(value == {'success': True, 'value': 42} for value, _ in results))
+    check("7 callers were served from the cache", sum(1 for _, cached in results if cached) == 7)
+
+    # Rejected results are returned but not stored
+    value, _ = cache.get_or_compute(
+        cache.key('test', 'failed'), lambda: {'success': False}, store_if=lambda result: result.get('success')
+    )
+    check("failed result returned", value == {'success': False})
+    check("failed result not stored", cache.get(cache.key('test', 'failed')) is None)
+
+
+# ============================================
+# SQLITE DRIVER
+# ============================================
+
+print("\n" + "="*60)
+print("🧪 Testing Shared Cache")
+print("="*60 + "\n")
+
+with tempfile.TemporaryDirectory() as directory:
+    print("1️⃣ SQLite driver...")
+    driver = SQLiteCacheDriver(os.path.join(directory, 'shared.sqlite3'), max_bytes=64 * 1024)
+    run_checks(SharedCache(driver))
+
+    # Size-bounded LRU eviction
+    cache = SharedCache(driver)
+    for number in range(100):
+        cache.set(cache.key('fill', str(number)), 'x' * 1000)
+    stats = driver.get_stats()
+    check(f"stays under the size bound ({stats['bytes']} <= {stats['max_bytes']} bytes)",
+          stats['bytes'] <= stats['max_bytes'])
+    check("oldest entries evicted first",
+          cache.get(cache.key('fill', '0')) is None and cache.get(cache.key('fill', '99')) is not None)
+    print()
+
+# ============================================
+# REDIS-PROTOCOL DRIVER
+# ============================================
+
+print("2️⃣ Redis-protocol driver (local stand-in server)...")
+server = RespStandIn(password='secret')
+threading.Thread(target=server.serve_forever, daemon=True).start()
+port = server.server_address[1]
+
+run_checks(SharedCache(RedisCacheDriver(f"redis://:secret@127.0.0.1:{port}/1")))
+
+cache = SharedCache(RedisCacheDriver(f"redis://:wrong@127.0.0.1:{port}/0"))
+check("bad password: cache skipped, value still computed",
+      cache.get_or_compute(cache.key('test', 'auth'), lambda: 'computed') == ('computed', False))
+check("bad password: error counted", cache.get_stats()['errors'] > 0)
+server.shutdown()
+print()
+
+# Backend unreachable: every call falls through to the compute function
+print("3️⃣ Unreachable backend...")
+cache = SharedCache(RedisCacheDriver(f"redis://127.0.0.1:{port}/0", timeout=0.2))
+check("value computed without the cache",
+      cache.get_or_compute(cache.key('test', 'down'), lambda: 'computed') == ('computed', False))
+print()
+
+# ============================================
+# USERS OF THE TIER
+# ============================================
+
+print("4️⃣ Generations are opt-in...")
+calls = []
+key = generation_cache.key('generation', 'impact of ai on education')
+for _ in range(2):
+    generation_cache.get_or_compute(key, lambda: calls.append(1) or {'success': True})
+check("not shared by default (SHARED_CACHE_GENERATIONS unset)",
+      generation_cache is not shared_cache and len(calls) == 2)
+check("nothing stored in the shared tier", shared_cache.get(key, record_stats=False) is None)
+print()
+
+print("5️⃣ File ID lookups...")
+root = os.path.join(TEMP_DIR, 'outputs')
+os.makedirs(root)
+index = FileIndex(root, miss_ttl=60)
+check("unknown ID not found", index.find_by_file_id('abcd1234') is None)
+for _ in range(5):
+    index.find_by_file_id('abcd1234')
+stats = index.get_stats()
+check(f"unknown ID scanned for once ({stats['id_scans']} scan(s))",
+      stats['id_scans'] == 1 and stats['id_misses_cached'] == 5)
+open(os.path.join(root, 'Topic_abcd1234.docx'), 'wb').close()
+check("still a miss within miss_ttl", index.find_by_file_id('abcd1234') is None)
+index.invalidate()
+entry = index.find_by_file_id('abcd1234')
+check("found once the remembered misses are cleared", entry is not None and entry.filename == 'Topic_abcd1234.docx')
+other_worker = FileIndex(root, miss_ttl=60)
+scans = other_worker.get_stats()['id_scans']
+check("another worker reuses the shared scan result",
+      other_worker.find_by_file_id('abcd1234') is not None and other_worker.get_stats()['id_scans'] == scans)
+print()
+
+print("="*60)
+print("✅ All shared cache tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,133 @@
+"""
+Test script for the streaming create-document parser
+Strings split across read chunks (escapes, backslashes, unicode) and
+the error cases, read a few bytes at a time
+"""
+
+import json
+
+from services.streaming_ingest import IngestError, IngestLimits, MemoryMeter, parse_document_stream
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+class ChunkedStream:
+    """Request body that returns at most chunk_size bytes per read"""
+
+    def __init__(self, body, chunk_size):
+        self._body = body
+        self._chunk_size = chunk_size
+        self._pos = 0
+
+    def read(self, size=-1):
+        chunk = self._body[self._pos:self._pos + self._chunk_size]
+        self._pos += len(chunk)
+        return chunk
+
+
+def parse(body, chunk_size, max_section_bytes=5000):
+    """Events for a body (str or bytes) read chunk_size bytes at a time"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    limits = IngestLimits()
+    limits.max_section_bytes = max_section_bytes
+    return list(parse_document_stream(ChunkedStream(body, chunk_size), limits, MemoryMeter()))
+
+
+def parse_error(body, chunk_size, **options):
+    """The IngestError a body raises (None if it parses)"""
+    try:
+        parse(body, chunk_size, **options)
+    except IngestError as error:
+        return error
+    return None
+
+
+def sections_for_every_chunk_size(document, sizes=range(1, 9)):
+    """True if every chunk size yields the document's sections unchanged"""
+    body = json.dumps(document, ensure_ascii=False)
+    expected = list(document['sections'].items())
+    try:
+        return all(
+            [event[1:] for event in parse(body, size) if event[0] == 'section'] == expected
+            for size in sizes
+        )
+    except IngestError:
+        return False
+
+
+print("\n" + "="*60)
+print("🧪 Testing Streaming Ingest")
+print("="*60 + "\n")
+
+# ============================================
+# CHUNK BOUNDARIES
+# ============================================
+
+print("1️⃣ Escaped quotes across chunk boundaries...")
+document = {'title': 'Say "hello"', 'sections': {'abstract': 'He said "stop" and "go".', 'quote': '"'}}
+check("every chunk size from 1 to 8 bytes", sections_for_every_chunk_size(document))
+events = parse(json.dumps(document), 1)
+check("title read one byte at a time", events[0] == ('title', 'Say "hello"'))
+print()
+
+print("2️⃣ Backslash runs ending a chunk...")
+for count in range(1, 6):
+    document = {'title': 'Paths', 'sections': {'even_odd': '\\' * count + '"' + '\\' * count}}
+    check(f"{count} backslash(es) before an escaped quote", sections_for_every_chunk_size(document))
+document = {'title': 'Paths', 'sections': {'windows': 'C:\\Users\\', 'after': 'x'}}
+check("string ending in an escaped backslash", sections_for_every_chunk_size(document))
+print()
+
+print("3️⃣ Unicode...")
+document = {'title': 'सौर ऊर्जा', 'sections': {'abstract': 'Énergie — सौर ऊर्जा 🌞 “quoted”'}}
+check("multi-byte UTF-8 split at every offset", sections_for_every_chunk_size(document))
+body = '{"title": "T", "sections": {"abstract": "caf\\u00e9 \\ud83c\\udf1e \\"\\u0022"}}'
+events = parse(body, 3)
+check("\\u escapes and surrogate pairs decoded", events[-1] == ('section', 'abstract', 'café 🌞 ""'))
+print()
+
+# ============================================
+# ERRORS
+# ============================================
+
+print("4️⃣ Unterminated strings...")
+error = parse_error('{"title": "T", "sections": {"abstract": "no end', 4)
+check("end of body inside a string", error is not None and error.error_code == 'INVALID_JSON')
+error = parse_error('{"title": "T", "sections": {"abstract": "ends in \\"}}', 4)
+check("escaped closing quote is not a terminator", error is not None and error.error_code == 'INVALID_JSON')
+error = parse_error('{"title": "T", "sections": {"abstract": "bad \\x escape"}}', 4)
+check("invalid escape rejected", error is not None and error.error_code == 'INVALID_JSON')
+print()
+
+print("5️⃣ Oversize strings...")
+body = json.dumps({'title': 'T', 'sections': {'abstract': 'a' * 500}})
+error = parse_error(body, 7, max_section_bytes=100)
+check("long section rejected with 413 SECTION_TOO_LARGE",
+      error is not None and error.status_code == 413 and error.error_code == 'SECTION_TOO_LARGE')
+error = parse_error(body.replace('"abstract": "', '"abstract": "' + '\\"' * 200), 5, max_section_bytes=100)
+check("escapes count towards the limit", error is not None and error.status_code == 413)
+error = parse_error(json.dumps({'title': 'x' * 2000, 'sections': {}}), 16)
+check("long title rejected with 413 TITLE_TOO_LONG",
+      error is not None and error.status_code == 413 and error.error_code == 'TITLE_TOO_LONG')
+error = parse_error('{"title": "' + 'x' * 2000, 16)
+check("limit applies before the string ends",
+      error is not None and error.error_code == 'TITLE_TOO_LONG')
+body = json.dumps({'title': 'T', 'sections': {'abstract': 'a' * 100}})
+check("string exactly at the limit accepted", parse_error(body, 7, max_section_bytes=100) is None)
+print()
+
+print("="*60)
+print("✅ All streaming ingest tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
@@ -0,0 +1,204 @@
+"""
+Test script for the trending topic warmer
+Ranking recent topics, one warmer per host, idle checks that see every
+worker, warming into the shared cache within the hourly budget, and
+pre-rendered documents copied by any worker
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+TEMP_DIR = tempfile.mkdtemp()
+os.environ['WARMER_ENABLED'] = 'true'
+os.environ['WARMER_MAX_PER_HOUR'] = '3'
+os.environ['SHARED_CACHE_BACKEND'] = 'sqlite'
+os.environ['SHARED_CACHE_GENERATIONS'] = 'true'
+os.environ['SHARED_CACHE_PATH'] = os.path.join(TEMP_DIR, 'shared.sqlite3')
+os.environ['SEMANTIC_CACHE_ENABLED'] = 'false'
+os.environ['DOCUMENT_CATALOG_PATH'] = os.path.join(TEMP_DIR, 'catalog.sqlite3')
+
+from services.document_catalog import document_catalog
+from services.docx_writer import document_builder
+from services.generation_plan import is_cached, resolve_plan
+from services.shared_cache import shared_cache
+from services.topic_warmer import LIVE_CALL_KEY, MODEL_CALLS_KEY, TopicWarmer, _parse_hours
+
+document_builder.output_dir = TEMP_DIR
+# The sections the model stand-in writes
+PLAN = resolve_plan(sections=['abstract', 'conclusion'])
+LOCK_PATH = os.path.join(TEMP_DIR, 'topic_warmer.lock')
+PRERENDER_DIR = os.path.join(TEMP_DIR, 'prerendered')
+
+
+# ============================================
+# CHECKS
+# ============================================
+
+failures = 0
+
+
+def check(name, condition):
+    global failures
+    print(f"   {'✅' if condition else '❌'} {name}")
+    failures += 0 if condition else 1
+
+
+def make_warmer(**settings):
+    """Warmer of one worker process, sharing the lock file and pre-render directory"""
+    warmer = TopicWarmer(prerender_dir=PRERENDER_DIR, lock_path=LOCK_PATH)
+    for name, value in settings.items():
+        setattr(warmer, name, value)
+    return warmer
+
+
+calls = []
+
+
+def generate(topic):
+    """Model stand-in that records the topics it was called for"""
+    calls.append(topic)
+    return {'success': True, 'topic': topic,
+            'content': {'abstract': f"Abstract of {topic}.", 'conclusion': f"Conclusion of {topic}.",
+                        'full_text': "not a section"},
+            'metadata': {}}
+
+
+print("\n" + "="*60)
+print("🧪 Testing Topic Warmer")
+print("="*60 + "\n")
+
+# ============================================
+# RANKING
+# ============================================
+
+print("1️⃣ Off-peak hours...")
+check("range", _parse_hours('1-4') == {1, 2, 3})
+check("wraps around midnight", _parse_hours('22-2') == {22, 23, 0, 1})
+check("empty is any hour, same start and end is all day",
+      _parse_hours('') is None and _parse_hours('5-5') == set(range(24)))
+print()
+
+print("2️⃣ Ranking recent topics...")
+now = time.time()
+hour = 3600
+for index, (topic, age) in enumerate([
+    ("Impact of AI on Education", 1), ("impact of  AI on education", 2), ("IMPACT OF AI ON EDUCATION", 3),
+    ("Blockchain in Healthcare", 1), ("Blockchain in Healthcare", 2),
+    ("Cyber Security in Banking", 90), ("Cyber Security in Banking", 100),
+    ("Quantum Computing", 1),
+    ("Ancient History", 24 * 30), ("Ancient History", 24 * 30),
+]):
+    document_catalog.record(f"rank{index:04d}", title=topic, topic=topic, created_at=now - age * hour)
+
+warmer = make_warmer()
+ranked = warmer.rank_topics(now=now)
+topics = [entry['topic'] for entry in ranked]
+check("spellings of a topic counted together, latest spelling kept",
+      ranked[0]['topic'] == "Impact of AI on Education" and ranked[0]['requests'] == 3)
+check("recent requests outrank older ones", topics == ["Impact of AI on Education", "Blockchain in Healthcare",
+                                                      "Cyber Security in Banking"])
+check("single requests and topics outside the window left out",
+      "Quantum Computing" not in topics and "Ancient History" not in topics)
+for _ in range(20):
+    document_catalog.increment_downloads('rank0005')
+check("downloads raise a topic's score", warmer.rank_topics(now=now)[0]['topic'] == "Cyber Security in Banking")
+check("top topics limit", len(make_warmer(top_topics=1).rank_topics(now=now)) == 1)
+print()
+
+# ============================================
+# ONE WARMER PER HOST
+# ============================================
+
+print("3️⃣ Leader election between workers...")
+leader, follower = make_warmer(), make_warmer()
+check("first worker takes the lock", leader._is_leader() and leader.get_stats()['leader'])
+check("other workers do not warm", not follower._is_leader() and not follower.get_stats()['leader'])
+
+shared_cache.set(MODEL_CALLS_KEY, [time.time()] * 2, ttl=3600)
+leader._lock_file.close()  # the leader's process exits
+check("another worker takes over", follower._is_leader())
+check("and inherits this hour's model calls", follower.get_stats()['model_calls_last_hour'] == 2)
+shared_cache.delete(MODEL_CALLS_KEY)
+print()
+
+print("4️⃣ Idle capacity seen across workers...")
+warmer = make_warmer(quiet_seconds=60)
+check("idle when no worker made a live call", warmer._has_idle_capacity())
+make_warmer().note_live_call()  # another worker's live generation
+check("not idle after another worker's live call", not warmer._has_idle_capacity())
+check("no model call while busy", warmer.warm_cycle(generate) == 0 and not calls
+      and warmer.get_stats()['cycles_skipped_busy'] == 1)
+shared_cache.delete(LIVE_CALL_KEY)
+check("idle again once the quiet period is over", warmer._has_idle_capacity())
+print()
+
+# ============================================
+# WARMING
+# ============================================
+
+print("5️⃣ Warming into the shared cache...")
+warmer = make_warmer(max_per_hour=2)
+check("hourly budget stops the cycle", warmer.warm_cycle(generate) == 2 and len(calls) == 2
+      and warmer.get_stats()['cycles_skipped_busy'] == 1)
+check("budget recorded for the next leader", len(shared_cache.get(MODEL_CALLS_KEY, record_stats=False)) == 2)
+check("warmed topics cached for every worker",
+      all(is_cached(topic, PLAN) for topic in calls)
+      and not is_cached("Blockchain in Healthcare", PLAN))
+check("top candidates reported", [entry['topic'] for entry in warmer.get_stats()['top_candidates']]
+      == ["Cyber Security in Banking", "Impact of AI on Education", "Blockchain in Healthcare"])
+
+calls.clear()
+warmer = make_warmer()
+warmed = warmer.warm_cycle(generate)
+stats = warmer.get_stats()
+check("cached topics not generated again", warmed == 1 and calls == ["Blockchain in Healthcare"]
+      and stats['already_cached'] == 2 and stats['warmed'] == 1)
+check("a document pre-rendered per topic", stats['prerendered'] == 3
+      and all(os.path.exists(path) for _, path in warmer._prerendered.values()))
+
+failed = make_warmer()
+failed._prerendered = dict(warmer._prerendered)
+document_catalog.record('rank9999', title="Flaky Topic", topic="Flaky Topic", created_at=now)
+document_catalog.record('rank9998', title="Flaky Topic", topic="Flaky Topic", created_at=now)
+failed.warm_cycle(lambda topic: {'success': False, 'error': 'model error'})
+check("failed generations counted and not cached",
+      failed.get_stats()['errors'] == 1 and not is_cached("Flaky Topic", PLAN))
+print()
+
+# ============================================
+# PRE-RENDERED DOCUMENTS
+# ============================================
+
+print("6️⃣ Pre-rendered documents...")
+topic = "Blockchain in Healthcare"
+sections = {'abstract': f"Abstract of {topic}.", 'conclusion': f"Conclusion of {topic}."}
+copies_dir = os.path.join(TEMP_DIR, 'copies')
+os.makedirs(copies_dir)
+other_worker = make_warmer()
+first = other_worker.copy_prerendered(topic, sections, output_dir=copies_dir)
+second = other_worker.copy_prerendered(topic.upper(), sections, output_dir=copies_dir)
+check("copied by a worker that did not render it", first and first['prerendered'] and os.path.exists(first['filepath']))
+check("each request gets its own file ID", second and first['filename'] != second['filename']
+      and first['filename'].startswith('Blockchain_in_Healthcare_'))
+check("edited sections are not served",
+      other_worker.copy_prerendered(topic, {**sections, 'abstract': "Edited."}, output_dir=copies_dir) is None)
+check("other compression profile is not served",
+      other_worker.copy_prerendered(topic, sections, compression='stored', output_dir=copies_dir) is None)
+check("disabled warmer serves nothing",
+      make_warmer(enabled=False).copy_prerendered(topic, sections, output_dir=copies_dir) is None)
+
+evicting = make_warmer(max_prerendered=1)
+evicting._prerender("Old Topic", generate("Old Topic"))
+old_path = next(iter(evicting._prerendered.values()))[1]
+evicting._prerender("New Topic", generate("New Topic"))
+check("oldest document evicted past the limit", not os.path.exists(old_path)
+      and other_worker.copy_prerendered("Old Topic", sections, output_dir=copies_dir) is None)
+print()
+
+shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+print("="*60)
+print("✅ All topic warmer tests passed!" if not failures else f"❌ {failures} check(s) failed")
+print("="*60 + "\n")
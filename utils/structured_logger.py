@@ -0,0 +1,303 @@
+"""
+Structured Logger
+=================
+
+Non-blocking JSON-lines logger for the request path.
+
+Log calls only build a small record and put it on a queue; a background
+thread formats records, writes them in batches and flushes once per
+batch. Request handlers never wait on log I/O.
+
+Features:
+    - Same interface as utils.logger (info, success, warning, error, get_timestamp)
+    - JSON lines with timestamp, level, message and request ID
+    - Batched writes from a daemon thread, flushed on exit
+    - Per-level sampling for high-volume lines (e.g. keep 10% of info)
+    - Never blocks: records are dropped (and counted) if the queue is full
+
+Configuration (environment variables):
+    LOG_FILE            JSON-lines output file (default: logs/app.jsonl)
+    LOG_CONSOLE         Also print readable lines to stderr (default: true)
+    LOG_SAMPLE_RATES    Per-level keep rates, e.g. "info=0.1,success=0.5"
+    LOG_QUEUE_SIZE      Maximum queued records (default: 10000)
+    LOG_BATCH_SIZE      Records written per batch (default: 256)
+
+Usage:
+    from utils.structured_logger import logger, set_request_id
+
+    set_request_id("3f2a9c1e")
+    logger.info("Topic received", topic="AI in Education")
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_LOG_FILE = os.path.join('logs', 'app.jsonl')
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 256
+
+# Longest time a record waits in the queue before being written
+FLUSH_INTERVAL_SECONDS = 0.5
+
+# Levels that are never sampled out
+UNSAMPLED_LEVELS = frozenset({'WARNING', 'ERROR'})
+
+# Request ID of the request currently being handled (per thread/context)
+_request_id = contextvars.ContextVar('request_id', default=None)
+
+
+# ============================================
+# REQUEST ID HELPERS
+# ============================================
+
+def set_request_id(request_id):
+    """
+    Attach a request ID to every record logged in the current context
+
+    Args:
+        request_id (str): Request identifier (None to clear)
+    """
+    _request_id.set(request_id)
+
+
+def get_request_id():
+    """
+    Get the request ID of the current context
+
+    Returns:
+        str: Request ID, or None outside a request
+    """
+    return _request_id.get()
+
+
+def parse_sample_rates(value):
+    """
+    Parse a "level=rate,level=rate" string
+
+    Args:
+        value (str): Sampling configuration, e.g. "info=0.1,success=0.5"
+
+    Returns:
+        dict: Upper-case level -> keep probability (0.0 to 1.0)
+
+    Example:
+        >>> parse_sample_rates("info=0.1")
+        {'INFO': 0.1}
+    """
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        level, rate = item.split('=', 1)
+        try:
+            rates[level.strip().upper()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+# ============================================
+# STRUCTURED LOGGER CLASS
+# ============================================
+
+class StructuredLogger:
+    """
+    Queue-backed asynchronous JSON-lines logger
+
+    Attributes:
+        log_file (str): Output file path (None disables file output)
+        console (bool): Whether readable lines are printed to stderr
+        sample_rates (dict): Level -> keep probability
+        batch_size (int): Maximum records per write batch
+    """
+
+    def __init__(self, log_file=None, console=None, sample_rates=None,
+                 queue_size=None, batch_size=None):
+        """
+        Initialize the logger and start the writer thread
+
+        Args:
+            log_file (str): JSON-lines file (default: LOG_FILE)
+            console (bool): Print to stderr (default: LOG_CONSOLE)
+            sample_rates (dict): Level -> keep rate (default: LOG_SAMPLE_RATES)
+            queue_size (int): Queue capacity (default: LOG_QUEUE_SIZE)
+            batch_size (int): Batch size (default: LOG_BATCH_SIZE)
+        """
+        self.log_file = log_file if log_file is not None else os.getenv('LOG_FILE', DEFAULT_LOG_FILE)
+        self.console = console if console is not None else (
+            os.getenv('LOG_CONSOLE', 'true').lower() == 'true'
+        )
+        self.sample_rates = sample_rates if sample_rates is not None else (
+            parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))
+        )
+        self.batch_size = int(batch_size or os.getenv('LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+
+        self._queue = queue.Queue(maxsize=int(queue_size or os.getenv('LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)))
+        self._stats_lock = threading.Lock()
+        self._stats = {'logged': 0, 'written': 0, 'sampled_out': 0, 'dropped': 0}
+
+        self._writer = threading.Thread(target=self._write_loop, name='log-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    # ----------------------------------------
+    # Logging methods
+    # ----------------------------------------
+
+    def info(self, message, **fields):
+        """Log an informational message"""
+        self._log('INFO', message, fields)
+
+    def success(self, message, **fields):
+        """Log a success message"""
+        self._log('SUCCESS', message, fields)
+
+    def warning(self, message, **fields):
+        """Log a warning message"""
+        self._log('WARNING', message, fields)
+
+    def error(self, message, **fields):
+        """Log an error message"""
+        self._log('ERROR', message, fields)
+
+    def debug(self, message, **fields):
+        """Log a debug message"""
+        self._log('DEBUG', message, fields)
+
+    @staticmethod
+    def get_timestamp():
+        """
+        Get the current time as an ISO 8601 string
+
+        Returns:
+            str: Timestamp like '2026-02-20T10:30:00.123456'
+        """
+        return datetime.now().isoformat()
+
+    # ----------------------------------------
+    # Control and statistics
+    # ----------------------------------------
+
+    def flush(self, timeout=2.0):
+        """
+        Wait until all queued records are written
+
+        Args:
+            timeout (float): Maximum seconds to wait
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def get_stats(self):
+        """
+        Get logger counters
+
+        Returns:
+            dict: logged, written, sampled_out, dropped and queued counts
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    # ----------------------------------------
+    # Internal methods
+    # ----------------------------------------
+
+    def _log(self, level, message, fields):
+        """Sample, build and enqueue a record (never blocks)"""
+        rate = self.sample_rates.get(level, 1.0)
+        if level not in UNSAMPLED_LEVELS and rate < 1.0 and random.random() >= rate:
+            self._count('sampled_out')
+            return
+
+        record = (time.time(), level, message, _request_id.get(), fields)
+        try:
+            self._queue.put_nowait(record)
+            self._count('logged')
+        except queue.Full:
+            self._count('dropped')
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _write_loop(self):
+        """Background thread: collect batches and write them"""
+        log_handle = None
+
+        while True:
+            try:
+                batch = [self._queue.get(timeout=FLUSH_INTERVAL_SECONDS)]
+            except queue.Empty:
+                continue
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if self.log_file and log_handle is None:
+                    log_directory = os.path.dirname(self.log_file)
+                    if log_directory:
+                        os.makedirs(log_directory, exist_ok=True)
+                    log_handle = open(self.log_file, 'a', encoding='utf-8')
+
+                json_lines = []
+                console_lines = []
+                for created, level, message, request_id, fields in batch:
+                    timestamp = datetime.fromtimestamp(created, tz=timezone.utc).isoformat()
+                    entry = {'timestamp': timestamp, 'level': level, 'message': message}
+                    if request_id:
+                        entry['request_id'] = request_id
+                    if fields:
+                        entry.update(fields)
+                    json_lines.append(json.dumps(entry, ensure_ascii=False, default=str))
+
+                    if self.console:
+                        prefix = f"[{request_id}] " if request_id else ''
+                        console_lines.append(f"{timestamp} {level:<7} {prefix}{message}")
+
+                if log_handle is not None:
+                    log_handle.write('\n'.join(json_lines) + '\n')
+                    log_handle.flush()
+                if console_lines:
+                    sys.stderr.write('\n'.join(console_lines) + '\n')
+                    sys.stderr.flush()
+
+                self._count('written', len(batch))
+
+            except Exception as e:
+                # Logging must never take the application down
+                sys.stderr.write(f"Log writer error: {str(e)}\n")
+
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+logger = StructuredLogger()
@@ -0,0 +1,129 @@
+"""
+Text Statistics
+===============
+
+Single-pass statistics for AI-generated section content.
+
+Every section is tokenized exactly once. The same pass produces the
+word/character/paragraph counts reported in API responses and the
+paragraph split list that document writers use, so nothing downstream
+needs to walk the section text again.
+
+Functions:
+    - analyze_section(): Stats and paragraphs for one section
+    - analyze_sections(): Stats for a whole sections dict plus totals
+    - public_section_stats(): Stats without paragraph lists (for JSON responses)
+
+Usage:
+    from utils.text_stats import analyze_sections
+
+    stats = analyze_sections(sections)
+    stats['word_count']                           # Total words
+    stats['sections']['abstract']['paragraphs']   # Paragraph split list
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import re
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+# A paragraph ends at one or more blank lines
+PARAGRAPH_BREAK_PATTERN = re.compile(r'\n[ \t]*\n')
+
+
+# ============================================
+# ANALYSIS FUNCTIONS
+# ============================================
+
+def analyze_section(text):
+    """
+    Split one section into paragraphs and count words and characters
+
+    Args:
+        text (str): Section content
+
+    Returns:
+        dict: word_count, character_count, paragraph_count and paragraphs
+
+    Example:
+        >>> analyze_section("First paragraph.\\n\\nSecond one here.")['word_count']
+        5
+    """
+    paragraphs = []
+    word_count = 0
+
+    for block in PARAGRAPH_BREAK_PATTERN.split(text or ''):
+        paragraph = block.strip()
+        if not paragraph:
+            continue
+        paragraphs.append(paragraph)
+        word_count += len(paragraph.split())
+
+    return {
+        'word_count': word_count,
+        'character_count': len(text or ''),
+        'paragraph_count': len(paragraphs),
+        'paragraphs': paragraphs
+    }
+
+
+def analyze_sections(sections_dict):
+    """
+    Analyze every section of a document in one pass
+
+    Non-string values (like the 'full_text' key some callers leave in)
+    are skipped.
+
+    Args:
+        sections_dict (dict): Section name -> content
+
+    Returns:
+        dict: Totals plus a 'sections' dict of per-section stats
+    """
+    section_stats = {}
+    total_words = 0
+    total_characters = 0
+    total_paragraphs = 0
+
+    for name, content in sections_dict.items():
+        if name == 'full_text' or not isinstance(content, str):
+            continue
+
+        stats = analyze_section(content)
+        section_stats[name] = stats
+        total_words += stats['word_count']
+        total_characters += stats['character_count']
+        total_paragraphs += stats['paragraph_count']
+
+    return {
+        'word_count': total_words,
+        'character_count': total_characters,
+        'paragraph_count': total_paragraphs,
+        'sections': section_stats
+    }
+
+
+def public_section_stats(stats):
+    """
+    Strip paragraph lists from analyze_sections() output
+
+    Args:
+        stats (dict): Result of analyze_sections()
+
+    Returns:
+        dict: Section name -> counts, safe to include in API responses
+    """
+    return {
+        name: {
+            'word_count': section['word_count'],
+            'character_count': section['character_count'],
+            'paragraph_count': section['paragraph_count']
+        }
+        for name, section in stats['sections'].items()
+    }
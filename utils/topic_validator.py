@@ -0,0 +1,300 @@
+"""
+Topic Validator
+===============
+
+Precompiled normalization and validation of incoming topics.
+
+Topic validation runs first on every `/generate` and `/api/generate` call,
+which makes it the first line of defence against junk traffic. Everything
+the validator needs is compiled when the module is imported: the regular
+expressions, and the blocked terms merged into a trie and compiled to a
+single regex. A flood of identical bad requests is answered from a
+bounded memo of recent verdicts.
+
+Pipeline (cheapest check first):
+    1. Memo lookup on the raw input
+    2. Hard size limit (before any normalization work)
+    3. Normalization: Unicode NFKC, control characters removed,
+       whitespace collapsed
+    4. Junk patterns: no letters, long character runs, URLs
+    5. Blocked terms (case-folded, on word boundaries) in one pass
+    6. The existing rules of utils.helpers.validate_topic()
+
+Configuration (environment variables):
+    TOPIC_BLOCKLIST_PATH        Extra blocked terms, one per line, # comments (optional)
+    TOPIC_MAX_INPUT_CHARS       Raw inputs longer than this are rejected (default: 1000)
+    TOPIC_VALIDATION_MEMO_SIZE  Verdicts remembered (default: 4096)
+
+Usage:
+    from utils.topic_validator import topic_validator
+
+    verdict = topic_validator.validate(request_data.get('topic', ''))
+    if not verdict.is_valid:
+        return error(verdict.error, verdict.error_code)
+    topic = verdict.topic
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+from utils.helpers import validate_topic as validate_topic_rules
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_MAX_INPUT_CHARS = 1000
+DEFAULT_MEMO_SIZE = 4096
+
+# Inputs longer than this are not memoized (they would crowd out the memo)
+MAX_MEMO_KEY_CHARS = 256
+
+# Prompt-injection phrases that no academic topic contains. Terms that are
+# also legitimate subjects ('jailbreak', 'system prompt', 'union select',
+# '<script', ...) belong in a deployment's TOPIC_BLOCKLIST_PATH instead:
+# "Jailbreak detection in iOS security" is a valid blackbook topic.
+BUILTIN_BLOCKED_TERMS = (
+    'ignore previous instructions',
+    'ignore all previous instructions',
+    'disregard previous instructions',
+    'disregard all previous instructions',
+)
+
+# Compiled once at import
+CONTROL_CHARS_PATTERN = re.compile(r'[\x00-\x08\x0b-\x1f\x7f\u200b-\u200f\u202a-\u202e\u2060-\u2064\ufeff]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+LETTER_PATTERN = re.compile(r'[^\W\d_]')
+CHARACTER_RUN_PATTERN = re.compile(r'(.)\1{7,}')
+URL_PATTERN = re.compile(r'(?:https?://|www\.)\S', re.IGNORECASE)
+
+# Trie-to-regex building blocks
+TERM_END = ''
+WORD_CHARACTER_PATTERN = re.compile(r'\w')
+WORD_START = r'(?<!\w)'
+WORD_END = r'(?!\w)'
+
+Verdict = namedtuple('Verdict', ['is_valid', 'error', 'error_code', 'topic'])
+
+
+# ============================================
+# TRIE MATCHER
+# ============================================
+
+class TermMatcher:
+    """
+    Blocked terms merged into a trie and compiled to a single regex
+
+    Shared prefixes are factored out ('drop table' and 'drop database'
+    become 'drop (?:table|database)'), so one search walks the text once
+    in C instead of once per term. Terms only match on word boundaries:
+    'drop table' does not match inside 'raindrop tables'.
+    """
+
+    def __init__(self, terms):
+        trie = {}
+        for term in terms:
+            term = WHITESPACE_PATTERN.sub(' ', term.casefold()).strip()
+            if not term:
+                continue
+            node = trie
+            for character in term:
+                node = node.setdefault(character, {})
+            node[TERM_END] = True
+
+        self.term_count = sum(1 for _ in self._iter_ends(trie))
+        self._pattern = re.compile('|'.join(
+            (WORD_START if WORD_CHARACTER_PATTERN.match(character) else '')
+            + re.escape(character) + self._to_pattern(child, character)
+            for character, child in sorted(trie.items())
+        )) if trie else None
+
+    def _to_pattern(self, node, last_character):
+        """Regex for the subtree below one trie node (longest branches first)"""
+        branches = [
+            re.escape(character) + self._to_pattern(child, character)
+            for character, child in sorted(node.items()) if character != TERM_END
+        ]
+        if TERM_END in node:
+            branches.append(WORD_END if WORD_CHARACTER_PATTERN.match(last_character) else '')
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    def _iter_ends(self, node):
+        for character, child in node.items():
+            if character == TERM_END:
+                yield character
+            else:
+                yield from self._iter_ends(child)
+
+    def find(self, text):
+        """
+        Find the first blocked term in a case-folded, normalized text
+
+        Args:
+            text (str): Case-folded text
+
+        Returns:
+            str: The matched term, or None
+        """
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text)
+        return match.group(0) if match else None
+
+    def __len__(self):
+        return self.term_count
+
+
+# ============================================
+# TOPIC VALIDATOR CLASS
+# ============================================
+
+class TopicValidator:
+    """
+    Normalizes topics and rejects junk with precompiled rules
+
+    Attributes:
+        max_input_chars (int): Hard limit on the raw input
+        memo_size (int): Number of remembered verdicts
+    """
+
+    def __init__(self, blocked_terms=None, max_input_chars=None, memo_size=None):
+        self.max_input_chars = int(max_input_chars or os.getenv('TOPIC_MAX_INPUT_CHARS', DEFAULT_MAX_INPUT_CHARS))
+        self.memo_size = int(memo_size or os.getenv('TOPIC_VALIDATION_MEMO_SIZE', DEFAULT_MEMO_SIZE))
+
+        if blocked_terms is None:
+            blocked_terms = list(BUILTIN_BLOCKED_TERMS) + self._load_blocklist()
+        self.matcher = TermMatcher(blocked_terms)
+
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'validated': 0, 'rejected': 0, 'memo_hits': 0, 'blocked': 0}
+
+    @staticmethod
+    def _load_blocklist():
+        """Read TOPIC_BLOCKLIST_PATH (one term per line, # comments)"""
+        path = os.getenv('TOPIC_BLOCKLIST_PATH')
+        if not path:
+            return []
+        try:
+            with open(path, encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        except OSError:
+            return []
+
+    # ----------------------------------------
+    # Validation
+    # ----------------------------------------
+
+    def normalize(self, topic):
+        """
+        Canonical form of a topic: NFKC, no control characters, single spaces
+
+        Case is kept (it is the document title); matching uses casefold().
+
+        Args:
+            topic (str): Raw topic
+
+        Returns:
+            str: Normalized topic
+        """
+        topic = unicodedata.normalize('NFKC', topic)
+        topic = CONTROL_CHARS_PATTERN.sub('', topic)
+        return WHITESPACE_PATTERN.sub(' ', topic).strip()
+
+    def validate(self, topic):
+        """
+        Validate and normalize a topic
+
+        Args:
+            topic (str): Raw topic from the request
+
+        Returns:
+            Verdict: is_valid, error, error_code and the normalized topic
+        """
+        if not isinstance(topic, str):
+            return self._count(Verdict(False, "Topic must be a string", "INVALID_TOPIC", None))
+
+        memoizable = len(topic) <= MAX_MEMO_KEY_CHARS
+        if memoizable:
+            with self._lock:
+                verdict = self._memo.get(topic)
+                if verdict is not None:
+                    self._memo.move_to_end(topic)
+                    self._stats['memo_hits'] += 1
+            if verdict is not None:
+                return self._count(verdict)
+
+        verdict = self._evaluate(topic)
+
+        if memoizable:
+            with self._lock:
+                self._memo[topic] = verdict
+                if len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+
+        return self._count(verdict)
+
+    def _evaluate(self, topic):
+        """Run the rule pipeline on one input (no memo)"""
+        if len(topic) > self.max_input_chars:
+            return Verdict(False, f"Topic is too long (maximum {self.max_input_chars} characters)",
+                           "TOPIC_TOO_LONG", None)
+
+        normalized = self.normalize(topic)
+        if not normalized:
+            return Verdict(False, "Topic cannot be empty", "EMPTY_TOPIC", None)
+
+        if not LETTER_PATTERN.search(normalized):
+            return Verdict(False, "Topic must contain words", "INVALID_TOPIC", None)
+        if CHARACTER_RUN_PATTERN.search(normalized):
+            return Verdict(False, "Topic contains repeated characters", "INVALID_TOPIC", None)
+        if URL_PATTERN.search(normalized):
+            return Verdict(False, "Topic cannot contain links", "INVALID_TOPIC", None)
+
+        if self.matcher.find(normalized.casefold()) is not None:
+            with self._lock:
+                self._stats['blocked'] += 1
+            return Verdict(False, "Topic is not allowed", "BLOCKED_TOPIC", None)
+
+        is_valid, error_message, error_code = validate_topic_rules(normalized)
+        if not is_valid:
+            return Verdict(False, error_message, error_code, None)
+
+        return Verdict(True, None, None, normalized)
+
+    def _count(self, verdict):
+        with self._lock:
+            self._stats['validated'] += 1
+            if not verdict.is_valid:
+                self._stats['rejected'] += 1
+        return verdict
+
+    def get_stats(self):
+        """
+        Get validation counters
+
+        Returns:
+            dict: Validated, rejected, blocked and memo hits, memo size, terms
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memo_entries'] = len(self._memo)
+        stats['blocked_terms'] = len(self.matcher)
+        return stats
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+topic_validator = TopicValidator()
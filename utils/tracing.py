@@ -0,0 +1,368 @@
+"""
+Request Tracing
+===============
+
+Lightweight built-in tracing for the generation pipeline.
+
+Spans follow the OpenTelemetry data model (32-hex trace IDs, 16-hex span
+IDs, parent links, nanosecond timestamps, attributes, status) and W3C
+`traceparent` propagation, but are exported locally so no collector is
+needed. A finished trace is written as one JSON line containing all of its
+spans.
+
+Features:
+    - tracer.span() context manager with automatic parent/child nesting
+    - instrument_methods() wraps existing methods in spans without editing them
+    - Exporters: 'file' (JSON lines), 'console' (stderr summary) or 'none'
+    - Export happens on a background thread
+
+Configuration (environment variables):
+    TRACE_EXPORTER   file | console | none (default: file)
+    TRACE_FILE       Output for the file exporter (default: logs/traces.jsonl)
+
+Usage:
+    from utils.tracing import tracer
+
+    with tracer.span("validate_topic", topic_length=len(topic)):
+        validate_topic(topic)
+"""
+
+# ============================================
+# IMPORTS
+# ============================================
+
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+
+
+# ============================================
+# CONSTANTS
+# ============================================
+
+DEFAULT_TRACE_FILE = os.path.join('logs', 'traces.jsonl')
+SUPPORTED_EXPORTERS = ('file', 'console', 'none')
+
+# Span currently active in this context
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+# ============================================
+# SPAN CLASS
+# ============================================
+
+class Span:
+    """
+    One timed operation inside a trace
+
+    Attributes:
+        name (str): Operation name
+        trace_id (str): 32-hex trace identifier
+        span_id (str): 16-hex span identifier
+        parent_span_id (str): Parent span ID (None for the root span)
+        attributes (dict): Key/value details about the operation
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_span_id', 'attributes',
+                 'start_ns', 'end_ns', 'status', 'status_message', 'children',
+                 'is_local_root', '_token')
+
+    def __init__(self, name, trace_id, parent_span_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = 'UNSET'
+        self.status_message = None
+        self.children = []
+        self.is_local_root = False
+        self._token = None
+
+    def set_attribute(self, key, value):
+        """Attach a detail to the span"""
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        """Mark the span as failed"""
+        self.status = 'ERROR'
+        self.status_message = message
+
+    @property
+    def duration_ms(self):
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self):
+        """Serialize in OpenTelemetry (OTLP JSON) field naming"""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_span_id or '',
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'durationMs': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'status': {'code': self.status}
+        }
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+
+# ============================================
+# TRACER CLASS
+# ============================================
+
+class Tracer:
+    """
+    Creates spans and exports finished traces
+
+    Attributes:
+        exporter (str): 'file', 'console' or 'none'
+        trace_file (str): Output path for the file exporter
+    """
+
+    def __init__(self, exporter=None, trace_file=None):
+        """
+        Initialize the tracer
+
+        Args:
+            exporter (str): Exporter name (default: TRACE_EXPORTER or 'file')
+            trace_file (str): JSON-lines output (default: TRACE_FILE)
+        """
+        exporter = (exporter or os.getenv('TRACE_EXPORTER', 'file')).lower()
+        self.exporter = exporter if exporter in SUPPORTED_EXPORTERS else 'file'
+        self.trace_file = trace_file or os.getenv('TRACE_FILE', DEFAULT_TRACE_FILE)
+
+        self._queue = queue.Queue(maxsize=1000)
+        if self.exporter != 'none':
+            threading.Thread(target=self._export_loop, name='trace-exporter', daemon=True).start()
+
+    # ----------------------------------------
+    # Span creation
+    # ----------------------------------------
+
+    def start_span(self, name, traceparent=None, **attributes):
+        """
+        Start a span and make it the current span
+
+        A span started without an active parent begins a new trace (or
+        continues the one in a W3C `traceparent` header). End it with
+        end_span().
+
+        Args:
+            name (str): Operation name
+            traceparent (str): Optional incoming W3C traceparent header
+            **attributes: Span attributes
+
+        Returns:
+            Span: The started span
+        """
+        parent = _current_span.get()
+
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+            parent.children.append(span)
+        else:
+            trace_id, parent_id = _parse_traceparent(traceparent)
+            span = Span(name, trace_id or secrets.token_hex(16), parent_id, attributes)
+            span.is_local_root = True
+
+        span._token = _current_span.set(span)
+        return span
+
+    def end_span(self, span, error=None):
+        """
+        Finish a span; finishing a root span exports its whole trace
+
+        Args:
+            span (Span): Span returned by start_span()
+            error (str): Error message if the operation failed
+        """
+        if span.end_ns is not None:
+            return
+
+        span.end_ns = time.time_ns()
+        if error:
+            span.set_error(error)
+        elif span.status == 'UNSET':
+            span.status = 'OK'
+
+        if span._token is not None:
+            try:
+                _current_span.reset(span._token)
+            except ValueError:
+                # Ended from a different context; just clear it
+                _current_span.set(None)
+            span._token = None
+
+        if span.is_local_root:
+            self._export(span)
+
+    def span(self, name, **attributes):
+        """
+        Context manager that wraps a block in a span
+
+        Args:
+            name (str): Operation name
+            **attributes: Span attributes
+
+        Returns:
+            contextmanager: Yields the Span
+        """
+        return _SpanContext(self, name, attributes)
+
+    def current_span(self):
+        """Get the active span (or None)"""
+        return _current_span.get()
+
+    @staticmethod
+    def traceparent(span):
+        """
+        Format a span as a W3C traceparent header value
+
+        Args:
+            span (Span): Span to reference
+
+        Returns:
+            str: Header like '00-<trace_id>-<span_id>-01'
+        """
+        return f"00-{span.trace_id}-{span.span_id}-01"
+
+    # ----------------------------------------
+    # Export
+    # ----------------------------------------
+
+    def _export(self, root_span):
+        """Queue a finished trace for export (never blocks)"""
+        if self.exporter == 'none':
+            return
+        try:
+            self._queue.put_nowait(root_span)
+        except queue.Full:
+            pass
+
+    def _export_loop(self):
+        """Background thread: write finished traces"""
+        while True:
+            root_span = self._queue.get()
+            try:
+                spans = []
+                pending = [root_span]
+                while pending:
+                    span = pending.pop()
+                    spans.append(span.to_dict())
+                    pending.extend(span.children)
+                spans.sort(key=lambda item: item['startTimeUnixNano'])
+
+                if self.exporter == 'file':
+                    directory = os.path.dirname(self.trace_file)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with open(self.trace_file, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps({'traceId': root_span.trace_id, 'spans': spans},
+                                           default=str) + '\n')
+                else:
+                    lines = [f"trace {root_span.trace_id} ({root_span.duration_ms:.1f} ms)"]
+                    lines.extend(
+                        f"  {item['name']:<40} {item['durationMs']:>10.1f} ms  {item['status']['code']}"
+                        for item in spans
+                    )
+                    sys.stderr.write('\n'.join(lines) + '\n')
+
+            except Exception as e:
+                sys.stderr.write(f"Trace export error: {str(e)}\n")
+
+
+class _SpanContext:
+    """Context manager returned by Tracer.span()"""
+
+    def __init__(self, tracer, name, attributes):
+        self._tracer = tracer
+        self._name = name
+        self._attributes = attributes
+        self._span = None
+
+    def __enter__(self):
+        self._span = self._tracer.start_span(self._name, **self._attributes)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        error = f"{exc_type.__name__}: {exc_value}" if exc_type else None
+        self._tracer.end_span(self._span, error=error)
+        return False
+
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+
+def _parse_traceparent(header):
+    """
+    Read trace and parent span IDs from a W3C traceparent header
+
+    Returns:
+        tuple: (trace_id, parent_span_id) or (None, None) if invalid
+    """
+    parts = (header or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None, None
+    return parts[1], parts[2]
+
+
+def instrument_methods(target, method_names, prefix):
+    """
+    Wrap methods of an existing object in spans
+
+    Missing methods are skipped, so instrumentation keeps working when
+    the wrapped class changes.
+
+    Args:
+        target (object): Instance (or class) whose methods should be traced
+        method_names (iterable): Method names to wrap
+        prefix (str): Span name prefix, e.g. 'DocumentGenerator'
+
+    Returns:
+        list: Names of the methods that were wrapped
+    """
+    wrapped = []
+
+    for method_name in method_names:
+        original = getattr(target, method_name, None)
+        if original is None or not callable(original) or getattr(original, '_traced', False):
+            continue
+
+        def make_wrapper(function, span_name):
+            @functools.wraps(function)
+            def traced(*args, **kwargs):
+                with tracer.span(span_name):
+                    return function(*args, **kwargs)
+            traced._traced = True
+            return traced
+
+        setattr(target, method_name, make_wrapper(original, f"{prefix}.{method_name}"))
+        wrapped.append(method_name)
+
+    return wrapped
+
+
+# ============================================
+# GLOBAL INSTANCE
+# ============================================
+
+tracer = Tracer()